@@ -8,6 +8,7 @@ import enum
 from datetime import datetime
 from models import db
 from sqlalchemy.ext.hybrid import hybrid_property
+from money import Money, MONEY_SCALE
 
 class ExchangeType(enum.Enum):
     """Types of currency exchanges"""
@@ -362,10 +363,10 @@ class CurrencyExchangeTransaction(db.Model):
     exchange_type = db.Column(db.Enum(ExchangeType), nullable=False)
     from_currency = db.Column(db.Enum(CurrencyType), nullable=False)
     to_currency = db.Column(db.Enum(CurrencyType), nullable=False)
-    from_amount = db.Column(db.Float, nullable=False)
-    to_amount = db.Column(db.Float, nullable=False)
+    from_amount = db.Column(Money(MONEY_SCALE, numeric=True), nullable=False)
+    to_amount = db.Column(Money(MONEY_SCALE, numeric=True), nullable=False)
     rate_applied = db.Column(db.Float, nullable=False)
-    fee_amount = db.Column(db.Float, default=0.0)
+    fee_amount = db.Column(Money(MONEY_SCALE, numeric=True), default=0)
     fee_currency = db.Column(db.Enum(CurrencyType))
     status = db.Column(db.Enum(ExchangeStatus), default=ExchangeStatus.PENDING)
     reference_number = db.Column(db.String(50), unique=True)
@@ -398,8 +399,8 @@ class BankAccount(db.Model):
     account_name = db.Column(db.String(255))
     account_type = db.Column(db.Enum(AccountType), default=AccountType.CHECKING)
     currency = db.Column(db.Enum(CurrencyType), nullable=False)
-    balance = db.Column(db.Float, default=0.0)
-    available_balance = db.Column(db.Float, default=0.0)
+    balance = db.Column(Money(MONEY_SCALE, numeric=True), default=0)
+    available_balance = db.Column(Money(MONEY_SCALE, numeric=True), default=0)
     status = db.Column(db.Enum(AccountStatus), default=AccountStatus.ACTIVE)
     
     # Foreign keys
@@ -411,4 +412,20 @@ class BankAccount(db.Model):
     last_transaction_at = db.Column(db.DateTime)
     
     def __repr__(self):
-        return f"<BankAccount {self.account_number} ({self.currency.value}): {self.balance}>"
\ No newline at end of file
+        return f"<BankAccount {self.account_number} ({self.currency.value}): {self.balance}>"
+
+class BankAccountBalanceCheckpoint(db.Model):
+    """Balance of a bank account at the close of a day (see statement_checkpoints.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('bank_account.id'), nullable=False)
+    as_of = db.Column(db.DateTime, nullable=False)  # End of the day, exclusive
+    balance = db.Column(Money(MONEY_SCALE, numeric=True), nullable=False)
+    entry_count = db.Column(db.Integer, default=0)  # Entries on that day
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'as_of', name='uq_balance_checkpoint_account_as_of'),
+    )
+
+    def __repr__(self):
+        return f"<BankAccountBalanceCheckpoint {self.account_id} @ {self.as_of}: {self.balance}>"
@@ -10,6 +10,11 @@ import logging
 import psycopg2
 from datetime import datetime
 
+from money import Money, MONEY_SCALE
+
+# Storage of bank_account.balance and available_balance (BankAccount in account_holder_models)
+BALANCE = Money(MONEY_SCALE, numeric=True)
+
 # Get database connection parameters from environment
 db_url = os.environ.get('DATABASE_URL')
 
@@ -82,7 +87,7 @@ try:
             (account_number, account_name, account_type, currency, balance, available_balance, 
              status, account_holder_id, created_at, updated_at)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, ("USD-testaccount", "Test USD Account", "CHECKING", "USD", 10000.00, 10000.00, 
+        """, ("USD-testaccount", "Test USD Account", "CHECKING", "USD", BALANCE.to_storage(10000), BALANCE.to_storage(10000), 
               "ACTIVE", account_holder_id, now, now))
         
         # Insert bank accounts - NVCT
@@ -91,7 +96,7 @@ try:
             (account_number, account_name, account_type, currency, balance, available_balance, 
              status, account_holder_id, created_at, updated_at)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, ("NVCT-testaccount", "Test NVCT Account", "CUSTODY", "NVCT", 5000.00, 5000.00, 
+        """, ("NVCT-testaccount", "Test NVCT Account", "CUSTODY", "NVCT", BALANCE.to_storage(5000), BALANCE.to_storage(5000), 
               "ACTIVE", account_holder_id, now, now))
         
         # Commit all changes
@@ -0,0 +1,49 @@
+"""
+Add bank account balance checkpoints for account statements
+
+Creates bank_account_balance_checkpoint, adds the index statements use to
+read an account's entries in time order, and records the closing balance of
+every past day with activity for each account.
+"""
+import sys
+from sqlalchemy import text
+from app import db, app
+
+def add_balance_checkpoints():
+    """Create the checkpoint table and entry index, then build checkpoints"""
+
+    with app.app_context():
+        try:
+            from account_holder_models import BankAccountBalanceCheckpoint
+            from statement_checkpoints import compact
+
+            print("Creating bank_account_balance_checkpoint table...")
+            BankAccountBalanceCheckpoint.__table__.create(db.engine, checkfirst=True)
+
+            postgres = db.engine.dialect.name == 'postgresql'
+            with db.engine.connect() as connection:
+                if postgres:
+                    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+                    connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+                print("Creating index ix_transaction_recipient_account_created...")
+                concurrently = 'CONCURRENTLY ' if postgres else ''
+                connection.execute(text(
+                    f'CREATE INDEX {concurrently}IF NOT EXISTS ix_transaction_recipient_account_created '
+                    f'ON "transaction" (recipient_account, created_at, id);'
+                ))
+                if not postgres:
+                    connection.commit()
+
+            print("Building balance checkpoints...")
+            added = compact()
+            print(f"Added {added} balance checkpoints")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error: {str(e)}")
+            return False
+
+if __name__ == "__main__":
+    result = add_balance_checkpoints()
+    sys.exit(0 if result else 1)
@@ -0,0 +1,47 @@
+"""
+Add composite indexes for transaction history listings
+
+Payment history pages and APIs list a user's transactions newest first,
+optionally filtered by status or type, using keyset pagination on
+(created_at, id). These indexes let every page be read straight from the
+index instead of sorting or scanning the user's whole history.
+"""
+import sys
+from sqlalchemy import text
+from app import db, app
+
+INDEXES = {
+    'ix_transaction_user_created': '(user_id, created_at, id)',
+    'ix_transaction_user_status_created': '(user_id, status, created_at, id)',
+    'ix_transaction_user_type_created': '(user_id, transaction_type, created_at, id)',
+}
+
+def add_transaction_history_indexes():
+    """Create the transaction history indexes if they don't exist"""
+    
+    with app.app_context():
+        try:
+            postgres = db.engine.dialect.name == 'postgresql'
+            with db.engine.connect() as connection:
+                if postgres:
+                    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+                    connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+                for name, columns in INDEXES.items():
+                    print(f"Creating index {name}...")
+                    concurrently = 'CONCURRENTLY ' if postgres else ''
+                    connection.execute(text(
+                        f'CREATE INDEX {concurrently}IF NOT EXISTS {name} ON "transaction" {columns};'
+                    ))
+                if not postgres:
+                    connection.commit()
+            
+            print("Transaction history indexes created successfully")
+            return True
+            
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return False
+
+if __name__ == "__main__":
+    result = add_transaction_history_indexes()
+    sys.exit(0 if result else 1)
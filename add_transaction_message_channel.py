@@ -0,0 +1,119 @@
+"""
+Add and backfill the message_channel column on the transaction table
+
+New and updated transactions are classified on write (see
+models.classify_message_channel). This script adds the column and its index
+to existing databases and classifies the rows written before it existed,
+in batches so it can run against a live table.
+"""
+import sys
+from sqlalchemy import text, update, bindparam
+from app import db, app
+
+BATCH_SIZE = 5000
+INDEX_NAME = 'ix_transaction_user_channel_created'
+
+def add_message_channel_column():
+    """
+    Add message_channel and ix_transaction_user_channel_created if they don't exist
+
+    On PostgreSQL the index is built with CREATE INDEX CONCURRENTLY, so
+    writes to the table continue while it builds.
+    """
+    inspector = db.inspect(db.engine)
+    columns = [column['name'] for column in inspector.get_columns('transaction')]
+    if 'message_channel' in columns:
+        print("Column message_channel already exists in transaction table")
+    else:
+        print("Adding message_channel column to transaction table...")
+        if db.engine.dialect.name == 'postgresql':
+            from models import MessageChannel
+            values = ', '.join(f"'{channel.name}'" for channel in MessageChannel)
+            db.session.execute(text(
+                f"DO $$ BEGIN CREATE TYPE messagechannel AS ENUM ({values}); "
+                f"EXCEPTION WHEN duplicate_object THEN NULL; END $$;"
+            ))
+            db.session.execute(text('ALTER TABLE "transaction" ADD COLUMN message_channel messagechannel;'))
+        else:
+            db.session.execute(text('ALTER TABLE "transaction" ADD COLUMN message_channel VARCHAR(5);'))
+        db.session.commit()
+
+    postgres = db.engine.dialect.name == 'postgresql'
+    with db.engine.connect() as connection:
+        if postgres:
+            # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+            connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+            # An interrupted concurrent build leaves an invalid index that IF NOT EXISTS would keep
+            invalid = connection.execute(text(
+                "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+            ), {'name': INDEX_NAME}).scalar()
+            if invalid:
+                print(f"Dropping invalid index {INDEX_NAME} left by an interrupted build...")
+                connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME};'))
+        print(f"Creating index {INDEX_NAME}...")
+        concurrently = 'CONCURRENTLY ' if postgres else ''
+        connection.execute(text(
+            f'CREATE INDEX {concurrently}IF NOT EXISTS {INDEX_NAME} '
+            'ON "transaction" (user_id, message_channel, created_at, id);'
+        ))
+        if not postgres:
+            connection.commit()
+
+def backfill_message_channel():
+    """Classify every transaction that has no message_channel yet"""
+    from models import Transaction, FinancialInstitution, classify_message_channel
+
+    institution_names = dict(db.session.query(FinancialInstitution.id, FinancialInstitution.name).all())
+    table = Transaction.__table__
+    statement = update(table).where(table.c.id == bindparam('row_id')).values(
+        message_channel=bindparam('channel')
+    )
+
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.session.query(
+            Transaction.id, Transaction.transaction_type, Transaction.description,
+            Transaction.tx_metadata_json, Transaction.institution_id
+        ).filter(
+            Transaction.id > last_id,
+            Transaction.message_channel.is_(None)
+        ).order_by(Transaction.id).limit(BATCH_SIZE).all()
+        if not rows:
+            break
+
+        params = [{
+            'row_id': row.id,
+            'channel': classify_message_channel(
+                row.transaction_type, row.description, row.tx_metadata_json,
+                institution_names.get(row.institution_id)
+            )
+        } for row in rows]
+        db.session.execute(statement, params)
+        db.session.commit()
+
+        last_id = rows[-1].id
+        total += len(rows)
+        print(f"Classified {total} transactions...")
+
+    return total
+
+def add_transaction_message_channel():
+    """Add the message_channel column and index, then backfill existing rows"""
+
+    with app.app_context():
+        try:
+            add_message_channel_column()
+            total = backfill_message_channel()
+            print(f"message_channel backfilled for {total} transactions")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error: {str(e)}")
+            return False
+
+if __name__ == "__main__":
+    result = add_transaction_message_channel()
+    sys.exit(0 if result else 1)
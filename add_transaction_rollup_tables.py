@@ -0,0 +1,42 @@
+"""
+Add the transaction analytics rollup tables and backfill them
+
+Creates transaction_daily_rollup and transaction_rollup_day, adds the
+created_at index that the live part of the analytics query relies on, and
+builds rollups for every closed day.
+"""
+import sys
+from sqlalchemy import text
+from app import db, app
+
+def add_transaction_rollup_tables():
+    """Create the rollup tables and index, then build rollups for past days"""
+
+    with app.app_context():
+        try:
+            from models import TransactionDailyRollup, TransactionRollupDay
+            from transaction_rollup import compact
+
+            print("Creating transaction rollup tables...")
+            TransactionDailyRollup.__table__.create(db.engine, checkfirst=True)
+            TransactionRollupDay.__table__.create(db.engine, checkfirst=True)
+
+            print("Adding index on transaction.created_at...")
+            db.session.execute(text(
+                'CREATE INDEX IF NOT EXISTS ix_transaction_created_at ON "transaction" (created_at);'
+            ))
+            db.session.commit()
+
+            print("Building rollups for past days...")
+            days = compact()
+            print(f"Built transaction rollups for {days} days")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error: {str(e)}")
+            return False
+
+if __name__ == "__main__":
+    result = add_transaction_rollup_tables()
+    sys.exit(0 if result else 1)
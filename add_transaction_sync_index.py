@@ -0,0 +1,57 @@
+"""
+Add the unique index that PHP platform transaction syncs upsert against
+
+The /transaction/sync endpoint writes new transactions with
+INSERT ... ON CONFLICT (external_id), which needs a unique index on
+external_id. Other integrations reuse external ids, so the index is partial
+and only covers synced transactions (transaction_id NVC-SYNC-...).
+"""
+import sys
+from sqlalchemy import text
+from app import db, app
+
+INDEX_NAME = 'ux_transaction_sync_external_id'
+INDEX_WHERE = "transaction_id LIKE 'NVC-SYNC-%'"
+
+def add_transaction_sync_index():
+    """Create the sync upsert index if it doesn't exist"""
+
+    with app.app_context():
+        try:
+            postgres = db.engine.dialect.name == 'postgresql'
+            with db.engine.connect() as connection:
+                # Syncs racing before this index existed can have left duplicates
+                duplicates = connection.execute(text(
+                    f'SELECT external_id, COUNT(*) FROM "transaction" WHERE {INDEX_WHERE} '
+                    'AND external_id IS NOT NULL GROUP BY external_id HAVING COUNT(*) > 1'
+                )).fetchall()
+                if duplicates:
+                    print(f"Error: {len(duplicates)} external ids are shared by several synced transactions, "
+                          "merge them before adding the index:")
+                    for external_id, count in duplicates[:20]:
+                        print(f"  {external_id}: {count} transactions")
+                    return False
+
+                if postgres:
+                    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+                    connection.commit()
+                    connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+                print(f"Creating index {INDEX_NAME}...")
+                concurrently = 'CONCURRENTLY ' if postgres else ''
+                connection.execute(text(
+                    f'CREATE UNIQUE INDEX {concurrently}IF NOT EXISTS {INDEX_NAME} '
+                    f'ON "transaction" (external_id) WHERE {INDEX_WHERE};'
+                ))
+                if not postgres:
+                    connection.commit()
+
+            print("Transaction sync index created successfully")
+            return True
+
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return False
+
+if __name__ == "__main__":
+    result = add_transaction_sync_index()
+    sys.exit(0 if result else 1)
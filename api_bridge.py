@@ -11,6 +11,7 @@ import requests
 import hmac
 import hashlib
 import time
+import tempfile
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.security import generate_password_hash
 from datetime import datetime, timedelta
@@ -18,6 +19,7 @@ from datetime import datetime, timedelta
 from models import db, User, PaymentGateway, Transaction, TransactionStatus, UserRole
 from payment_gateways import get_gateway_handler, get_gateway_by_type, PaymentGatewayType
 from auth import api_key_required, jwt_required
+from transaction_sync import sync_transaction_rows, iter_ndjson
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +39,8 @@ def disable_csrf():
 # Constants
 API_TIMEOUT = 30  # seconds
 SHARED_SECRET = "php_bridge_shared_secret"  # Shared secret for signature verification
+NDJSON_MIMETYPE = 'application/x-ndjson'  # Streamed transaction sync uploads
+NDJSON_BLOCK_SIZE = 64 * 1024  # bytes read per step when spooling a signed upload
 
 
 def verify_nvcplatform_signature(request_data, signature, shared_secret):
@@ -226,7 +230,21 @@ def sync_transactions(user):
         ],
         "signature": "hmac_signature"
     }
+    
+    Large syncs can instead be streamed as application/x-ndjson, one
+    transaction object per line, optionally signed with an X-NVC-Signature
+    header holding the hex HMAC-SHA256 of the body. The body is then read
+    line by line, so its size is not bounded by request memory.
+    
+    Transactions are written in chunks (see transaction_sync.py); rows that
+    fail are listed in "errors" with their index and transaction_id.
     """
+    gateway = get_gateway_by_type(PaymentGatewayType.NVC_GLOBAL)
+    gateway_id = gateway.id if gateway else None
+    
+    if request.mimetype == NDJSON_MIMETYPE:
+        return _sync_ndjson_transactions(gateway_id)
+    
     # Get request data
     data = request.json
     
@@ -240,85 +258,27 @@ def sync_transactions(user):
         if not verify_nvcplatform_signature(data, signature, SHARED_SECRET):
             return jsonify({"success": False, "error": "Invalid signature"}), 401
     
-    # Process transaction data
-    transactions = data['transactions']
-    results = {
-        "success": True,
-        "processed": 0,
-        "created": 0,
-        "updated": 0,
-        "errors": []
-    }
-    
-    for txn in transactions:
-        try:
-            # Find user by external customer ID
-            user = User.query.filter_by(external_customer_id=txn['customer_id']).first()
-            
-            if not user:
-                results["errors"].append({
-                    "transaction": txn.get('transaction_id'),
-                    "error": f"User with customer_id {txn['customer_id']} not found"
-                })
-                continue
-            
-            # Check if transaction exists
-            transaction = Transaction.query.filter_by(
-                external_id=txn['transaction_id']
-            ).first()
-            
-            # Map PHP transaction status to our status
-            status_mapping = {
-                'pending': TransactionStatus.PENDING,
-                'processing': TransactionStatus.PROCESSING,
-                'completed': TransactionStatus.COMPLETED,
-                'failed': TransactionStatus.FAILED,
-                'refunded': TransactionStatus.REFUNDED,
-                'cancelled': TransactionStatus.FAILED
-            }
-            
-            transaction_status = status_mapping.get(
-                txn['status'].lower(), 
-                TransactionStatus.PENDING
-            )
-            
-            if transaction:
-                # Update existing transaction
-                transaction.amount = txn['amount']
-                transaction.currency = txn['currency']
-                transaction.description = txn['description']
-                transaction.status = transaction_status
-                
-                db.session.commit()
-                results["updated"] += 1
-            else:
-                # Create new transaction
-                new_transaction = Transaction(
-                    transaction_id=f"NVC-SYNC-{int(time.time())}-{user.id}",
-                    external_id=txn['transaction_id'],
-                    user_id=user.id,
-                    amount=txn['amount'],
-                    currency=txn['currency'],
-                    description=f"Imported: {txn['description']}",
-                    status=transaction_status,
-                    transaction_type=txn['transaction_type'].upper(),
-                    gateway_id=get_gateway_by_type(PaymentGatewayType.NVC_GLOBAL).id if get_gateway_by_type(PaymentGatewayType.NVC_GLOBAL) else None,
-                    created_at=datetime.fromisoformat(txn['created_at'].replace('Z', '+00:00'))
-                )
-                
-                db.session.add(new_transaction)
-                db.session.commit()
-                results["created"] += 1
-            
-            results["processed"] += 1
-            
-        except Exception as e:
-            logger.error(f"Error syncing transaction {txn.get('transaction_id')}: {str(e)}")
-            results["errors"].append({
-                "transaction": txn.get('transaction_id'),
-                "error": str(e)
-            })
-    
+    results = sync_transaction_rows(data['transactions'], gateway_id=gateway_id)
+    return jsonify(results), 200
+
+
+def _sync_ndjson_transactions(gateway_id):
+    """Sync an NDJSON transaction upload from the request stream"""
+    signature = request.headers.get('X-NVC-Signature')
+    if not signature:
+        return jsonify(sync_transaction_rows(iter_ndjson(request.stream), gateway_id=gateway_id)), 200
+    
+    # A signed body is verified before any row is written, so spool it to disk
+    # while hashing instead of holding it in memory
+    digest = hmac.new(SHARED_SECRET.encode(), digestmod=hashlib.sha256)
+    with tempfile.TemporaryFile() as body:
+        for block in iter(lambda: request.stream.read(NDJSON_BLOCK_SIZE), b''):
+            digest.update(block)
+            body.write(block)
+        if not hmac.compare_digest(digest.hexdigest(), signature):
+            return jsonify({"success": False, "error": "Invalid signature"}), 401
+        body.seek(0)
+        results = sync_transaction_rows(iter_ndjson(body), gateway_id=gateway_id)
     return jsonify(results), 200
 
 
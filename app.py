@@ -5,7 +5,9 @@ import boto3
 import json
 from botocore.exceptions import ClientError
 from datetime import datetime
+from decimal import Decimal
 from flask import Flask, render_template, redirect, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -31,6 +33,16 @@ class Base(DeclarativeBase):
     pass
 
 
+class MoneyJSONProvider(DefaultJSONProvider):
+    """Serialize the Decimal amounts read from Money columns as JSON numbers"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Decimal):
+            return float(o)
+        return DefaultJSONProvider.default(o)
+
+
 # Create extension instances
 from models import db
 csrf = CSRFProtect()
@@ -53,6 +65,7 @@ def create_app():
     global app
     # Create the app
     app = Flask(__name__)
+    app.json = MoneyJSONProvider(app)
     # Set a default secret key if SESSION_SECRET environment variable isn't available
     app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key_for_testing_only")
     app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)  # needed for url_for to generate with https
@@ -344,6 +357,27 @@ def create_app():
         except Exception as e:
             logger.error(f"Error importing account holder models: {str(e)}")
             logger.warning("Application will run without account holder functionality")
+
+        # Keep cached account balances in step with committed writes
+        try:
+            from balance_cache import register_balance_cache_hooks
+            register_balance_cache_hooks(db.session)
+        except Exception as e:
+            logger.error(f"Error registering balance cache hooks: {str(e)}")
+
+        # Keep transaction analytics rollups in step with transaction writes
+        try:
+            from transaction_rollup import register_rollup_hooks
+            register_rollup_hooks(db.session)
+        except Exception as e:
+            logger.error(f"Error registering transaction rollup hooks: {str(e)}")
+
+        # Keep statement balance checkpoints in step with transaction writes
+        try:
+            from statement_checkpoints import register_checkpoint_hooks
+            register_checkpoint_hooks(db.session)
+        except Exception as e:
+            logger.error(f"Error registering balance checkpoint hooks: {str(e)}")
             
         # Import trust portfolio models
         try:
@@ -379,6 +413,24 @@ def create_app():
         
         # Create database tables
         db.create_all()
+
+        # Build analytics rollups for closed days in the background
+        rollup_interval = int(os.environ.get('TRANSACTION_ROLLUP_INTERVAL', '900'))
+        if rollup_interval > 0:
+            try:
+                from transaction_rollup import start_rollup_compactor
+                start_rollup_compactor(app, interval=rollup_interval)
+            except Exception as e:
+                logger.error(f"Error starting transaction rollup compactor: {str(e)}")
+
+        # Record daily closing balances for account statements in the background
+        checkpoint_interval = int(os.environ.get('BALANCE_CHECKPOINT_INTERVAL', '3600'))
+        if checkpoint_interval > 0:
+            try:
+                from statement_checkpoints import start_checkpoint_compactor
+                start_checkpoint_compactor(app, interval=checkpoint_interval)
+            except Exception as e:
+                logger.error(f"Error starting balance checkpoint compactor: {str(e)}")
         
         # Initialize blockchain connection (make it optional to allow app to start without blockchain)
         try:
@@ -1143,16 +1195,10 @@ def create_app():
                 for (from_curr, to_curr), rate in essential_rates.items():
                     cache_exchange_rate(from_curr, to_curr, rate)
                     
-                # Add currency service module patching
+                # Disable automatic updates in currency_exchange_service
                 try:
-                    # This approach is safer - use sys.modules to redirect imports
                     import sys
-                    import fast_memory_cache
-                    
-                    # Replace any future imports of memory_cache
-                    sys.modules['memory_cache'] = fast_memory_cache
                     
-                    # Disable automatic updates in currency_exchange_service
                     if 'currency_exchange_service' in sys.modules:
                         # Get the module reference
                         currency_module = sys.modules['currency_exchange_service']
@@ -1172,7 +1218,7 @@ def create_app():
                                         from_curr = str(args[0])
                                         to_curr = str(args[1])
                                         rate = float(args[2])
-                                        fast_memory_cache.cache_exchange_rate(from_curr, to_curr, rate)
+                                        cache_exchange_rate(from_curr, to_curr, rate)
                                     return None
                                 
                                 # Apply the patch
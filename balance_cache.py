@@ -0,0 +1,230 @@
+"""
+Balance Cache for NVC Banking Platform
+
+Write-through cache of account balance snapshots for bank, stablecoin and
+treasury accounts, kept current by SQLAlchemy session events:
+
+- after_flush records a snapshot of every tracked account whose balance
+  columns were inserted, changed or deleted in the flush
+- after_commit writes those snapshots to the 'balance' cache namespace,
+  keeping a newer cached snapshot, and publishes the invalidation to the
+  other worker processes
+- after_rollback discards them
+
+Only changes made through the ORM unit of work are seen; bulk
+``query.update()`` calls bypass the session and must call
+``invalidate_balance`` themselves.
+"""
+
+import logging
+import importlib
+from datetime import datetime
+
+from sqlalchemy import event, inspect
+
+from memory_cache import balance_cache
+
+logger = logging.getLogger(__name__)
+
+# session.info key holding snapshots waiting for the transaction to commit
+PENDING_KEY = 'balance_cache_pending'
+
+# Snapshot fields per account kind; the first field group decides whether an
+# update touched the balance
+TRACKED_ACCOUNTS = {
+    'bank': {
+        'model': ('account_holder_models', 'BankAccount'),
+        'balance_fields': ('balance', 'available_balance'),
+        'fields': ('currency', 'account_holder_id', 'status'),
+    },
+    'stablecoin': {
+        'model': ('models', 'StablecoinAccount'),
+        'balance_fields': ('balance',),
+        'fields': ('currency', 'user_id', 'is_active'),
+    },
+    'treasury': {
+        'model': ('models', 'TreasuryAccount'),
+        'balance_fields': ('current_balance', 'available_balance'),
+        'fields': ('currency', 'is_active'),
+    },
+}
+
+_models = {}
+_hooks_registered = False
+
+
+def _model(kind):
+    """Import the model class for an account kind on first use"""
+    model = _models.get(kind)
+    if model is None:
+        module_name, class_name = TRACKED_ACCOUNTS[kind]['model']
+        model = getattr(importlib.import_module(module_name), class_name)
+        _models[kind] = model
+    return model
+
+
+def _kind_of(instance):
+    for kind in TRACKED_ACCOUNTS:
+        if isinstance(instance, _model(kind)):
+            return kind
+    return None
+
+
+def _key(kind, account_id):
+    return f"{kind}:{account_id}"
+
+
+def _plain(value):
+    if hasattr(value, 'value'):  # Enum
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def snapshot(kind, account, loaded_only=False):
+    """
+    Build the cached balance snapshot for an account
+
+    Args:
+        kind (str): 'bank', 'stablecoin' or 'treasury'
+        account: Model instance
+        loaded_only (bool): Return None instead of loading unloaded attributes
+            (used inside flush events, where lazy loads must be avoided)
+
+    Returns:
+        dict snapshot or None
+    """
+    spec = TRACKED_ACCOUNTS[kind]
+    fields = spec['balance_fields'] + spec['fields'] + ('updated_at',)
+    values = inspect(account).dict if loaded_only else None
+    if values is not None and any(field not in values for field in fields):
+        return None
+
+    data = {'id': account.id, 'kind': kind}
+    for field in fields:
+        value = values[field] if values is not None else getattr(account, field)
+        data[field] = _plain(value)
+    return data
+
+
+def _store(key, data):
+    """Cache a snapshot unless a newer one for the same account is already cached"""
+    current = balance_cache.get(key)
+    if current is not None and data['updated_at'] and (current.get('updated_at') or '') > data['updated_at']:
+        return
+    balance_cache.set(key, data)
+
+
+def _balance_changed(kind, instance):
+    state = inspect(instance)
+    return any(state.attrs[field].history.has_changes() for field in TRACKED_ACCOUNTS[kind]['balance_fields'])
+
+
+def _after_flush(session, flush_context):
+    """Record snapshots of accounts whose balances changed in this flush"""
+    pending = None
+    for instances, deleted in ((session.new, False), (session.dirty, False), (session.deleted, True)):
+        for instance in instances:
+            kind = _kind_of(instance)
+            if kind is None:
+                continue
+            if not deleted and instance not in session.new and not _balance_changed(kind, instance):
+                continue
+
+            if pending is None:
+                pending = session.info.setdefault(PENDING_KEY, {})
+            # A deleted account, or one we cannot snapshot without a query, is only invalidated
+            pending[_key(kind, instance.id)] = None if deleted else snapshot(kind, instance, loaded_only=True)
+
+
+def _after_commit(session):
+    """Write through the snapshots recorded during the committed transaction"""
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+
+    for key, data in pending.items():
+        try:
+            # Both set() and delete() publish the invalidation to other workers' memory tiers
+            if data is None:
+                balance_cache.delete(key)
+            else:
+                _store(key, data)
+        except Exception as e:
+            logger.error(f"Error updating balance cache for {key}: {str(e)}")
+
+
+def _after_rollback(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def register_balance_cache_hooks(session):
+    """
+    Attach the balance cache to a session or session factory
+
+    Args:
+        session: Session class, sessionmaker or scoped_session (e.g. db.session)
+    """
+    global _hooks_registered
+    if _hooks_registered:
+        return
+    event.listen(session, 'after_flush', _after_flush)
+    event.listen(session, 'after_commit', _after_commit)
+    event.listen(session, 'after_rollback', _after_rollback)
+    _hooks_registered = True
+    logger.info("Balance cache hooks registered")
+
+
+def get_balance(kind, account_id):
+    """
+    Get an account's balance snapshot, from the cache if possible
+
+    Args:
+        kind (str): 'bank', 'stablecoin' or 'treasury'
+        account_id (int): Account ID
+
+    Returns:
+        dict snapshot or None if the account does not exist
+    """
+    return get_balances(kind, [account_id]).get(account_id)
+
+
+def get_balances(kind, account_ids):
+    """
+    Get balance snapshots for several accounts, loading misses in one query
+
+    Misses are cached add-if-absent, so a snapshot loaded here never
+    replaces one written through by a transaction that committed meanwhile.
+
+    Args:
+        kind (str): 'bank', 'stablecoin' or 'treasury'
+        account_ids (list): Account IDs
+
+    Returns:
+        dict mapping account ID to snapshot (missing accounts are left out)
+    """
+    balances = {}
+    missing = []
+    for account_id in account_ids:
+        data = balance_cache.get(_key(kind, account_id))
+        if data is None:
+            missing.append(account_id)
+        else:
+            balances[account_id] = data
+
+    if missing:
+        model = _model(kind)
+        for account in model.query.filter(model.id.in_(missing)).all():
+            data = snapshot(kind, account)
+            key = _key(kind, account.id)
+            # A write-through committed after our load wins; return what it cached
+            if not balance_cache.add(key, data):
+                data = balance_cache.get(key) or data
+            balances[account.id] = data
+    return balances
+
+
+def invalidate_balance(kind, account_id):
+    """Drop an account's cached balance in every worker"""
+    balance_cache.delete(_key(kind, account_id))
@@ -0,0 +1,227 @@
+"""
+Benchmark for cluster replication (Raft over the TCP transport)
+
+Starts a cluster of 3-5 ClusterNode instances on localhost, has client
+threads submit transactions to the current leader for a fixed time, stops
+the leader part way through, and reports:
+1. Throughput (commits per second) and commit latency before and after the
+   leader loss
+2. Failover time: from stopping the leader to the first commit on the new one
+3. Whether every acknowledged transaction is committed on every surviving
+   node (no lost commits)
+4. Restart of the stopped leader: time to reopen its log and snapshot, and
+   time to catch up with the cluster (by log entries or InstallSnapshot)
+
+All nodes run in this process, each with its own event loop thread, so
+absolute throughput is bounded by the GIL; relative numbers (batch size,
+pipeline depth) are what to compare.
+
+Run with: python benchmark_cluster.py [nodes] [clients] [seconds] [kill_after] [max_batch] [pipeline_depth]
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import threading
+
+from cluster import ClusterNode, NodeRole
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logging.getLogger('cluster').setLevel(logging.WARNING)
+logging.getLogger('cluster_transport').setLevel(logging.WARNING)
+logging.getLogger('raft_log').setLevel(logging.WARNING)
+logger = logging.getLogger("BenchmarkCluster")
+
+BASE_PORT = 17100
+
+# Shared secret authenticating the benchmark cluster's RPCs
+SECRET = os.urandom(32)
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+# Small segments and frequent snapshots, so a run exercises compaction
+SEGMENT_BYTES = 1024 * 1024
+SNAPSHOT_THRESHOLD = 5000
+
+
+def make_node(node_id, members, data_dir, max_batch, pipeline_depth):
+    info = members[node_id]
+    return ClusterNode(
+        node_id, info['host'], info['port'],
+        cluster_nodes={member_id: dict(member) for member_id, member in members.items()},
+        data_dir=data_dir,
+        heartbeat_interval=0.05,
+        election_timeout_min=0.3,
+        election_timeout_max=0.6,
+        max_batch=max_batch,
+        pipeline_depth=pipeline_depth,
+        commit_timeout=2.0,
+        segment_bytes=SEGMENT_BYTES,
+        snapshot_threshold=SNAPSHOT_THRESHOLD,
+        secret=SECRET
+    )
+
+
+def cluster_members(count):
+    return {
+        f"node{i}": {
+            'host': '127.0.0.1',
+            'port': BASE_PORT + i,
+            'address': f"127.0.0.1:{BASE_PORT + i}",
+            'last_seen': None,
+            'health': 'healthy'
+        }
+        for i in range(count)
+    }
+
+
+def start_cluster(members, data_dir, max_batch, pipeline_depth):
+    """Start nodes that know each other"""
+    nodes = []
+    for node_id in members:
+        node = make_node(node_id, members, data_dir, max_batch, pipeline_depth)
+        node.start()
+        nodes.append(node)
+    return nodes
+
+
+def missing_commits(node, acknowledged):
+    """Acknowledged transactions the node doesn't know as committed"""
+    return [tx_id for tx_id in acknowledged
+            if (node.get_transaction_status(tx_id) or {}).get('status') != 'committed']
+
+
+def current_leader(nodes, timeout=10.0):
+    """Wait for a running node to lead"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for node in nodes:
+            if node.running and node.role == NodeRole.LEADER:
+                return node
+        time.sleep(0.01)
+    return None
+
+
+def benchmark(node_count, clients, seconds, kill_after, max_batch, pipeline_depth):
+    """Load the cluster for `seconds`, stopping the leader after `kill_after` seconds (0: never)"""
+    data_dir = tempfile.mkdtemp(prefix='cluster_benchmark_')
+    members = cluster_members(node_count)
+    nodes = start_cluster(members, data_dir, max_batch, pipeline_depth)
+    leader = current_leader(nodes)
+    if leader is None:
+        logger.error("No leader elected")
+        return False
+    logger.info(f"{leader.node_id} elected leader of {node_count} nodes")
+
+    results = []  # (submitted_at, latency, tx_id)
+    failures = [0]
+    results_lock = threading.Lock()
+    stop_at = time.time() + seconds
+    killed = {}
+
+    def client(number):
+        sequence = 0
+        while time.time() < stop_at:
+            node = current_leader(nodes, timeout=5.0)
+            if node is None:
+                continue
+            sequence += 1
+            tx_id = f"bench-{number}-{sequence}"
+            submitted = time.time()
+            success, _ = node.apply_transaction({'id': tx_id, 'amount': sequence})
+            with results_lock:
+                if success:
+                    results.append((submitted, time.time() - submitted, tx_id))
+                else:
+                    failures[0] += 1
+
+    def kill_leader():
+        time.sleep(kill_after)
+        node = current_leader(nodes)
+        killed['at'] = time.time()
+        killed['node'] = node
+        logger.info(f"Stopping leader {node.node_id}")
+        node.stop()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    if kill_after:
+        threads.append(threading.Thread(target=kill_leader))
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    before = [latency for submitted, latency, _ in results if 'at' not in killed or submitted < killed['at']]
+    after = [latency for submitted, latency, _ in results if 'at' in killed and submitted >= killed['at']]
+    logger.info(f"{len(results)} commits ({failures[0]} failed or redirected) in {elapsed:.2f}s "
+                f"from {clients} clients: {len(results) / elapsed:,.0f} commits/s")
+    logger.info(f"Latency before leader loss: p50 {percentile(before, 0.5) * 1000:.2f}ms, "
+                f"p99 {percentile(before, 0.99) * 1000:.2f}ms ({len(before)} commits)")
+    if 'at' in killed:
+        first_commit = min((submitted + latency for submitted, latency, _ in results
+                            if submitted + latency > killed['at'] and submitted >= killed['at']), default=None)
+        failover = f"{(first_commit - killed['at']) * 1000:.0f}ms" if first_commit else "no commit after leader loss"
+        logger.info(f"Failover: {failover}; latency after: p50 {percentile(after, 0.5) * 1000:.2f}ms, "
+                    f"p99 {percentile(after, 0.99) * 1000:.2f}ms ({len(after)} commits)")
+
+    # Followers learn the final commit index from the next heartbeats
+    survivors = [node for node in nodes if node.running]
+    deadline = time.time() + 5.0
+    while time.time() < deadline and len({node.commit_index for node in survivors}) > 1:
+        time.sleep(0.05)
+    acknowledged = {tx_id for _, _, tx_id in results}
+    consistent = True
+    for node in survivors:
+        missing = missing_commits(node, acknowledged)
+        if missing:
+            consistent = False
+        logger.info(f"{node.node_id}: commit index {node.commit_index}, log {node.log.first_index}..{node.log.last_index}, "
+                    f"snapshot at {node.log.snapshot_index}, {len(missing)} acknowledged transactions missing: "
+                    f"{'OK' if not missing else 'MISMATCH'}")
+
+    if 'node' in killed:
+        # Bring the old leader back: recovery reads its snapshot and the segments after it
+        node_id = killed['node'].node_id
+        started = time.time()
+        node = make_node(node_id, members, data_dir, max_batch, pipeline_depth)
+        recovered = time.time() - started
+        logger.info(f"{node_id} reopened log {node.log.first_index}..{node.log.last_index} "
+                    f"(snapshot at {node.log.snapshot_index}) in {recovered * 1000:.0f}ms")
+        node.start()
+        target = max(survivor.commit_index for survivor in survivors)
+        deadline = time.time() + 10.0
+        while time.time() < deadline and node.commit_index < target:
+            time.sleep(0.01)
+        missing = missing_commits(node, acknowledged)
+        if missing or node.commit_index < target:
+            consistent = False
+        logger.info(f"{node_id} caught up to commit index {node.commit_index}/{target} in "
+                    f"{(time.time() - started - recovered) * 1000:.0f}ms, snapshot at {node.log.snapshot_index}, "
+                    f"{len(missing)} acknowledged transactions missing: {'OK' if not missing else 'MISMATCH'}")
+        survivors.append(node)
+
+    for node in survivors:
+        node.stop()
+    shutil.rmtree(data_dir, ignore_errors=True)
+    return consistent
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    node_count, clients, seconds, kill_after, max_batch, pipeline_depth = args + [3, 16, 10, 5, 256, 4][len(args):]
+
+    ok = benchmark(node_count, clients, seconds, kill_after, max_batch, pipeline_depth)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,144 @@
+"""
+Benchmark of the external exchange rate fetcher against a local stub provider
+
+Starts a stub rate provider on localhost that answers after a configurable
+delay and counts the requests per base currency, then measures:
+1. Coalescing: many threads fetching every major base at once
+2. Non-blocking lookups: cached_rate latency while the provider is slow
+3. Negative caching: repeated lookups of a base the provider fails for
+
+Run with: python benchmark_exchange_rate_fetcher.py [threads] [delay_seconds]
+"""
+
+import sys
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from account_holder_models import CurrencyType
+from exchange_rate_fetcher import ExternalRateFetcher, MAJOR_CURRENCIES
+
+# Set up logging
+logging.basicConfig(level=logging.WARNING,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("BenchmarkExchangeRateFetcher")
+
+# Base the stub provider always fails for
+FAILING_BASE = CurrencyType.CHF
+
+
+class StubProvider(BaseHTTPRequestHandler):
+    """Answers /<BASE> with a rate table for every major currency after a delay"""
+
+    delay = 0.2
+    requests = Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        base = self.path.rsplit('/', 1)[-1]
+        with self.lock:
+            self.requests[base] += 1
+        time.sleep(self.delay)
+
+        if base == FAILING_BASE.value:
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = json.dumps({'base': base, 'rates': {
+            currency.value: 1.0 + index / 10 for index, currency in enumerate(MAJOR_CURRENCIES)
+        }}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(delay):
+    StubProvider.delay = delay
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def reset_counts():
+    with StubProvider.lock:
+        StubProvider.requests.clear()
+
+
+def total_requests():
+    with StubProvider.lock:
+        return sum(StubProvider.requests.values())
+
+
+def bench_coalescing(url, threads, delay):
+    """Every thread asks for all major bases; requests for a base in flight are shared"""
+    fetcher = ExternalRateFetcher(base_url=url)
+    bases = [currency.value for currency in MAJOR_CURRENCIES]
+    reset_counts()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda _: fetcher.fetch_tables(bases, timeout=30), range(threads)))
+    elapsed = time.perf_counter() - start
+
+    print(f"Coalescing: {threads} callers x {len(bases)} bases -> {total_requests()} provider requests "
+          f"(uncoalesced: {threads * len(bases)}), {elapsed:.2f}s with a {delay:.2f}s provider, "
+          f"{len(results[0])} tables returned")
+
+
+def bench_lookups(url, delay):
+    """cached_rate never waits for the provider, even on a cold cache"""
+    fetcher = ExternalRateFetcher(base_url=url)
+    reset_counts()
+    latencies = []
+    hits = 0
+    deadline = time.perf_counter() + delay * 3
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        rate = fetcher.cached_rate(CurrencyType.USD, CurrencyType.EUR)
+        latencies.append(time.perf_counter() - start)
+        hits += rate is not None
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f"Lookups: {len(latencies)} cached_rate calls during a cold fetch, {hits} hits, "
+          f"p99 {p99 * 1e6:.0f}us, max {latencies[-1] * 1e3:.2f}ms, {total_requests()} provider requests")
+
+
+def bench_negative_cache(url, delay):
+    """A failing base is fetched once per negative_ttl, not on every lookup"""
+    fetcher = ExternalRateFetcher(base_url=url, negative_ttl=60)
+    reset_counts()
+    lookups = 0
+    deadline = time.perf_counter() + delay * 5
+    while time.perf_counter() < deadline:
+        fetcher.cached_rate(FAILING_BASE, CurrencyType.USD)
+        lookups += 1
+        time.sleep(0.001)
+
+    print(f"Negative caching: {lookups} lookups of failing base {FAILING_BASE.value} -> "
+          f"{StubProvider.requests[FAILING_BASE.value]} provider requests")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    server, url = start_stub(delay)
+    try:
+        bench_coalescing(url, threads, delay)
+        bench_lookups(url, delay)
+        bench_negative_cache(url, delay)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
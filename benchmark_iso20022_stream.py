@@ -0,0 +1,113 @@
+"""
+Benchmark of streaming ISO 20022 parsing
+
+Writes camt.053 statements and pain.002 status reports of increasing size
+to temporary files, then compares:
+1. Loading the whole document (ElementTree.parse) and walking its entries
+2. ISO20022StreamParser, which yields entries and discards them as it goes
+
+and reports file size, time, entries per second and peak traced memory.
+
+Run with: python benchmark_iso20022_stream.py [entries ...]
+"""
+
+import os
+import sys
+import time
+import logging
+import tempfile
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from iso20022_stream import ISO20022StreamParser, reconciliation_records
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("BenchmarkISO20022Stream")
+
+CAMT_NS = 'urn:iso:std:iso:20022:tech:xsd:camt.053.001.02'
+PAIN_NS = 'urn:iso:std:iso:20022:tech:xsd:pain.002.001.03'
+
+
+def write_camt053(path, entries):
+    """Write a camt.053 statement; every tenth entry is a batch booking of three transactions"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<Document xmlns="{CAMT_NS}"><BkToCstmrStmt>'
+                '<GrpHdr><MsgId>STMT-BENCH-1</MsgId><CreDtTm>2026-10-01T00:00:00Z</CreDtTm></GrpHdr>'
+                '<Stmt><Id>STMT-1</Id><CreDtTm>2026-10-01T00:00:00Z</CreDtTm>'
+                '<Acct><Id><IBAN>GL89NVCT0000000000000001</IBAN></Id><Ccy>USD</Ccy></Acct>'
+                '<Bal><Tp><CdOrPrtry><Cd>OPBD</Cd></CdOrPrtry></Tp><Amt Ccy="USD">1000000.00</Amt>'
+                '<CdtDbtInd>CRDT</CdtDbtInd><Dt><Dt>2026-09-30</Dt></Dt></Bal>')
+        for number in range(entries):
+            details = 3 if number % 10 == 0 else 1
+            f.write(f'<Ntry><NtryRef>{number}</NtryRef><Amt Ccy="USD">{details * 125}.50</Amt>'
+                    f'<CdtDbtInd>{"CRDT" if number % 2 else "DBIT"}</CdtDbtInd><Sts>BOOK</Sts>'
+                    '<BookgDt><Dt>2026-10-01</Dt></BookgDt><ValDt><Dt>2026-10-01</Dt></ValDt>'
+                    f'<AcctSvcrRef>SVC{number:08d}</AcctSvcrRef>'
+                    '<BkTxCd><Prtry><Cd>NTRF</Cd></Prtry></BkTxCd><NtryDtls>')
+            for detail in range(details):
+                f.write(f'<TxDtls><Refs><InstrId>INS{number:08d}{detail}</InstrId>'
+                        f'<EndToEndId>E2E{number:08d}{detail}</EndToEndId></Refs>'
+                        '<AmtDtls><TxAmt><Amt Ccy="USD">125.50</Amt></TxAmt></AmtDtls>'
+                        '<RltdPties><Dbtr><Nm>Correspondent Customer</Nm></Dbtr></RltdPties>'
+                        f'<RmtInf><Ustrd>Invoice {number} settlement, batch position {detail}</Ustrd></RmtInf></TxDtls>')
+            f.write('</NtryDtls></Ntry>')
+        f.write('</Stmt></BkToCstmrStmt></Document>\n')
+
+
+def write_pain002(path, entries):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<Document xmlns="{PAIN_NS}"><CstmrPmtStsRpt>'
+                '<GrpHdr><MsgId>PSR-BENCH-1</MsgId><CreDtTm>2026-10-01T00:00:00Z</CreDtTm></GrpHdr>'
+                '<OrgnlGrpInfAndSts><OrgnlMsgId>NVC-BATCH-1</OrgnlMsgId><OrgnlMsgNmId>pain.001.001.03</OrgnlMsgNmId>'
+                '<GrpSts>PART</GrpSts></OrgnlGrpInfAndSts>'
+                '<OrgnlPmtInfAndSts><OrgnlPmtInfId>PMTINF-1</OrgnlPmtInfId>')
+        for number in range(entries):
+            rejected = number % 50 == 0
+            f.write(f'<TxInfAndSts><StsId>STS{number}</StsId><OrgnlInstrId>INS{number:08d}</OrgnlInstrId>'
+                    f'<OrgnlEndToEndId>E2E{number:08d}</OrgnlEndToEndId><TxSts>{"RJCT" if rejected else "ACSC"}</TxSts>')
+            if rejected:
+                f.write('<StsRsnInf><Rsn><Cd>AC04</Cd></Rsn><AddtlInf>Closed account</AddtlInf></StsRsnInf>')
+            f.write('<OrgnlTxRef><Amt><InstdAmt Ccy="USD">125.50</InstdAmt></Amt></OrgnlTxRef></TxInfAndSts>')
+        f.write('</OrgnlPmtInfAndSts></CstmrPmtStsRpt></Document>\n')
+
+
+def load_whole(path, entry_tag):
+    """The previous approach: parse the whole tree, then walk its entries"""
+    root = ET.parse(path).getroot()
+    ns = {'ns': root.tag[1:].partition('}')[0]}
+    return sum(1 for _ in root.iterfind(f'.//ns:{entry_tag}', ns))
+
+
+def stream(path, entry_tag):
+    return sum(1 for _ in reconciliation_records(ISO20022StreamParser(path).entries()))
+
+
+def measure(function, path, entry_tag):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = function(path, entry_tag)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak / (1024 * 1024)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 50000]
+    directory = tempfile.mkdtemp(prefix='iso20022-bench-')
+
+    for message, writer, entry_tag in (('camt.053', write_camt053, 'Ntry'), ('pain.002', write_pain002, 'TxInfAndSts')):
+        for entries in sizes:
+            path = os.path.join(directory, f'{message}-{entries}.xml')
+            writer(path, entries)
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+
+            _, whole_seconds, whole_peak = measure(load_whole, path, entry_tag)
+            records, stream_seconds, stream_peak = measure(stream, path, entry_tag)
+            logger.info(f"{message} {entries} entries ({size_mb:.1f} MB): "
+                        f"whole tree {whole_seconds:.2f}s peak {whole_peak:.1f} MB | "
+                        f"streaming {stream_seconds:.2f}s ({entries / stream_seconds:.0f} entries/s) "
+                        f"peak {stream_peak:.2f} MB, {records} reconciliation records")
+            os.remove(path)
@@ -0,0 +1,151 @@
+"""
+Benchmark of streaming pain.001 generation for large payment batches
+
+Generates a payroll-style batch of ISO20022Payment objects (several debtor
+accounts and currencies) on the fly and writes it:
+1. With ISO20022MessageGenerator.generate_customer_credit_transfer
+   (whole tree in memory, one string)
+2. With Pain001StreamWriter, grouped into PmtInf blocks by debtor account
+   and currency and split at a block size
+3. As several files with write_credit_transfer_files
+
+and reports time, peak traced memory, and checks the control sums (in
+Decimal) against the written files.
+
+Run with: python benchmark_pain001_writer.py [payments ...]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+import tracemalloc
+import xml.etree.ElementTree as ET
+from decimal import Decimal
+
+from iso20022_integration import (
+    ISO20022MessageGenerator, ISO20022Payment, ISO20022PartyIdentification, ISO20022BankAccount
+)
+from iso20022_writer import Pain001StreamWriter, write_credit_transfer_files, PAIN_001_NAMESPACE
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logging.getLogger('iso20022_writer').setLevel(logging.WARNING)
+logger = logging.getLogger("BenchmarkPain001Writer")
+
+DEBTOR_ACCOUNTS = [
+    (f"GL89NVCT000000000000000{number}", currency)
+    for number, currency in enumerate(['USD', 'USD', 'EUR', 'GBP'], start=1)
+]
+
+
+def payments(count, seed=7):
+    """Generate payments lazily (the batch is never materialised)"""
+    rng = random.Random(seed)
+    debtor = ISO20022PartyIdentification(name="NVC Fund Holding Trust")
+    for number in range(count):
+        iban, currency = DEBTOR_ACCOUNTS[number % len(DEBTOR_ACCOUNTS)]
+        yield ISO20022Payment(
+            instruction_id=f"PAY{number:08d}",
+            end_to_end_id=f"E2E{number:08d}",
+            amount=Decimal(rng.randint(1000, 999999)) / 100,
+            currency=currency,
+            debtor=debtor,
+            debtor_account=ISO20022BankAccount(iban=iban, currency=currency, bank_code="NVCFGLGL"),
+            creditor=ISO20022PartyIdentification(name=f"Employee {number} & Family <Payroll>"),
+            creditor_account=ISO20022BankAccount(iban=f"DE{number:020d}", bank_code="DEUTDEFF"),
+            remittance_info=f"Salary 2026-10 ref {number}"
+        )
+
+
+def expected_totals(count):
+    totals = {}
+    for payment in payments(count):
+        key = (payment.debtor_account.iban, payment.currency)
+        entry = totals.setdefault(key, [0, Decimal('0')])
+        entry[0] += 1
+        entry[1] += payment.amount
+    return totals
+
+
+def check_file(path):
+    """Parse a written file and check every control sum against its transactions"""
+    ns = {'p': PAIN_001_NAMESPACE}
+    root = ET.parse(path).getroot()
+    header = root.find('p:CstmrCdtTrfInitn/p:GrpHdr', ns)
+    grand_count, grand_sum = 0, Decimal('0')
+    totals = {}
+    for block in root.iterfind('p:CstmrCdtTrfInitn/p:PmtInf', ns):
+        amounts = [Decimal(amount.text) for amount in block.iterfind('p:CdtTrfTxInf/p:Amt/p:InstdAmt', ns)]
+        assert int(block.find('p:NbOfTxs', ns).text) == len(amounts)
+        assert Decimal(block.find('p:CtrlSum', ns).text) == sum(amounts, Decimal('0'))
+        key = (block.find('p:DbtrAcct/p:Id/p:IBAN', ns).text, block.find('p:DbtrAcct/p:Ccy', ns).text)
+        entry = totals.setdefault(key, [0, Decimal('0')])
+        entry[0] += len(amounts)
+        entry[1] += sum(amounts, Decimal('0'))
+        grand_count += len(amounts)
+        grand_sum += sum(amounts, Decimal('0'))
+    assert int(header.find('p:NbOfTxs', ns).text) == grand_count
+    assert Decimal(header.find('p:CtrlSum', ns).text) == grand_sum
+    return totals
+
+
+def measure(label, function):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    logger.info(f"  {label}: {elapsed:.2f}s, peak {peak / (1024 * 1024):.1f} MB")
+    return result
+
+
+def merge(totals, more):
+    for key, (count, amount) in more.items():
+        entry = totals.setdefault(key, [0, Decimal('0')])
+        entry[0] += count
+        entry[1] += amount
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [20000, 100000]
+    directory = tempfile.mkdtemp(prefix='pain001-bench-')
+
+    for count in sizes:
+        logger.info(f"{count} payments")
+        expected = expected_totals(count)
+
+        def in_memory():
+            xml = ISO20022MessageGenerator().generate_customer_credit_transfer(list(payments(count)))
+            return len(xml)
+        measure("generate_customer_credit_transfer (tree, string)", in_memory)
+
+        path = os.path.join(directory, f'stream-{count}.xml')
+
+        def streamed():
+            with Pain001StreamWriter(path, max_block_transactions=10000) as writer:
+                writer.add_all(payments(count))
+            return writer.summary()
+        summary = measure("Pain001StreamWriter", streamed)
+        written = check_file(path)
+        assert written == expected, "streamed totals differ from the batch"
+        logger.info(f"    {len(summary['blocks'])} PmtInf blocks, {os.path.getsize(path) / (1024 * 1024):.1f} MB, "
+                    f"control sum {summary['control_sum']} (checked exactly against every block)")
+        os.remove(path)
+
+        files_directory = os.path.join(directory, f'files-{count}')
+        results = measure("write_credit_transfer_files (by currency, 25k per file)", lambda: write_credit_transfer_files(
+            payments(count), files_directory, max_file_transactions=25000, split_files_by=('currency',)
+        ))
+        written = {}
+        for result in results:
+            merge(written, check_file(result['path']))
+            os.remove(result['path'])
+        assert written == expected, "split file totals differ from the batch"
+        logger.info(f"    {len(results)} files: " + ', '.join(
+            f"{result['transaction_count']} tx/{len(result['blocks'])} blocks" for result in results
+        ))
@@ -0,0 +1,113 @@
+"""
+Benchmark of connection pool admission in the high-availability database cluster
+
+Runs more worker threads than a DatabaseServer's pool has connections
+against a local SQLite database, each taking a session, running a query
+and holding the connection for a while. Compares:
+1. No admission control: every request waits inside the pool
+2. Admission with a bounded queue and a deadline: excess requests are shed
+
+and reports throughput, request latency, shed requests and the pool's
+checkout wait histogram from its event accounting.
+
+Run with: python benchmark_pool_admission.py [workers] [seconds] [hold_ms]
+"""
+
+import os
+import sys
+import time
+import logging
+import tempfile
+import threading
+
+from sqlalchemy import text
+
+from ha_database import DatabaseServer, DatabaseRole
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logging.getLogger('ha_database').setLevel(logging.ERROR)
+logging.getLogger('db_pool').setLevel(logging.ERROR)
+logger = logging.getLogger("BenchmarkPoolAdmission")
+
+MAX_CONNECTIONS = 20  # pool of 4 connections + 2 overflow
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(label, workers, seconds, hold_ms, admission_queue=None, admission_timeout=None):
+    """Run the workers against a fresh server and log the results"""
+    directory = tempfile.mkdtemp(prefix='pool-admission-')
+    server = DatabaseServer('bench', f"sqlite:///{os.path.join(directory, 'bench.db')}",
+                            role=DatabaseRole.PRIMARY, max_connections=MAX_CONNECTIONS)
+    monitor = server.pool_monitor
+    if admission_queue is None:
+        # Admit everything: requests queue inside the pool instead
+        monitor.capacity = workers
+    else:
+        monitor.max_waiting = admission_queue
+        monitor.admission_timeout = admission_timeout
+    server.initialize()
+
+    latencies = []
+    rejected = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def worker():
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            session = server.get_session()
+            if session is None:
+                with lock:
+                    rejected[0] += 1
+                # Back off as a client would after a 503
+                time.sleep(hold_ms / 1000)
+                continue
+            try:
+                session.execute(text("SELECT 1")).fetchone()
+                time.sleep(hold_ms / 1000)
+            finally:
+                server.release_session(session)
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = monitor.get_stats()
+    wait = stats['checkout_wait']
+    server.shutdown()
+
+    logger.info(f"{label}: {len(latencies) / seconds:.0f} requests/s, "
+                f"latency p50 {percentile(latencies, 0.5):.0f}ms p99 {percentile(latencies, 0.99):.0f}ms "
+                f"max {max(latencies, default=0):.0f}ms, {rejected[0]} shed")
+    logger.info(f"  pool: {stats['checkouts']} checkouts, {stats['overflow_checkouts']} overflow, "
+                f"peak {stats['peak_checked_out']}/{server.pool_size + server.max_overflow} checked out, "
+                f"{stats['checkout_timeouts']} checkout timeouts, {stats['connections_opened']} connections opened")
+    logger.info(f"  checkout wait p50 {wait['p50_ms'] or 0:.1f}ms p95 {wait['p95_ms'] or 0:.1f}ms "
+                f"p99 {wait['p99_ms'] or 0:.1f}ms; "
+                f"admission: {stats['sessions_queued']} queued, {stats['sessions_shed']} shed, "
+                f"{stats['admission_timeouts']} past deadline")
+    busy = {bucket: count for bucket, count in wait['buckets'].items() if count}
+    logger.info(f"  checkout wait histogram: {busy}")
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    hold_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 20.0
+
+    logger.info(f"{workers} workers, {seconds:.0f}s, connections held {hold_ms:.0f}ms, "
+                f"pool of {MAX_CONNECTIONS // 5} + {MAX_CONNECTIONS // 10} overflow connections")
+    run("No admission control", workers, seconds, hold_ms)
+    run("Admission (queue 6, 50ms deadline)", workers, seconds, hold_ms, admission_queue=6, admission_timeout=0.05)
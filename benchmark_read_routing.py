@@ -0,0 +1,162 @@
+"""
+Simulation of read routing in the high-availability database cluster
+
+Runs DatabaseCluster's routing against simulated servers (no database
+needed): a primary and replicas with set replication lag, pool utilization
+and query latency. Reports:
+1. The share of reads each replica gets (lag-, load- and latency-aware
+   routing versus the previous uniform random choice)
+2. Stale reads after a write (the replica hadn't replayed the session's
+   write yet), with and without a session key (read-your-writes)
+
+Run with: python benchmark_read_routing.py [reads] [sessions]
+"""
+
+import sys
+import bisect
+import random
+import logging
+
+from ha_database import (
+    DatabaseCluster, DatabaseServer, DatabaseRole, DatabaseStatus, TransactionType, RoutingPolicy
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logging.getLogger('ha_database').setLevel(logging.WARNING)
+logger = logging.getLogger("BenchmarkReadRouting")
+
+# server_id: (replication lag in seconds, pool utilization, p95 query latency in ms)
+REPLICAS = {
+    'replica_healthy_1': (0.2, 0.2, 3.0),
+    'replica_healthy_2': (0.3, 0.3, 4.0),
+    'replica_lagging': (12.0, 0.2, 3.0),
+    'replica_overloaded': (0.2, 0.85, 40.0),
+    'replica_saturated': (0.2, 1.0, 5.0),
+}
+
+
+class SimulatedWAL:
+    """The primary's WAL position over simulated time"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.times = [0.0]
+        self.positions = [0]
+
+    def write(self):
+        self.times.append(self.now)
+        self.positions.append(self.positions[-1] + 1)
+        return self.positions[-1]
+
+    def position_at(self, at):
+        return self.positions[max(0, bisect.bisect_right(self.times, at) - 1)]
+
+
+class SimulatedServer(DatabaseServer):
+    """A DatabaseServer whose health numbers are set instead of measured"""
+
+    def __init__(self, server_id, role, wal, lag=0.0, utilization=0.0, p95=1.0):
+        super().__init__(server_id, f"postgresql://{server_id}.sim/banking", role=role)
+        self.wal = wal
+        self.lag = lag
+        self.utilization = utilization
+        for _ in range(100):
+            self.query_latency.add(p95 * random.uniform(0.5, 1.0))
+
+    def initialize(self):
+        self.status = DatabaseStatus.ONLINE
+        return True
+
+    def shutdown(self):
+        pass
+
+    def pool_utilization(self):
+        return self.utilization
+
+    def pool_saturated(self):
+        return self.utilization >= 1.0
+
+    def current_wal_lsn(self):
+        return self.wal.position_at(self.wal.now)
+
+    def advance(self):
+        """Replay what the primary wrote `lag` seconds ago"""
+        if self.role == DatabaseRole.REPLICA:
+            self.replication_lag = self.lag
+            self.replay_lsn = self.wal.position_at(self.wal.now - self.lag)
+
+
+def build_cluster(wal):
+    db_cluster = DatabaseCluster('simulated', RoutingPolicy.PRIMARY_WRITE_REPLICA_READ)
+    db_cluster.add_server(SimulatedServer('primary', DatabaseRole.PRIMARY, wal, p95=5.0))
+    for server_id, (lag, utilization, p95) in REPLICAS.items():
+        db_cluster.add_server(SimulatedServer(server_id, DatabaseRole.REPLICA, wal, lag, utilization, p95))
+    return db_cluster
+
+
+def advance(db_cluster, wal, seconds):
+    wal.now += seconds
+    for server in db_cluster.servers.values():
+        server.advance()
+
+
+def read_shares(reads):
+    """Share of reads per server: weighted routing versus uniform choice among ONLINE replicas"""
+    wal = SimulatedWAL()
+    db_cluster = build_cluster(wal)
+    advance(db_cluster, wal, 1.0)
+
+    routed = {server_id: 0 for server_id in db_cluster.servers}
+    for _ in range(reads):
+        server = db_cluster.get_server_for_transaction(TransactionType.READ)
+        routed[server.server_id] += 1
+
+    uniform = 1.0 / len(REPLICAS)
+    logger.info(f"{'server':<20} {'lag s':>6} {'pool':>5} {'p95 ms':>7} {'uniform':>8} {'weighted':>9}")
+    for server_id, count in routed.items():
+        lag, utilization, p95 = REPLICAS.get(server_id, (0.0, 0.0, 5.0))
+        share = uniform if server_id in REPLICAS else 0.0
+        logger.info(f"{server_id:<20} {lag:>6.1f} {utilization:>5.2f} {p95:>7.1f} "
+                    f"{share:>8.1%} {count / reads:>9.1%}")
+
+    def expected_p95(shares):
+        return sum(share * REPLICAS[server_id][2] for server_id, share in shares.items() if server_id in REPLICAS)
+
+    weighted = {server_id: count / reads for server_id, count in routed.items()}
+    logger.info(f"Read-weighted p95 latency: uniform {expected_p95({s: uniform for s in REPLICAS}):.1f}ms, "
+                f"weighted {expected_p95(weighted):.1f}ms")
+
+
+def read_your_writes(sessions):
+    """Write, then read within a second, counting reads that miss the session's own write"""
+    for use_session_key in (False, True):
+        wal = SimulatedWAL()
+        db_cluster = build_cluster(wal)
+        stale = 0
+        for number in range(sessions):
+            session_key = f"user-{number}" if use_session_key else None
+            written = wal.write()
+            if session_key:
+                db_cluster.record_write(session_key)
+
+            # The read comes up to a second after the write
+            advance(db_cluster, wal, random.uniform(0.0, 1.0))
+            server = db_cluster.get_server_for_transaction(TransactionType.READ, session_key=session_key)
+            if server.role == DatabaseRole.REPLICA and server.replay_lsn < written:
+                stale += 1
+
+        stats = db_cluster.get_cluster_status()['read_routing']
+        logger.info(f"Read-your-writes {'on ' if use_session_key else 'off'}: {stale}/{sessions} stale reads; "
+                    f"{stats['replica_reads']} replica, {stats['pinned_reads']} pinned to primary, "
+                    f"{stats['primary_reads']} primary reads; {stats['pinned_sessions']} sessions still pinned")
+
+
+if __name__ == "__main__":
+    reads = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    random.seed(42)
+    read_shares(reads)
+    read_your_writes(sessions)
@@ -0,0 +1,84 @@
+"""
+Microbenchmark for the response cache
+
+Fills a ResponseCache to 10k and 100k entries and measures:
+1. Hit latency (lookup of a cached key)
+2. Miss latency (lookup that misses, then an insert that evicts)
+
+Run with: python benchmark_response_cache.py [sizes...]
+"""
+
+import sys
+import time
+import random
+import logging
+from types import SimpleNamespace
+
+from flask import Response
+
+from response_cache import ResponseCache, CachedResponse
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("BenchmarkResponseCache")
+
+OPERATIONS = 20000
+
+
+def fake_request(index):
+    """Minimal stand-in for a Flask request"""
+    return SimpleNamespace(
+        path=f"/api/accounts/{index}",
+        query_string=b"",
+        headers={},
+        endpoint="api.accounts"
+    )
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def benchmark(size):
+    """Benchmark hit and miss latency for a cache holding `size` entries"""
+    response = Response('{"balance": 100.0}', mimetype='application/json')
+    entry_bytes = CachedResponse.from_response(response, None, None, None).size
+    cache = ResponseCache(max_bytes=size * entry_bytes, default_ttl=3600)
+
+    requests = [fake_request(i) for i in range(size)]
+    keys = [cache._generate_key(request) for request in requests]
+
+    start = time.perf_counter()
+    for request in requests:
+        cache.set(request, response)
+    fill_time = time.perf_counter() - start
+
+    # Hits: random keys that are in the cache
+    hit_samples = []
+    for key in random.choices(keys, k=OPERATIONS):
+        start = time.perf_counter()
+        cache.lookup(key)
+        hit_samples.append(time.perf_counter() - start)
+
+    # Misses: new keys, each inserted into a full cache (forcing an eviction)
+    miss_samples = []
+    for index in range(size, size + OPERATIONS):
+        request = fake_request(index)
+        start = time.perf_counter()
+        if cache.lookup(cache._generate_key(request)) is None:
+            cache.set(request, response)
+        miss_samples.append(time.perf_counter() - start)
+
+    stats = cache.get_stats()
+    logger.info(f"{size:>7} entries | fill {fill_time:.3f}s | "
+                f"hit p50 {percentile(hit_samples, 0.5) * 1e6:.1f}us p99 {percentile(hit_samples, 0.99) * 1e6:.1f}us | "
+                f"miss+set p50 {percentile(miss_samples, 0.5) * 1e6:.1f}us p99 {percentile(miss_samples, 0.99) * 1e6:.1f}us | "
+                f"evictions {stats['evictions']}")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        benchmark(size)
@@ -0,0 +1,137 @@
+"""
+Benchmark for the stablecoin ledger posting engine
+
+Creates a hot set of stablecoin accounts and has many threads submit random
+transfers between them concurrently, then reports:
+1. Throughput (transfers per second) and submit-to-posted latency
+2. Commits used (batches) versus transfers posted
+3. Whether the total balance of the hot set is unchanged and every posted
+   transfer has exactly two ledger entries (no lost updates)
+
+Runs against the database configured for the app. Everything the benchmark
+creates is removed afterwards.
+
+Run with: python benchmark_stablecoin_ledger.py [transfers] [accounts] [threads] [max_batch]
+"""
+
+import sys
+import time
+import random
+import secrets
+import logging
+import threading
+
+from sqlalchemy import func
+
+from app import app, db
+from models import User, StablecoinAccount, LedgerEntry, Transaction
+from stablecoin_ledger import LedgerPoster
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("BenchmarkStablecoinLedger")
+
+BENCHMARK_USERNAME = "ledger_benchmark"
+BENCHMARK_DESCRIPTION = "Ledger benchmark transfer"
+STARTING_BALANCE = 1000000.0
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def create_accounts(count):
+    """Create the benchmark user and its hot accounts"""
+    user = User.query.filter_by(username=BENCHMARK_USERNAME).first()
+    if not user:
+        user = User(username=BENCHMARK_USERNAME, email=f"{BENCHMARK_USERNAME}@example.com")
+        db.session.add(user)
+        db.session.flush()
+
+    accounts = [
+        StablecoinAccount(
+            account_number=f"NVCT-BENCH-{secrets.token_hex(6).upper()}",
+            user_id=user.id,
+            balance=STARTING_BALANCE
+        )
+        for _ in range(count)
+    ]
+    db.session.add_all(accounts)
+    db.session.commit()
+    return user.id, [account.id for account in accounts]
+
+
+def cleanup(user_id, account_ids):
+    """Remove everything the benchmark created"""
+    db.session.query(LedgerEntry).filter(LedgerEntry.account_id.in_(account_ids)).delete(synchronize_session=False)
+    db.session.query(Transaction).filter(
+        Transaction.user_id == user_id,
+        Transaction.description == BENCHMARK_DESCRIPTION
+    ).delete(synchronize_session=False)
+    db.session.query(StablecoinAccount).filter(StablecoinAccount.id.in_(account_ids)).delete(synchronize_session=False)
+    db.session.query(User).filter_by(id=user_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def benchmark(transfers, account_count, threads, max_batch):
+    """Post `transfers` random transfers between `account_count` accounts from `threads` threads"""
+    with app.app_context():
+        user_id, account_ids = create_accounts(account_count)
+
+    poster = LedgerPoster(app, max_batch=max_batch).start()
+    latencies = []
+    latencies_lock = threading.Lock()
+    per_thread = transfers // threads
+
+    def submitter():
+        local = []
+        for _ in range(per_thread):
+            source, destination = random.sample(account_ids, 2)
+            submitted = time.perf_counter()
+            poster.submit(source, destination, round(random.uniform(0.01, 100), 2), BENCHMARK_DESCRIPTION).wait()
+            local.append(time.perf_counter() - submitted)
+        with latencies_lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=submitter) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        total_balance = db.session.query(func.sum(StablecoinAccount.balance)).filter(
+            StablecoinAccount.id.in_(account_ids)
+        ).scalar()
+        entries = db.session.query(func.count(LedgerEntry.id)).filter(
+            LedgerEntry.account_id.in_(account_ids)
+        ).scalar()
+        cleanup(user_id, account_ids)
+
+    posted = poster.stats['posted']
+    logger.info(f"{posted} transfers posted ({poster.stats['rejected']} rejected) in {elapsed:.2f}s "
+                f"over {account_count} accounts from {threads} threads")
+    logger.info(f"Throughput: {posted / elapsed:,.0f} transfers/s in {poster.stats['batches']} commits "
+                f"({posted / max(poster.stats['batches'], 1):.1f} transfers/commit)")
+    logger.info(f"Latency: p50 {percentile(latencies, 0.5) * 1000:.2f}ms, "
+                f"p99 {percentile(latencies, 0.99) * 1000:.2f}ms")
+
+    expected_balance = STARTING_BALANCE * account_count
+    balanced = abs(total_balance - expected_balance) < 0.005
+    logger.info(f"Total balance {total_balance:.2f} (expected {expected_balance:.2f}): "
+                f"{'OK' if balanced else 'MISMATCH'}")
+    logger.info(f"Ledger entries {entries} (expected {posted * 2}): "
+                f"{'OK' if entries == posted * 2 else 'MISMATCH'}")
+    return balanced and entries == posted * 2
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    transfers, accounts, threads, max_batch = args + [10000, 50, 32, 500][len(args):]
+
+    ok = benchmark(transfers, accounts, threads, max_batch)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,299 @@
+"""
+Headless Browser Pool for NVC Banking Platform PDF Rendering
+
+HTML documents that WeasyPrint cannot render are printed with headless
+Chromium (pyppeteer). Launching a browser per document costs seconds and
+hundreds of MB, so a process-wide pool keeps a few browsers running:
+
+- The browsers live on one asyncio event loop in a background thread;
+  render_pdf() can be called from any request thread.
+- Each browser serves up to pages_per_browser documents at once, and a
+  semaphore bounds the documents rendered concurrently across the pool.
+  Finished pages are reset to about:blank and reused.
+- HTML is loaded with setContent (no temp files); a relative base URL is
+  kept through a <base> element. The page is printed as soon as the
+  document, its images and its web fonts have loaded, instead of after a
+  fixed sleep.
+- A browser is replaced after max_uses documents, when its process exits,
+  or after repeated render failures.
+
+Configuration (environment):
+    PDF_BROWSER_POOL_SIZE       Browsers kept running (default 2)
+    PDF_BROWSER_PAGES           Concurrent documents per browser (default 4)
+    PDF_BROWSER_MAX_USES        Documents before a browser is replaced (default 200)
+    PDF_BROWSER_RENDER_TIMEOUT  Seconds allowed per document (default 30)
+"""
+
+import os
+import re
+import atexit
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+LAUNCH_OPTIONS = {
+    'headless': True,
+    'args': [
+        '--no-sandbox',
+        '--disable-setuid-sandbox',
+        '--disable-dev-shm-usage',
+        '--disable-gpu'
+    ],
+    # The pool owns the browser lifecycle; don't let pyppeteer hook the web server's signals
+    'handleSIGINT': False,
+    'handleSIGTERM': False,
+    'handleSIGHUP': False
+}
+
+DEFAULT_VIEWPORT = {'width': 1200, 'height': 1600}
+
+DEFAULT_PDF_OPTIONS = {
+    'format': 'Letter',
+    'margin': {
+        'top': '0.5in',
+        'right': '0.5in',
+        'bottom': '0.5in',
+        'left': '0.5in'
+    },
+    'printBackground': True
+}
+
+# True once the document, its images and its web fonts have finished loading
+READY_CHECK = """() => document.readyState === 'complete'
+    && Array.from(document.images).every(image => image.complete)
+    && (!document.fonts || document.fonts.status === 'loaded')"""
+
+# Consecutive failures after which a browser is replaced
+MAX_FAILURES = 3
+
+HEAD_TAG = re.compile(r'<head[^>]*>', re.IGNORECASE)
+
+
+def _with_base_url(html, base_url):
+    """Insert a <base> element so relative links resolve as they would from base_url"""
+    if not base_url:
+        return html
+    if '://' not in base_url:
+        base_url = f"file://{os.path.abspath(base_url)}"
+    base = f'<base href="{base_url.rstrip("/")}/">'
+    match = HEAD_TAG.search(html)
+    if match:
+        return html[:match.end()] + base + html[match.end():]
+    return base + html
+
+
+class _PooledBrowser:
+    """A running browser and its reusable pages"""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.idle_pages = []
+        self.active = 0
+        self.uses = 0
+        self.failures = 0
+
+    def alive(self):
+        process = getattr(self.browser, 'process', None)
+        return self.failures < MAX_FAILURES and (process is None or process.poll() is None)
+
+
+class BrowserPool:
+    """
+    Pool of long-lived headless browsers for HTML to PDF rendering
+
+    Args:
+        size (int): Browsers kept running
+        pages_per_browser (int): Concurrent documents per browser
+        max_uses (int): Documents a browser renders before it is replaced
+        render_timeout (float): Seconds allowed per document
+    """
+
+    def __init__(self, size=2, pages_per_browser=4, max_uses=200, render_timeout=30):
+        self.size = size
+        self.pages_per_browser = pages_per_browser
+        self.max_uses = max_uses
+        self.render_timeout = render_timeout
+        self.stats = {'rendered': 0, 'failed': 0, 'launched': 0, 'recycled': 0}
+        self._browsers = []
+        self._loop = None
+        self._thread = None
+        self._slots = None
+        self._launch_lock = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(started.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name='pdf-browser-pool', daemon=True)
+                self._thread.start()
+                started.wait()
+                self._loop = loop
+            return self._loop
+
+    def render_pdf(self, html, pdf_options=None, base_url=None, viewport=None, timeout=None):
+        """
+        Print an HTML document to PDF
+
+        Args:
+            html (str): HTML document
+            pdf_options (dict): page.pdf() options overriding DEFAULT_PDF_OPTIONS
+            base_url (str): Directory or URL relative links resolve against
+            viewport (dict): Viewport size (default DEFAULT_VIEWPORT)
+            timeout (float): Seconds to wait, including time queued for a free page
+
+        Returns:
+            bytes: PDF document
+
+        Raises:
+            Exception: If the document could not be rendered in time
+        """
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            self._render(_with_base_url(html, base_url), pdf_options, viewport), loop
+        )
+        try:
+            return future.result(timeout or self.render_timeout * 2)
+        except Exception:
+            future.cancel()
+            raise
+
+    async def _render(self, html, pdf_options, viewport):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size * self.pages_per_browser)
+            self._launch_lock = asyncio.Lock()
+
+        async with self._slots:
+            pooled = await self._acquire()
+            pooled.active += 1
+            page = None
+            try:
+                page = pooled.idle_pages.pop() if pooled.idle_pages else await pooled.browser.newPage()
+                await page.setViewport(viewport or DEFAULT_VIEWPORT)
+                pdf = await asyncio.wait_for(self._print(page, html, pdf_options), self.render_timeout)
+                pooled.failures = 0
+                self.stats['rendered'] += 1
+            except BaseException:
+                pooled.failures += 1
+                self.stats['failed'] += 1
+                # The page may be mid-navigation or wedged; don't reuse it
+                if page is not None:
+                    await self._close_page(page)
+                    page = None
+                raise
+            finally:
+                pooled.active -= 1
+                pooled.uses += 1
+                if page is not None:
+                    await self._release_page(pooled, page)
+                await self._retire_if_done(pooled)
+            return pdf
+
+    async def _print(self, page, html, pdf_options):
+        await page.setContent(html)
+        await page.waitForFunction(READY_CHECK, {'timeout': self.render_timeout * 1000})
+        return await page.pdf(dict(DEFAULT_PDF_OPTIONS, **(pdf_options or {})))
+
+    async def _acquire(self):
+        """Pick the least busy serving browser, launching one if the pool is short"""
+        async with self._launch_lock:
+            serving = [pooled for pooled in self._browsers if pooled.alive() and pooled.uses < self.max_uses]
+            free = [pooled for pooled in serving if pooled.active < self.pages_per_browser]
+            least_busy = min(free, key=lambda pooled: pooled.active) if free else None
+            if least_busy is not None and (least_busy.active == 0 or len(serving) >= self.size):
+                return least_busy
+            if len(serving) < self.size or least_busy is None:
+                from pyppeteer import launch
+                pooled = _PooledBrowser(await launch(options=dict(LAUNCH_OPTIONS)))
+                self._browsers.append(pooled)
+                self.stats['launched'] += 1
+                logger.info(f"Launched PDF browser ({len(serving) + 1}/{self.size} serving)")
+                return pooled
+            return least_busy
+
+    async def _release_page(self, pooled, page):
+        """Reset a page and keep it for the next document"""
+        if not pooled.alive() or pooled.uses >= self.max_uses:
+            await self._close_page(page)
+            return
+        try:
+            await page.goto('about:blank')
+            pooled.idle_pages.append(page)
+        except Exception as e:
+            logger.warning(f"Discarding PDF browser page: {str(e)}")
+            await self._close_page(page)
+
+    async def _close_page(self, page):
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+    async def _retire_if_done(self, pooled):
+        """Close a browser that is worn out or unhealthy once its last document finishes"""
+        if pooled.active or (pooled.alive() and pooled.uses < self.max_uses):
+            return
+        if pooled in self._browsers:
+            self._browsers.remove(pooled)
+            self.stats['recycled'] += 1
+            logger.info(f"Recycling PDF browser after {pooled.uses} documents ({pooled.failures} recent failures)")
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing PDF browser: {str(e)}")
+
+    async def _close_all(self):
+        browsers, self._browsers = self._browsers, []
+        for pooled in browsers:
+            try:
+                await pooled.browser.close()
+            except Exception:
+                pass
+
+    def shutdown(self, timeout=10):
+        """Close every browser and stop the event loop"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_all(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Error shutting down PDF browser pool: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout)
+        self._slots = None
+        self._launch_lock = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """Get the process-wide browser pool, configured from the environment"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                size=int(os.environ.get('PDF_BROWSER_POOL_SIZE', 2)),
+                pages_per_browser=int(os.environ.get('PDF_BROWSER_PAGES', 4)),
+                max_uses=int(os.environ.get('PDF_BROWSER_MAX_USES', 200)),
+                render_timeout=float(os.environ.get('PDF_BROWSER_RENDER_TIMEOUT', 30))
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def render_pdf(html, pdf_options=None, base_url=None, viewport=None, timeout=None):
+    """Print an HTML document to PDF with the shared browser pool (see BrowserPool.render_pdf)"""
+    return get_browser_pool().render_pdf(html, pdf_options, base_url, viewport, timeout)
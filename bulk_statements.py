@@ -0,0 +1,319 @@
+"""
+Bulk Account Statement Generation for NVC Banking Platform
+
+Generates statements for many bank accounts and one period outside the web
+tier:
+
+1. The parent process loads statement data in chunks of accounts (one
+   query per chunk for accounts, holders, addresses and entries, and at
+   most three for the opening balances, which come from balance
+   checkpoints).
+2. Rendering runs in a process pool. Each worker builds its own Jinja
+   environment and warms WeasyPrint once, then renders PDFs (or camt.053
+   XML through ISO20022MessageGenerator) from plain data; workers never
+   touch the database.
+3. Finished documents are streamed into a zip file or a directory as they
+   complete, with a bounded number in flight, and progress is reported
+   through a callback and the log.
+
+Run with: python bulk_statements.py --month 2026-09 --output statements.zip [--format pdf|camt053] [--workers N]
+"""
+
+import os
+import sys
+import time
+import zipfile
+import logging
+import argparse
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from money import quantize_amount
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_TEMPLATE = 'account_holders/account_statement_template.html'
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+FORMATS = ('pdf', 'camt053')
+
+# Accounts loaded per database round trip
+CHUNK_SIZE = 200
+
+# Worker state, set up once per process by _init_worker
+_environment = None
+_weasyprint = None
+
+
+def _init_worker():
+    """Prepare a render worker: Jinja environment and a warmed-up WeasyPrint"""
+    global _environment, _weasyprint
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+    _environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(['html', 'xml']))
+    try:
+        import weasyprint
+        # The first render loads fonts and styles; pay for it before the first statement
+        weasyprint.HTML(string='<p>NVC Fund Bank</p>').write_pdf()
+        _weasyprint = weasyprint
+    except Exception as e:
+        logger.warning(f"WeasyPrint unavailable in statement worker: {str(e)}")
+
+
+def _render(job):
+    """
+    Render one statement in a worker
+
+    Returns:
+        tuple: (filename, document bytes or None, error or None)
+    """
+    filename = job['filename']
+    try:
+        if job['format'] == 'camt053':
+            from iso20022_integration import ISO20022MessageGenerator
+            xml = ISO20022MessageGenerator().generate_account_statement(**job['camt'])
+            return filename, xml.encode('utf-8'), None
+
+        if _weasyprint is None:
+            return filename, None, "WeasyPrint is not available"
+        html = _environment.get_template(STATEMENT_TEMPLATE).render(**job['context'])
+        return filename, _weasyprint.HTML(string=html).write_pdf(), None
+    except Exception as e:
+        return filename, None, str(e)
+
+
+class StatementSink:
+    """Destination for finished statements: a zip file or a directory"""
+
+    def __init__(self, output):
+        self.output = output
+        self._zip = None
+        if output.endswith('.zip'):
+            # PDFs are already compressed; store them as-is
+            self._zip = zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+        else:
+            os.makedirs(output, exist_ok=True)
+
+    def write(self, filename, data):
+        if self._zip is not None:
+            self._zip.writestr(filename, data)
+            return
+        path = os.path.join(self.output, filename)
+        with open(f"{path}.tmp", 'wb') as handle:
+            handle.write(data)
+        os.replace(f"{path}.tmp", path)
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+
+def _plain_context(context):
+    """Replace the ORM objects in a statement context with plain data a worker can render"""
+    account = context['account']
+    holder = context['account_holder']
+    context = dict(context)
+    context['account'] = {
+        'account_number': account.account_number,
+        'account_type': {'value': account.account_type.value if account.account_type else ''},
+        'currency': {'value': account.currency.value if account.currency else ''}
+    }
+    context['account_holder'] = {'name': holder.name, 'email': holder.email}
+    return context
+
+
+def _camt_arguments(account, transactions, closing_balance, end_date):
+    """Arguments for ISO20022MessageGenerator.generate_account_statement"""
+    currency = account.currency.value if account.currency else 'USD'
+    entries = []
+    for transaction in transactions:
+        amount = transaction.amount or 0
+        booked = transaction.created_at.strftime('%Y-%m-%d') if transaction.created_at else None
+        entries.append({
+            'amount': str(abs(quantize_amount(amount, currency))),
+            'currency': currency,
+            'type': 'CRDT' if amount >= 0 else 'DBIT',
+            'date': booked,
+            'value_date': booked,
+            'end_to_end_id': transaction.transaction_id or 'NOTPROVIDED',
+            'remittance_info': transaction.description
+        })
+    return {
+        'account_number': account.account_number,
+        'statement_id': f"STMT-{account.account_number}-{end_date.strftime('%Y%m%d')}",
+        'transactions': entries,
+        'balance': quantize_amount(closing_balance, currency),
+        'currency': currency
+    }
+
+
+def iter_statement_jobs(account_ids, start_date, end_date, output_format='pdf', chunk_size=CHUNK_SIZE):
+    """
+    Load statement data for a set of accounts, chunk by chunk
+
+    Must run inside an app context.
+
+    Args:
+        account_ids (list): Bank account IDs
+        start_date (datetime): Start of the period
+        end_date (datetime): End of the period
+        output_format (str): 'pdf' or 'camt053'
+        chunk_size (int): Accounts loaded per round trip
+
+    Yields:
+        dict: Picklable render job
+    """
+    from sqlalchemy import asc
+    from app import db
+    from models import Transaction
+    from account_holder_models import AccountHolder, Address, BankAccount
+    from pdf_service import PDFService
+    from statement_checkpoints import balances_at
+
+    extension = 'xml' if output_format == 'camt053' else 'pdf'
+    for offset in range(0, len(account_ids), chunk_size):
+        chunk = account_ids[offset:offset + chunk_size]
+        accounts = BankAccount.query.filter(BankAccount.id.in_(chunk)).order_by(BankAccount.id).all()
+        holder_ids = {account.account_holder_id for account in accounts}
+        holders = {holder.id: holder for holder in AccountHolder.query.filter(AccountHolder.id.in_(holder_ids))}
+
+        # AccountHolder.primary_address is the holder's first address
+        addresses = {}
+        for address in Address.query.filter(Address.account_holder_id.in_(holder_ids)).order_by(Address.id):
+            addresses.setdefault(address.account_holder_id, address)
+
+        entries = {}
+        for transaction in Transaction.query.filter(
+            Transaction.recipient_account.in_([account.account_number for account in accounts]),
+            Transaction.created_at >= start_date,
+            Transaction.created_at <= end_date
+        ).order_by(asc(Transaction.created_at), asc(Transaction.id)):
+            entries.setdefault(transaction.recipient_account, []).append(transaction)
+
+        openings = balances_at(accounts, start_date)
+
+        for account in accounts:
+            holder = holders.get(account.account_holder_id)
+            if holder is None:
+                logger.warning(f"Skipping statement for account {account.id}: account holder not found")
+                continue
+            transactions = entries.get(account.account_number, [])
+            context = PDFService.account_statement_context(
+                account, holder, transactions, openings[account.id],
+                start_date, end_date, addresses.get(holder.id)
+            )
+            job = {
+                'format': output_format,
+                'filename': f"statement_{account.account_number}_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{extension}"
+            }
+            if output_format == 'camt053':
+                job['camt'] = _camt_arguments(account, transactions, context['closing_balance'], end_date)
+            else:
+                job['context'] = _plain_context(context)
+            yield job
+
+        # Loaded rows are not needed again; keep the session small
+        db.session.expunge_all()
+
+
+def generate_statements(account_ids, start_date, end_date, output, output_format='pdf', workers=None,
+                        progress=None, progress_every=100):
+    """
+    Generate statements for many accounts in a process pool
+
+    Must run inside an app context (statement data is loaded from the database).
+
+    Args:
+        account_ids (list): Bank account IDs
+        start_date (datetime): Start of the period
+        end_date (datetime): End of the period
+        output (str): Zip file (ending in .zip) or directory to write to
+        output_format (str): 'pdf' or 'camt053'
+        workers (int): Render processes (default: CPU count)
+        progress (callable): Called with a stats dict after each statement
+        progress_every (int): Log progress every this many statements
+
+    Returns:
+        dict: Stats (total, written, failed, errors, elapsed)
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"Unsupported statement format: {output_format}")
+
+    account_ids = list(dict.fromkeys(account_ids))
+    workers = workers or os.cpu_count() or 1
+    stats = {'total': len(account_ids), 'written': 0, 'failed': 0, 'errors': [], 'elapsed': 0.0}
+    sink = StatementSink(output)
+    started = time.monotonic()
+
+    def collect(done):
+        for future in done:
+            filename, data, error = future.result()
+            if error:
+                stats['failed'] += 1
+                stats['errors'].append((filename, error))
+                logger.error(f"Error generating statement {filename}: {error}")
+            else:
+                sink.write(filename, data)
+                stats['written'] += 1
+            stats['elapsed'] = time.monotonic() - started
+            finished = stats['written'] + stats['failed']
+            if progress:
+                progress(stats)
+            if finished % progress_every == 0:
+                logger.info(f"Statements: {finished}/{stats['total']} ({stats['failed']} failed) "
+                            f"in {stats['elapsed']:.1f}s")
+
+    # Spawned workers only import this module, not the web application
+    context = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+            pending = set()
+            for job in iter_statement_jobs(account_ids, start_date, end_date, output_format):
+                pending.add(pool.submit(_render, job))
+                # Bound the work in flight so memory stays flat for any account count
+                if len(pending) >= workers * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+    finally:
+        sink.close()
+
+    stats['elapsed'] = time.monotonic() - started
+    logger.info(f"Generated {stats['written']} statements ({stats['failed']} failed) in {stats['elapsed']:.1f}s")
+    return stats
+
+
+def month_period(month):
+    """Start and end of a month given as YYYY-MM"""
+    start = datetime.strptime(month, '%Y-%m')
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(microseconds=1)
+    return start, end
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate account statements in bulk")
+    parser.add_argument('--month', required=True, help="Statement month (YYYY-MM)")
+    parser.add_argument('--output', required=True, help="Zip file (.zip) or directory")
+    parser.add_argument('--format', default='pdf', choices=FORMATS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--accounts', help="Comma-separated bank account IDs (default: all active accounts)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from app import app
+    from account_holder_models import BankAccount, AccountStatus
+
+    with app.app_context():
+        if args.accounts:
+            ids = [int(account_id) for account_id in args.accounts.split(',')]
+        else:
+            ids = [account_id for (account_id,) in BankAccount.query.with_entities(BankAccount.id).filter(
+                BankAccount.status == AccountStatus.ACTIVE
+            ).order_by(BankAccount.id)]
+        period_start, period_end = month_period(args.month)
+        result = generate_statements(ids, period_start, period_end, args.output, args.format, args.workers)
+
+    sys.exit(0 if result['failed'] == 0 else 1)
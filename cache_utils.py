@@ -1,21 +1,18 @@
 """
 Simple caching utility to improve performance
+
+Values are kept in the 'file' namespace of the caching package: a memory
+tier in front of JSON files under data/cache.
 """
-import os
-import json
-import time
 import logging
 from functools import wraps
 
-logger = logging.getLogger(__name__)
+from caching import CACHE_DIR, JSONSerializer, get_cache
 
-# Cache directory
-CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache')
-os.makedirs(CACHE_DIR, exist_ok=True)
+logger = logging.getLogger(__name__)
 
-def get_cache_path(cache_key):
-    """Get the path to a cache file"""
-    return os.path.join(CACHE_DIR, f"{cache_key}.json")
+file_cache = get_cache('file', max_size=256, default_ttl=3600, shared=False, disk=True,
+                       serializer=JSONSerializer())
 
 def cache_data(data, cache_key, expire_seconds=3600):
     """
@@ -27,16 +24,7 @@ def cache_data(data, cache_key, expire_seconds=3600):
         expire_seconds (int): Time in seconds until cache expires
     """
     try:
-        cache_path = get_cache_path(cache_key)
-        
-        cache_data = {
-            'data': data,
-            'expires_at': time.time() + expire_seconds
-        }
-        
-        with open(cache_path, 'w') as f:
-            json.dump(cache_data, f)
-            
+        file_cache.set(cache_key, data, expire_seconds)
         logger.debug(f"Cached data with key: {cache_key}")
         return True
     except Exception as e:
@@ -53,26 +41,7 @@ def get_cached_data(cache_key):
     Returns:
         The cached data or None if no valid cache exists
     """
-    try:
-        cache_path = get_cache_path(cache_key)
-        
-        if not os.path.exists(cache_path):
-            return None
-            
-        with open(cache_path, 'r') as f:
-            cache_data = json.load(f)
-            
-        # Check if cache has expired
-        if time.time() > cache_data.get('expires_at', 0):
-            logger.debug(f"Cache expired for key: {cache_key}")
-            os.remove(cache_path)  # Remove expired cache
-            return None
-            
-        logger.debug(f"Retrieved cached data with key: {cache_key}")
-        return cache_data.get('data')
-    except Exception as e:
-        logger.error(f"Error getting cached data: {str(e)}")
-        return None
+    return file_cache.get(cache_key)
 
 def clear_cache(cache_key=None):
     """
@@ -82,20 +51,12 @@ def clear_cache(cache_key=None):
         cache_key (str, optional): Key to identify the specific cache to clear.
                                   If None, all caches are cleared.
     """
-    try:
-        if cache_key:
-            cache_path = get_cache_path(cache_key)
-            if os.path.exists(cache_path):
-                os.remove(cache_path)
-                logger.debug(f"Cleared cache with key: {cache_key}")
-        else:
-            # Clear all caches
-            for filename in os.listdir(CACHE_DIR):
-                if filename.endswith('.json'):
-                    os.remove(os.path.join(CACHE_DIR, filename))
-            logger.debug("Cleared all caches")
-    except Exception as e:
-        logger.error(f"Error clearing cache: {str(e)}")
+    if cache_key:
+        file_cache.delete(cache_key)
+        logger.debug(f"Cleared cache with key: {cache_key}")
+    else:
+        file_cache.invalidate()
+        logger.debug("Cleared all caches")
 
 def cached(expire_seconds=3600, key_prefix=''):
     """
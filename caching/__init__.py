@@ -0,0 +1,187 @@
+"""
+Caching package for NVC Banking Platform
+
+One cache subsystem with pluggable tiers:
+
+- L1: per-process LRU/TTL memory tier
+- L2: store shared by all worker processes. Uses Redis when CACHE_REDIS_URL
+  is set, otherwise a SQLite file in a private per-user directory on
+  /dev/shm (CACHE_SHARED_PATH overrides), so a warm cache survives worker
+  recycling. CACHE_SHARED_DISABLED=1 turns it off.
+- Optional on-disk tier for large or long-lived values
+- Content-addressed artifact stores for generated files (see artifacts.py)
+
+Caches are created per namespace (account, rate, dashboard, ...) and share
+one stats surface and one invalidation entry point.
+"""
+
+import os
+import stat
+import logging
+import threading
+
+from caching.serializers import PickleSerializer, JSONSerializer, DEFAULT_SERIALIZER
+from caching.tiers import CacheTier, MemoryTier, SQLiteTier, RedisTier, DiskTier
+from caching.tiered import TieredCache
+from caching.artifacts import ArtifactCache, artifact_key
+
+logger = logging.getLogger(__name__)
+
+# Default location for the on-disk tier
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'cache')
+
+_registry = {}
+_registry_lock = threading.Lock()
+_shared_tier = None
+_shared_tier_initialized = False
+
+
+def _private_directory(directory):
+    """Create a directory only the current user can use, refusing one owned by someone else"""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"Cache directory {directory} is not a directory owned by the current user")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(directory, 0o700)
+    return directory
+
+
+def _private_file(path):
+    """
+    Create the shared cache file readable by the current user only
+
+    The SQLite tier unpickles what it reads, so a file another user can
+    write to would let them run code in every worker.
+
+    Raises:
+        PermissionError: If the file is a symlink or owned by another user
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    try:
+        info = os.fstat(fd)
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"Cache file {path} is owned by another user")
+        if stat.S_IMODE(info.st_mode) & 0o077:
+            os.fchmod(fd, 0o600)
+    finally:
+        os.close(fd)
+    return path
+
+
+def _default_shared_path():
+    shm_dir = '/dev/shm'
+    parent = shm_dir if os.path.isdir(shm_dir) and os.access(shm_dir, os.W_OK) else CACHE_DIR
+    directory = _private_directory(os.path.join(parent, f"nvc_cache-{os.getuid()}"))
+    return os.path.join(directory, 'nvc_cache.sqlite')
+
+
+def shared_tier():
+    """Get the process-wide L2 tier, or None if no shared store is available"""
+    global _shared_tier, _shared_tier_initialized
+    with _registry_lock:
+        if _shared_tier_initialized:
+            return _shared_tier
+        _shared_tier_initialized = True
+
+        if os.environ.get('CACHE_SHARED_DISABLED') == '1':
+            return None
+
+        try:
+            redis_url = os.environ.get('CACHE_REDIS_URL')
+            if redis_url:
+                _shared_tier = RedisTier(redis_url)
+            else:
+                _shared_tier = SQLiteTier(_private_file(os.environ.get('CACHE_SHARED_PATH') or _default_shared_path()))
+            logger.info(f"Shared cache tier: {_shared_tier.name}")
+        except Exception as e:
+            logger.warning(f"Shared cache tier unavailable, using memory only: {str(e)}")
+            _shared_tier = None
+        return _shared_tier
+
+
+def get_cache(namespace, max_size=1000, default_ttl=300, shared=True, disk=False,
+              serializer=None, sync_interval=1.0):
+    """
+    Get or create the cache for a namespace
+
+    Args:
+        namespace (str): Cache namespace, e.g. 'account', 'rate', 'dashboard'
+        max_size (int): Maximum number of entries in the memory tier
+        default_ttl (int): Default time-to-live in seconds
+        shared (bool): Add the cross-process L2 tier
+        disk (bool): Add the on-disk tier
+        serializer: Serializer for the disk tier (default: pickle)
+        sync_interval (float): Seconds between checks for other processes' invalidations
+
+    Returns:
+        TieredCache for the namespace
+    """
+    with _registry_lock:
+        cache = _registry.get(namespace)
+    if cache is not None:
+        return cache
+
+    tiers = [MemoryTier(max_size=max_size)]
+    if shared:
+        tier = shared_tier()
+        if tier is not None:
+            tiers.append(tier)
+    if disk:
+        tiers.append(DiskTier(CACHE_DIR, serializer=serializer or DEFAULT_SERIALIZER))
+
+    cache = TieredCache(namespace, tiers, default_ttl=default_ttl, sync_interval=sync_interval)
+    with _registry_lock:
+        return _registry.setdefault(namespace, cache)
+
+
+def get_artifact_cache(namespace, max_bytes=512 * 1024 * 1024, extension='.bin'):
+    """
+    Get or create the artifact store for a namespace
+
+    Args:
+        namespace (str): Artifact namespace, e.g. 'pdf'
+        max_bytes (int): Size cap of the store's directory
+        extension (str): File extension of stored artifacts
+
+    Returns:
+        ArtifactCache stored under CACHE_DIR/artifacts/<namespace>
+    """
+    with _registry_lock:
+        cache = _registry.get(namespace)
+        if cache is None:
+            cache = ArtifactCache(os.path.join(CACHE_DIR, 'artifacts', namespace), max_bytes, extension)
+            _registry[namespace] = cache
+        return cache
+
+
+def register_cache(namespace, cache):
+    """Register another cache (anything with get_stats and clear) under a namespace"""
+    with _registry_lock:
+        _registry[namespace] = cache
+    return cache
+
+
+def invalidate_namespace(namespace):
+    """Invalidate every entry in a namespace"""
+    with _registry_lock:
+        cache = _registry.get(namespace)
+    if cache is None:
+        return False
+    cache.clear()
+    return True
+
+
+def get_cache_stats():
+    """Get statistics for every registered cache"""
+    with _registry_lock:
+        caches = dict(_registry)
+    return {namespace: cache.get_stats() for namespace, cache in caches.items()}
+
+
+__all__ = [
+    'PickleSerializer', 'JSONSerializer', 'DEFAULT_SERIALIZER',
+    'CacheTier', 'MemoryTier', 'SQLiteTier', 'RedisTier', 'DiskTier',
+    'TieredCache', 'ArtifactCache', 'artifact_key', 'CACHE_DIR',
+    'shared_tier', 'get_cache', 'get_artifact_cache', 'register_cache', 'invalidate_namespace', 'get_cache_stats'
+]
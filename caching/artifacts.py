@@ -0,0 +1,187 @@
+"""
+Content-addressed artifact store
+
+Generated documents (PDFs, exports) are stored as one file per key in a
+local directory shared by all worker processes, so a repeat request is a
+file send instead of a render. Keys are SHA-256 digests of everything that
+determines the output, which makes an entry immutable: a changed input or
+renderer produces a new key, and the old entry ages out.
+
+The directory is capped at max_bytes; reads refresh a file's mtime and
+eviction removes the least recently used files first.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Eviction trims the directory to this fraction of its cap, so it doesn't run on every write
+EVICTION_TARGET = 0.9
+
+
+def artifact_key(*parts):
+    """
+    Digest the inputs that determine an artifact
+
+    Args:
+        *parts: JSON-serialisable values (others are converted with str)
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ArtifactCache:
+    """
+    Directory of immutable artifacts with an LRU size cap
+
+    Args:
+        directory (str): Where artifacts are stored
+        max_bytes (int): Size cap for the directory
+        extension (str): File extension of stored artifacts
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, extension='.bin'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0}
+        self._bytes = None
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.extension)
+
+    def get(self, key):
+        """
+        Look up an artifact
+
+        Returns:
+            str: Path of the stored file, or None
+        """
+        path = self.path(key)
+        try:
+            # Refresh the LRU position
+            os.utime(path)
+        except FileNotFoundError:
+            self._stats['misses'] += 1
+            return None
+        self._stats['hits'] += 1
+        return path
+
+    def put(self, key, data):
+        """
+        Store an artifact
+
+        Args:
+            key (str): Artifact key (see artifact_key)
+            data (bytes): Content
+
+        Returns:
+            str: Path of the stored file
+        """
+        path = self.path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self._stats['sets'] += 1
+
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += len(data)
+            if self._bytes is None or self._bytes > self.max_bytes:
+                self._evict()
+        return path
+
+    def get_or_create(self, key, create):
+        """
+        Get an artifact, creating it on a miss
+
+        Concurrent misses for the same key in this process create it once.
+
+        Args:
+            key (str): Artifact key
+            create (callable): Returns the content as bytes
+
+        Returns:
+            str: Path of the stored file
+        """
+        path = self.get(key)
+        if path is not None:
+            return path
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                # Another thread may have created it while we waited
+                if os.path.exists(self.path(key)):
+                    return self.path(key)
+                return self.put(key, create())
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+    def _evict(self):
+        """Remove least recently used artifacts until the directory is under its target size"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.extension):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICTION_TARGET
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    self._stats['evictions'] += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+        self._bytes = total
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self._bytes = None
+        return True
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.extension):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            self._bytes = 0
+
+    def get_stats(self):
+        with self._lock:
+            if self._bytes is None:
+                self._evict()
+            stats = dict(self._stats, bytes=self._bytes, max_bytes=self.max_bytes)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['timestamp'] = time.time()
+        return stats
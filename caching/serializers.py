@@ -0,0 +1,35 @@
+"""
+Cache Serializers
+Serializers convert cached values to and from bytes for tiers that live
+outside the current process (shared memory, Redis, disk).
+"""
+
+import json
+import pickle
+
+
+class PickleSerializer:
+    """Serializer for arbitrary picklable Python values"""
+
+    name = 'pickle'
+
+    def dumps(self, value):
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data):
+        return pickle.loads(data)
+
+
+class JSONSerializer:
+    """Serializer for JSON-compatible values, readable by other tools"""
+
+    name = 'json'
+
+    def dumps(self, value):
+        return json.dumps(value, default=str).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data.decode('utf-8'))
+
+
+DEFAULT_SERIALIZER = PickleSerializer()
@@ -0,0 +1,221 @@
+"""
+Tiered Cache
+A namespaced cache that reads through a list of tiers (fastest first) and
+writes through to all of them. Writes and invalidations are published to
+the shared tier so that other worker processes drop the same entries from
+their own memory tier.
+"""
+
+import time
+import logging
+import threading
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TieredCache:
+    """Namespaced cache over an ordered list of cache tiers"""
+
+    def __init__(self, namespace, tiers, default_ttl=300, sync_interval=1.0):
+        """
+        Initialize a tiered cache
+
+        Args:
+            namespace (str): Namespace prefixed to every key, used for invalidation
+            tiers (list): Cache tiers, fastest first
+            default_ttl (int): Default time-to-live in seconds
+            sync_interval (float): Minimum seconds between checks of the shared
+                invalidation log (0 checks on every read)
+        """
+        self.namespace = namespace
+        self.tiers = tiers
+        self.default_ttl = default_ttl
+        self.sync_interval = sync_interval
+        self._prefix = f"{namespace}:"
+        self._shared = next((tier for tier in tiers if tier.shared), None)
+        self._local_tiers = [tier for tier in tiers if not tier.shared]
+        self._sync_lock = threading.Lock()
+        self._last_seq = None
+        self._last_sync = 0.0
+        self._published = set()  # seqs of our own invalidations, already applied locally
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'invalidations': 0}
+
+    def _key(self, key):
+        return f"{self._prefix}{key}"
+
+    def _call(self, tier, operation, *args):
+        """Run a tier operation, treating a failing tier as a miss"""
+        try:
+            return getattr(tier, operation)(*args)
+        except Exception as e:
+            tier._stats['errors'] += 1
+            logger.debug(f"Cache tier {tier.name} failed on {operation} in {self.namespace}: {str(e)}")
+            return None
+
+    def _sync_invalidations(self):
+        """Apply invalidations published by other processes to the local tiers"""
+        if self._shared is None or not self._local_tiers:
+            return
+        now = time.monotonic()
+        if now - self._last_sync < self.sync_interval:
+            return
+
+        with self._sync_lock:
+            self._last_sync = now
+            if self._last_seq is None:
+                # Local tiers start empty, so earlier invalidations do not apply
+                self._last_seq = self._call(self._shared, 'latest_invalidation') or 0
+                self._published = {seq for seq in self._published if seq > self._last_seq}
+                return
+
+            entries = self._call(self._shared, 'invalidations_since', self._last_seq) or []
+            for seq, namespace, key in entries:
+                self._last_seq = seq
+                if seq in self._published:
+                    self._published.discard(seq)
+                    continue
+                if namespace != self.namespace:
+                    continue
+                for tier in self._local_tiers:
+                    if key is None:
+                        tier.delete_prefix(self._prefix)
+                    else:
+                        tier.delete(self._key(key))
+
+    def _publish(self, key):
+        """Tell other processes to drop a key (or the whole namespace if key is None)"""
+        if self._shared is None:
+            return
+        seq = self._call(self._shared, 'publish_invalidation', self.namespace, key)
+        if seq is not None and self._local_tiers:
+            with self._sync_lock:
+                self._published.add(seq)
+
+    def get(self, key, default=None):
+        """
+        Get a value from the first tier that has it
+
+        Args:
+            key: Cache key
+            default: Default value if key not found
+
+        Returns:
+            Cached value or default
+        """
+        self._sync_invalidations()
+        full_key = self._key(key)
+        for index, tier in enumerate(self.tiers):
+            result = self._call(tier, 'get_entry', full_key)
+            if result and result[0]:
+                _, value, expires_at = result
+                # Promote to the faster tiers that missed, expiring with the original entry
+                ttl = None if expires_at is None else expires_at - time.time()
+                if ttl is None or ttl > 0:
+                    for upper in self.tiers[:index]:
+                        self._call(upper, 'set', full_key, value, ttl)
+                self._stats['hits'] += 1
+                return value
+        self._stats['misses'] += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        """
+        Set a value in every tier, dropping the old value from other processes' memory tiers
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Time-to-live in seconds (None for the default)
+        """
+        full_key = self._key(key)
+        ttl = self.default_ttl if ttl is None else ttl
+        for tier in self.tiers:
+            self._call(tier, 'set', full_key, value, ttl)
+        self._publish(str(key))
+        self._stats['sets'] += 1
+
+    def add(self, key, value, ttl=None):
+        """
+        Set a value only if the key is not cached yet
+
+        The shared tier (or the first tier, without one) decides atomically,
+        so a reader filling a miss with data loaded before a concurrent
+        write never overwrites the value that write cached.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Time-to-live in seconds (None for the default)
+
+        Returns:
+            bool: Whether the value was stored
+        """
+        full_key = self._key(key)
+        ttl = self.default_ttl if ttl is None else ttl
+        authority = self._shared or self.tiers[0]
+        if not self._call(authority, 'add', full_key, value, ttl):
+            return False
+        for tier in self.tiers:
+            if tier is not authority:
+                self._call(tier, 'add', full_key, value, ttl)
+        self._stats['sets'] += 1
+        return True
+
+    def delete(self, key):
+        """Delete a key from every tier, including other processes' memory tiers"""
+        full_key = self._key(key)
+        for tier in self.tiers:
+            self._call(tier, 'delete', full_key)
+        self._publish(str(key))
+        self._stats['invalidations'] += 1
+        return True
+
+    def invalidate(self):
+        """Invalidate the whole namespace in every tier and process"""
+        for tier in self.tiers:
+            self._call(tier, 'delete_prefix', self._prefix)
+        self._publish(None)
+        self._stats['invalidations'] += 1
+
+    def clear(self):
+        """Clear the namespace (alias of invalidate)"""
+        self.invalidate()
+
+    def get_stats(self):
+        """Get statistics for the cache and each of its tiers"""
+        stats = self._stats.copy()
+        stats['namespace'] = self.namespace
+        stats['tiers'] = {}
+        for tier in self.tiers:
+            stats['tiers'][tier.name] = self._call(tier, 'get_stats') or {}
+        return stats
+
+    def cached(self, key_func=None, ttl=None):
+        """
+        Decorator for caching function results in this cache
+
+        Args:
+            key_func (callable): Function to generate cache key from args and kwargs
+            ttl (int): Time-to-live in seconds
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if key_func:
+                    key = key_func(*args, **kwargs)
+                else:
+                    key = f"{func.__module__}.{func.__name__}:{str(args)}:{str(sorted(kwargs.items()))}"
+
+                result = self.get(key, _MISSING)
+                if result is not _MISSING:
+                    return result
+
+                result = func(*args, **kwargs)
+                if result is not None:  # Don't cache None results
+                    self.set(key, result, ttl)
+                return result
+            return wrapper
+        return decorator
@@ -0,0 +1,555 @@
+"""
+Cache Tiers
+Each tier is one storage layer of a TieredCache:
+
+- MemoryTier: per-process LRU with TTL (L1)
+- SQLiteTier: SQLite store shared by every worker process; placed on
+  /dev/shm it acts as a local shared-memory stand-in for Redis (L2)
+- RedisTier: Redis store shared across processes and hosts (L2, optional)
+- DiskTier: one file per entry on local disk, capped at max_bytes
+
+All tiers expose the same interface. ``get`` returns a ``(found, value)``
+tuple so that falsy values can be cached; ``get_entry`` also returns the
+entry's expiry timestamp so that promoted copies expire with the original.
+``add`` stores a value only if the key has no live entry, atomically within
+the tier, so a reader filling a miss never overwrites a newer write.
+"""
+
+import os
+import abc
+import time
+import struct
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from caching.serializers import DEFAULT_SERIALIZER
+
+logger = logging.getLogger(__name__)
+
+MISS = (False, None)
+MISS_ENTRY = (False, None, None)
+
+
+class CacheTier(abc.ABC):
+    """Base class for cache tiers"""
+
+    name = 'tier'
+    shared = False  # True if visible to other processes
+
+    def __init__(self):
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'deletes': 0, 'evictions': 0, 'errors': 0}
+
+    def get(self, key):
+        found, value, _ = self.get_entry(key)
+        return found, value
+
+    @abc.abstractmethod
+    def get_entry(self, key):
+        """Return (found, value, expires_at), expires_at being None for entries that never expire"""
+
+    @abc.abstractmethod
+    def set(self, key, value, ttl=None):
+        """Store a value, replacing any existing entry"""
+
+    @abc.abstractmethod
+    def add(self, key, value, ttl=None):
+        """Store a value only if the key has no live entry; returns whether it was stored"""
+
+    @abc.abstractmethod
+    def delete(self, key):
+        """Remove an entry; returns whether it existed"""
+
+    @abc.abstractmethod
+    def delete_prefix(self, prefix):
+        """Remove every entry whose key starts with prefix; returns how many were removed"""
+
+    def clear(self):
+        self.delete_prefix('')
+
+    def size(self):
+        return None
+
+    def get_stats(self):
+        stats = self._stats.copy()
+        stats['size'] = self.size()
+        return stats
+
+    @staticmethod
+    def _expiry(ttl):
+        return None if not ttl else time.time() + ttl
+
+
+class MemoryTier(CacheTier):
+    """Per-process LRU cache with TTL"""
+
+    name = 'memory'
+
+    def __init__(self, max_size=1000):
+        super().__init__()
+        self._cache = OrderedDict()
+        self._max_size = max_size
+        self._lock = threading.RLock()
+
+    def get_entry(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                value, expiry = entry
+                if expiry is None or time.time() < expiry:
+                    self._cache.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return True, value, expiry
+                del self._cache[key]
+            self._stats['misses'] += 1
+            return MISS_ENTRY
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+            elif len(self._cache) >= self._max_size:
+                self._cache.popitem(last=False)
+                self._stats['evictions'] += 1
+            self._cache[key] = (value, self._expiry(ttl))
+            self._stats['sets'] += 1
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and (entry[1] is None or time.time() < entry[1]):
+                return False
+            self.set(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            if self._cache.pop(key, None) is not None:
+                self._stats['deletes'] += 1
+                return True
+            return False
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            keys = [key for key in self._cache if key.startswith(prefix)]
+            for key in keys:
+                del self._cache[key]
+            self._stats['deletes'] += len(keys)
+            return len(keys)
+
+    def size(self):
+        return len(self._cache)
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats['max_size'] = self._max_size
+        return stats
+
+
+class SQLiteTier(CacheTier):
+    """
+    Cache tier backed by a SQLite file shared between processes.
+
+    Besides cache entries the file holds an invalidation log, which lets
+    TieredCache drop entries from other processes' memory tiers.
+    """
+
+    name = 'sqlite'
+    shared = True
+
+    PRUNE_EVERY = 1000
+    INVALIDATION_RETENTION = 3600
+
+    def __init__(self, path, serializer=DEFAULT_SERIALIZER, max_entries=100000):
+        super().__init__()
+        self.path = path
+        self.serializer = serializer
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._sets_since_prune = 0
+        self._conn()
+
+    def _conn(self):
+        # Connections must not be shared across threads or forked workers
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL, created_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_invalidations ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT NOT NULL, key TEXT, created_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _prefix_range(prefix):
+        return prefix, prefix + '\U0010ffff'
+
+    def get_entry(self, key):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._stats['misses'] += 1
+            return MISS_ENTRY
+        if row[1] is not None and row[1] < time.time():
+            self.delete(key)
+            self._stats['misses'] += 1
+            return MISS_ENTRY
+        self._stats['hits'] += 1
+        return True, self.serializer.loads(row[0]), row[1]
+
+    def set(self, key, value, ttl=None):
+        data = self.serializer.dumps(value)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, created_at) VALUES (?, ?, ?, ?)",
+            (key, data, self._expiry(ttl), time.time())
+        )
+        self._stats['sets'] += 1
+
+        self._count_set()
+
+    def _count_set(self):
+        self._sets_since_prune += 1
+        if self._sets_since_prune >= self.PRUNE_EVERY:
+            self._sets_since_prune = 0
+            self.prune()
+
+    def add(self, key, value, ttl=None):
+        data = self.serializer.dumps(value)
+        now = time.time()
+        # Inserts, or replaces an expired entry; a live entry is left alone
+        added = self._conn().execute(
+            "INSERT INTO cache_entries (key, value, expires_at, created_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+            "created_at = excluded.created_at "
+            "WHERE cache_entries.expires_at IS NOT NULL AND cache_entries.expires_at < ?",
+            (key, data, self._expiry(ttl), now, now)
+        ).rowcount > 0
+        if added:
+            self._stats['sets'] += 1
+            self._count_set()
+        return added
+
+    def delete(self, key):
+        deleted = self._conn().execute("DELETE FROM cache_entries WHERE key = ?", (key,)).rowcount
+        self._stats['deletes'] += deleted
+        return deleted > 0
+
+    def delete_prefix(self, prefix):
+        deleted = self._conn().execute(
+            "DELETE FROM cache_entries WHERE key >= ? AND key < ?", self._prefix_range(prefix)
+        ).rowcount
+        self._stats['deletes'] += deleted
+        return deleted
+
+    def prune(self):
+        """Drop expired entries, the oldest entries beyond max_entries and old invalidations"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        evicted = conn.execute(
+            "DELETE FROM cache_entries WHERE key IN ("
+            "SELECT key FROM cache_entries ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        self._stats['evictions'] += evicted
+        conn.execute("DELETE FROM cache_invalidations WHERE created_at < ?", (now - self.INVALIDATION_RETENTION,))
+
+    def size(self):
+        return self._conn().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+    def publish_invalidation(self, namespace, key=None):
+        """Record that a key (or a whole namespace if key is None) was invalidated; returns its seq"""
+        return self._conn().execute(
+            "INSERT INTO cache_invalidations (namespace, key, created_at) VALUES (?, ?, ?)",
+            (namespace, key, time.time())
+        ).lastrowid
+
+    def invalidations_since(self, seq):
+        """Return (seq, namespace, key) invalidations recorded after seq"""
+        return self._conn().execute(
+            "SELECT seq, namespace, key FROM cache_invalidations WHERE seq > ? ORDER BY seq", (seq,)
+        ).fetchall()
+
+    def latest_invalidation(self):
+        return self._conn().execute("SELECT COALESCE(MAX(seq), 0) FROM cache_invalidations").fetchone()[0]
+
+
+class RedisTier(CacheTier):
+    """Cache tier backed by Redis; requires the optional redis package"""
+
+    name = 'redis'
+    shared = True
+
+    INVALIDATION_LOG_LENGTH = 10000
+
+    def __init__(self, url, serializer=DEFAULT_SERIALIZER, key_prefix='nvc-cache:'):
+        super().__init__()
+        import redis  # Optional dependency, only needed when this tier is configured
+        self.client = redis.Redis.from_url(url)
+        self.serializer = serializer
+        self.key_prefix = key_prefix
+        self._seq_key = f"{key_prefix}__invalidation_seq"
+        self._log_key = f"{key_prefix}__invalidations"
+
+    def get_entry(self, key):
+        pipeline = self.client.pipeline()
+        pipeline.get(self.key_prefix + key)
+        pipeline.pttl(self.key_prefix + key)
+        data, remaining_ms = pipeline.execute()
+        if data is None or remaining_ms == -2:  # -2: expired between the two commands
+            self._stats['misses'] += 1
+            return MISS_ENTRY
+        self._stats['hits'] += 1
+        expires_at = time.time() + remaining_ms / 1000 if remaining_ms > 0 else None
+        return True, self.serializer.loads(data), expires_at
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.key_prefix + key, self.serializer.dumps(value), ex=ttl or None)
+        self._stats['sets'] += 1
+
+    def add(self, key, value, ttl=None):
+        added = bool(self.client.set(self.key_prefix + key, self.serializer.dumps(value), ex=ttl or None, nx=True))
+        if added:
+            self._stats['sets'] += 1
+        return added
+
+    def delete(self, key):
+        deleted = self.client.delete(self.key_prefix + key)
+        self._stats['deletes'] += deleted
+        return deleted > 0
+
+    def delete_prefix(self, prefix):
+        keys = list(self.client.scan_iter(match=f"{self.key_prefix}{prefix}*"))
+        keys = [key for key in keys if key.decode() not in (self._seq_key, self._log_key)]
+        deleted = self.client.delete(*keys) if keys else 0
+        self._stats['deletes'] += deleted
+        return deleted
+
+    def publish_invalidation(self, namespace, key=None):
+        seq = self.client.incr(self._seq_key)
+        self.client.zadd(self._log_key, {f"{seq}|{namespace}|{key or ''}": seq})
+        self.client.zremrangebyscore(self._log_key, 0, seq - self.INVALIDATION_LOG_LENGTH)
+        return seq
+
+    def invalidations_since(self, seq):
+        entries = []
+        for member in self.client.zrangebyscore(self._log_key, seq + 1, '+inf'):
+            entry_seq, namespace, key = member.decode().split('|', 2)
+            entries.append((int(entry_seq), namespace, key or None))
+        return entries
+
+    def latest_invalidation(self):
+        return int(self.client.get(self._seq_key) or 0)
+
+
+class DiskTier(CacheTier):
+    """
+    Cache tier storing one file per entry in a local directory
+
+    Files are named by the SHA-256 of their key, and the payload repeats the
+    key so that a read only returns the entry it asked for. Each file starts
+    with its expiry timestamp, which lets pruning drop expired entries
+    without deserializing them. The directory is capped at max_bytes: every
+    PRUNE_EVERY sets, or once the bytes written exceed the cap, expired files
+    are removed and then the least recently used ones until the directory is
+    under its target size.
+    """
+
+    name = 'disk'
+
+    PRUNE_EVERY = 1000
+    # Pruning trims the directory to this fraction of its cap, so it doesn't run on every set
+    EVICTION_TARGET = 0.9
+    # Temp files of writers that died before renaming them are removed after this many seconds
+    STALE_TEMP_SECONDS = 3600
+
+    EXPIRY = struct.Struct('>d')  # 0.0 for entries that never expire
+
+    def __init__(self, directory, serializer=DEFAULT_SERIALIZER, max_bytes=256 * 1024 * 1024):
+        super().__init__()
+        self.directory = directory
+        self.serializer = serializer
+        self.max_bytes = max_bytes
+        self.extension = f".{serializer.name}"
+        self._bytes = None
+        self._sets_since_prune = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + self.extension)
+
+    def _read(self, path):
+        """Return (expires_at, payload) of an entry file"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        (expires_at,) = self.EXPIRY.unpack_from(data)
+        return expires_at or None, self.serializer.loads(data[self.EXPIRY.size:])
+
+    def get_entry(self, key):
+        path = self._path(key)
+        try:
+            expires_at, payload = self._read(path)
+        except FileNotFoundError:
+            self._stats['misses'] += 1
+            return MISS_ENTRY
+        except Exception as e:
+            logger.warning(f"Discarding unreadable disk cache entry {path}: {str(e)}")
+            self._stats['errors'] += 1
+            self._remove(path)
+            self._stats['misses'] += 1
+            return MISS_ENTRY
+
+        if payload.get('key') != key:
+            self._stats['misses'] += 1
+            return MISS_ENTRY
+        if expires_at is not None and time.time() > expires_at:
+            self._remove(path)
+            self._stats['misses'] += 1
+            return MISS_ENTRY
+        try:
+            # Refresh the LRU position
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self._stats['hits'] += 1
+        return True, payload.get('data'), expires_at
+
+    def _write_temp(self, path, key, value, ttl):
+        """Write an entry to a temp file next to path; returns (temp path, bytes written)"""
+        data = self.EXPIRY.pack(self._expiry(ttl) or 0.0) + self.serializer.dumps({'key': key, 'data': value})
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        return temp_path, len(data)
+
+    def set(self, key, value, ttl=None):
+        path = self._path(key)
+        temp_path, size = self._write_temp(path, key, value, ttl)
+        os.replace(temp_path, path)
+        self._count_set(size)
+
+    def add(self, key, value, ttl=None):
+        path = self._path(key)
+        temp_path, size = self._write_temp(path, key, value, ttl)
+        try:
+            for _ in range(2):
+                try:
+                    # A hard link fails if the entry exists, unlike a rename
+                    os.link(temp_path, path)
+                except FileExistsError:
+                    try:
+                        expires_at, payload = self._read(path)
+                    except FileNotFoundError:
+                        continue
+                    except Exception:
+                        expires_at, payload = 0.0, {}
+                    live = payload.get('key') == key and (expires_at is None or time.time() <= expires_at)
+                    if live:
+                        return False
+                    # An expired, unreadable or colliding entry is replaced
+                    self._remove(path)
+                    continue
+                self._count_set(size)
+                return True
+            return False
+        finally:
+            self._remove(temp_path)
+
+    def _count_set(self, size):
+        self._stats['sets'] += 1
+        with self._lock:
+            self._sets_since_prune += 1
+            if self._bytes is not None:
+                self._bytes += size
+            if self._bytes is None or self._bytes > self.max_bytes or self._sets_since_prune >= self.PRUNE_EVERY:
+                self.prune()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def delete(self, key):
+        if not self._remove(self._path(key)):
+            return False
+        self._stats['deletes'] += 1
+        return True
+
+    def delete_prefix(self, prefix):
+        # File names don't preserve keys, so every entry's stored key is checked
+        deleted = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(self.extension):
+                continue
+            try:
+                _, payload = self._read(entry.path)
+            except FileNotFoundError:
+                continue
+            except Exception:
+                payload = {}
+            key = payload.get('key')
+            if (key is None or key.startswith(prefix)) and self._remove(entry.path):
+                deleted += 1
+        self._stats['deletes'] += deleted
+        with self._lock:
+            self._bytes = None
+        return deleted
+
+    def prune(self):
+        """Drop expired entries, stale temp files and the least recently used entries beyond max_bytes"""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+                if entry.name.endswith('.tmp'):
+                    if stat.st_mtime < now - self.STALE_TEMP_SECONDS:
+                        self._remove(entry.path)
+                    continue
+                if not entry.name.endswith(self.extension):
+                    continue
+                with open(entry.path, 'rb') as f:
+                    header = f.read(self.EXPIRY.size)
+            except FileNotFoundError:
+                continue
+            expires_at = self.EXPIRY.unpack(header)[0] if len(header) == self.EXPIRY.size else now
+            if expires_at and expires_at <= now:
+                self._remove(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            target = self.max_bytes * self.EVICTION_TARGET
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                if self._remove(path):
+                    self._stats['evictions'] += 1
+                total -= size
+        self._bytes = total
+        self._sets_since_prune = 0
+
+    def size(self):
+        return sum(1 for filename in os.listdir(self.directory) if filename.endswith(self.extension))
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats['bytes'] = self._bytes
+        stats['max_bytes'] = self.max_bytes
+        return stats
@@ -12,10 +12,16 @@ import socket
 import json
 import hashlib
 import random
+import asyncio
+import collections
 from enum import Enum
 from typing import Dict, List, Optional, Tuple, Any, Set, Callable
 from datetime import datetime, timedelta
 
+from cluster_transport import RaftServer, PeerClient, TransportError, load_secret
+from raft_log import RaftLog, DEFAULT_SEGMENT_BYTES
+from transaction_status import TransactionStatusStore, DEFAULT_MAX_ENTRIES, DEFAULT_TTL
+
 # Configure logger
 logger = logging.getLogger(__name__)
 
@@ -43,10 +49,50 @@ class HealthStatus(Enum):
     DEGRADED = "degraded"          # Node is operational but with issues
     UNHEALTHY = "unhealthy"        # Node is not operational
 
+# Bind addresses that would expose the RPC port on every interface
+WILDCARD_HOSTS = ('0.0.0.0', '::', '')
+
+# Seconds allowed for an InstallSnapshot RPC, which carries the whole state machine
+SNAPSHOT_RPC_TIMEOUT = 30.0
+
+
+def _discard_call(call: asyncio.Future) -> None:
+    """Cancel an RPC whose outcome no longer matters, consuming any failure it ends with"""
+    call.cancel()
+    call.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+
 class ClusterNode:
     """
     Represents a node in the high-availability cluster.
     Implements the Raft consensus algorithm for leader election and replication.
+    
+    Raft state lives on the node's own asyncio event loop, which runs in a
+    background thread together with the RPC server (cluster_transport). The
+    server only accepts frames signed with the cluster's shared secret, and
+    only from senders listed in cluster_nodes.
+    
+    The leader replicates to each follower from a dedicated task that pipelines
+    batches of up to max_batch entries, keeps up to pipeline_depth
+    AppendEntries in flight and backs next_index off using the follower's
+    hint when logs diverge. A proposal commits once a majority has
+    acknowledged it; followers acknowledge in parallel.
+    
+    The log is a RaftLog of append-only segment files. Appended entries are
+    fsynced in batches (one fsync per loop pass on the leader, one per
+    AppendEntries on a follower) before they count towards a majority.
+    Every snapshot_threshold applied entries the node snapshots its state
+    machine and drops the segments behind it; followers that fall behind the
+    log are sent the snapshot (InstallSnapshot).
+    
+    The state machine is committed_transactions, a compact map of every
+    committed transaction to its log index and timestamp; it is built from
+    the log alone, so every node snapshots the same state for an index.
+    Recent statuses, including pending ones, are also kept in memory (a
+    TransactionStatusStore, bounded by size and TTL) together with the
+    commit callbacks.
+    
+    Log indices start at 1; commit_index 0 means nothing is committed.
     """
     
     def __init__(
@@ -58,7 +104,17 @@ class ClusterNode:
         data_dir: str = None,
         heartbeat_interval: float = 0.5,
         election_timeout_min: float = 1.5,
-        election_timeout_max: float = 3.0
+        election_timeout_max: float = 3.0,
+        max_batch: int = 256,
+        pipeline_depth: int = 4,
+        rpc_timeout: float = None,
+        commit_timeout: float = 5.0,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        snapshot_threshold: int = 10000,
+        fsync: bool = True,
+        status_max_entries: int = DEFAULT_MAX_ENTRIES,
+        status_ttl: float = DEFAULT_TTL,
+        secret: bytes = None
     ):
         """
         Initialize a cluster node
@@ -72,10 +128,21 @@ class ClusterNode:
             heartbeat_interval: Time between heartbeats (in seconds)
             election_timeout_min: Minimum election timeout (in seconds)
             election_timeout_max: Maximum election timeout (in seconds)
+            max_batch: Maximum log entries per AppendEntries request
+            pipeline_depth: AppendEntries requests in flight per follower
+            rpc_timeout: Seconds to wait for an RPC response (default: the minimum election timeout)
+            commit_timeout: Seconds apply_transaction waits for a majority
+            segment_bytes: Size of a log segment file
+            snapshot_threshold: Applied entries between snapshots
+            fsync: fsync the log (disable only for throwaway clusters)
+            status_max_entries: Transaction statuses kept in memory
+            status_ttl: Seconds a transaction status or commit callback is kept
+            secret: Shared secret authenticating cluster RPCs (default: CLUSTER_SECRET)
         """
         self.node_id = node_id
         self.host = host
         self.port = port
+        self.secret = load_secret(secret)
         self.address = f"{host}:{port}"
         self.data_dir = data_dir or os.path.join(os.getcwd(), "cluster_data")
         
@@ -96,7 +163,7 @@ class ClusterNode:
         # Raft state
         self.current_term = 0
         self.voted_for = None
-        self.log = []
+        self.log = None  # RaftLog, opened by _load_state
         self.commit_index = 0
         self.last_applied = 0
         
@@ -113,19 +180,38 @@ class ClusterNode:
         self.election_timeout = self._generate_election_timeout()
         self.last_heartbeat_time = time.time()
         
+        # Replication
+        self.max_batch = max_batch
+        self.pipeline_depth = pipeline_depth
+        self.rpc_timeout = rpc_timeout or election_timeout_min
+        self.commit_timeout = commit_timeout
+        
+        # Log storage
+        self.segment_bytes = segment_bytes
+        self.snapshot_threshold = snapshot_threshold
+        self.fsync = fsync
+        
         # Cluster state
         self.cluster_state = ClusterState.INITIALIZING
         self.health_status = HealthStatus.HEALTHY
         
-        # Thread control
+        # Event loop and transport (see start)
         self.running = False
-        self.election_timer = None
-        self.heartbeat_timer = None
-        self.state_persistor_timer = None
-        
-        # Transaction cache for distributed consensus
-        self.transaction_cache = {}
-        self.transaction_lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self._tasks = []
+        self._peers = {}
+        self._replicators = {}
+        self._proposals = {}  # Log index -> future resolved when the entry commits
+        self._entries_appended = None
+        self._sync_scheduled = False
+        self._snapshotting = False
+        
+        # State machine: tx_id -> [log index, timestamp] of every committed transaction
+        self.committed_transactions = {}
+        # Recent transaction statuses and commit callbacks
+        self.transaction_status = TransactionStatusStore(status_max_entries, status_ttl)
         
         # Load saved state if available
         self._load_state()
@@ -137,34 +223,102 @@ class ClusterNode:
         return random.uniform(self.election_timeout_min, self.election_timeout_max)
     
     def _load_state(self) -> None:
-        """Load persisted state if available"""
-        state_file = os.path.join(self.data_dir, f"node_{self.node_id}_state.json")
+        """Open the log, restore the latest snapshot and load the term and vote"""
+        self.log = RaftLog(
+            os.path.join(self.data_dir, f"node_{self.node_id}_log"),
+            segment_bytes=self.segment_bytes,
+            fsync=self.fsync
+        )
         try:
+            snapshot = self.log.read_snapshot()
+            if snapshot:
+                self._restore_snapshot(snapshot['index'], snapshot['state'])
+            
+            # State saved by earlier versions: the whole log as one JSON document
+            state_file = os.path.join(self.data_dir, f"node_{self.node_id}_state.json")
             if os.path.exists(state_file):
                 with open(state_file, 'r') as f:
                     state = json.load(f)
-                    self.current_term = state.get('current_term', 0)
-                    self.voted_for = state.get('voted_for')
-                    self.log = state.get('log', [])
-                    logger.info(f"Node {self.node_id} loaded persistent state. Term: {self.current_term}")
+                self.current_term = state.get('current_term', 0)
+                self.voted_for = state.get('voted_for')
+                if self.log.last_index == 0 and state.get('log'):
+                    self.log.append(state['log'])
+                    self.log.sync()
+                    logger.info(f"Node {self.node_id} moved {len(state['log'])} log entries to segment files")
+                os.replace(state_file, state_file + '.migrated')
+            
+            term_file = os.path.join(self.data_dir, f"node_{self.node_id}_term.json")
+            if os.path.exists(term_file):
+                with open(term_file, 'r') as f:
+                    vote = json.load(f)
+                if vote.get('current_term', 0) >= self.current_term:
+                    self.current_term = vote.get('current_term', 0)
+                    self.voted_for = vote.get('voted_for')
             else:
                 logger.info(f"No persistent state found for node {self.node_id}, starting fresh")
+            self._save_term()
+            logger.info(f"Node {self.node_id} loaded persistent state. Term: {self.current_term}, "
+                        f"log: {self.log.first_index}..{self.log.last_index}, snapshot: {self.log.snapshot_index}")
         except Exception as e:
             logger.error(f"Error loading state: {str(e)}")
     
     def _save_state(self) -> None:
-        """Save persistent state to disk"""
-        state_file = os.path.join(self.data_dir, f"node_{self.node_id}_state.json")
+        """Make the log durable and save the term and vote"""
         try:
-            state = {
-                'current_term': self.current_term,
-                'voted_for': self.voted_for,
-                'log': self.log
-            }
-            with open(state_file, 'w') as f:
-                json.dump(state, f)
+            self.log.sync()
+        except Exception as e:
+            logger.error(f"Error saving log: {str(e)}")
+        self._save_term()
+    
+    def _save_term(self) -> None:
+        """Save the current term and vote before they are acted on"""
+        term_file = os.path.join(self.data_dir, f"node_{self.node_id}_term.json")
+        temp_file = term_file + '.tmp'
+        try:
+            with open(temp_file, 'w') as f:
+                json.dump({'current_term': self.current_term, 'voted_for': self.voted_for}, f)
+            os.replace(temp_file, term_file)
         except Exception as e:
-            logger.error(f"Error saving state: {str(e)}")
+            logger.error(f"Error saving term: {str(e)}")
+    
+    # Log access by Raft index (1-based)
+    
+    def _last_log_index(self) -> int:
+        return self.log.last_index
+    
+    def _term_at(self, index: int) -> int:
+        return self.log.term_at(index)
+    
+    def _entries_from(self, index: int, limit: int) -> List[Dict[str, Any]]:
+        return self.log.entries(index, limit)
+    
+    def _append_local(self, entries: List[Dict[str, Any]]) -> None:
+        self.log.append(entries)
+    
+    def _truncate_from(self, index: int) -> None:
+        self.log.truncate_from(index)
+    
+    def _schedule_sync(self) -> None:
+        """Fsync the log once for everything appended during this pass of the event loop"""
+        if not self._sync_scheduled:
+            self._sync_scheduled = True
+            self._loop.call_soon(self._sync_log)
+    
+    def _sync_log(self) -> None:
+        self._sync_scheduled = False
+        try:
+            self.log.sync()
+        except Exception as e:
+            logger.error(f"Node {self.node_id} failed to sync its log: {str(e)}")
+            return
+        if self.role == NodeRole.LEADER:
+            self._advance_commit_index()
+    
+    def _majority(self) -> int:
+        return (len(self.cluster_nodes) // 2) + 1
+    
+    def _peer_ids(self) -> List[str]:
+        return [node_id for node_id in self.cluster_nodes if node_id != self.node_id]
     
     def start(self) -> None:
         """Start the node's operation in the cluster"""
@@ -175,47 +329,94 @@ class ClusterNode:
         self.running = True
         logger.info(f"Starting node {self.node_id} in {self.role.value} role")
         
-        # Start election timer
-        self._reset_election_timer()
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run_loop, args=(started,), name=f"cluster-node-{self.node_id}", daemon=True
+        )
+        self._thread.start()
+        started.wait()
+    
+    def _run_loop(self, started: threading.Event) -> None:
+        """Run the node's event loop (RPC server, election timer, replication, persistence)"""
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._start_services())
+        except Exception as e:
+            logger.error(f"Node {self.node_id} failed to start: {str(e)}")
+            self.running = False
+            self.health_status = HealthStatus.UNHEALTHY
+        finally:
+            started.set()
         
-        # Start state persistor thread
-        self.state_persistor_timer = threading.Timer(5.0, self._state_persistor_loop)
-        self.state_persistor_timer.daemon = True
-        self.state_persistor_timer.start()
+        if self.running:
+            self._loop.run_forever()
+        self._loop.close()
+    
+    async def _start_services(self) -> None:
+        self._entries_appended = asyncio.Event()
+        self._server = RaftServer(self.host, self.port, self._handle_rpc, self.secret)
+        await self._server.start()
+        self._reset_election_timer()
+        self._tasks = [
+            asyncio.ensure_future(self._election_loop()),
+            asyncio.ensure_future(self._state_persistor_loop())
+        ]
     
     def stop(self) -> None:
         """Stop the node's operation in the cluster"""
+        if not self.running:
+            return
         logger.info(f"Stopping node {self.node_id}")
         self.running = False
         
-        # Cancel timers
-        if self.election_timer:
-            self.election_timer.cancel()
-        
-        if self.heartbeat_timer:
-            self.heartbeat_timer.cancel()
-            
-        if self.state_persistor_timer:
-            self.state_persistor_timer.cancel()
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop_services(), self._loop).result(5)
+        except Exception as e:
+            logger.error(f"Error stopping node {self.node_id}: {str(e)}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
         
         # Save state before stopping
         self._save_state()
+        self.log.close()
+    
+    async def _stop_services(self) -> None:
+        self._stop_replication("Node is stopping")
+        self._tasks = []
+        await self._server.stop()
+        for peer in self._peers.values():
+            await peer.close()
+        self._peers = {}
+        
+        # Cancel everything still running on the loop (timers, replicators, RPCs in flight)
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
     
     def _reset_election_timer(self) -> None:
         """Reset the election timeout"""
-        if self.election_timer:
-            self.election_timer.cancel()
-        
-        if not self.running:
-            return
-        
-        if self.role != NodeRole.LEADER:
-            self.election_timeout = self._generate_election_timeout()
-            self.election_timer = threading.Timer(self.election_timeout, self._start_election)
-            self.election_timer.daemon = True
-            self.election_timer.start()
+        self.election_timeout = self._generate_election_timeout()
+        self.last_heartbeat_time = time.time()
+    
+    async def _election_loop(self) -> None:
+        """Start an election whenever the election timeout passes without word from a leader"""
+        while self.running:
+            if self.role == NodeRole.LEADER:
+                await asyncio.sleep(self.election_timeout_min)
+                continue
+            remaining = self.last_heartbeat_time + self.election_timeout - time.time()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+                continue
+            try:
+                await self._start_election()
+            except Exception as e:
+                logger.error(f"Node {self.node_id} election failed: {str(e)}")
+                self._reset_election_timer()
     
-    def _start_election(self) -> None:
+    async def _start_election(self) -> None:
         """Start a leader election"""
         if not self.running or self.role == NodeRole.LEADER:
             return
@@ -223,66 +424,56 @@ class ClusterNode:
         self.role = NodeRole.CANDIDATE
         self.current_term += 1
         self.voted_for = self.node_id  # Vote for self
+        self.leader_id = None
         self.cluster_state = ClusterState.ELECTION
+        self._save_term()
+        term = self.current_term
         
-        logger.info(f"Node {self.node_id} starting election for term {self.current_term}")
+        logger.info(f"Node {self.node_id} starting election for term {term}")
         
         # Reset election timer
         self._reset_election_timer()
         
-        # Request votes from all nodes
         votes_received = 1  # Count own vote
-        votes_needed = (len(self.cluster_nodes) // 2) + 1
-        
-        # Prepare request vote message
-        last_log_index = len(self.log) - 1 if self.log else -1
-        last_log_term = self.log[last_log_index]['term'] if last_log_index >= 0 else 0
-        
-        for node_id, node_info in self.cluster_nodes.items():
-            if node_id == self.node_id:
-                continue
-            
-            # In a real implementation, you would send RPC to the node
-            # Here we'll simulate with a direct function call
-            granted = self._simulate_request_vote(node_id, {
-                'term': self.current_term, 
-                'candidate_id': self.node_id,
-                'last_log_index': last_log_index,
-                'last_log_term': last_log_term
-            })
-            
-            if granted:
-                votes_received += 1
-            
-            if votes_received >= votes_needed:
-                self._become_leader()
-                break
-    
-    def _simulate_request_vote(self, target_node_id: str, request: Dict[str, Any]) -> bool:
-        """
-        Simulate sending request vote RPC to another node
-        In a real implementation, this would be a network call
-        
-        Args:
-            target_node_id: ID of the node to request vote from
-            request: Vote request parameters
-            
-        Returns:
-            bool: Whether vote was granted
-        """
-        # This is a simulation - in a real implementation, send an RPC and wait for a response
-        # Here we'll randomly decide whether the vote was granted based on health
-        target_health = self.cluster_nodes.get(target_node_id, {}).get('health', HealthStatus.UNHEALTHY.value)
-        
-        if target_health == HealthStatus.UNHEALTHY.value:
-            # Unhealthy nodes can't vote
-            return False
+        votes_needed = self._majority()
+        if votes_received >= votes_needed:
+            self._become_leader()
+            return
         
-        # Simulate a successful vote with high probability for healthy nodes
-        if target_health == HealthStatus.HEALTHY.value:
-            return random.random() < 0.8  # 80% chance of success
-        else:
-            return random.random() < 0.4  # 40% chance if degraded
+        # Request votes from all nodes in parallel
+        last_log_index = self._last_log_index()
+        request = {
+            'type': 'request_vote',
+            'term': term,
+            'candidate_id': self.node_id,
+            'last_log_index': last_log_index,
+            'last_log_term': self._term_at(last_log_index)
+        }
+        calls = [asyncio.ensure_future(self._call_peer(node_id, request)) for node_id in self._peer_ids()]
+        try:
+            # Collect votes until this node's election timeout passes, then campaign again
+            for next_response in asyncio.as_completed(calls, timeout=self.election_timeout):
+                try:
+                    response = await next_response
+                except TransportError as e:
+                    logger.debug(f"Vote request failed: {str(e)}")
+                    continue
+                
+                if response['term'] > self.current_term:
+                    self._step_down(response['term'])
+                    return
+                if self.role != NodeRole.CANDIDATE or self.current_term != term:
+                    return
+                if response.get('vote_granted'):
+                    votes_received += 1
+                if votes_received >= votes_needed:
+                    self._become_leader()
+                    return
+        except asyncio.TimeoutError:
+            logger.info(f"Node {self.node_id} election for term {term} timed out with {votes_received} votes")
+        finally:
+            for call in calls:
+                _discard_call(call)
     
     def _become_leader(self) -> None:
         """Become the leader of the cluster"""
@@ -294,74 +485,278 @@ class ClusterNode:
         self.leader_id = self.node_id
         self.cluster_state = ClusterState.STABLE
         
+        # A no-op entry of the new term lets entries of earlier terms commit (Raft section 5.4.2)
+        self._append_local([{'term': self.current_term, 'command': None, 'timestamp': datetime.now().isoformat()}])
+        
         # Initialize leader state
-        for node_id in self.cluster_nodes:
-            self.next_index[node_id] = len(self.log)
+        for node_id in self._peer_ids():
+            self.next_index[node_id] = self._last_log_index()
             self.match_index[node_id] = 0
-        
-        # Cancel election timer
-        if self.election_timer:
-            self.election_timer.cancel()
-        
-        # Start sending heartbeats
-        self._send_heartbeats()
+            self._replicators[node_id] = asyncio.ensure_future(self._replicate(node_id, self.current_term))
+        self._schedule_sync()
     
-    def _send_heartbeats(self) -> None:
-        """Send heartbeats to all followers"""
-        if not self.running or self.role != NodeRole.LEADER:
-            return
-        
-        logger.debug(f"Leader {self.node_id} sending heartbeats")
-        
-        for node_id, node_info in self.cluster_nodes.items():
-            if node_id == self.node_id:
-                continue
-            
-            # In a real implementation, you would send append entries RPC to the node
-            # Here we'll simulate with a direct function call
-            self._simulate_append_entries(node_id, {
+    def _step_down(self, term: int) -> None:
+        """Adopt a newer term (if given) and return to the follower role"""
+        if term > self.current_term:
+            self.current_term = term
+            self.voted_for = None
+            self._save_term()
+        if self.role == NodeRole.LEADER:
+            logger.info(f"Leader {self.node_id} stepping down in term {self.current_term}")
+            self._stop_replication("Leadership lost before the transaction was committed")
+            # A leader's election clock is stale; give the new leader time to reach us
+            self._reset_election_timer()
+        # Otherwise the timer keeps running: a rejected candidate must not stop us from campaigning
+        self.role = NodeRole.FOLLOWER
+    
+    def _stop_replication(self, reason: str) -> None:
+        """Cancel the replicators and fail proposals still waiting to commit"""
+        for task in self._replicators.values():
+            task.cancel()
+        self._replicators = {}
+        proposals, self._proposals = self._proposals, {}
+        for future in proposals.values():
+            if not future.done():
+                future.set_result((False, reason))
+    
+    def _notify_replicators(self) -> None:
+        """Wake the replicators: new entries are waiting"""
+        event, self._entries_appended = self._entries_appended, asyncio.Event()
+        event.set()
+    
+    def _append_request(self, next_index: int) -> Dict[str, Any]:
+        prev_log_index = next_index - 1
+        if next_index < self.log.first_index or not self.log.knows_term(prev_log_index):
+            # The entries the follower needs are compacted: send the snapshot instead
+            snapshot = self.log.read_snapshot()
+            return {
+                'type': 'install_snapshot',
                 'term': self.current_term,
                 'leader_id': self.node_id,
-                'prev_log_index': self.next_index[node_id] - 1,
-                'prev_log_term': self.log[self.next_index[node_id] - 1]['term'] if self.next_index[node_id] > 0 and self.log else 0,
-                'entries': [],  # No entries for heartbeat
-                'leader_commit': self.commit_index
-            })
+                'last_included_index': snapshot['index'],
+                'last_included_term': snapshot['term'],
+                'state': snapshot['state']
+            }
+        return {
+            'type': 'append_entries',
+            'term': self.current_term,
+            'leader_id': self.node_id,
+            'prev_log_index': prev_log_index,
+            'prev_log_term': self._term_at(prev_log_index),
+            'entries': self._entries_from(next_index, self.max_batch),
+            'leader_commit': self.commit_index
+        }
+    
+    async def _replicate(self, node_id: str, term: int) -> None:
+        """
+        Replicate the log to one follower for as long as this node leads in term
+        
+        Sends batches while fewer than pipeline_depth are in flight (an empty
+        batch doubles as the heartbeat) and handles responses in order.
+        """
+        inflight = collections.deque()
+        next_send = self.next_index[node_id]
+        last_sent = 0.0
+        backoff = self.heartbeat_interval / 4
+        
+        def reset_pipeline(next_index):
+            for _, call in inflight:
+                _discard_call(call)
+            inflight.clear()
+            self.next_index[node_id] = next_index
+            return next_index
         
-        # Schedule next heartbeat
-        if self.running and self.role == NodeRole.LEADER:
-            self.heartbeat_timer = threading.Timer(self.heartbeat_interval, self._send_heartbeats)
-            self.heartbeat_timer.daemon = True
-            self.heartbeat_timer.start()
+        try:
+            while self.running and self.role == NodeRole.LEADER and self.current_term == term:
+                now = time.monotonic()
+                while len(inflight) < self.pipeline_depth:
+                    has_entries = next_send <= self._last_log_index()
+                    if not has_entries and (inflight or now - last_sent < self.heartbeat_interval):
+                        break
+                    request = self._append_request(next_send)
+                    if request['type'] == 'install_snapshot':
+                        # Sent alone, once the pipeline has drained
+                        if inflight:
+                            break
+                        next_send = request['last_included_index'] + 1
+                        call = self._call_peer(node_id, request, SNAPSHOT_RPC_TIMEOUT)
+                    else:
+                        next_send += len(request['entries'])
+                        call = self._call_peer(node_id, request)
+                    inflight.append((request, asyncio.ensure_future(call)))
+                    last_sent = now
+                
+                # Wait for the oldest response, new entries to pipeline, or the next heartbeat
+                appended = asyncio.ensure_future(self._entries_appended.wait())
+                waiting = {appended}
+                if inflight:
+                    waiting.add(inflight[0][1])
+                timeout = self.heartbeat_interval if inflight else max(0.0, last_sent + self.heartbeat_interval - now)
+                await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                appended.cancel()
+                if not inflight or not inflight[0][1].done():
+                    continue
+                
+                request, call = inflight.popleft()
+                try:
+                    response = call.result()
+                except TransportError as e:
+                    # Unreachable or slow: resend everything unacknowledged after a pause
+                    logger.debug(f"AppendEntries to {node_id} failed: {str(e)}")
+                    next_send = reset_pipeline(self.match_index[node_id] + 1)
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, self.election_timeout_min)
+                    continue
+                backoff = self.heartbeat_interval / 4
+                
+                if response['term'] > self.current_term:
+                    self._step_down(response['term'])
+                    return
+                
+                if response['success']:
+                    if request['type'] == 'install_snapshot':
+                        match = request['last_included_index']
+                    else:
+                        match = request['prev_log_index'] + len(request['entries'])
+                    if match > self.match_index[node_id]:
+                        self.match_index[node_id] = match
+                        self._advance_commit_index()
+                    self.next_index[node_id] = max(self.next_index[node_id], match + 1)
+                else:
+                    # Logs diverge: skip back to the follower's hint and rebuild the pipeline
+                    hint = response.get('last_log_index', request['prev_log_index'] - 1)
+                    next_send = reset_pipeline(max(self.match_index[node_id] + 1, min(request['prev_log_index'], hint + 1)))
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for _, call in inflight:
+                _discard_call(call)
+    
+    def _advance_commit_index(self) -> None:
+        """Commit the highest entry of the current term stored on a majority"""
+        # The leader's own copy counts once it is on disk
+        matches = sorted([self.log.durable_index] + [self.match_index.get(node_id, 0) for node_id in self._peer_ids()],
+                         reverse=True)
+        candidate = matches[self._majority() - 1]
+        if candidate > self.commit_index and self._term_at(candidate) == self.current_term:
+            self.commit_index = candidate
+            self._apply_committed()
+    
+    def _apply_committed(self) -> None:
+        """Apply newly committed entries and resolve the proposals waiting on them"""
+        while self.last_applied < self.commit_index:
+            for entry in self.log.entries(self.last_applied + 1, self.commit_index - self.last_applied):
+                self.last_applied += 1
+                command = entry.get('command')
+                if command and command.get('id'):
+                    self.committed_transactions[command['id']] = [self.last_applied, entry.get('timestamp')]
+                    # Fires the transaction's commit callbacks
+                    self.transaction_status.record(command['id'], 'committed', self.last_applied)
+                    future = self._proposals.pop(self.last_applied, None)
+                    if future is not None and not future.done():
+                        future.set_result((True, f"Transaction {command['id']} committed"))
+        
+        if not self._snapshotting and self.last_applied - self.log.snapshot_index >= self.snapshot_threshold:
+            self._snapshotting = True
+            asyncio.ensure_future(self._take_snapshot())
+    
+    def _snapshot_state(self) -> Dict[str, Any]:
+        """The state machine as of last_applied: the index and timestamp of every committed transaction"""
+        return {'transactions': dict(self.committed_transactions)}
     
-    def _simulate_append_entries(self, target_node_id: str, request: Dict[str, Any]) -> bool:
+    def _restore_snapshot(self, index: int, state: Dict[str, Any]) -> None:
+        """Replace the state machine with a snapshot's"""
+        committed = {}
+        for tx_id, item in state.get('transactions', {}).items():
+            # Snapshots of earlier versions hold status dicts
+            committed[tx_id] = [item['index'], item.get('timestamp')] if isinstance(item, dict) else list(item)
+        self.committed_transactions = committed
+        self.transaction_status.restore(self._committed_status)
+        self.commit_index = max(self.commit_index, index)
+        self.last_applied = index
+    
+    def _committed_status(self, tx_id: str) -> Optional[Dict[str, Any]]:
+        """The status of a committed transaction from the state machine, or None"""
+        item = self.committed_transactions.get(tx_id)
+        if item is None:
+            return None
+        return {'status': 'committed', 'index': item[0], 'timestamp': item[1]}
+    
+    async def _take_snapshot(self) -> None:
+        """Snapshot the state machine and release the log segments behind it"""
+        try:
+            index = self.last_applied
+            term = self.log.term_at(index)
+            state = self._snapshot_state()
+            # Writing the snapshot doesn't touch the segments, so the loop keeps serving meanwhile
+            await asyncio.get_running_loop().run_in_executor(None, self.log.write_snapshot, index, term, state)
+            released = self.log.compact(index, term)
+            logger.info(f"Node {self.node_id} took a snapshot at {index} and released {released} log entries")
+        except Exception as e:
+            logger.error(f"Node {self.node_id} failed to take a snapshot: {str(e)}")
+        finally:
+            self._snapshotting = False
+    
+    async def _call_peer(self, node_id: str, request: Dict[str, Any], timeout: float = None) -> Dict[str, Any]:
+        """Send an RPC to a peer and record that it was seen"""
+        peer = self._peers.get(node_id)
+        if peer is None:
+            node_info = self.cluster_nodes[node_id]
+            peer = self._peers[node_id] = PeerClient(node_info['host'], node_info['port'], self.secret, self.rpc_timeout)
+        response = await peer.call(request, timeout or self.rpc_timeout)
+        self._mark_seen(node_id)
+        return response
+    
+    def _mark_seen(self, node_id: Optional[str]) -> None:
+        if node_id in self.cluster_nodes:
+            self.cluster_nodes[node_id]['last_seen'] = datetime.now().isoformat()
+    
+    async def _handle_rpc(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Dispatch an incoming RPC from a cluster member"""
+        rpc_type = request.get('type')
+        sender_id = request.get('candidate_id' if rpc_type == 'request_vote' else 'leader_id')
+        if sender_id == self.node_id or sender_id not in self.cluster_nodes:
+            raise ValueError(f"{rpc_type} RPC from unknown node {sender_id}")
+        if rpc_type == 'append_entries':
+            self._mark_seen(sender_id)
+            return self._receive_append_entries(request)
+        if rpc_type == 'request_vote':
+            self._mark_seen(sender_id)
+            return self._receive_request_vote(request)
+        if rpc_type == 'install_snapshot':
+            self._mark_seen(sender_id)
+            return await self._receive_install_snapshot(request)
+        raise ValueError(f"Unknown RPC type: {rpc_type}")
+    
+    def _receive_request_vote(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Simulate sending append entries RPC to another node
-        In a real implementation, this would be a network call
+        Handle a request vote from a candidate
         
         Args:
-            target_node_id: ID of the node to send entries to
-            request: Append entries request parameters
+            request: The request vote request
             
         Returns:
-            bool: Whether entries were appended successfully
+            dict: The response
         """
-        # Update last seen time for the target node
-        if target_node_id in self.cluster_nodes:
-            self.cluster_nodes[target_node_id]['last_seen'] = datetime.now().isoformat()
-        
-        # This is a simulation - in a real implementation, send an RPC and wait for a response
-        # Here we'll randomly decide whether the append entries succeeded based on health
-        target_health = self.cluster_nodes.get(target_node_id, {}).get('health', HealthStatus.UNHEALTHY.value)
-        
-        if target_health == HealthStatus.UNHEALTHY.value:
-            return False
+        term = request.get('term', 0)
+        candidate_id = request.get('candidate_id')
         
-        # Simulate successful append with high probability for healthy nodes
-        if target_health == HealthStatus.HEALTHY.value:
-            return random.random() < 0.95  # 95% chance of success
-        else:
-            return random.random() < 0.6   # 60% chance if degraded
+        if term < self.current_term:
+            return {'term': self.current_term, 'vote_granted': False}
+        if term > self.current_term:
+            self._step_down(term)
+        
+        # Only vote for candidates whose log is at least as up to date as ours
+        last_log_index = self._last_log_index()
+        last_log_term = self._term_at(last_log_index)
+        up_to_date = (request.get('last_log_term', 0), request.get('last_log_index', 0)) >= (last_log_term, last_log_index)
+        
+        granted = up_to_date and self.voted_for in (None, candidate_id)
+        if granted:
+            self.voted_for = candidate_id
+            self._save_term()
+            self._reset_election_timer()
+        return {'term': self.current_term, 'vote_granted': granted}
     
     def _receive_append_entries(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -371,7 +766,7 @@ class ClusterNode:
             request: The append entries request
             
         Returns:
-            dict: The response
+            dict: The response; on a log mismatch, last_log_index hints where the leader should resume
         """
         term = request.get('term', 0)
         leader_id = request.get('leader_id')
@@ -380,70 +775,102 @@ class ClusterNode:
         entries = request.get('entries', [])
         leader_commit = request.get('leader_commit', 0)
         
-        response = {'term': self.current_term, 'success': False}
-        
         # If term is older, reject
         if term < self.current_term:
-            return response
+            return {'term': self.current_term, 'success': False, 'last_log_index': self._last_log_index()}
         
-        # If this is a newer term, update our term and step down if we're a leader or candidate
-        if term > self.current_term:
-            self.current_term = term
-            self.voted_for = None
-            if self.role in (NodeRole.LEADER, NodeRole.CANDIDATE):
-                self.role = NodeRole.FOLLOWER
+        # A newer term, or a leader elected in our term while we campaigned: follow it
+        if term > self.current_term or self.role != NodeRole.FOLLOWER:
+            self._step_down(term)
         
         # This is a valid append entries from the current leader
-        self.last_heartbeat_time = time.time()
         self._reset_election_timer()
-        
-        if self.role != NodeRole.FOLLOWER:
-            self.role = NodeRole.FOLLOWER
-        
         self.leader_id = leader_id
         self.cluster_state = ClusterState.STABLE
         
-        # Check if our log is consistent with the leader's
-        log_ok = (prev_log_index == 0) or (
-            prev_log_index > 0 and 
-            prev_log_index <= len(self.log) and 
-            (prev_log_index == 0 or self.log[prev_log_index - 1]['term'] == prev_log_term)
-        )
-        
-        if not log_ok:
-            # Our log doesn't match the leader's, we need to fix it
-            return response
+        # Entries up to our snapshot are committed and therefore match the leader's
+        match = prev_log_index + len(entries)
+        if prev_log_index < self.log.snapshot_index:
+            entries = entries[self.log.snapshot_index - prev_log_index:]
+            prev_log_index = self.log.snapshot_index
+            prev_log_term = self.log.snapshot_term
+            match = max(match, prev_log_index)
         
-        # If we have conflicting entries, remove them
-        if entries and prev_log_index < len(self.log):
-            self.log = self.log[:prev_log_index]
-        
-        # Append new entries to our log
-        for entry in entries:
-            self.log.append(entry)
+        # Check if our log is consistent with the leader's
+        last_log_index = self._last_log_index()
+        if prev_log_index > last_log_index:
+            return {'term': self.current_term, 'success': False, 'last_log_index': last_log_index}
+        if self._term_at(prev_log_index) != prev_log_term:
+            # Skip the whole conflicting term rather than one entry per round trip
+            conflict_term = self._term_at(prev_log_index)
+            index = prev_log_index
+            while index > self.log.first_index and self._term_at(index - 1) == conflict_term:
+                index -= 1
+            return {'term': self.current_term, 'success': False, 'last_log_index': index - 1}
+        
+        # Skip entries we already have; drop ours from the first conflict on
+        for offset, entry in enumerate(entries):
+            index = prev_log_index + 1 + offset
+            if index <= last_log_index:
+                if self._term_at(index) == entry['term']:
+                    continue
+                self._truncate_from(index)
+            self._append_local(entries[offset:])
+            break
+        # Acknowledge only what is on disk
+        self.log.sync()
         
         # Update commit index if leader committed more entries
-        if leader_commit > self.commit_index:
-            self.commit_index = min(leader_commit, len(self.log))
+        if min(leader_commit, match) > self.commit_index:
+            self.commit_index = min(leader_commit, match)
+            self._apply_committed()
         
-        response['success'] = True
-        return response
+        return {'term': self.current_term, 'success': True, 'last_log_index': match}
     
-    def _state_persistor_loop(self) -> None:
-        """Periodically save state to disk"""
-        if not self.running:
-            return
+    async def _receive_install_snapshot(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Handle a snapshot sent by the leader because our log is behind its compacted prefix
         
-        self._save_state()
+        Args:
+            request: The install snapshot request
+            
+        Returns:
+            dict: The response; last_log_index is the snapshot's index
+        """
+        term = request.get('term', 0)
+        index = request['last_included_index']
+        snapshot_term = request['last_included_term']
         
-        # Check health of other nodes
-        self._check_node_health()
+        if term < self.current_term:
+            return {'term': self.current_term, 'success': False, 'last_log_index': self._last_log_index()}
+        if term > self.current_term or self.role != NodeRole.FOLLOWER:
+            self._step_down(term)
+        self._reset_election_timer()
+        self.leader_id = request.get('leader_id')
+        self.cluster_state = ClusterState.STABLE
         
-        # Schedule next run
-        if self.running:
-            self.state_persistor_timer = threading.Timer(5.0, self._state_persistor_loop)
-            self.state_persistor_timer.daemon = True
-            self.state_persistor_timer.start()
+        # Nothing to do if we already applied everything it covers
+        if index > self.last_applied:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.log.write_snapshot, index, snapshot_term, request['state']
+            )
+            self.log.reset(index, snapshot_term)
+            self._restore_snapshot(index, request['state'])
+            logger.info(f"Node {self.node_id} installed a snapshot at {index} from {self.leader_id}")
+            # Entries we kept past the snapshot may already be committed
+            self._apply_committed()
+        
+        return {'term': self.current_term, 'success': True, 'last_log_index': index}
+    
+    async def _state_persistor_loop(self) -> None:
+        """Periodically save state to disk"""
+        while self.running:
+            await asyncio.sleep(5.0)
+            self._save_state()
+            self.transaction_status.expire()
+            
+            # Check health of other nodes
+            self._check_node_health()
     
     def _check_node_health(self) -> None:
         """Check the health of all nodes in the cluster"""
@@ -494,6 +921,9 @@ class ClusterNode:
         """
         Apply a transaction to the cluster
         
+        Appends the transaction to the leader's log and waits until a majority
+        of the cluster has stored it (at most commit_timeout seconds).
+        
         Args:
             transaction: Transaction data to apply
             
@@ -516,82 +946,107 @@ class ClusterNode:
             tx_id = hashlib.sha256(f"{time.time()}:{json.dumps(transaction)}".encode()).hexdigest()
             transaction['id'] = tx_id
         
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._propose(transaction), self._loop)
+            return future.result(self.commit_timeout + 1)
+        except Exception as e:
+            logger.warning(f"Failed to replicate transaction {tx_id}: {str(e)}")
+            return False, f"Failed to replicate transaction {tx_id}: {str(e)}"
+    
+    async def _propose(self, transaction: Dict[str, Any]) -> Tuple[bool, str]:
+        """Append a transaction to the log on the leader and wait for it to commit"""
+        tx_id = transaction['id']
+        if self.role != NodeRole.LEADER:
+            return False, "Not the leader and no leader is known"
+        
         # Add entry to log
-        log_entry = {
+        self._append_local([{
             'term': self.current_term,
             'command': transaction,
             'timestamp': datetime.now().isoformat()
-        }
+        }])
+        log_index = self._last_log_index()
         
-        with self.transaction_lock:
-            self.log.append(log_entry)
-            log_index = len(self.log) - 1
-            
-            # Save to transaction cache for tracking
-            self.transaction_cache[tx_id] = {
-                'status': 'pending',
-                'index': log_index,
-                'timestamp': datetime.now().isoformat()
-            }
-        
-        # Replicate to followers and wait for majority confirmation
-        # In a real implementation, this would be asynchronous
-        # For simplicity, we'll simulate direct responses
+        self.transaction_status.record(tx_id, 'pending', log_index)
         
-        success_count = 1  # Count self
-        needed_count = (len(self.cluster_nodes) // 2) + 1
+        future = asyncio.get_running_loop().create_future()
+        self._proposals[log_index] = future
+        self._notify_replicators()
+        # Commits once the leader's copy is on disk and, unless it's alone, a majority has acked
+        self._schedule_sync()
         
-        for node_id, node_info in self.cluster_nodes.items():
-            if node_id == self.node_id:
-                continue
-            
-            # Simulate appending to follower
-            if self._simulate_append_entries(node_id, {
-                'term': self.current_term,
-                'leader_id': self.node_id,
-                'prev_log_index': log_index - 1,
-                'prev_log_term': self.log[log_index - 1]['term'] if log_index > 0 else 0,
-                'entries': [log_entry],
-                'leader_commit': self.commit_index
-            }):
-                success_count += 1
-                self.match_index[node_id] = log_index
-                self.next_index[node_id] = log_index + 1
-            else:
-                # If append fails, we would decrement next_index and retry in a real implementation
-                # For simplicity, we'll just note the failure
-                logger.warning(f"Failed to replicate transaction {tx_id} to node {node_id}")
-        
-        # Check if we have replicated to a majority
-        if success_count >= needed_count:
-            # Update commit index to include this entry
-            if log_index > self.commit_index:
-                self.commit_index = log_index
-            
-            # Mark transaction as committed
-            with self.transaction_lock:
-                self.transaction_cache[tx_id]['status'] = 'committed'
-            
-            return True, f"Transaction {tx_id} committed"
-        else:
-            # Mark transaction as failed
-            with self.transaction_lock:
-                self.transaction_cache[tx_id]['status'] = 'failed'
-            
-            return False, f"Failed to replicate transaction {tx_id} to majority of nodes"
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.commit_timeout)
+        except asyncio.TimeoutError:
+            # The entry stays in the log and may still commit; its status stays pending until then
+            return False, f"Failed to replicate transaction {tx_id} to majority of nodes within {self.commit_timeout}s"
     
     def get_transaction_status(self, tx_id: str) -> Dict[str, Any]:
         """
         Get the status of a transaction
         
+        Recent transactions are answered from memory, older committed ones
+        from the state machine, and pending ones that dropped out of memory
+        from the log.
+        
         Args:
             tx_id: Transaction ID
             
         Returns:
             dict: Transaction status or None if not found
         """
-        with self.transaction_lock:
-            return self.transaction_cache.get(tx_id)
+        status = self.transaction_status.get(tx_id)
+        if status is not None:
+            return status
+        status = self._committed_status(tx_id)
+        if status is not None:
+            return status
+        
+        try:
+            if self.running and threading.current_thread() is not self._thread:
+                found = asyncio.run_coroutine_threadsafe(self._find_in_log(tx_id), self._loop).result(self.commit_timeout)
+            else:
+                found = self._find_transaction_entry(tx_id)
+        except Exception as e:
+            logger.error(f"Error looking up transaction {tx_id} in the log: {str(e)}")
+            return None
+        self.transaction_status.record_log_lookup(found is not None)
+        if found is None:
+            return None
+        index, entry = found
+        return {
+            'status': 'committed' if index <= self.commit_index else 'pending',
+            'index': index,
+            'timestamp': entry.get('timestamp')
+        }
+    
+    async def _find_in_log(self, tx_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        return self._find_transaction_entry(tx_id)
+    
+    def _find_transaction_entry(self, tx_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Find the log entry of a transaction (on the loop thread while running)"""
+        needle = json.dumps(tx_id).encode('utf-8')
+        return self.log.find_latest(needle, lambda entry: (entry.get('command') or {}).get('id') == tx_id)
+    
+    def on_commit(self, tx_id: str, callback: Callable[[str, Dict[str, Any]], None]) -> None:
+        """
+        Call callback(tx_id, status) once the transaction commits on this node
+        
+        The callback fires on the commit index passing the transaction's
+        entry (at once if it already has) and is then released; if the
+        transaction doesn't commit within status_ttl it fires with status
+        'expired'. Callbacks run on a worker thread, one at a time.
+        
+        Args:
+            tx_id: Transaction ID
+            callback: Called with the transaction ID and its status
+        """
+        if self.transaction_status.get(tx_id) is None:
+            # Committed too long ago to be kept: reload its status so the callback fires now
+            status = self.get_transaction_status(tx_id)
+            if status and status['status'] == 'committed':
+                self.transaction_status.record(tx_id, 'committed', status['index'], status['timestamp'])
+        self.transaction_status.add_callback(tx_id, callback)
     
     def get_cluster_status(self) -> Dict[str, Any]:
         """
@@ -609,7 +1064,11 @@ class ClusterNode:
             'health': self.health_status.value,
             'commit_index': self.commit_index,
             'last_applied': self.last_applied,
-            'log_size': len(self.log),
+            'log_size': self._last_log_index(),
+            'log_first_index': self.log.first_index,
+            'snapshot_index': self.log.snapshot_index,
+            'match_index': dict(self.match_index) if self.role == NodeRole.LEADER else {},
+            'transaction_status': self.transaction_status.get_stats(),
             'nodes': {
                 node_id: {
                     'address': info['address'],
@@ -671,9 +1130,6 @@ class ClusterManager:
             data_dir=data_dir
         )
         
-        # Transaction callback registry for distributed transactions
-        self.transaction_callbacks = {}
-        
         # Cache of known leaders for routing client requests
         self.leader_cache = {
             'id': None,
@@ -743,7 +1199,8 @@ class ClusterManager:
         
         Args:
             transaction_data: The transaction data to execute
-            callback: Optional callback function to call when transaction completes
+            callback: Optional callback(tx_id, status), called once the transaction commits;
+                only registered when this node is the leader and appended it to its log
             
         Returns:
             tuple: (success, message, transaction_id)
@@ -757,10 +1214,10 @@ class ClusterManager:
         # If we're the leader, apply directly
         if self.node.role == NodeRole.LEADER:
             success, message = self.node.apply_transaction(transaction_data)
-            
-            if callback:
-                self.transaction_callbacks[tx_id] = callback
-            
+            # Only a transaction in the local log can commit (even after a timeout);
+            # on_commit fires at once if it already has
+            if callback and self.node.transaction_status.get(tx_id) is not None:
+                self.node.on_commit(tx_id, callback)
             return success, message, tx_id
         
         # Otherwise, forward to the leader if known
@@ -777,9 +1234,6 @@ class ClusterManager:
             
             # In a real implementation, we would forward to the leader
             # For this simulation, we'll just return the forward info
-            if callback:
-                self.transaction_callbacks[tx_id] = callback
-                
             return False, f"Not the leader. Forward to {leader_addr}", tx_id
         
         # No leader known, transaction cannot be processed
@@ -849,9 +1303,9 @@ class ClusterManager:
         
         Args:
             tx_id: Transaction ID
-            callback: Callback function to call when transaction status changes
+            callback: Callback(tx_id, status), called once the transaction commits (see ClusterNode.on_commit)
         """
-        self.transaction_callbacks[tx_id] = callback
+        self.node.on_commit(tx_id, callback)
 
 
 def initialize_cluster_node(
@@ -865,20 +1319,25 @@ def initialize_cluster_node(
     
     Args:
         node_id: Unique identifier for this node
-        host: Host where this node is running
+        host: Address of the cluster interface to listen on (required; also
+            the address peers reach this node at, so never a wildcard)
         port: Port where this node is listening
         seed_nodes: List of seed nodes to join the cluster
         
     Returns:
         ClusterManager: Initialized cluster manager instance
+        
+    Raises:
+        ValueError: If host is missing or a wildcard address
     """
     # Generate node ID if not provided
     if not node_id:
         hostname = socket.gethostname()
         node_id = f"node_{hostname}_{int(time.time())}"
     
-    # Default host and port
-    host = host or "0.0.0.0"
+    # The RPC port must only be reachable on the cluster's own network
+    if not host or host in WILDCARD_HOSTS:
+        raise ValueError(f"Cluster nodes must bind to an explicit cluster interface, not {host!r} (set CLUSTER_HOST)")
     port = port or 7000
     
     # Create and start the cluster manager
@@ -913,7 +1372,7 @@ def init_cluster():
     
     # Read configuration from environment
     node_id = os.environ.get('CLUSTER_NODE_ID')
-    host = os.environ.get('CLUSTER_HOST', '0.0.0.0')
+    host = os.environ.get('CLUSTER_HOST')
     port = int(os.environ.get('CLUSTER_PORT', '7000'))
     
     # Parse seed nodes if provided
@@ -931,12 +1390,12 @@ def init_cluster():
                         'port': int(parts[2])
                     })
                 elif len(parts) == 2:  # host:port format
-                    host, port = parts
-                    seed_id = f"seed_{host}_{port}"
+                    seed_host, seed_port = parts
+                    seed_id = f"seed_{seed_host}_{seed_port}"
                     seed_nodes.append({
                         'id': seed_id,
-                        'host': host,
-                        'port': int(port)
+                        'host': seed_host,
+                        'port': int(seed_port)
                     })
         except Exception as e:
             logger.error(f"Error parsing seed nodes: {str(e)}")
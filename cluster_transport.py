@@ -0,0 +1,285 @@
+"""
+Cluster RPC Transport for NVC Banking Platform
+
+Raft RPCs (AppendEntries, RequestVote) between cluster nodes over asyncio TCP.
+
+- A frame is a 4-byte big-endian length followed by a JSON object.
+- Every request carries an 'rpc_id' that its response echoes, so a
+  connection carries many outstanding requests at once (pipelining) and
+  responses are matched to their callers as they arrive.
+- A server handles the requests of one connection in order, which keeps a
+  leader's pipelined AppendEntries in log order on the follower.
+- Client connections are opened lazily and re-opened after a failure; a
+  broken connection fails every request outstanding on it.
+- Peers are authenticated with a cluster-wide shared secret: the server
+  opens each connection with a random nonce, both sides derive a
+  connection key from the secret and the nonce, and every frame carries an
+  HMAC-SHA256 over its direction, sequence number and payload. A frame that
+  fails verification (wrong secret, replayed, reordered or from another
+  connection) closes the connection before it is parsed.
+"""
+
+import os
+import hmac
+import json
+import struct
+import asyncio
+import hashlib
+import logging
+import itertools
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('>I')
+SEQUENCE = struct.Struct('>Q')
+
+# Upper bound for one frame; a full AppendEntries batch stays far below it
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+NONCE_BYTES = 16
+MAC_BYTES = hashlib.sha256().digest_size
+
+# Environment variable holding the shared secret when none is passed in
+SECRET_ENV = 'CLUSTER_SECRET'
+MIN_SECRET_BYTES = 16
+
+
+class TransportError(Exception):
+    """An RPC could not be delivered or its connection was lost"""
+
+
+def load_secret(secret: Optional[bytes] = None) -> bytes:
+    """
+    Resolve the cluster's shared secret
+
+    Args:
+        secret: Secret to use (default: the CLUSTER_SECRET environment variable)
+
+    Returns:
+        bytes: The secret
+
+    Raises:
+        ValueError: If no secret is configured or it is shorter than MIN_SECRET_BYTES
+    """
+    if secret is None:
+        secret = os.environ.get(SECRET_ENV, '')
+    if isinstance(secret, str):
+        secret = secret.encode('utf-8')
+    if len(secret) < MIN_SECRET_BYTES:
+        raise ValueError(f"The cluster secret ({SECRET_ENV}) must be at least {MIN_SECRET_BYTES} bytes")
+    return secret
+
+
+class FrameCodec:
+    """
+    Signs outgoing and verifies incoming frames of one connection
+
+    A frame is the 4-byte payload length, the HMAC of the frame and the JSON
+    payload. Each direction numbers its frames from 0, so a frame is only
+    accepted once, in order, on the connection it was sent on.
+
+    Args:
+        secret: Cluster shared secret
+        nonce: Random nonce the server opened the connection with
+        server: Whether this is the server side of the connection
+    """
+
+    def __init__(self, secret: bytes, nonce: bytes, server: bool):
+        self._key = hmac.new(secret, nonce, hashlib.sha256).digest()
+        self._send_label, self._receive_label = (b'S', b'C') if server else (b'C', b'S')
+        self._sent = 0
+        self._received = 0
+
+    def _mac(self, label: bytes, sequence: int, payload: bytes) -> bytes:
+        return hmac.new(self._key, label + SEQUENCE.pack(sequence) + payload, hashlib.sha256).digest()
+
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        """Encode and sign a message; frames must be written in the order they are encoded"""
+        payload = json.dumps(message, separators=(',', ':'), default=str).encode('utf-8')
+        mac = self._mac(self._send_label, self._sent, payload)
+        self._sent += 1
+        return HEADER.pack(len(payload)) + mac + payload
+
+    async def read(self, reader: asyncio.StreamReader) -> Dict[str, Any]:
+        """
+        Read and verify one frame
+
+        Raises:
+            asyncio.IncompleteReadError: If the connection closed
+            TransportError: If the frame is larger than MAX_FRAME_BYTES or fails verification
+        """
+        header = await reader.readexactly(HEADER.size)
+        (length,) = HEADER.unpack(header)
+        if length > MAX_FRAME_BYTES:
+            raise TransportError(f"Frame of {length} bytes exceeds the {MAX_FRAME_BYTES} byte limit")
+        mac = await reader.readexactly(MAC_BYTES)
+        payload = await reader.readexactly(length)
+        if not hmac.compare_digest(mac, self._mac(self._receive_label, self._received, payload)):
+            raise TransportError("Frame failed authentication")
+        self._received += 1
+        return json.loads(payload)
+
+
+class RaftServer:
+    """
+    Accepts RPC connections and answers each request with handler(message)
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on
+        handler: Coroutine function taking a request dict and returning a response dict
+        secret: Cluster shared secret (see load_secret)
+    """
+
+    def __init__(self, host: str, port: int, handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 secret: bytes):
+        self.host = host
+        self.port = port
+        self.handler = handler
+        self.secret = secret
+        self._server = None
+        self._connections = set()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        logger.info(f"Cluster RPC server listening on {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(writer)
+        try:
+            nonce = os.urandom(NONCE_BYTES)
+            codec = FrameCodec(self.secret, nonce, server=True)
+            writer.write(nonce)
+            while True:
+                message = await codec.read(reader)
+                try:
+                    response = await self.handler(message)
+                except Exception as e:
+                    logger.error(f"Error handling {message.get('type')} RPC: {str(e)}")
+                    response = {'error': str(e)}
+                response['rpc_id'] = message.get('rpc_id')
+                writer.write(codec.encode(response))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # Server shutdown; end the handler quietly
+            pass
+        except Exception as e:
+            logger.warning(f"Closing cluster RPC connection from {writer.get_extra_info('peername')}: {str(e)}")
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+
+class PeerClient:
+    """
+    RPC client for one peer, multiplexing requests over a single connection
+
+    Args:
+        host: Peer host
+        port: Peer port
+        secret: Cluster shared secret (see load_secret)
+        connect_timeout: Seconds allowed to open a connection and receive its nonce
+    """
+
+    def __init__(self, host: str, port: int, secret: bytes, connect_timeout: float = 1.0):
+        self.host = host
+        self.port = port
+        self.secret = secret
+        self.connect_timeout = connect_timeout
+        self._writer = None
+        self._codec = None
+        self._pending = None
+        self._ids = itertools.count(1)
+        self._connect_lock = None
+
+    async def _connect(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                try:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port), self.connect_timeout
+                    )
+                except (OSError, asyncio.TimeoutError) as e:
+                    raise TransportError(f"Cannot connect to {self.host}:{self.port}: {str(e) or type(e).__name__}")
+                try:
+                    nonce = await asyncio.wait_for(reader.readexactly(NONCE_BYTES), self.connect_timeout)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                    writer.close()
+                    raise TransportError(f"No handshake from {self.host}:{self.port}: {str(e) or type(e).__name__}")
+                # Requests outstanding on a connection are tracked with it
+                codec = FrameCodec(self.secret, nonce, server=False)
+                self._writer, self._codec, self._pending = writer, codec, {}
+                asyncio.ensure_future(self._read_responses(reader, writer, codec, self._pending))
+            return self._writer, self._codec, self._pending
+
+    async def _read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, codec: FrameCodec,
+                              pending: Dict[int, asyncio.Future]) -> None:
+        error = TransportError(f"Connection to {self.host}:{self.port} closed")
+        try:
+            while True:
+                response = await codec.read(reader)
+                future = pending.pop(response.pop('rpc_id', None), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except Exception as e:
+            error = TransportError(f"Connection to {self.host}:{self.port} lost: {str(e) or type(e).__name__}")
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            # Every request outstanding on this connection is lost with it
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            pending.clear()
+
+    async def call(self, message: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """
+        Send a request and wait for its response
+
+        Args:
+            message: Request (must be JSON-serialisable)
+            timeout: Seconds to wait for the response
+
+        Returns:
+            dict: The response
+
+        Raises:
+            TransportError: If the request could not be delivered or answered in time
+        """
+        writer, codec, pending = await self._connect()
+        rpc_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        pending[rpc_id] = future
+        try:
+            writer.write(codec.encode(dict(message, rpc_id=rpc_id)))
+            await writer.drain()
+            response = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TransportError(f"{message.get('type')} to {self.host}:{self.port} timed out after {timeout}s")
+        except ConnectionError as e:
+            raise TransportError(f"Connection to {self.host}:{self.port} failed: {str(e)}")
+        finally:
+            pending.pop(rpc_id, None)
+        if 'error' in response:
+            raise TransportError(f"{message.get('type')} failed on {self.host}:{self.port}: {response['error']}")
+        return response
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
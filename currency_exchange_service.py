@@ -5,22 +5,154 @@ This module provides a service for currency exchange operations between various
 
 import os
 import json
+import time
 import logging
-import requests
+import threading
+import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Union
+from sqlalchemy import func, text
 from account_holder_models import CurrencyType, ExchangeType, ExchangeStatus, CurrencyExchangeRate
+from exchange_rate_fetcher import rate_fetcher, MAJOR_CURRENCIES
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Currencies used to derive missing cross rates, in order of preference
+TRIANGULATION_PIVOTS = [CurrencyType.USD, CurrencyType.NVCT]
+
+# PostgreSQL advisory lock serializing periodic external rate refreshes
+RATE_REFRESH_LOCK_KEY = 0x4E564352  # 'NVCR'
+
+
+class RateMatrix:
+    """
+    Dense, versioned matrix of exchange rates indexed by CurrencyType ordinal.
+
+    ``rates[i, j]`` is the rate to convert one unit of currency ``i`` into
+    currency ``j``; unknown pairs are NaN. The matrix is loaded once from
+    CurrencyExchangeRate and replaced wholesale (copy-on-write) whenever a rate
+    changes, so readers always see a consistent snapshot without locking.
+    Pairs with no stored rate are derived by triangulating through
+    TRIANGULATION_PIVOTS.
+    """
+
+    def __init__(self, max_age: int = 300):
+        self.currencies = list(CurrencyType)
+        self.index = {currency: i for i, currency in enumerate(self.currencies)}
+        self.max_age = max_age
+        self._write_lock = threading.Lock()
+        self._direct = self._empty()
+        self._snapshot = (0, self._derive(self._direct))
+        self.loaded_at = None
+
+    def _empty(self) -> np.ndarray:
+        size = len(self.currencies)
+        matrix = np.full((size, size), np.nan)
+        np.fill_diagonal(matrix, 1.0)
+        return matrix
+
+    def _derive(self, direct: np.ndarray) -> np.ndarray:
+        """Fill inverses and triangulated crosses into a copy of the direct rates"""
+        rates = direct.copy()
+
+        # Use the inverse of a stored rate where the reverse pair is missing
+        with np.errstate(divide='ignore'):
+            inverse = 1.0 / rates.T
+        inverse[~np.isfinite(inverse)] = np.nan
+        missing = np.isnan(rates)
+        rates[missing] = inverse[missing]
+
+        # Derive remaining crosses as from -> pivot -> to
+        for pivot in TRIANGULATION_PIVOTS:
+            p = self.index[pivot]
+            cross = np.outer(rates[:, p], rates[p, :])
+            missing = np.isnan(rates)
+            rates[missing] = cross[missing]
+
+        rates.setflags(write=False)
+        return rates
+
+    @property
+    def version(self) -> int:
+        return self._snapshot[0]
+
+    @property
+    def rates(self) -> np.ndarray:
+        return self._snapshot[1]
+
+    def is_stale(self) -> bool:
+        """Whether the matrix should be (re)loaded from the database"""
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age
+
+    def load(self, session) -> int:
+        """Rebuild the matrix from the latest active CurrencyExchangeRate row of each pair"""
+        # Every refresh inserts a row per pair, so only the newest one per pair is read
+        recency = func.row_number().over(
+            partition_by=(CurrencyExchangeRate.from_currency, CurrencyExchangeRate.to_currency),
+            order_by=(CurrencyExchangeRate.last_updated.desc(), CurrencyExchangeRate.id.desc())
+        ).label('recency')
+        latest = session.query(
+            CurrencyExchangeRate.from_currency,
+            CurrencyExchangeRate.to_currency,
+            CurrencyExchangeRate.rate,
+            recency
+        ).filter(
+            CurrencyExchangeRate.is_active == True
+        ).subquery()
+        rows = session.query(latest.c.from_currency, latest.c.to_currency, latest.c.rate).filter(
+            latest.c.recency == 1
+        ).all()
+
+        direct = self._empty()
+        for from_currency, to_currency, rate in rows:
+            if from_currency != to_currency and rate:
+                direct[self.index[from_currency], self.index[to_currency]] = rate
+
+        with self._write_lock:
+            self._direct = direct
+            self._snapshot = (self.version + 1, self._derive(direct))
+            self.loaded_at = time.monotonic()
+
+        logger.info(f"Loaded {len(rows)} exchange rates into rate matrix (version {self.version})")
+        return self.version
+
+    def set_rates(self, updates: List[Tuple[CurrencyType, CurrencyType, float]]) -> int:
+        """Apply a batch of direct rates and atomically publish a new snapshot"""
+        with self._write_lock:
+            direct = self._direct.copy()
+            for from_currency, to_currency, rate in updates:
+                if from_currency != to_currency and rate:
+                    direct[self.index[from_currency], self.index[to_currency]] = rate
+            self._direct = direct
+            self._snapshot = (self.version + 1, self._derive(direct))
+        return self.version
+
+    def set_rate(self, from_currency: CurrencyType, to_currency: CurrencyType, rate: float) -> int:
+        """Set a single direct rate and atomically publish a new snapshot"""
+        return self.set_rates([(from_currency, to_currency, rate)])
+
+    def get(self, from_currency: CurrencyType, to_currency: CurrencyType) -> Optional[float]:
+        """Look up a rate, returning None if it cannot be derived"""
+        rate = self.rates[self.index[from_currency], self.index[to_currency]]
+        return None if np.isnan(rate) else float(rate)
+
+    def rates_to(self, to_currency: CurrencyType) -> np.ndarray:
+        """Column of rates from every currency into ``to_currency``"""
+        return self.rates[:, self.index[to_currency]]
+
+
+# Shared by every CurrencyExchangeService instance in this process
+rate_matrix = RateMatrix()
+
 class CurrencyExchangeService:
     """Service for handling currency exchange operations"""
     
     def __init__(self, db=None):
         """Initialize the currency exchange service"""
         self.db = db
+        self.rate_matrix = rate_matrix
         self.rates_cache = {}
         self.rates_timestamp = {}
         self.load_fallback_rates()
@@ -39,29 +171,28 @@ class CurrencyExchangeService:
         """Create a key for the rates cache"""
         return f"{from_currency.value}_{to_currency.value}"
     
+    def ensure_rates_loaded(self) -> None:
+        """Load the shared rate matrix from the database if it is missing or stale"""
+        if self.db and self.rate_matrix.is_stale():
+            try:
+                self.rate_matrix.load(self.db.session)
+            except Exception as e:
+                logger.error(f"Error loading rate matrix from database: {str(e)}")
+
     def get_exchange_rate(self, from_currency: CurrencyType, to_currency: CurrencyType) -> float:
         """
         Get the exchange rate between two currencies.
-        First checks the database, then external APIs, then fallback rates.
+        First checks the in-memory rate matrix (database rates plus triangulated
+        crosses), then external APIs, then fallback rates.
         """
         # If same currency, rate is 1
         if from_currency == to_currency:
             return 1.0
         
-        # Try to get from database if available
-        if self.db:
-            try:
-                rate = CurrencyExchangeRate.query.filter_by(
-                    from_currency=from_currency,
-                    to_currency=to_currency,
-                    is_active=True
-                ).order_by(CurrencyExchangeRate.last_updated.desc()).first()
-                
-                if rate:
-                    logger.info(f"Found exchange rate in database: {from_currency.value} -> {to_currency.value} = {rate.rate}")
-                    return rate.rate
-            except Exception as e:
-                logger.error(f"Error getting rate from database: {str(e)}")
+        self.ensure_rates_loaded()
+        rate = self.rate_matrix.get(from_currency, to_currency)
+        if rate is not None:
+            return rate
         
         # Check if we have a recent cached rate
         rate_key = self.get_rate_key(from_currency, to_currency)
@@ -76,6 +207,7 @@ class CurrencyExchangeService:
             # Store in cache
             self.rates_cache[rate_key] = rate
             self.rates_timestamp[rate_key] = datetime.now()
+            self.rate_matrix.set_rate(from_currency, to_currency, rate)
             
             # Store in database if available
             if self.db:
@@ -87,30 +219,15 @@ class CurrencyExchangeService:
         return self._get_fallback_rate(from_currency, to_currency)
     
     def _fetch_external_rate(self, from_currency: CurrencyType, to_currency: CurrencyType) -> Optional[float]:
-        """Fetch exchange rate from external API"""
-        # Skip for non-standard currencies that likely won't be in public APIs
-        non_standard_currencies = ["NVCT", "AFD1", "SPU", "TU", "SFN", "AKLUMI"]
-        if from_currency.value in non_standard_currencies or to_currency.value in non_standard_currencies:
-            return None
-        
-        try:
-            # Example using free exchange rate API - replace with your preferred provider
-            url = f"https://api.exchangerate-api.com/v4/latest/{from_currency.value}"
-            response = requests.get(url, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if "rates" in data and to_currency.value in data["rates"]:
-                    rate = data["rates"][to_currency.value]
-                    logger.info(f"Fetched external rate: {from_currency.value} -> {to_currency.value} = {rate}")
-                    return rate
-            
-            logger.warning(f"Failed to fetch external rate for {from_currency.value} -> {to_currency.value}")
-            return None
-        
-        except Exception as e:
-            logger.error(f"Error fetching external rate: {str(e)}")
-            return None
+        """
+        Get an exchange rate from the shared external rate tables.
+        Never blocks on the provider: a missing or stale base table is fetched
+        in the background and None is returned until it arrives.
+        """
+        rate = rate_fetcher.cached_rate(from_currency, to_currency)
+        if rate:
+            logger.info(f"Using external rate: {from_currency.value} -> {to_currency.value} = {rate}")
+        return rate
     
     def _store_rate_in_db(self, from_currency: CurrencyType, to_currency: CurrencyType, rate: float) -> None:
         """Store exchange rate in database"""
@@ -152,7 +269,18 @@ class CurrencyExchangeService:
                 calculated_rate = 1 / inverse_rate
                 logger.info(f"Using calculated inverse fallback rate: {from_currency.value} -> {to_currency.value} = {calculated_rate}")
                 return calculated_rate
-        
+
+        # Try triangulating through a pivot currency
+        for pivot in TRIANGULATION_PIVOTS:
+            if pivot in (from_currency, to_currency):
+                continue
+            from_pivot = self.fallback_rates.get(self.get_rate_key(from_currency, pivot))
+            pivot_to = self.fallback_rates.get(self.get_rate_key(pivot, to_currency))
+            if from_pivot and pivot_to:
+                calculated_rate = from_pivot * pivot_to
+                logger.info(f"Using triangulated fallback rate via {pivot.value}: {from_currency.value} -> {to_currency.value} = {calculated_rate}")
+                return calculated_rate
+
         # If all else fails, return 1.0 as default
         logger.warning(f"No rate found for {from_currency.value} -> {to_currency.value}, using default (1.0)")
         return 1.0
@@ -164,94 +292,171 @@ class CurrencyExchangeService:
         
         rate = self.get_exchange_rate(from_currency, to_currency)
         converted_amount = amount * rate
-        logger.info(f"Converted {amount} {from_currency.value} to {converted_amount} {to_currency.value} at rate {rate}")
+        logger.debug(f"Converted {amount} {from_currency.value} to {converted_amount} {to_currency.value} at rate {rate}")
         return converted_amount
     
+    def convert_many(self, amounts, from_currencies, to_currency: CurrencyType) -> Dict:
+        """
+        Convert many amounts in mixed currencies into one target currency.
+
+        Amounts and currencies are parallel sequences; currencies may be
+        CurrencyType members or their string codes. Rates come from the shared
+        rate matrix in one vectorized pass; only currencies missing from the
+        matrix fall back to get_exchange_rate, once per distinct currency.
+
+        Returns a dict with the per-item ``converted`` amounts, the ``total``
+        and a ``by_currency`` breakdown keyed by source currency code.
+
+        Raises ValueError if an amount is not a finite number or the
+        sequences differ in length.
+        """
+        if isinstance(to_currency, str):
+            to_currency = CurrencyType[to_currency]
+
+        amounts = np.asarray(amounts, dtype=np.float64)
+        # None converts to NaN; NaN and inf would poison every total they reach
+        if amounts.ndim != 1 or not np.isfinite(amounts).all():
+            raise ValueError("amounts must be a sequence of finite numbers")
+        currencies = [CurrencyType[c] if isinstance(c, str) else c for c in from_currencies]
+        if len(currencies) != len(amounts):
+            raise ValueError("amounts and from_currencies must have the same length")
+
+        index = self.rate_matrix.index
+        ordinals = np.fromiter((index[c] for c in currencies), dtype=np.intp, count=len(currencies))
+
+        self.ensure_rates_loaded()
+        column = self.rate_matrix.rates_to(to_currency).copy()
+
+        # Resolve currencies the matrix cannot price through the slower path
+        for ordinal in np.unique(ordinals[np.isnan(column[ordinals])]):
+            column[ordinal] = self.get_exchange_rate(self.rate_matrix.currencies[ordinal], to_currency)
+
+        rates = column[ordinals]
+        converted = amounts * rates
+
+        size = len(self.rate_matrix.currencies)
+        counts = np.bincount(ordinals, minlength=size)
+        amount_totals = np.bincount(ordinals, weights=amounts, minlength=size)
+        converted_totals = np.bincount(ordinals, weights=converted, minlength=size)
+
+        by_currency = {}
+        for ordinal in np.flatnonzero(counts):
+            by_currency[self.rate_matrix.currencies[ordinal].value] = {
+                'count': int(counts[ordinal]),
+                'amount': float(amount_totals[ordinal]),
+                'rate': float(column[ordinal]),
+                'converted_amount': float(converted_totals[ordinal])
+            }
+
+        return {
+            'to_currency': to_currency.value,
+            'converted': converted,
+            'total': float(converted.sum()),
+            'by_currency': by_currency,
+            'rates_version': self.rate_matrix.version
+        }
+
     def calculate_fee(self, amount: float, currency: CurrencyType, fee_percentage: float = 0.5) -> float:
         """Calculate fee for currency exchange based on percentage"""
         fee = amount * (fee_percentage / 100)
         logger.info(f"Calculated fee: {fee} {currency.value} ({fee_percentage}% of {amount})")
         return fee
     
+    def store_rates(self, updates: List[Tuple[CurrencyType, CurrencyType, float]], source: str) -> int:
+        """Insert a batch of exchange rates in one commit and publish them to the rate matrix"""
+        if not updates:
+            return 0
+        
+        exchange_rates = [
+            CurrencyExchangeRate(
+                from_currency=from_currency,
+                to_currency=to_currency,
+                rate=rate,
+                inverse_rate=1 / rate if rate != 0 else 0,
+                source=source,
+                is_active=True
+            )
+            for from_currency, to_currency, rate in updates
+        ]
+        
+        try:
+            self.db.session.add_all(exchange_rates)
+            self.db.session.commit()
+        except Exception as e:
+            self.db.session.rollback()
+            logger.error(f"Error committing exchange rate updates: {str(e)}")
+            return 0
+        
+        self.rate_matrix.set_rates(updates)
+        return len(updates)
+    
+    def external_rates_age(self) -> Optional[float]:
+        """Seconds since external rates were last stored, or None if there are none"""
+        latest = self.db.session.query(func.max(CurrencyExchangeRate.last_updated)).filter(
+            CurrencyExchangeRate.source == "external_api"
+        ).scalar()
+        return None if latest is None else (datetime.utcnow() - latest).total_seconds()
+    
+    def external_rates_stale(self, max_age: float) -> bool:
+        """Whether external rates are missing or older than max_age seconds"""
+        try:
+            age = self.external_rates_age()
+            self.db.session.rollback()
+        except Exception as e:
+            self.db.session.rollback()
+            logger.error(f"Error checking exchange rate age: {str(e)}")
+            return True
+        return age is None or age >= max_age
+    
+    def store_refreshed_rates(self, updates: List[Tuple[CurrencyType, CurrencyType, float]], max_age: float) -> int:
+        """
+        Store a periodic refresh unless another process stored one within max_age seconds
+        
+        Every worker process runs the refresh; on PostgreSQL an advisory lock
+        held until the commit serializes the check and the insert, so only one
+        of them stores each refresh.
+        """
+        try:
+            if self.db.session.get_bind().dialect.name == 'postgresql':
+                self.db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': RATE_REFRESH_LOCK_KEY})
+            age = self.external_rates_age()
+        except Exception as e:
+            self.db.session.rollback()
+            logger.error(f"Error locking exchange rate refresh: {str(e)}")
+            return 0
+        
+        if age is not None and age < max_age:
+            self.db.session.rollback()
+            logger.info(f"Exchange rates were refreshed {age:.0f}s ago by another process, skipping")
+            return 0
+        return self.store_rates(updates, "external_api")
+    
     def update_exchange_rates(self) -> int:
         """Update all exchange rates in the database from external sources"""
         if not self.db:
             logger.error("Database not available for updating exchange rates")
             return 0
         
-        updated_count = 0
-        currency_pairs = []
+        # Fetch each major base currency once and fan it out to every pair
+        tables = rate_fetcher.fetch_tables([currency.value for currency in MAJOR_CURRENCIES])
+        external_updates = rate_fetcher.fan_out(tables, MAJOR_CURRENCIES)
         
-        # Generate pairs for major currencies
-        major_currencies = [
-            CurrencyType.USD, CurrencyType.EUR, CurrencyType.GBP, 
-            CurrencyType.JPY, CurrencyType.CHF, CurrencyType.CAD,
-            CurrencyType.AUD, CurrencyType.CNY
-        ]
-        
-        for base in major_currencies:
-            for target in major_currencies:
-                if base != target:
-                    currency_pairs.append((base, target))
-        
-        # Add pairs for native tokens
+        # Native tokens are not quoted externally, so use the fallback rates
         native_tokens = [
             CurrencyType.NVCT, CurrencyType.AFD1, CurrencyType.SFN, CurrencyType.AKLUMI
         ]
         
+        fallback_updates = []
         for token in native_tokens:
-            for currency in major_currencies:
-                currency_pairs.append((token, currency))
-                currency_pairs.append((currency, token))
+            for currency in MAJOR_CURRENCIES:
+                for from_currency, to_currency in ((token, currency), (currency, token)):
+                    rate = self.fallback_rates.get(self.get_rate_key(from_currency, to_currency))
+                    if rate:
+                        fallback_updates.append((from_currency, to_currency, rate))
         
-        # Update each pair
-        for from_currency, to_currency in currency_pairs:
-            # Skip if using fallback for non-standard currencies
-            if (from_currency.value in ["NVCT", "AFD1", "SPU", "TU", "SFN", "AKLUMI"] or 
-                to_currency.value in ["NVCT", "AFD1", "SPU", "TU", "SFN", "AKLUMI"]):
-                rate_key = self.get_rate_key(from_currency, to_currency)
-                if rate_key in self.fallback_rates:
-                    # Use fallback rate
-                    rate = self.fallback_rates[rate_key]
-                    inverse_rate = 1 / rate if rate != 0 else 0
-                    
-                    # Create new exchange rate record
-                    exchange_rate = CurrencyExchangeRate(
-                        from_currency=from_currency,
-                        to_currency=to_currency,
-                        rate=rate,
-                        inverse_rate=inverse_rate,
-                        source="fallback",
-                        is_active=True
-                    )
-                    
-                    self.db.session.add(exchange_rate)
-                    updated_count += 1
-            else:
-                # Try external API
-                rate = self._fetch_external_rate(from_currency, to_currency)
-                if rate:
-                    inverse_rate = 1 / rate if rate != 0 else 0
-                    
-                    # Create new exchange rate record
-                    exchange_rate = CurrencyExchangeRate(
-                        from_currency=from_currency,
-                        to_currency=to_currency,
-                        rate=rate,
-                        inverse_rate=inverse_rate,
-                        source="external_api",
-                        is_active=True
-                    )
-                    
-                    self.db.session.add(exchange_rate)
-                    updated_count += 1
-        
-        try:
-            self.db.session.commit()
-            logger.info(f"Updated {updated_count} exchange rates")
-        except Exception as e:
-            self.db.session.rollback()
-            logger.error(f"Error committing exchange rate updates: {str(e)}")
+        updated_count = self.store_rates(external_updates, "external_api")
+        updated_count += self.store_rates(fallback_updates, "fallback")
+        logger.info(f"Updated {updated_count} exchange rates")
         
         return updated_count
     
@@ -297,6 +502,7 @@ class CurrencyExchangeService:
             self.rates_timestamp[rate_key] = datetime.now()
             
             self.db.session.commit()
+            self.rate_matrix.set_rate(from_currency, to_currency, rate)
             logger.info(f"Updated exchange rate: {from_currency.value} -> {to_currency.value} = {rate}")
             return rate_obj
             
@@ -0,0 +1,291 @@
+"""
+Database Connection Pool Accounting for NVC Banking Platform
+
+Per-server connection accounting and admission control for the
+high-availability database cluster (ha_database).
+
+- Connections are counted from SQLAlchemy pool events (connect, checkout,
+  checkin, invalidate, close), so the numbers follow the pool itself
+  rather than the sessions handed out.
+- The time each checkout waits for a connection, and checkouts that time
+  out, are measured by InstrumentedQueuePool and kept in a histogram.
+- Sessions are admitted up to the pool's capacity. Further requests queue
+  for a free slot until their deadline, or are shed at once when the
+  queue is full, instead of blocking unseen inside the pool.
+"""
+
+import time
+import bisect
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the wait histogram buckets; the last bucket is open-ended
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Seconds a session request may queue for admission by default
+DEFAULT_ADMISSION_TIMEOUT = 5.0
+
+
+class WaitHistogram:
+    """
+    Thread-safe histogram of wait times in milliseconds
+
+    Args:
+        bounds: Upper bounds of the buckets in milliseconds, ascending
+    """
+
+    def __init__(self, bounds=WAIT_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, wait_ms: float) -> None:
+        bucket = bisect.bisect_left(self.bounds, wait_ms)
+        with self.lock:
+            self.counts[bucket] += 1
+            self.total += 1
+            self.sum_ms += wait_ms
+            self.max_ms = max(self.max_ms, wait_ms)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Estimate a percentile as the upper bound of the bucket it falls in
+
+        Returns:
+            float: Milliseconds (the maximum seen, for the open-ended bucket), or None without samples
+        """
+        with self.lock:
+            if not self.total:
+                return None
+            rank = fraction * self.total
+            seen = 0
+            for bucket, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank and count:
+                    return min(self.bounds[bucket], self.max_ms) if bucket < len(self.bounds) else self.max_ms
+            return self.max_ms
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            buckets = {f"le_{bound}ms": count for bound, count in zip(self.bounds, self.counts)}
+            buckets[f"gt_{self.bounds[-1]}ms"] = self.counts[-1]
+            stats = {
+                'count': self.total,
+                'mean_ms': self.sum_ms / self.total if self.total else 0.0,
+                'max_ms': self.max_ms,
+                'buckets': buckets
+            }
+        stats['p50_ms'] = self.percentile(0.50)
+        stats['p95_ms'] = self.percentile(0.95)
+        stats['p99_ms'] = self.percentile(0.99)
+        return stats
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that reports how long each checkout waited for a connection
+
+    The monitor is attached by PoolMonitor.attach and carried over when the
+    pool is recreated (engine.dispose()).
+    """
+
+    monitor = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.monitor:
+                self.monitor.record_checkout_timeout((time.perf_counter() - started) * 1000)
+            raise
+        if self.monitor:
+            self.monitor.record_checkout_wait((time.perf_counter() - started) * 1000)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.monitor = self.monitor
+        return pool
+
+
+class PoolMonitor:
+    """
+    Connection accounting and session admission for one database server
+
+    Args:
+        server_id: Server the pool belongs to (for logging)
+        pool_size: Connections the pool keeps open
+        max_overflow: Connections the pool may open beyond pool_size
+        max_waiting: Session requests allowed to queue for admission (default: the pool's capacity)
+        admission_timeout: Default seconds a session request may queue
+    """
+
+    def __init__(self, server_id: str, pool_size: int, max_overflow: int, max_waiting: int = None,
+                 admission_timeout: float = DEFAULT_ADMISSION_TIMEOUT):
+        self.server_id = server_id
+        self.pool_size = pool_size
+        self.capacity = pool_size + max_overflow
+        self.max_waiting = self.capacity if max_waiting is None else max_waiting
+        self.admission_timeout = admission_timeout
+        self.checkout_wait = WaitHistogram()
+        self.admission_wait = WaitHistogram()
+        self._checked_out = 0
+        self._open = 0
+        self._admitted = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'connections_invalidated': 0,
+            'checkouts': 0,
+            'checkins': 0,
+            'overflow_checkouts': 0,
+            'checkout_timeouts': 0,
+            'peak_checked_out': 0,
+            'sessions_admitted': 0,
+            'sessions_queued': 0,
+            'sessions_shed': 0,
+            'admission_timeouts': 0
+        }
+
+    def attach(self, engine) -> None:
+        """Follow an engine's pool through its events"""
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.monitor = self
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+        event.listen(engine, 'close', self._on_close)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._condition:
+            self._open += 1
+            self._stats['connections_opened'] += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._condition:
+            self._checked_out += 1
+            self._stats['checkouts'] += 1
+            if self._checked_out > self.pool_size:
+                self._stats['overflow_checkouts'] += 1
+            self._stats['peak_checked_out'] = max(self._stats['peak_checked_out'], self._checked_out)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._condition:
+            self._checked_out = max(0, self._checked_out - 1)
+            self._stats['checkins'] += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._condition:
+            self._stats['connections_invalidated'] += 1
+
+    def _on_close(self, dbapi_connection, connection_record):
+        with self._condition:
+            self._open = max(0, self._open - 1)
+            self._stats['connections_closed'] += 1
+
+    def record_checkout_wait(self, wait_ms: float) -> None:
+        self.checkout_wait.add(wait_ms)
+
+    def record_checkout_timeout(self, wait_ms: float) -> None:
+        self.checkout_wait.add(wait_ms)
+        with self._condition:
+            self._stats['checkout_timeouts'] += 1
+        logger.warning(f"Connection checkout on {self.server_id} timed out after {wait_ms:.0f}ms")
+
+    @property
+    def checked_out(self) -> int:
+        """Connections currently checked out of the pool"""
+        return self._checked_out
+
+    def admit(self, timeout: float = None) -> bool:
+        """
+        Admit a session, queueing for a free slot until the deadline
+
+        Args:
+            timeout: Seconds to queue at most (default: admission_timeout)
+
+        Returns:
+            bool: Whether the session was admitted; False if shed (queue full) or the deadline passed
+        """
+        deadline = time.monotonic() + (self.admission_timeout if timeout is None else timeout)
+        with self._condition:
+            if self._admitted < self.capacity:
+                self._admitted += 1
+                self._stats['sessions_admitted'] += 1
+                return True
+            if self._waiting >= self.max_waiting:
+                self._stats['sessions_shed'] += 1
+                return False
+
+            started = time.perf_counter()
+            self._waiting += 1
+            self._stats['sessions_queued'] += 1
+            try:
+                while self._admitted >= self.capacity:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['admission_timeouts'] += 1
+                        return False
+                    self._condition.wait(remaining)
+                self._admitted += 1
+                self._stats['sessions_admitted'] += 1
+            finally:
+                self._waiting -= 1
+        self.admission_wait.add((time.perf_counter() - started) * 1000)
+        return True
+
+    def release(self) -> None:
+        """Free an admitted session's slot for the next queued request"""
+        with self._condition:
+            self._admitted = max(0, self._admitted - 1)
+            self._condition.notify()
+
+    def utilization(self) -> float:
+        """
+        Load of the pool: the larger of its checked-out and admitted shares
+
+        Returns:
+            float: 0.0 (idle) to 1.0 (saturated, or requests are queueing)
+        """
+        if not self.capacity:
+            return 0.0
+        with self._condition:
+            if self._waiting:
+                return 1.0
+            return min(1.0, max(self._checked_out, self._admitted) / self.capacity)
+
+    def saturated(self) -> bool:
+        """Whether a new session would have to queue"""
+        with self._condition:
+            return self._waiting > 0 or self._admitted >= self.capacity
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            stats = dict(
+                self._stats,
+                capacity=self.capacity,
+                pool_size=self.pool_size,
+                open=self._open,
+                checked_out=self._checked_out,
+                admitted=self._admitted,
+                waiting=self._waiting,
+                max_waiting=self.max_waiting,
+                admission_timeout=self.admission_timeout
+            )
+        stats['utilization'] = self.utilization()
+        stats['checkout_wait'] = self.checkout_wait.get_stats()
+        stats['admission_wait'] = self.admission_wait.get_stats()
+        return stats
@@ -0,0 +1,227 @@
+"""
+External Exchange Rate Fetcher for NVC Banking Platform
+This module fetches rate tables from the external exchange rate provider on a
+background asyncio event loop. The provider returns every rate for a base
+currency in one response, so each base is fetched once and fanned out to all
+pairs, and concurrent callers asking for the same base share a single
+in-flight request. A base whose fetch failed is not retried by lookups for
+negative_ttl seconds.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import requests
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from account_holder_models import CurrencyType
+
+logger = logging.getLogger(__name__)
+
+# Provider endpoint; the base currency code is appended to this URL
+EXCHANGE_RATE_API_URL = os.environ.get('EXCHANGE_RATE_API_URL', 'https://api.exchangerate-api.com/v4/latest')
+
+# Native tokens and units that public rate providers do not quote
+NON_STANDARD_CURRENCIES = {"NVCT", "AFD1", "SPU", "TU", "SFN", "AKLUMI"}
+
+# Currencies refreshed from the provider by default
+MAJOR_CURRENCIES = [
+    CurrencyType.USD, CurrencyType.EUR, CurrencyType.GBP,
+    CurrencyType.JPY, CurrencyType.CHF, CurrencyType.CAD,
+    CurrencyType.AUD, CurrencyType.CNY
+]
+
+RateUpdate = Tuple[CurrencyType, CurrencyType, float]
+
+
+class ExternalRateFetcher:
+    """Coalescing, non-blocking client for the external exchange rate provider"""
+
+    def __init__(self, base_url: str = EXCHANGE_RATE_API_URL, timeout: int = 5, table_ttl: int = 3600,
+                 negative_ttl: int = 60):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.table_ttl = table_ttl
+        self.negative_ttl = negative_ttl
+        self.session = requests.Session()
+        self.refresh_active = False
+        self._tables = {}    # base code -> (fetched_at, {code: rate})
+        self._failures = {}  # base code -> time of the last failed fetch
+        self._prefetching = set()  # base codes with a prefetch scheduled or running
+        self._prefetch_lock = threading.Lock()
+        self._inflight = {}  # base code -> asyncio.Task, only touched on the loop thread
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        self._refresh_task = None
+
+    # Event loop management
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background event loop thread on first use"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="exchange-rate-fetcher",
+                    daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    # Coroutines, run on the background loop
+
+    async def fetch_base(self, base: str) -> Optional[Dict[str, float]]:
+        """Fetch the rate table for a base currency, sharing any in-flight request"""
+        task = self._inflight.get(base)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_base(base))
+            self._inflight[base] = task
+            task.add_done_callback(lambda _: self._inflight.pop(base, None))
+        # Shield so one cancelled waiter does not cancel the shared request
+        return await asyncio.shield(task)
+
+    async def _fetch_base(self, base: str) -> Optional[Dict[str, float]]:
+        url = f"{self.base_url}/{base}"
+        try:
+            # requests is blocking; run it off the loop so other bases proceed concurrently
+            response = await asyncio.to_thread(self.session.get, url, timeout=self.timeout)
+            if response.status_code == 200:
+                rates = response.json().get("rates")
+                if rates:
+                    self._tables[base] = (time.monotonic(), rates)
+                    self._failures.pop(base, None)
+                    logger.info(f"Fetched {len(rates)} external rates for base {base}")
+                    return rates
+            logger.warning(f"Failed to fetch external rates for base {base} (status {response.status_code})")
+        except Exception as e:
+            logger.error(f"Error fetching external rates for base {base}: {str(e)}")
+        self._failures[base] = time.monotonic()
+        return None
+
+    async def fetch_bases(self, bases: Iterable[str]) -> Dict[str, Dict[str, float]]:
+        """Fetch several bases concurrently, one request per base"""
+        bases = list(dict.fromkeys(bases))
+        results = await asyncio.gather(*(self.fetch_base(base) for base in bases))
+        return {base: rates for base, rates in zip(bases, results) if rates}
+
+    async def _refresh_loop(self, writer: Callable[[List[RateUpdate]], None], interval: int,
+                            bases: List[CurrencyType], targets: List[CurrencyType],
+                            should_refresh: Optional[Callable[[], bool]], initial_delay: float) -> None:
+        if initial_delay > 0:
+            await asyncio.sleep(initial_delay)
+        while self.refresh_active:
+            try:
+                # The writer and the check talk to the database, so keep them off the loop
+                if should_refresh is not None and not await asyncio.to_thread(should_refresh):
+                    logger.debug("Skipping exchange rate refresh, another process refreshed recently")
+                else:
+                    tables = await self.fetch_bases(base.value for base in bases)
+                    updates = self.fan_out(tables, targets)
+                    if updates:
+                        await asyncio.to_thread(writer, updates)
+                    logger.info(f"Refreshed {len(updates)} exchange rates from {len(tables)} base currencies")
+            except Exception as e:
+                logger.error(f"Error in exchange rate refresh: {str(e)}")
+            await asyncio.sleep(interval)
+
+    # Helpers usable from any thread
+
+    @staticmethod
+    def fan_out(tables: Dict[str, Dict[str, float]], targets: List[CurrencyType] = None) -> List[RateUpdate]:
+        """Expand base rate tables into (from, to, rate) updates for the target currencies"""
+        targets = targets or MAJOR_CURRENCIES
+        updates = []
+        for base_code, rates in tables.items():
+            base = CurrencyType[base_code]
+            for target in targets:
+                if target != base and target.value in rates:
+                    updates.append((base, target, rates[target.value]))
+        return updates
+
+    def cached_rate(self, from_currency: CurrencyType, to_currency: CurrencyType) -> Optional[float]:
+        """
+        Look up a pair in the fetched tables without blocking.
+
+        If the base table is missing or older than table_ttl a background
+        fetch is scheduled, unless the last fetch of the base failed less
+        than negative_ttl ago; a stale table is still used until it completes.
+        """
+        if from_currency.value in NON_STANDARD_CURRENCIES or to_currency.value in NON_STANDARD_CURRENCIES:
+            return None
+
+        base = from_currency.value
+        entry = self._tables.get(base)
+        if entry is None or time.monotonic() - entry[0] > self.table_ttl:
+            failed_at = self._failures.get(base)
+            if failed_at is None or time.monotonic() - failed_at > self.negative_ttl:
+                self.prefetch([base])
+        if entry is None:
+            return None
+        return entry[1].get(to_currency.value)
+
+    def prefetch(self, bases: Iterable[str]) -> None:
+        """Schedule fetches for the given bases that are not already scheduled and return immediately"""
+        with self._prefetch_lock:
+            bases = [base for base in dict.fromkeys(bases) if base not in self._prefetching]
+            self._prefetching.update(bases)
+        if not bases:
+            return
+
+        def done(_):
+            with self._prefetch_lock:
+                self._prefetching.difference_update(bases)
+
+        loop = self._ensure_loop()
+        asyncio.run_coroutine_threadsafe(self.fetch_bases(bases), loop).add_done_callback(done)
+
+    def fetch_tables(self, bases: Iterable[str], timeout: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        """Fetch bases on the background loop and wait for all of them"""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self.fetch_bases(bases), loop)
+        return future.result(timeout)
+
+    def start_refresh(self, writer: Callable[[List[RateUpdate]], None], interval: int = 3600,
+                      bases: List[CurrencyType] = None, targets: List[CurrencyType] = None,
+                      should_refresh: Callable[[], bool] = None, initial_delay: float = 0) -> bool:
+        """
+        Start periodic background refreshes.
+
+        Args:
+            writer: Called from a worker thread with the fanned-out rate updates
+            interval: Time between refreshes in seconds (default: 1 hour)
+            bases: Base currencies to fetch (default: MAJOR_CURRENCIES)
+            targets: Target currencies to fan out to (default: MAJOR_CURRENCIES)
+            should_refresh: Called from a worker thread before each refresh; returning
+                False skips it, e.g. because another process refreshed recently
+            initial_delay: Seconds to wait before the first refresh
+        """
+        if self.refresh_active:
+            logger.warning("Exchange rate refresh is already active")
+            return False
+
+        loop = self._ensure_loop()
+        self.refresh_active = True
+        coroutine = self._refresh_loop(writer, interval, bases or MAJOR_CURRENCIES, targets or MAJOR_CURRENCIES,
+                                       should_refresh, initial_delay)
+        self._refresh_task = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        logger.info(f"Exchange rate refresh started (every {interval}s)")
+        return True
+
+    def stop_refresh(self) -> bool:
+        """Stop periodic background refreshes"""
+        if not self.refresh_active:
+            return False
+
+        self.refresh_active = False
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        logger.info("Exchange rate refresh stopped")
+        return True
+
+
+# Shared fetcher for the process
+rate_fetcher = ExternalRateFetcher()
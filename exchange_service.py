@@ -11,6 +11,7 @@ from decimal import Decimal, ROUND_HALF_DOWN
 from sqlalchemy.exc import SQLAlchemyError
 
 from app import db
+from money import to_decimal
 from account_holder_models import (
     CurrencyType, 
     ExchangeType, 
@@ -170,6 +171,9 @@ class CurrencyExchangeService:
             if from_account.account_holder_id != account_holder_id or to_account.account_holder_id != account_holder_id:
                 return {"success": False, "error": "Account holder does not own one or both accounts"}
                 
+            # Balances are Decimal, so the arithmetic below is too
+            amount = to_decimal(amount)
+            
             # Verify sufficient balance
             if from_account.balance < amount:
                 return {"success": False, "error": "Insufficient balance in source account"}
@@ -181,14 +185,14 @@ class CurrencyExchangeService:
                 return {"success": False, "error": "Exchange rate not available for these currencies"}
                 
             # Calculate converted amount
-            converted_amount = amount * rate
+            converted_amount = amount * to_decimal(rate)
             
             # Apply fee if needed
-            fee_amount = 0
+            fee_amount = Decimal(0)
             if apply_fee and fee_percentage > 0:
-                fee_amount = (amount * fee_percentage) / 100
+                fee_amount = (amount * to_decimal(fee_percentage)) / 100
                 amount_after_fee = amount - fee_amount
-                converted_amount = amount_after_fee * rate
+                converted_amount = amount_after_fee * to_decimal(rate)
                 
             # Determine exchange type
             fiat_currencies = [CurrencyType.USD, CurrencyType.EUR, CurrencyType.GBP, CurrencyType.NGN]
@@ -1,50 +1,25 @@
 """
 Fast Memory Cache System
 
-This module provides a simplified, high-performance memory cache
-to replace the more complex memory_cache module. It focuses on:
-
-1. Minimizing locking overhead
-2. Reducing complexity
-3. Preventing excessive database queries
+Compatibility module for code written against the old lightweight rate
+cache. Everything is backed by the caching package, so this module and
+memory_cache share the same caches and swapping one for the other in
+sys.modules has no effect.
 """
 
 import logging
-import threading
-from functools import lru_cache
-from typing import Dict, Tuple, Any, Optional
-
-logger = logging.getLogger(__name__)
+from typing import Any, Optional
 
-# Simple global cache with minimal locking
-_RATE_CACHE: Dict[Tuple[str, str], float] = {}
-_CACHE_LOCK = threading.RLock()
+from caching import get_cache
+from memory_cache import rate_cache, cache_exchange_rate as _cache_exchange_rate, get_cached_exchange_rate
 
-# Create a rate_cache object for compatibility with existing code
-class RateCache:
-    def __init__(self):
-        self._cache = {}
-        self._lock = threading.RLock()
-    
-    def get(self, key, default=None):
-        return self._cache.get(key, default)
-    
-    def set(self, key, value):
-        with self._lock:
-            self._cache[key] = value
-    
-    def clear(self):
-        with self._lock:
-            self._cache.clear()
+logger = logging.getLogger(__name__)
 
-# Create a singleton instance
-rate_cache = RateCache()
+value_cache = get_cache('value', max_size=1000, default_ttl=3600)
 
-# LRU cache for high-frequency lookups
-@lru_cache(maxsize=256)
 def get_cached_rate(from_currency: str, to_currency: str) -> Optional[float]:
     """
-    Get a cached exchange rate with minimal overhead
+    Get a cached exchange rate
     
     Args:
         from_currency: Source currency code
@@ -53,56 +28,33 @@ def get_cached_rate(from_currency: str, to_currency: str) -> Optional[float]:
     Returns:
         float: Exchange rate or None if not found
     """
-    key = (str(from_currency), str(to_currency))
-    
-    # Fast path - check without lock
-    if key in _RATE_CACHE:
-        return _RATE_CACHE[key]
-    return None
+    return get_cached_exchange_rate(str(from_currency), str(to_currency))
 
 def cache_exchange_rate(from_currency: str, to_currency: str, rate: float, ttl: int = 3600) -> None:
     """
-    Cache an exchange rate with minimal locking
+    Cache an exchange rate and its inverse
     
     Args:
         from_currency: Source currency code
         to_currency: Target currency code
         rate: Exchange rate value
-        ttl: Time to live in seconds (unused, for compatibility)
+        ttl: Time to live in seconds
     """
-    key = (str(from_currency), str(to_currency))
-    
-    with _CACHE_LOCK:
-        _RATE_CACHE[key] = rate
-    
-    # Also cache the inverse rate
+    _cache_exchange_rate(str(from_currency), str(to_currency), rate, ttl)
     if rate != 0:
-        inverse_key = (str(to_currency), str(from_currency))
-        inverse_rate = 1.0 / rate
-        
-        with _CACHE_LOCK:
-            _RATE_CACHE[inverse_key] = inverse_rate
+        _cache_exchange_rate(str(to_currency), str(from_currency), 1.0 / rate, ttl)
 
 def clear_rate_cache() -> None:
     """Clear the entire rate cache"""
-    with _CACHE_LOCK:
-        _RATE_CACHE.clear()
-    
-    # Also clear the LRU cache
-    get_cached_rate.cache_clear()
+    rate_cache.invalidate()
 
-# Additional cache functions to match the original memory_cache API
 def cache_value(key: str, value: Any, ttl: int = 3600) -> None:
-    """Simple stub to maintain API compatibility"""
-    pass
+    """Cache an arbitrary value"""
+    value_cache.set(key, value, ttl)
 
 def get_cached_value(key: str) -> Optional[Any]:
-    """Simple stub to maintain API compatibility"""
-    return None
-    
-def get_cached_exchange_rate(from_currency: str, to_currency: str) -> Optional[float]:
-    """Get cached exchange rate - compatibility function"""
-    return get_cached_rate(from_currency, to_currency)
+    """Get an arbitrary cached value"""
+    return value_cache.get(key)
 
 # Public API compatible with the original memory_cache
 __all__ = [
@@ -113,4 +65,4 @@ __all__ = [
     'get_cached_value',
     'get_cached_exchange_rate',
     'rate_cache'
-]
\ No newline at end of file
+]
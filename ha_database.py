@@ -10,19 +10,89 @@ import logging
 import threading
 import random
 import json
+import collections
 from enum import Enum
 from typing import Dict, List, Optional, Tuple, Any, Set, Callable, Union
 from datetime import datetime, timedelta
 from urllib.parse import urlparse, parse_qs
-from sqlalchemy import create_engine, exc, text
+from sqlalchemy import create_engine, event, exc, text
 from sqlalchemy.orm import Session, sessionmaker
-from sqlalchemy.pool import QueuePool
 
 import cluster
+from db_pool import InstrumentedQueuePool, PoolMonitor
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# Query latencies kept per server for the p95 used in read routing
+LATENCY_SAMPLES = 512
+LATENCY_WINDOW_SECONDS = 60
+
+# Read routing: replicas further behind than this get no reads, and every
+# LAG_HALF_WEIGHT_SECONDS of lag halves a replica's share of reads
+MAX_READ_LAG_SECONDS = float(os.environ.get('DB_MAX_READ_LAG', '30'))
+LAG_HALF_WEIGHT_SECONDS = 5.0
+
+# Floor for p95 latency when weighting replicas, so an idle replica's share stays finite
+LATENCY_FLOOR_MS = 1.0
+
+# Longest a session stays pinned to the primary after a write if replicas don't catch up
+READ_YOUR_WRITES_TTL = 300
+
+# Session admission: seconds a request may queue for a connection slot, and
+# requests allowed to queue per server (default: the pool's capacity)
+ADMISSION_TIMEOUT_SECONDS = float(os.environ.get('DB_ADMISSION_TIMEOUT', '5'))
+ADMISSION_QUEUE = int(os.environ['DB_ADMISSION_QUEUE']) if os.environ.get('DB_ADMISSION_QUEUE') else None
+
+
+def parse_lsn(lsn: Optional[str]) -> Optional[int]:
+    """
+    Convert a PostgreSQL LSN ('16/B374D848') to an integer for comparison
+    
+    Args:
+        lsn: LSN text, or None
+        
+    Returns:
+        int: The LSN as a 64-bit position, or None
+    """
+    if not lsn:
+        return None
+    high, _, low = str(lsn).partition('/')
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+class LatencyWindow:
+    """
+    Recent latency samples of a server, for percentile estimates
+    
+    Args:
+        max_samples: Samples kept at most
+        window_seconds: Samples older than this are ignored
+    """
+    
+    def __init__(self, max_samples: int = LATENCY_SAMPLES, window_seconds: float = LATENCY_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.samples = collections.deque(maxlen=max_samples)
+        self.lock = threading.Lock()
+    
+    def add(self, latency_ms: float) -> None:
+        with self.lock:
+            self.samples.append((time.monotonic(), latency_ms))
+    
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Get a percentile of the recent samples
+        
+        Returns:
+            float: Latency in milliseconds, or None without recent samples
+        """
+        cutoff = time.monotonic() - self.window_seconds
+        with self.lock:
+            values = sorted(latency for at, latency in self.samples if at >= cutoff)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(len(values) * fraction))]
+
 class DatabaseRole(Enum):
     """Database server roles in high-availability setup"""
     PRIMARY = "primary"       # Primary read-write database
@@ -90,13 +160,25 @@ class DatabaseServer:
         self.username = parsed_url.username
         self.database_name = parsed_url.path.lstrip('/') if parsed_url.path else None
         
+        # Connection pool, sized from max_connections; pool events drive the
+        # connection accounting and sessions are admitted up to its capacity
+        self.pool_size = max(1, min(20, max_connections // 5))
+        self.max_overflow = min(10, max_connections // 10)
+        self.pool_monitor = PoolMonitor(
+            server_id, self.pool_size, self.max_overflow,
+            max_waiting=ADMISSION_QUEUE, admission_timeout=ADMISSION_TIMEOUT_SECONDS
+        )
+        
         # Runtime state
         self.status = DatabaseStatus.OFFLINE
-        self.current_connections = 0
+        self.backend_connections = None  # connections to the database from all clients (PostgreSQL)
         self.last_checked = datetime.now()
         self.latency = 0.0  # in milliseconds
         self.error_rate = 0.0  # percentage of failed queries
         self.replication_lag = 0.0  # in seconds (for replicas)
+        self.replay_lsn = None  # WAL position replayed (replicas), as an int
+        self.wal_receiver_status = None  # pg_stat_wal_receiver.status (replicas); None when not connected
+        self.query_latency = LatencyWindow()
         
         # SQLAlchemy engine
         self.engine = None
@@ -105,6 +187,7 @@ class DatabaseServer:
         # Health check thread
         self.health_check_thread = None
         self.health_check_interval = 30  # seconds
+        self.replication_check_interval = 5  # seconds (replicas)
         self.running = False
         
         # Statistics
@@ -128,17 +211,25 @@ class DatabaseServer:
         """
         try:
             # Create SQLAlchemy engine with connection pooling
+            connect_args = {"connect_timeout": 10} if 'postgresql' in self.connection_url.lower() else {}
             self.engine = create_engine(
                 self.connection_url,
-                poolclass=QueuePool,
-                pool_size=min(20, self.max_connections // 5),
-                max_overflow=min(10, self.max_connections // 10),
+                poolclass=InstrumentedQueuePool,
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
                 pool_timeout=30,
                 pool_recycle=300,
                 pool_pre_ping=True,
-                connect_args={"connect_timeout": 10}
+                connect_args=connect_args
             )
             
+            # Account connections from pool events
+            self.pool_monitor.attach(self.engine)
+            
+            # Time every statement for the latency percentiles used in routing
+            event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(self.engine, 'after_cursor_execute', self._after_cursor_execute)
+            
             # Create session factory
             self.session_factory = sessionmaker(bind=self.engine)
             
@@ -201,23 +292,16 @@ class DatabaseServer:
             if self.stats['queries_total'] > 0:
                 self.error_rate = (self.stats['queries_failed'] / self.stats['queries_total']) * 100
             
-            # Get connection count
-            with self.engine.connect() as conn:
-                if 'postgresql' in self.connection_url.lower():
+            # Get the database's connection count (all clients, not just this pool)
+            if 'postgresql' in self.connection_url.lower():
+                with self.engine.connect() as conn:
                     result = conn.execute(text(
                         "SELECT count(*) FROM pg_stat_activity WHERE datname = :db_name"
                     ), {"db_name": self.database_name})
-                    self.current_connections = result.scalar() or 0
-                
-                # Check replication lag for replicas
-                if self.role == DatabaseRole.REPLICA and 'postgresql' in self.connection_url.lower():
-                    try:
-                        result = conn.execute(text(
-                            "SELECT extract(epoch from now() - pg_last_xact_replay_timestamp()) as lag"
-                        ))
-                        self.replication_lag = result.scalar() or 0
-                    except Exception as e:
-                        logger.warning(f"Could not check replication lag for {self.server_id}: {str(e)}")
+                    self.backend_connections = result.scalar() or 0
+            
+            # Check replication lag for replicas
+            self._check_replication()
             
             return True
             
@@ -235,8 +319,81 @@ class DatabaseServer:
             
             return False
     
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_start_time')
+        if started:
+            self.query_latency.add((time.perf_counter() - started.pop()) * 1000)
+    
+    def _check_replication(self) -> None:
+        """
+        Measure a replica's replication lag and replayed WAL position
+        
+        The lag is 0 while the WAL receiver is streaming from the primary and
+        everything received has been replayed (an idle primary doesn't make a
+        replica look stale). Otherwise it is the age of the last replayed
+        transaction (or of the server's start, if it has replayed none): a
+        replica whose receiver is disconnected has replayed all it received
+        but may be arbitrarily far behind the primary.
+        """
+        if self.role != DatabaseRole.REPLICA or 'postgresql' not in self.connection_url.lower():
+            return
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(text(
+                    "SELECT pg_last_wal_replay_lsn()::text AS replay_lsn, receiver.status AS receiver_status, "
+                    "CASE WHEN receiver.status = 'streaming' "
+                    "AND pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE extract(epoch from now() - COALESCE(pg_last_xact_replay_timestamp(), "
+                    "pg_postmaster_start_time())) END AS lag "
+                    "FROM (SELECT 1) AS probe LEFT JOIN pg_stat_wal_receiver AS receiver ON true"
+                )).fetchone()
+            self.replay_lsn = parse_lsn(row.replay_lsn)
+            self.replication_lag = max(float(row.lag or 0), 0.0)
+            if row.receiver_status != 'streaming' and self.wal_receiver_status == 'streaming':
+                logger.warning(f"Replica {self.server_id} stopped streaming WAL (receiver: {row.receiver_status})")
+            self.wal_receiver_status = row.receiver_status
+        except Exception as e:
+            logger.warning(f"Could not check replication lag for {self.server_id}: {str(e)}")
+    
+    def current_wal_lsn(self) -> Optional[int]:
+        """
+        Get the primary's current WAL position (the LSN a reader must see to observe prior commits)
+        
+        Returns:
+            int: The LSN, or None if it can't be determined (non-PostgreSQL or error)
+        """
+        if 'postgresql' not in self.connection_url.lower() or not self.engine:
+            return None
+        try:
+            with self.engine.connect() as conn:
+                return parse_lsn(conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar())
+        except Exception as e:
+            logger.warning(f"Could not read the WAL position of {self.server_id}: {str(e)}")
+            return None
+    
+    @property
+    def current_connections(self) -> int:
+        """Connections currently checked out of this server's pool"""
+        return self.pool_monitor.checked_out
+    
+    def pool_utilization(self) -> float:
+        """
+        Load of the connection pool (checked-out connections or admitted sessions)
+        
+        Returns:
+            float: 0.0 (idle) to 1.0 (saturated, or sessions are queueing)
+        """
+        return self.pool_monitor.utilization()
+    
+    def pool_saturated(self) -> bool:
+        """Whether a new session would have to queue for admission"""
+        return self.pool_monitor.saturated()
+    
     def _health_check_loop(self) -> None:
-        """Periodically check database health"""
+        """Periodically check database health (and, more often, a replica's replication)"""
         while self.running:
             try:
                 self._check_connection()
@@ -255,28 +412,43 @@ class DatabaseServer:
             except Exception as e:
                 logger.error(f"Health check error for {self.server_id}: {str(e)}")
             
-            # Sleep until next check
-            for _ in range(self.health_check_interval):
+            # Sleep until next check, probing replication in between
+            for second in range(1, self.health_check_interval + 1):
                 if not self.running:
                     break
                 time.sleep(1)
+                if (second % self.replication_check_interval == 0 and second < self.health_check_interval
+                        and self.status != DatabaseStatus.OFFLINE):
+                    self._check_replication()
     
-    def get_session(self) -> Optional[Session]:
+    def get_session(self, timeout: float = None) -> Optional[Session]:
         """
         Get a database session
         
+        Sessions are admitted up to the pool's capacity; beyond it the
+        request queues until its deadline, or is shed at once if the
+        admission queue is full.
+        
+        Args:
+            timeout: Seconds to queue for admission (default: the pool monitor's admission_timeout)
+        
         Returns:
             Session: SQLAlchemy session or None if not available
         """
         if not self.engine or self.status == DatabaseStatus.OFFLINE:
             return None
         
+        if not self.pool_monitor.admit(timeout):
+            logger.warning(f"Session request for {self.server_id} rejected: connection pool saturated")
+            return None
+        
         try:
             session = self.session_factory()
-            self.current_connections += 1
+            session.info['admitted_by'] = self.server_id
             self.stats['connections_created'] += 1
             return session
         except Exception as e:
+            self.pool_monitor.release()
             logger.error(f"Error creating session for {self.server_id}: {str(e)}")
             self.stats['last_error'] = str(e)
             self.stats['last_error_time'] = datetime.now().isoformat()
@@ -291,10 +463,12 @@ class DatabaseServer:
         """
         try:
             session.close()
-            self.current_connections = max(0, self.current_connections - 1)
             self.stats['connections_closed'] += 1
         except Exception as e:
             logger.error(f"Error releasing session for {self.server_id}: {str(e)}")
+        finally:
+            if session.info.pop('admitted_by', None) == self.server_id:
+                self.pool_monitor.release()
     
     def get_status(self) -> Dict[str, Any]:
         """
@@ -312,9 +486,15 @@ class DatabaseServer:
             'status': self.status.value,
             'current_connections': self.current_connections,
             'max_connections': self.max_connections,
+            'backend_connections': self.backend_connections,
             'latency_ms': self.latency,
             'error_rate': self.error_rate,
             'replication_lag': self.replication_lag,
+            'replay_lsn': self.replay_lsn,
+            'wal_receiver_status': self.wal_receiver_status,
+            'query_p95_ms': self.query_latency.percentile(0.95),
+            'pool_utilization': self.pool_utilization(),
+            'pool': self.pool_monitor.get_stats(),
             'last_checked': self.last_checked.isoformat(),
             'stats': self.stats
         }
@@ -370,6 +550,12 @@ class DatabaseCluster:
         self.transaction_counter = 0
         self.distributed_transactions = {}  # Dict[tx_id, transaction_info]
         
+        # Read routing
+        self.max_read_lag = MAX_READ_LAG_SECONDS
+        self.read_your_writes_ttl = READ_YOUR_WRITES_TTL
+        self.write_positions = collections.OrderedDict()  # session_key -> (primary LSN after its last write, time)
+        self.routing_stats = {'replica_reads': 0, 'primary_reads': 0, 'pinned_reads': 0}
+        
         logger.info(f"Database cluster {cluster_id} initialized with routing policy {routing_policy.value}")
     
     def add_server(self, server: DatabaseServer) -> bool:
@@ -634,10 +820,101 @@ class DatabaseCluster:
                     break
                 time.sleep(1)
     
+    def record_write(self, session_key: str) -> None:
+        """
+        Remember where the primary's WAL was after a session wrote, for read-your-writes
+        
+        Until a replica has replayed past that position, the session's reads
+        go to the primary. If the position can't be read (e.g. not
+        PostgreSQL), the session reads from the primary for read_your_writes_ttl.
+        
+        Args:
+            session_key: Identifies the session (e.g. the user ID or Flask session ID)
+        """
+        primary = self.servers.get(self.primary_id) if self.primary_id else None
+        lsn = primary.current_wal_lsn() if primary else None
+        if lsn is None:
+            lsn = float('inf')  # No replica can be shown to have caught up
+        
+        with self.lock:
+            now = time.monotonic()
+            self.write_positions[session_key] = (lsn, now)
+            self.write_positions.move_to_end(session_key)
+            # Oldest writes first: drop the pins that have run out
+            while self.write_positions:
+                _, written_at = next(iter(self.write_positions.values()))
+                if now - written_at <= self.read_your_writes_ttl:
+                    break
+                self.write_positions.popitem(last=False)
+    
+    def _min_read_lsn(self, session_key: Optional[str]) -> Optional[float]:
+        """
+        Get the WAL position a session's reads must see
+        
+        Returns:
+            The position, or None once every online replica has replayed it (or the pin expired)
+        """
+        entry = self.write_positions.get(session_key) if session_key else None
+        if entry is None:
+            return None
+        lsn, written_at = entry
+        
+        replicas = [self.servers[r] for r in self.servers_by_role[DatabaseRole.REPLICA]
+                    if self.servers[r].status == DatabaseStatus.ONLINE]
+        caught_up = replicas and all(r.replay_lsn is not None and r.replay_lsn >= lsn for r in replicas)
+        if caught_up or time.monotonic() - written_at > self.read_your_writes_ttl:
+            del self.write_positions[session_key]
+            return None
+        return lsn
+    
+    def _read_weight(self, server: DatabaseServer) -> float:
+        """
+        Share of reads a replica should get
+        
+        Proportional to the server's weight and pool headroom, inversely
+        proportional to its recent p95 latency, and halved for every
+        LAG_HALF_WEIGHT_SECONDS of replication lag.
+        """
+        lag_factor = 0.5 ** (server.replication_lag / LAG_HALF_WEIGHT_SECONDS)
+        headroom = 1.0 - server.pool_utilization()
+        p95 = server.query_latency.percentile(0.95) or server.latency
+        return server.weight * lag_factor * headroom / max(p95 or 0.0, LATENCY_FLOOR_MS)
+    
+    def _choose_read_replica(self, region: str, min_lsn: Optional[float] = None) -> Optional[DatabaseServer]:
+        """
+        Pick a replica for a read, at random in proportion to _read_weight
+        
+        Only ONLINE replicas within max_read_lag, whose pools aren't
+        saturated and (for read-your-writes) replayed past min_lsn qualify. Replicas in
+        the region are preferred.
+        
+        Returns:
+            DatabaseServer: The replica, or None if none qualifies
+        """
+        eligible = []
+        for server_id in self.servers_by_role[DatabaseRole.REPLICA]:
+            server = self.servers[server_id]
+            if server.status != DatabaseStatus.ONLINE or server.replication_lag > self.max_read_lag:
+                continue
+            if server.pool_saturated():
+                continue
+            if min_lsn is not None and (server.replay_lsn is None or server.replay_lsn < min_lsn):
+                continue
+            weight = self._read_weight(server)
+            if weight > 0:
+                eligible.append((server, weight))
+        
+        if not eligible:
+            return None
+        candidates = [(server, weight) for server, weight in eligible if server.region == region] or eligible
+        servers, weights = zip(*candidates)
+        return random.choices(servers, weights=weights)[0]
+    
     def get_server_for_transaction(
         self,
         transaction_type: TransactionType,
-        region: str = None
+        region: str = None,
+        session_key: str = None
     ) -> Optional[DatabaseServer]:
         """
         Get the appropriate server for a transaction based on routing policy
@@ -645,6 +922,7 @@ class DatabaseCluster:
         Args:
             transaction_type: Type of transaction
             region: Optional region preference
+            session_key: Optional session identity for read-your-writes consistency (see record_write)
             
         Returns:
             DatabaseServer: Selected server or None if no suitable server found
@@ -680,28 +958,16 @@ class DatabaseCluster:
                     return self.servers[self.primary_id]
                 
                 elif self.routing_policy == RoutingPolicy.PRIMARY_WRITE_REPLICA_READ:
-                    # Try to find a healthy replica
-                    replicas = self.servers_by_role[DatabaseRole.REPLICA]
-                    healthy_replicas = [r for r in replicas if self.servers[r].status == DatabaseStatus.ONLINE]
-                    
-                    if healthy_replicas:
-                        # First try replicas in the same region
-                        region_replicas = [
-                            r for r in healthy_replicas 
-                            if self.servers[r].region == region
-                        ]
-                        
-                        if region_replicas:
-                            # Use a random replica in the same region
-                            server_id = random.choice(region_replicas)
-                            return self.servers[server_id]
-                        
-                        # Otherwise use any healthy replica
-                        server_id = random.choice(healthy_replicas)
-                        return self.servers[server_id]
+                    # A session that just wrote needs a replica that has replayed its write
+                    min_lsn = self._min_read_lsn(session_key)
+                    replica = self._choose_read_replica(region, min_lsn)
+                    if replica:
+                        self.routing_stats['replica_reads'] += 1
+                        return replica
                     
-                    # Fall back to primary if no healthy replicas
+                    # Fall back to primary if no replica qualifies
                     if self.primary_id and self.primary_id in self.servers:
+                        self.routing_stats['pinned_reads' if min_lsn is not None else 'primary_reads'] += 1
                         return self.servers[self.primary_id]
                 
                 elif self.routing_policy == RoutingPolicy.LEAST_LOADED:
@@ -718,13 +984,13 @@ class DatabaseCluster:
                             
                         server = self.servers[server_id]
                         
-                        # Skip offline servers
-                        if server.status == DatabaseStatus.OFFLINE:
+                        # Skip offline servers and those whose pools are saturated
+                        if server.status == DatabaseStatus.OFFLINE or server.pool_saturated():
                             continue
                         
                         # Calculate load score (lower is better)
-                        # We consider connection percentage, latency, and error rate
-                        connection_pct = server.current_connections / server.max_connections if server.max_connections > 0 else 1.0
+                        # We consider pool load, latency, and error rate
+                        connection_pct = server.pool_utilization()
                         latency_factor = min(1.0, server.latency / 1000.0)  # Normalize to 0-1 range
                         error_factor = min(1.0, server.error_rate / 100.0)  # Normalize to 0-1 range
                         
@@ -837,7 +1103,7 @@ class DatabaseCluster:
                     primary = self.servers[self.primary_id]
                     if primary.status != DatabaseStatus.OFFLINE:
                         # Check if primary is not too loaded
-                        if primary.current_connections < (primary.max_connections * 0.8):
+                        if primary.pool_utilization() < 0.8:
                             return primary
                 
                 # Find least loaded server as fallback
@@ -847,7 +1113,7 @@ class DatabaseCluster:
                         continue
                     
                     # Calculate load percentage
-                    load_pct = server.current_connections / server.max_connections if server.max_connections > 0 else 1.0
+                    load_pct = server.pool_utilization()
                     candidates.append((server_id, load_pct))
                 
                 if candidates:
@@ -866,7 +1132,9 @@ class DatabaseCluster:
     def get_session(
         self,
         transaction_type: TransactionType = TransactionType.READ,
-        region: str = None
+        region: str = None,
+        session_key: str = None,
+        timeout: float = None
     ) -> Tuple[Optional[Session], Optional[str]]:
         """
         Get a database session from an appropriate server
@@ -874,16 +1142,18 @@ class DatabaseCluster:
         Args:
             transaction_type: Type of transaction
             region: Optional region preference
+            session_key: Optional session identity for read-your-writes consistency
+            timeout: Seconds to queue if the server's pool is saturated (default: its admission timeout)
             
         Returns:
             tuple: (session, server_id) or (None, None) if no session available
         """
-        server = self.get_server_for_transaction(transaction_type, region)
+        server = self.get_server_for_transaction(transaction_type, region, session_key)
         
         if not server:
             return None, None
         
-        session = server.get_session()
+        session = server.get_session(timeout)
         
         if not session:
             logger.error(f"Failed to get session from server {server.server_id}")
@@ -1069,6 +1339,11 @@ class DatabaseCluster:
                 'degraded_servers': sum(1 for s in self.servers.values() if s.status == DatabaseStatus.DEGRADED),
                 'offline_servers': sum(1 for s in self.servers.values() if s.status == DatabaseStatus.OFFLINE),
                 'last_failover': self.last_failover,
+                'read_routing': dict(
+                    self.routing_stats,
+                    max_read_lag=self.max_read_lag,
+                    pinned_sessions=len(self.write_positions)
+                ),
                 'servers': {
                     server_id: server.get_status()
                     for server_id, server in self.servers.items()
@@ -1084,23 +1359,30 @@ class HASession:
     Provides automatic routing and failover handling
     """
     
-    def __init__(self, cluster: DatabaseCluster, transaction_type: TransactionType = TransactionType.READ):
+    def __init__(
+        self,
+        cluster: DatabaseCluster,
+        transaction_type: TransactionType = TransactionType.READ,
+        session_key: str = None
+    ):
         """
         Initialize a high-availability session
         
         Args:
             cluster: DatabaseCluster instance
             transaction_type: Type of transaction
+            session_key: Optional session identity; reads after this session's writes see them
         """
         self.cluster = cluster
         self.transaction_type = transaction_type
+        self.session_key = session_key
         self.session = None
         self.server_id = None
         self.is_transaction_active = False
     
     def __enter__(self):
         """Context manager entry"""
-        self.session, self.server_id = self.cluster.get_session(self.transaction_type)
+        self.session, self.server_id = self.cluster.get_session(self.transaction_type, session_key=self.session_key)
         return self.session
     
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -1115,6 +1397,14 @@ class HASession:
             
             # Release session
             self.cluster.release_session(self.session, self.server_id)
+            
+            # Later reads of this session must see what it wrote
+            if self.session_key and not exc_type and self.transaction_type in (TransactionType.WRITE, TransactionType.BATCH):
+                try:
+                    self.cluster.record_write(self.session_key)
+                except Exception as e:
+                    logger.error(f"Error recording write position for session {self.session_key}: {str(e)}")
+            
             self.session = None
             self.server_id = None
             self.is_transaction_active = False
@@ -1225,12 +1515,13 @@ def shutdown_ha_database():
         _db_cluster.stop()
         _db_cluster = None
 
-def get_db_session(transaction_type: TransactionType = TransactionType.READ) -> HASession:
+def get_db_session(transaction_type: TransactionType = TransactionType.READ, session_key: str = None) -> HASession:
     """
     Get a high-availability database session
     
     Args:
         transaction_type: Type of transaction
+        session_key: Optional session identity (e.g. user ID) for read-your-writes consistency
         
     Returns:
         HASession: High-availability session wrapper
@@ -1244,7 +1535,7 @@ def get_db_session(transaction_type: TransactionType = TransactionType.READ) ->
         if not cluster:
             raise RuntimeError("Failed to initialize database cluster")
     
-    return HASession(cluster, transaction_type)
+    return HASession(cluster, transaction_type, session_key)
 
 def execute_distributed_sql(sql: str, params: Dict[str, Any] = None, tx_id: str = None) -> Dict[str, Any]:
     """
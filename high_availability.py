@@ -458,23 +458,29 @@ def get_app_node_status() -> Dict[str, Any]:
     
     return node_status
 
-def ha_read_session() -> ha_database.HASession:
+def ha_read_session(session_key: str = None) -> ha_database.HASession:
     """
     Get a high-availability database session for read operations
     
+    Args:
+        session_key: Optional session identity (e.g. user ID); its reads see its earlier writes
+    
     Returns:
         HASession: High-availability database session
     """
-    return ha_database.get_db_session(ha_database.TransactionType.READ)
+    return ha_database.get_db_session(ha_database.TransactionType.READ, session_key)
 
-def ha_write_session() -> ha_database.HASession:
+def ha_write_session(session_key: str = None) -> ha_database.HASession:
     """
     Get a high-availability database session for write operations
     
+    Args:
+        session_key: Optional session identity (e.g. user ID); its reads see its earlier writes
+    
     Returns:
         HASession: High-availability database session
     """
-    return ha_database.get_db_session(ha_database.TransactionType.WRITE)
+    return ha_database.get_db_session(ha_database.TransactionType.WRITE, session_key)
 
 def ha_analytics_session() -> ha_database.HASession:
     """
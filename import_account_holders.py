@@ -2,15 +2,22 @@
 """
 Import Account Holders Script
 This script imports account holders from a CSV file into the NVC Banking Platform.
+
+Usage:
+    python import_account_holders.py <csv_file_path> [--dry-run] [--checkpoint FILE] [--chunk-size N]
 """
 
 import csv
 import os
 import sys
+import hashlib
 import logging
+import argparse
 from datetime import datetime
+from itertools import islice
 import json
 from flask import Flask
+from sqlalchemy import select, insert
 from sqlalchemy.exc import SQLAlchemyError
 from app import create_app, db
 from account_holder_models import (
@@ -25,6 +32,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Account holders per insert round trip and commit
+IMPORT_CHUNK_SIZE = 1000
+
+# Bytes at the start of the CSV file (header and first chunks) hashed into a checkpoint
+CHECKPOINT_HASH_BYTES = 1024 * 1024
+
+# Currencies of the "Member Account <currency>" CSV columns
+ACCOUNT_CURRENCIES = ['USD', 'EUR', 'GBP', 'BTC', 'NGN', 'SPU', 'TU', 'ZCASH', 'NVC-Coin']
+
 def parse_phone_number(phone_str):
     """Parse phone number string and clean it"""
     if not phone_str:
@@ -147,159 +163,299 @@ def import_test_account_holder():
         logger.error(f"Error creating test account holder: {str(e)}")
         return 0, 0, 1
 
-def import_account_holders(csv_filepath):
+def _account_currencies():
+    """(CSV column, CurrencyType, code) for every member account column we can import"""
+    currencies = []
+    for currency in ACCOUNT_CURRENCIES:
+        # Map NVC-Coin to NVCT for our enum
+        currency_enum_value = 'NVCT' if currency == 'NVC-Coin' else currency
+        try:
+            currencies.append((f'Member Account {currency}', CurrencyType[currency_enum_value], currency_enum_value))
+        except KeyError:
+            logger.warning(f"Currency {currency_enum_value} not found in enum. Skipping its accounts.")
+    return currencies
+
+def _parse_row(row, currencies):
+    """
+    Build the rows to insert for one CSV account holder
+    
+    Args:
+        row: CSV row
+        currencies: Result of _account_currencies()
+        
+    Returns:
+        dict: holder, address (or None), phones and accounts column values
+    """
+    holder = {
+        'holder': {
+            'name': row['name'],
+            'username': row['username'],
+            'email': row['email'],
+            'created_at': datetime.strptime(row['creationdate'], '%m/%d/%Y %H:%M') if row['creationdate'] else datetime.utcnow(),
+            'broker': row['broker']
+        },
+        'address': None,
+        'phones': [],
+        'accounts': []
+    }
+    
+    if row.get('address.line1'):
+        holder['address'] = {
+            'name': row.get('address.name', 'Primary Address'),
+            'line1': row.get('address.line1'),
+            'line2': row.get('address.line2'),
+            'pobox': row.get('address.pobox'),
+            'neighborhood': row.get('address.neighborhood'),
+            'city': row.get('address.city'),
+            'region': row.get('address.region'),
+            'zip': row.get('address.zip'),
+            'country': row.get('address.country'),
+            'street': row.get('address.street'),
+            'building_number': row.get('address.buildingnumber'),
+            'complement': row.get('address.complement')
+        }
+    
+    if row.get('mobile.number'):
+        holder['phones'].append({
+            'name': row.get('mobile.name', 'Mobile'),
+            'number': parse_phone_number(row.get('mobile.number')),
+            'is_primary': True,
+            'is_mobile': True
+        })
+    if row.get('landline.number'):
+        holder['phones'].append({
+            'name': row.get('landline.name', 'Landline'),
+            'number': parse_phone_number(row.get('landline.number')),
+            'is_primary': False,
+            'is_mobile': False
+        })
+    
+    for column_name, currency_type, currency_code in currencies:
+        # Skip if the column doesn't exist or balance is 0
+        if not row.get(column_name):
+            continue
+        balance = parse_currency_value(row[column_name])
+        if balance == 0:
+            continue
+        holder['accounts'].append({
+            # A consistent account number based on username and currency
+            'account_number': f"{currency_code}-{row['username']}",
+            'account_name': f"{row['name']} {currency_code} Account",
+            'account_type': AccountType.CHECKING,
+            'currency': currency_type,
+            'balance': balance,
+            'available_balance': balance,
+            'status': AccountStatus.ACTIVE
+        })
+    
+    return holder
+
+def _load_existing(column):
+    """Stream the existing values of a unique AccountHolder column into a set"""
+    return set(db.session.execute(select(column).execution_options(yield_per=10000)).scalars())
+
+def _taken_account_numbers(holders):
+    """Account numbers of a chunk that already exist, with one query"""
+    numbers = [account['account_number'] for holder in holders for account in holder['accounts']]
+    if not numbers:
+        return set()
+    return set(db.session.execute(
+        select(BankAccount.account_number).where(BankAccount.account_number.in_(numbers))
+    ).scalars())
+
+def _insert_holders(holders):
+    """Insert a chunk of parsed holders with one executemany INSERT per table (the caller commits)"""
+    ids = db.session.execute(
+        insert(AccountHolder).returning(AccountHolder.id, sort_by_parameter_order=True),
+        [holder['holder'] for holder in holders]
+    ).scalars().all()
+    
+    addresses, phones, accounts = [], [], []
+    for account_holder_id, holder in zip(ids, holders):
+        if holder['address']:
+            addresses.append(dict(holder['address'], account_holder_id=account_holder_id))
+        phones.extend(dict(phone, account_holder_id=account_holder_id) for phone in holder['phones'])
+        accounts.extend(dict(account, account_holder_id=account_holder_id) for account in holder['accounts'])
+    
+    for model, values in ((Address, addresses), (PhoneNumber, phones), (BankAccount, accounts)):
+        if values:
+            db.session.execute(insert(model), values)
+
+def _write_holders(holders):
+    """
+    Insert and commit a chunk, retrying holder by holder if it fails
+    
+    Returns:
+        list: Holders that could not be imported
+    """
+    try:
+        _insert_holders(holders)
+        db.session.commit()
+        return []
+    except Exception as e:
+        db.session.rollback()
+        if len(holders) == 1:
+            logger.error(f"Error importing account holder {holders[0]['holder']['name']}: {str(e)}")
+            return holders
+        logger.warning(f"Chunk of {len(holders)} account holders failed, retrying one by one: {str(e)}")
+    
+    failed = []
+    for holder in holders:
+        failed.extend(_write_holders([holder]))
+    return failed
+
+def _csv_fingerprint(csv_filepath):
+    """Path, size, modification time and a hash of the start of the CSV file"""
+    digest = hashlib.sha256()
+    with open(csv_filepath, 'rb') as f:
+        digest.update(f.read(CHECKPOINT_HASH_BYTES))
+    stat = os.stat(csv_filepath)
+    return {
+        'csv_file': os.path.abspath(csv_filepath),
+        'csv_size': stat.st_size,
+        'csv_mtime': stat.st_mtime_ns,
+        'csv_hash': digest.hexdigest()
+    }
+
+def _load_checkpoint(checkpoint_path, csv_filepath):
+    """Progress of an interrupted import of this file, or a fresh start"""
+    fingerprint = _csv_fingerprint(csv_filepath)
+    progress = dict(fingerprint, rows=0, imported=0, skipped=0, errors=0)
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return progress
+    
+    with open(checkpoint_path, 'r') as f:
+        saved = json.load(f)
+    # Resuming skips rows by position, so any change to the file makes the checkpoint unusable
+    if any(saved.get(key) != value for key, value in fingerprint.items()):
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to another or a modified CSV file; "
+                         f"remove it to start over")
+    logger.info(f"Resuming import after row {saved['rows']} from checkpoint {checkpoint_path}")
+    progress.update(saved)
+    return progress
+
+def _save_checkpoint(checkpoint_path, progress):
+    """Record progress atomically, so an interrupted write never leaves a broken checkpoint"""
+    progress['updated_at'] = datetime.utcnow().isoformat()
+    temporary_path = f"{checkpoint_path}.tmp"
+    with open(temporary_path, 'w') as f:
+        json.dump(progress, f)
+    os.replace(temporary_path, checkpoint_path)
+
+def import_account_holders(csv_filepath, chunk_size=IMPORT_CHUNK_SIZE, checkpoint_path=None, dry_run=False):
     """
     Import account holders from CSV file
     
+    The file is streamed in chunks. Existing usernames and emails are loaded
+    into sets once; each chunk is validated in memory, checked for taken
+    account numbers with one query, and written with one executemany INSERT
+    per table (holder ids come back from RETURNING) and one commit. A chunk
+    that fails is retried holder by holder so a bad row only fails itself.
+    
     Args:
         csv_filepath: Path to the CSV file containing account holder data
+        chunk_size: Account holders per insert round trip and commit
+        checkpoint_path: File recording progress after every committed chunk;
+            an import started with an existing checkpoint resumes after it
+        dry_run: Validate and count the import without writing anything
+        
+    Returns:
+        tuple: (imported, skipped, errors); in a dry run, imported counts the
+            holders that would be imported
     """
     try:
+        if dry_run:
+            checkpoint_path = None
+        progress = _load_checkpoint(checkpoint_path, csv_filepath)
+        currencies = _account_currencies()
+        
         # Use ISO-8859-1 encoding as the file uses this encoding
-        with open(csv_filepath, 'r', encoding='ISO-8859-1') as csvfile:
+        with open(csv_filepath, 'r', encoding='ISO-8859-1', newline='') as csvfile:
             reader = csv.DictReader(csvfile)
             
-            # Track stats
-            imported_count = 0
-            skipped_count = 0
-            error_count = 0
+            # Skip the rows an earlier run already committed
+            for _ in islice(reader, progress['rows']):
+                pass
             
-            for row in reader:
-                try:
-                    # Check if account holder already exists
-                    existing = AccountHolder.query.filter_by(username=row['username']).first()
-                    if existing:
-                        logger.info(f"Account holder with username {row['username']} already exists. Skipping.")
-                        skipped_count += 1
-                        continue
-                    
-                    # Create account holder
-                    account_holder = AccountHolder(
-                        name=row['name'],
-                        username=row['username'],
-                        email=row['email'],
-                        created_at=datetime.strptime(row['creationdate'], '%m/%d/%Y %H:%M') if row['creationdate'] else datetime.utcnow(),
-                        broker=row['broker']
-                    )
-                    db.session.add(account_holder)
-                    
-                    # Need to flush to get the ID for relationships
-                    db.session.flush()
-                    
-                    # Create address
-                    if row.get('address.line1'):
-                        address = Address(
-                            name=row.get('address.name', 'Primary Address'),
-                            line1=row.get('address.line1'),
-                            line2=row.get('address.line2'),
-                            pobox=row.get('address.pobox'),
-                            neighborhood=row.get('address.neighborhood'),
-                            city=row.get('address.city'),
-                            region=row.get('address.region'),
-                            zip=row.get('address.zip'),
-                            country=row.get('address.country'),
-                            street=row.get('address.street'),
-                            building_number=row.get('address.buildingnumber'),
-                            complement=row.get('address.complement'),
-                            account_holder_id=account_holder.id
-                        )
-                        db.session.add(address)
-                    
-                    # Create mobile phone
-                    if row.get('mobile.number'):
-                        mobile = PhoneNumber(
-                            name=row.get('mobile.name', 'Mobile'),
-                            number=parse_phone_number(row.get('mobile.number')),
-                            is_primary=True,
-                            is_mobile=True,
-                            account_holder_id=account_holder.id
-                        )
-                        db.session.add(mobile)
-                    
-                    # Create landline phone
-                    if row.get('landline.number'):
-                        landline = PhoneNumber(
-                            name=row.get('landline.name', 'Landline'),
-                            number=parse_phone_number(row.get('landline.number')),
-                            is_primary=False,
-                            is_mobile=False,
-                            account_holder_id=account_holder.id
-                        )
-                        db.session.add(landline)
-                    
-                    # Create bank accounts
-                    currencies = [
-                        'USD', 'EUR', 'GBP', 'BTC', 'NGN', 
-                        'SPU', 'TU', 'ZCASH', 'NVC-Coin'
-                    ]
-                    
-                    for currency in currencies:
-                        # Get the corresponding column name
-                        column_name = f'Member Account {currency}'
-                        
-                        # Skip if the column doesn't exist or balance is 0
-                        if column_name not in row or not row[column_name]:
+            usernames = _load_existing(AccountHolder.username)
+            emails = _load_existing(AccountHolder.email)
+            
+            while True:
+                chunk = list(islice(reader, chunk_size))
+                if not chunk:
+                    break
+                
+                holders = []
+                for row in chunk:
+                    try:
+                        if row['username'] in usernames:
+                            logger.debug(f"Account holder with username {row['username']} already exists. Skipping.")
+                            progress['skipped'] += 1
                             continue
-                            
-                        # Map NVC-Coin to NVCT for our enum
-                        currency_enum_value = currency
-                        if currency == 'NVC-Coin':
-                            currency_enum_value = 'NVCT'
-                            
-                        try:
-                            # Get the appropriate CurrencyType enum value
-                            currency_type = CurrencyType[currency_enum_value]
-                            
-                            # Parse the balance value
-                            balance = parse_currency_value(row[column_name])
-                            
-                            # Skip if balance is 0
-                            if balance == 0:
-                                continue
-                                
-                            # Create a random but consistent account number based on username and currency
-                            account_number = f"{currency_enum_value}-{row['username']}"
-                            
-                            # Create the bank account
-                            bank_account = BankAccount(
-                                account_number=account_number,
-                                account_name=f"{row['name']} {currency_enum_value} Account",
-                                account_type=AccountType.CHECKING,
-                                currency=currency_type,
-                                balance=balance,
-                                available_balance=balance,
-                                status=AccountStatus.ACTIVE,
-                                account_holder_id=account_holder.id
-                            )
-                            db.session.add(bank_account)
-                        except KeyError:
-                            logger.warning(f"Currency {currency_enum_value} not found in enum. Skipping this account.")
-                    
-                    # Commit the transaction
-                    db.session.commit()
-                    logger.info(f"Successfully imported account holder: {row['name']} ({row['username']})")
-                    imported_count += 1
-                    
-                except Exception as e:
-                    db.session.rollback()
-                    logger.error(f"Error importing account holder {row.get('name', 'unknown')}: {str(e)}")
-                    error_count += 1
+                        if row['email'] in emails:
+                            raise ValueError(f"email {row['email']} is already used by another account holder")
+                        holder = _parse_row(row, currencies)
+                    except Exception as e:
+                        logger.error(f"Error importing account holder {row.get('name', 'unknown')}: {str(e)}")
+                        progress['errors'] += 1
+                        continue
+                    usernames.add(row['username'])
+                    emails.add(row['email'])
+                    holders.append(holder)
+                
+                taken = _taken_account_numbers(holders)
+                if taken:
+                    accepted = []
+                    for holder in holders:
+                        clashes = [account['account_number'] for account in holder['accounts']
+                                   if account['account_number'] in taken]
+                        if clashes:
+                            logger.error(f"Error importing account holder {holder['holder']['name']}: "
+                                         f"account numbers {', '.join(clashes)} already exist")
+                            progress['errors'] += 1
+                        else:
+                            accepted.append(holder)
+                    holders = accepted
+                
+                failed = [] if dry_run or not holders else _write_holders(holders)
+                for holder in failed:
+                    usernames.discard(holder['holder']['username'])
+                    emails.discard(holder['holder']['email'])
+                progress['imported'] += len(holders) - len(failed)
+                progress['errors'] += len(failed)
+                progress['rows'] += len(chunk)
+                
+                # Saved after the commit: a crash in between re-reads this chunk,
+                # whose holders are then skipped as existing
+                if checkpoint_path:
+                    _save_checkpoint(checkpoint_path, progress)
+                logger.info(f"{'Validated' if dry_run else 'Imported'} {progress['rows']} rows: "
+                            f"{progress['imported']} {'importable' if dry_run else 'imported'}, "
+                            f"{progress['skipped']} skipped, {progress['errors']} errors")
             
             # Log summary
-            logger.info(f"Import summary: {imported_count} imported, {skipped_count} skipped, {error_count} errors")
+            imported_count, skipped_count, error_count = progress['imported'], progress['skipped'], progress['errors']
+            logger.info(f"Import summary{' (dry run)' if dry_run else ''}: {imported_count} imported, "
+                        f"{skipped_count} skipped, {error_count} errors")
+            if checkpoint_path and os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
             return imported_count, skipped_count, error_count
             
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error opening or processing CSV file: {str(e)}")
         return 0, 0, 1
 
 def main():
     """Main function to run the import"""
-    if len(sys.argv) != 2:
-        logger.error("Usage: python import_account_holders.py <csv_file_path>")
-        sys.exit(1)
-        
-    csv_file_path = sys.argv[1]
+    parser = argparse.ArgumentParser(description='Import account holders from a CSV file')
+    parser.add_argument('csv_file_path', help='CSV file of account holders')
+    parser.add_argument('--dry-run', action='store_true', help='Validate and count the import without writing anything')
+    parser.add_argument('--checkpoint', help='Progress file; an interrupted import resumes from it')
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='Account holders per insert and commit')
+    args = parser.parse_args()
+    
+    csv_file_path = args.csv_file_path
     
     if not os.path.exists(csv_file_path):
         logger.error(f"CSV file not found: {csv_file_path}")
@@ -310,13 +466,18 @@ def main():
         try:
             # Check if database tables exist
             account_holder_table_exists = db.engine.dialect.has_table(db.engine.connect(), 'account_holder')
+            if not account_holder_table_exists and args.dry_run:
+                logger.error("Database tables do not exist.")
+                sys.exit(1)
             if not account_holder_table_exists:
                 logger.error("Database tables do not exist. Creating tables...")
                 db.create_all()
                 logger.info("Database tables created.")
             
             # Run the import
-            imported, skipped, errors = import_account_holders(csv_file_path)
+            imported, skipped, errors = import_account_holders(
+                csv_file_path, chunk_size=args.chunk_size, checkpoint_path=args.checkpoint, dry_run=args.dry_run
+            )
             
             if errors > 0:
                 logger.warning(f"Import completed with {errors} errors. Please check the logs.")
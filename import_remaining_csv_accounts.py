@@ -12,10 +12,15 @@ import logging
 import psycopg2
 from datetime import datetime
 
+from money import Money, MONEY_SCALE
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Storage of bank_account.balance and available_balance (BankAccount in account_holder_models)
+BALANCE = Money(MONEY_SCALE, numeric=True)
+
 # Get database connection parameters from environment
 db_url = os.environ.get('DATABASE_URL')
 
@@ -234,8 +239,8 @@ def import_remaining_accounts(csv_filepath):
                                 account_name,
                                 "CHECKING",
                                 currency_enum_value,
-                                balance,
-                                balance,
+                                BALANCE.to_storage(balance),
+                                BALANCE.to_storage(balance),
                                 "ACTIVE",
                                 account_holder_id,
                                 now,
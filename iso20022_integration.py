@@ -7,11 +7,14 @@ import xml.etree.ElementTree as ET
 from datetime import datetime, timezone
 from decimal import Decimal
 import uuid
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, Iterator, List, Optional, Any
 from dataclasses import dataclass
 from enum import Enum
 import logging
 
+from iso20022_stream import MESSAGE_LAYOUTS, ISO20022StreamParser, iter_entries, local_name, open_source
+from iso20022_writer import Pain001StreamWriter
+
 logger = logging.getLogger(__name__)
 
 class ISO20022MessageType(Enum):
@@ -83,6 +86,7 @@ class ISO20022MessageGenerator:
         self.namespace = {
             'pain': 'urn:iso:std:iso:20022:tech:xsd:pain.001.001.03',
             'camt': 'urn:iso:std:iso:20022:tech:xsd:camt.052.001.02',
+            'camt053': 'urn:iso:std:iso:20022:tech:xsd:camt.053.001.02',
             'acmt': 'urn:iso:std:iso:20022:tech:xsd:acmt.001.001.05'
         }
     
@@ -102,9 +106,9 @@ class ISO20022MessageGenerator:
         ET.SubElement(grp_hdr, "CreDtTm").text = datetime.now(timezone.utc).isoformat()
         ET.SubElement(grp_hdr, "NbOfTxs").text = str(len(payments))
         
-        # Control Sum
-        total_amount = sum(payment.amount for payment in payments)
-        ET.SubElement(grp_hdr, "CtrlSum").text = str(total_amount)
+        # Control Sum (exact, in Decimal)
+        total_amount = sum((Decimal(str(payment.amount)) for payment in payments), Decimal('0'))
+        ET.SubElement(grp_hdr, "CtrlSum").text = format(total_amount, 'f')
         
         # Initiating Party
         initg_pty = ET.SubElement(grp_hdr, "InitgPty")
@@ -181,10 +185,31 @@ class ISO20022MessageGenerator:
         ET.register_namespace('', self.namespace['pain'])
         return ET.tostring(root, encoding='unicode', xml_declaration=True)
     
+    def stream_customer_credit_transfer(self, payments: Iterable[ISO20022Payment], output,
+                                        message_id: str = None, **options) -> Dict[str, Any]:
+        """
+        Write a pain.001.001.03 message for a large batch in constant memory
+        
+        Unlike generate_customer_credit_transfer, payments are consumed one
+        at a time and grouped into PmtInf blocks by debtor account and
+        currency; options are passed to Pain001StreamWriter.
+        
+        Args:
+            payments: ISO20022Payment objects (any iterable, consumed once)
+            output: File path or binary file object
+            message_id: Message ID (default: generated)
+            
+        Returns:
+            dict: message_id, transaction_count, control_sum and blocks
+        """
+        with Pain001StreamWriter(output, message_id=message_id, **options) as writer:
+            writer.add_all(payments)
+        return writer.summary()
+    
     def generate_account_statement(self, account_number: str, statement_id: str,
-                                 transactions: List[Dict], balance: Decimal) -> str:
+                                 transactions: List[Dict], balance: Decimal, currency: str = "USD") -> str:
         """Generate camt.053.001.02 BankToCustomerStatement message"""
-        root = ET.Element("Document", xmlns=self.namespace['camt'])
+        root = ET.Element("Document", xmlns=self.namespace['camt053'])
         bk_to_cstmr_stmt = ET.SubElement(root, "BkToCstmrStmt")
         
         # Group Header
@@ -205,8 +230,8 @@ class ISO20022MessageGenerator:
         # Balance
         bal = ET.SubElement(stmt, "Bal")
         ET.SubElement(bal, "Tp").text = "CLBD"  # Closing Balance
-        amt = ET.SubElement(bal, "Amt", Ccy="USD")
-        amt.text = str(balance)
+        amt = ET.SubElement(bal, "Amt", Ccy=currency)
+        amt.text = str(abs(balance))
         ET.SubElement(bal, "CdtDbtInd").text = "CRDT" if balance >= 0 else "DBIT"
         ET.SubElement(bal, "Dt").text = datetime.now().strftime('%Y-%m-%d')
         
@@ -233,77 +258,56 @@ class ISO20022MessageGenerator:
 class ISO20022MessageParser:
     """Parse incoming ISO 20022 XML messages"""
     
+    def iter_entries(self, source) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the entries of a camt.052/053/054 or pain.002 message
+        
+        Args:
+            source: File path, file object, or the XML as str/bytes
+            
+        Returns:
+            generator: Entry dicts, parsed incrementally (see iso20022_stream)
+        """
+        return iter_entries(source)
+    
+    def parse_account_statement(self, xml_content: str) -> Dict[str, Any]:
+        """Parse a camt.052/053/054 report, statement or notification"""
+        try:
+            parser = ISO20022StreamParser(xml_content)
+            entries = list(parser.entries())
+            return {
+                'message_type': parser.message_type,
+                'message_id': parser.header['message_id'],
+                'creation_date': parser.header['creation_date'],
+                'entry_count': len(entries),
+                'entries': entries
+            }
+        except ET.ParseError as e:
+            logger.error(f"Error parsing ISO 20022 message: {str(e)}")
+            return {'error': f'XML parsing error: {str(e)}'}
+        except Exception as e:
+            logger.error(f"Error processing ISO 20022 message: {str(e)}")
+            return {'error': f'Processing error: {str(e)}'}
+    
     def parse_payment_status_report(self, xml_content: str) -> Dict[str, Any]:
         """Parse pain.002.001.03 PaymentStatusReport message"""
         try:
-            root = ET.fromstring(xml_content)
-            
-            # Extract namespace
-            ns = {'ns': root.tag.split('}')[0][1:]} if '}' in root.tag else {}
-            
-            result = {
-                'message_type': 'pain.002.001.03',
-                'message_id': None,
-                'creation_date': None,
-                'original_message_id': None,
-                'status_reports': []
+            parser = ISO20022StreamParser(xml_content)
+            status_reports = list(parser.entries())
+            
+            original_message_id = parser.header['original_message_id']
+            if original_message_id is None and status_reports:
+                original_message_id = status_reports[0]['original_payment_information_id']
+            
+            return {
+                'message_type': parser.message_type,
+                'message_id': parser.header['message_id'],
+                'creation_date': parser.header['creation_date'],
+                'original_message_id': original_message_id,
+                'group_status': parser.header['group_status'],
+                'status_reports': status_reports
             }
             
-            # Find elements (handle with or without namespace)
-            payment_status = root.find('.//PmtStsRpt') or root.find('.//ns:PmtStsRpt', ns)
-            if payment_status is not None:
-                # Group Header
-                grp_hdr = payment_status.find('.//GrpHdr') or payment_status.find('.//ns:GrpHdr', ns)
-                if grp_hdr is not None:
-                    msg_id = grp_hdr.find('.//MsgId') or grp_hdr.find('.//ns:MsgId', ns)
-                    if msg_id is not None:
-                        result['message_id'] = msg_id.text
-                    
-                    cre_dt_tm = grp_hdr.find('.//CreDtTm') or grp_hdr.find('.//ns:CreDtTm', ns)
-                    if cre_dt_tm is not None:
-                        result['creation_date'] = cre_dt_tm.text
-                
-                # Original Payment Information
-                orgnl_pmt_inf = payment_status.find('.//OrgnlPmtInfAndSts') or payment_status.find('.//ns:OrgnlPmtInfAndSts', ns)
-                if orgnl_pmt_inf is not None:
-                    orgnl_pmt_inf_id = orgnl_pmt_inf.find('.//OrgnlPmtInfId') or orgnl_pmt_inf.find('.//ns:OrgnlPmtInfId', ns)
-                    if orgnl_pmt_inf_id is not None:
-                        result['original_message_id'] = orgnl_pmt_inf_id.text
-                
-                # Transaction Status Information
-                for tx_inf_and_sts in payment_status.findall('.//TxInfAndSts') or payment_status.findall('.//ns:TxInfAndSts', ns):
-                    status_report = {}
-                    
-                    # Status Identification
-                    sts_id = tx_inf_and_sts.find('.//StsId') or tx_inf_and_sts.find('.//ns:StsId', ns)
-                    if sts_id is not None:
-                        status_report['status_id'] = sts_id.text
-                    
-                    # Original Instruction Identification
-                    orgnl_instr_id = tx_inf_and_sts.find('.//OrgnlInstrId') or tx_inf_and_sts.find('.//ns:OrgnlInstrId', ns)
-                    if orgnl_instr_id is not None:
-                        status_report['original_instruction_id'] = orgnl_instr_id.text
-                    
-                    # Transaction Status
-                    tx_sts = tx_inf_and_sts.find('.//TxSts') or tx_inf_and_sts.find('.//ns:TxSts', ns)
-                    if tx_sts is not None:
-                        status_report['transaction_status'] = tx_sts.text
-                    
-                    # Status Reason Information
-                    sts_rsn_inf = tx_inf_and_sts.find('.//StsRsnInf') or tx_inf_and_sts.find('.//ns:StsRsnInf', ns)
-                    if sts_rsn_inf is not None:
-                        rsn_cd = sts_rsn_inf.find('.//RsnCd') or sts_rsn_inf.find('.//ns:RsnCd', ns)
-                        if rsn_cd is not None:
-                            status_report['reason_code'] = rsn_cd.text
-                        
-                        addtl_inf = sts_rsn_inf.find('.//AddtlInf') or sts_rsn_inf.find('.//ns:AddtlInf', ns)
-                        if addtl_inf is not None:
-                            status_report['additional_info'] = addtl_inf.text
-                    
-                    result['status_reports'].append(status_report)
-            
-            return result
-            
         except ET.ParseError as e:
             logger.error(f"Error parsing ISO 20022 message: {str(e)}")
             return {'error': f'XML parsing error: {str(e)}'}
@@ -314,82 +318,95 @@ class ISO20022MessageParser:
 class ISO20022Validator:
     """Validate ISO 20022 messages against standard schemas"""
     
-    def validate_message_structure(self, xml_content: str, message_type: ISO20022MessageType) -> Dict[str, Any]:
-        """Validate basic message structure and required fields"""
+    # Message element expected under Document
+    MESSAGE_ELEMENTS = {
+        ISO20022MessageType.PAIN_001: 'CstmrCdtTrfInitn',
+        ISO20022MessageType.PAIN_002: 'CstmrPmtStsRpt',
+        ISO20022MessageType.CAMT_053: 'BkToCstmrStmt',
+        ISO20022MessageType.CAMT_054: 'BkToCstmrDbtCdtNtfctn'
+    }
+    
+    # (parent, element) pairs that must appear; a missing one is an error, or a
+    # warning for the types listed in RECOMMENDED_ONLY
+    REQUIRED_ELEMENTS = {
+        ISO20022MessageType.PAIN_001: [(None, 'MsgId'), (None, 'CreDtTm'), (None, 'NbOfTxs'),
+                                       (None, 'PmtInfId'), (None, 'PmtMtd')],
+        ISO20022MessageType.PAIN_002: [('GrpHdr', 'MsgId'), ('GrpHdr', 'CreDtTm')],
+        ISO20022MessageType.CAMT_053: [('GrpHdr', 'MsgId'), ('GrpHdr', 'CreDtTm'), ('Stmt', 'Id'), ('Stmt', 'Acct')],
+        ISO20022MessageType.CAMT_054: [('GrpHdr', 'MsgId'), ('GrpHdr', 'CreDtTm'), ('Ntfctn', 'Id'), ('Ntfctn', 'Acct')]
+    }
+    RECOMMENDED_ONLY = {ISO20022MessageType.PAIN_001}
+    
+    def validate_message_structure(self, xml_content, message_type: ISO20022MessageType) -> Dict[str, Any]:
+        """
+        Validate basic message structure and required fields
+        
+        The document is read incrementally and discarded as it goes, so
+        large files validate in flat memory.
+        
+        Args:
+            xml_content: The XML as str/bytes, a file path or a file object
+            message_type: Expected message type
+        """
         validation_result = {
             'is_valid': True,
             'errors': [],
             'warnings': []
         }
         
+        required = self.REQUIRED_ELEMENTS.get(message_type, [])
+        missing = set(required)
+        has_namespace = False
+        stack = []
+        
         try:
-            root = ET.fromstring(xml_content)
-            
-            # Check root element
-            if not root.tag.endswith('Document'):
-                validation_result['errors'].append("Root element must be 'Document'")
-                validation_result['is_valid'] = False
-            
-            # Check namespace
-            if 'xmlns' not in root.attrib:
-                validation_result['warnings'].append("Missing namespace declaration")
-            
-            # Message type specific validation
-            if message_type == ISO20022MessageType.PAIN_001:
-                self._validate_pain_001(root, validation_result)
-            elif message_type == ISO20022MessageType.CAMT_053:
-                self._validate_camt_053(root, validation_result)
+            for event, item in ET.iterparse(open_source(xml_content), events=('start-ns', 'start', 'end')):
+                if event == 'start-ns':
+                    has_namespace = True
+                    continue
+                
+                if event == 'start':
+                    name = local_name(item.tag)
+                    if not stack and name != 'Document':
+                        validation_result['errors'].append("Root element must be 'Document'")
+                        validation_result['is_valid'] = False
+                    elif len(stack) == 1 and message_type in self.MESSAGE_ELEMENTS \
+                            and name != self.MESSAGE_ELEMENTS[message_type]:
+                        validation_result['errors'].append(
+                            f"Missing {self.MESSAGE_ELEMENTS[message_type]} element (found {name})"
+                        )
+                        validation_result['is_valid'] = False
+                    stack.append((name, item))
+                    continue
+                
+                name, _ = stack.pop()
+                if missing:
+                    missing.discard((None, name))
+                    if stack:
+                        missing.discard((stack[-1][0], name))
+                # Only the structure matters here; drop what has been read
+                if stack:
+                    stack[-1][1].remove(item)
             
         except ET.ParseError as e:
             validation_result['errors'].append(f"XML parsing error: {str(e)}")
             validation_result['is_valid'] = False
+            return validation_result
         
-        return validation_result
-    
-    def _validate_pain_001(self, root: ET.Element, validation_result: Dict[str, Any]):
-        """Validate pain.001.001.03 CustomerCreditTransferInitiation"""
-        # Find the CustomerCreditTransferInitiation element
-        cct_element = None
-        for child in root:
-            if 'CstmrCdtTrfInitn' in child.tag or 'CustomerCreditTransferInitiation' in child.tag:
-                cct_element = child
-                break
-        
-        if cct_element is None:
-            validation_result['errors'].append("Missing CustomerCreditTransferInitiation element")
-            validation_result['is_valid'] = False
-            return
-        
-        # Check required elements in the found CustomerCreditTransferInitiation element
-        required_paths = [
-            './/MsgId',
-            './/CreDtTm', 
-            './/NbOfTxs',
-            './/PmtInfId',
-            './/PmtMtd'
-        ]
+        if not has_namespace:
+            validation_result['warnings'].append("Missing namespace declaration")
         
-        # Check each required element exists
-        for path in required_paths:
-            if cct_element.find(path) is None:
+        for parent, name in required:
+            if (parent, name) not in missing:
+                continue
+            path = f".//{parent}/{name}" if parent else f".//{name}"
+            if message_type in self.RECOMMENDED_ONLY:
                 validation_result['warnings'].append(f"Missing or empty element: {path}")
-        
-        # Validation complete - CustomerCreditTransferInitiation element found successfully
-    
-    def _validate_camt_053(self, root: ET.Element, validation_result: Dict[str, Any]):
-        """Validate camt.053.001.02 BankToCustomerStatement"""
-        # Check required elements
-        required_elements = [
-            './/GrpHdr/MsgId',
-            './/GrpHdr/CreDtTm',
-            './/Stmt/Id',
-            './/Stmt/Acct'
-        ]
-        
-        for element_path in required_elements:
-            if root.find(element_path) is None:
-                validation_result['errors'].append(f"Missing required element: {element_path}")
+            else:
+                validation_result['errors'].append(f"Missing required element: {path}")
                 validation_result['is_valid'] = False
+        
+        return validation_result
 
 class ISO20022Service:
     """Main service class for ISO 20022 integration"""
@@ -487,12 +504,17 @@ class ISO20022Service:
     def process_inbound_message(self, xml_content: str) -> Dict[str, Any]:
         """Process incoming ISO 20022 message"""
         try:
-            # Basic validation
-            root = ET.fromstring(xml_content)
-            
-            # Determine message type from namespace or root element
-            if 'pain.002' in xml_content:
+            # Determine message type from the message element (read without parsing the whole document)
+            message_type = None
+            for event, elem in ET.iterparse(open_source(xml_content), events=('start',)):
+                if local_name(elem.tag) != 'Document':
+                    message_type = MESSAGE_LAYOUTS.get(local_name(elem.tag), (None,))[0]
+                    break
+            
+            if message_type == 'pain.002':
                 return self.parser.parse_payment_status_report(xml_content)
+            elif message_type in ('camt.052', 'camt.053', 'camt.054'):
+                return self.parser.parse_account_statement(xml_content)
             else:
                 return {'error': 'Unsupported message type'}
                 
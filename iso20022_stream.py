@@ -0,0 +1,364 @@
+"""
+Streaming ISO 20022 Parser for NVC Banking Platform
+
+Reads camt.052/camt.053/camt.054 account reports, statements and
+notifications and pain.002 payment status reports incrementally, so that
+files from correspondents of tens of MB with tens of thousands of entries
+are parsed in flat memory.
+
+- The document is read with ElementTree.iterparse. Each entry (camt Ntry,
+  pain.002 TxInfAndSts) is yielded as a dict as soon as its end tag is
+  read, and is then removed from the tree along with everything read
+  before it; only the entry being read is held in memory.
+- The namespace is resolved once from the root element; lookups inside an
+  entry use paths qualified with it up front.
+- Each entry carries its message and statement context (message ID,
+  statement ID, account), so entries can be consumed on their own.
+  reconciliation_records flattens them into one record per underlying
+  transaction, keyed by its reference, for matching against the ledger.
+"""
+
+import io
+import os
+import logging
+import xml.etree.ElementTree as ET
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Message element under Document -> (message family, container element, entry element)
+MESSAGE_LAYOUTS = {
+    'BkToCstmrAcctRpt': ('camt.052', 'Rpt', 'Ntry'),
+    'BkToCstmrStmt': ('camt.053', 'Stmt', 'Ntry'),
+    'BkToCstmrDbtCdtNtfctn': ('camt.054', 'Ntfctn', 'Ntry'),
+    'CstmrPmtStsRpt': ('pain.002', 'OrgnlPmtInfAndSts', 'TxInfAndSts'),
+    'PmtStsRpt': ('pain.002', 'OrgnlPmtInfAndSts', 'TxInfAndSts'),
+}
+
+# End-to-end IDs that carry no reference
+NOT_PROVIDED = 'NOTPROVIDED'
+
+
+def local_name(tag: str) -> str:
+    """Strip the namespace from an element tag"""
+    return tag.rpartition('}')[2]
+
+
+def open_source(source):
+    """Wrap XML text or bytes in a file object; paths and file objects are passed through"""
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    if isinstance(source, str) and source.lstrip().startswith('<'):
+        return io.StringIO(source)
+    if isinstance(source, os.PathLike):
+        return os.fspath(source)
+    return source
+
+
+def _decimal(text: Optional[str]) -> Optional[Decimal]:
+    if text is None:
+        return None
+    try:
+        return Decimal(text.strip())
+    except InvalidOperation:
+        logger.warning(f"Invalid ISO 20022 amount: {text!r}")
+        return None
+
+
+class ISO20022StreamParser:
+    """
+    Incremental parser for one ISO 20022 camt.052/053/054 or pain.002 document
+
+    Iterate over entries() to read the document. The group header is
+    available in `header` once the first entry has been yielded (it
+    precedes the entries), and in full after the iteration.
+
+    Args:
+        source: File path, binary or text file object, or the XML as str/bytes
+
+    Raises (from entries()):
+        xml.etree.ElementTree.ParseError: If the document is malformed or
+            truncated (entries before the error have been yielded)
+        ValueError: If the document isn't one of the supported messages
+    """
+
+    def __init__(self, source: Union[str, bytes, os.PathLike, io.IOBase]):
+        self.source = open_source(source)
+        self.namespace = ''
+        self.message_type = None
+        self.family = None
+        self.header = {
+            'message_id': None,
+            'creation_date': None,
+            'original_message_id': None,
+            'group_status': None
+        }
+        self.entry_count = 0
+        self._container = {}
+        self._paths = {}
+
+    def _q(self, path: str) -> str:
+        """Qualify a tag like 'Amt' with the document namespace"""
+        return f'{{{self.namespace}}}{path}' if self.namespace else path
+
+    def _find(self, elem: ET.Element, path: str) -> Optional[ET.Element]:
+        """
+        Find a descendant by a path like 'BookgDt/Dt'
+
+        Paths are qualified once and cached; each step is a plain child
+        lookup, which skips ElementPath's path compiler.
+        """
+        steps = self._paths.get(path)
+        if steps is None:
+            steps = self._paths[path] = tuple(self._q(step) for step in path.split('/'))
+        for step in steps:
+            elem = elem.find(step)
+            if elem is None:
+                return None
+        return elem
+
+    def _text(self, elem: ET.Element, path: str) -> Optional[str]:
+        found = self._find(elem, path)
+        if found is None or found.text is None:
+            return None
+        return found.text.strip()
+
+    def _date(self, elem: ET.Element, path: str) -> Optional[str]:
+        """Read a date element written as <X><Dt>..</Dt></X>, <X><DtTm>..</DtTm></X> or <X>..</X>"""
+        found = self._find(elem, path)
+        if found is None:
+            return None
+        for child in ('Dt', 'DtTm'):
+            value = self._find(found, child)
+            if value is not None and value.text:
+                return value.text.strip()
+        return found.text.strip() if found.text and found.text.strip() else None
+
+    def _account(self, elem: ET.Element) -> Optional[str]:
+        return self._text(elem, 'Id/IBAN') or self._text(elem, 'Id/Othr/Id') or self._text(elem, 'Id/Othr')
+
+    def _start_message(self, elem: ET.Element) -> None:
+        """Resolve the namespace, message type and layout from the message element"""
+        name = local_name(elem.tag)
+        layout = MESSAGE_LAYOUTS.get(name)
+        if layout is None:
+            raise ValueError(f"Unsupported ISO 20022 message: {name}")
+        self.family, container, entry = layout
+        if elem.tag.startswith('{'):
+            self.namespace = elem.tag[1:].partition('}')[0]
+        # urn:iso:std:iso:20022:tech:xsd:camt.053.001.02 -> camt.053.001.02
+        version = self.namespace.rpartition(':')[2]
+        self.message_type = version if version.startswith(self.family) else self.family
+        self._group_header_tag = self._q('GrpHdr')
+        self._group_status_tag = self._q('OrgnlGrpInfAndSts')
+        self._container_tag = self._q(container)
+        self._entry_tag = self._q(entry)
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the document's entries in order
+
+        Yields:
+            dict: A camt entry (see _camt_entry) or a pain.002 transaction status (see _status_entry)
+        """
+        stack = []
+        for event, elem in ET.iterparse(self.source, events=('start', 'end')):
+            if event == 'start':
+                if len(stack) == 1:
+                    self._start_message(elem)
+                elif len(stack) == 2 and elem.tag == self._container_tag:
+                    self._container = {}
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            depth = len(stack)
+            if depth == 3 and stack[-1].tag == self._container_tag:
+                if elem.tag == self._entry_tag:
+                    self.entry_count += 1
+                    yield self._camt_entry(elem) if self.family.startswith('camt') else self._status_entry(elem)
+                else:
+                    self._read_container_field(elem)
+                stack[-1].remove(elem)
+            elif depth == 2:
+                if elem.tag == self._group_header_tag:
+                    self.header['message_id'] = self._text(elem, 'MsgId')
+                    self.header['creation_date'] = self._text(elem, 'CreDtTm')
+                elif elem.tag == self._group_status_tag:
+                    self.header['original_message_id'] = self._text(elem, 'OrgnlMsgId')
+                    self.header['group_status'] = self._text(elem, 'GrpSts')
+                stack[-1].remove(elem)
+
+    def _read_container_field(self, elem: ET.Element) -> None:
+        """Keep the statement (or original payment information) fields that entries refer to"""
+        name = local_name(elem.tag)
+        if name == 'Id':
+            self._container['statement_id'] = elem.text.strip() if elem.text else None
+        elif name == 'Acct':
+            self._container['account'] = self._account(elem)
+            self._container['account_currency'] = self._text(elem, 'Ccy')
+        elif name == 'Bal':
+            amount = self._find(elem, 'Amt')
+            self._container.setdefault('balances', []).append({
+                'type': self._text(elem, 'Tp/CdOrPrtry/Cd') or self._text(elem, 'Tp'),
+                'amount': _decimal(amount.text) if amount is not None else None,
+                'currency': amount.get('Ccy') if amount is not None else None,
+                'credit_debit': self._text(elem, 'CdtDbtInd'),
+                'date': self._date(elem, 'Dt')
+            })
+        elif name == 'OrgnlPmtInfId':
+            self._container['original_payment_information_id'] = elem.text.strip() if elem.text else None
+        elif name == 'PmtInfSts':
+            self._container['payment_information_status'] = elem.text.strip() if elem.text else None
+
+    def _camt_entry(self, ntry: ET.Element) -> Dict[str, Any]:
+        """
+        Read one camt Ntry
+
+        Returns:
+            dict: Entry fields, its statement context and 'transactions', one
+            dict per TxDtls (end_to_end_id, instruction_id, amount, ...)
+        """
+        amount = self._find(ntry, 'Amt')
+        status = self._text(ntry, 'Sts/Cd') or self._text(ntry, 'Sts')
+        transactions = []
+        tx_tag = self._q('TxDtls')
+        for tx in (tx for details in ntry.findall(self._q('NtryDtls')) for tx in details.findall(tx_tag)):
+            tx_amount = self._find(tx, 'Amt')
+            if tx_amount is None:
+                tx_amount = self._find(tx, 'AmtDtls/TxAmt/Amt')
+            transactions.append({
+                'end_to_end_id': self._text(tx, 'Refs/EndToEndId') or self._text(tx, 'EndToEndId'),
+                'instruction_id': self._text(tx, 'Refs/InstrId'),
+                'transaction_id': self._text(tx, 'Refs/TxId'),
+                'account_servicer_reference': self._text(tx, 'Refs/AcctSvcrRef'),
+                'amount': _decimal(tx_amount.text) if tx_amount is not None else None,
+                'currency': tx_amount.get('Ccy') if tx_amount is not None else None,
+                'remittance_info': self._text(tx, 'RmtInf/Ustrd'),
+                'counterparty': self._text(tx, 'RltdPties/Dbtr/Nm') or self._text(tx, 'RltdPties/Cdtr/Nm')
+            })
+        return {
+            'message_type': self.message_type,
+            'message_id': self.header['message_id'],
+            'statement_id': self._container.get('statement_id'),
+            'account': self._container.get('account'),
+            'entry_reference': self._text(ntry, 'NtryRef'),
+            'amount': _decimal(amount.text) if amount is not None else None,
+            'currency': amount.get('Ccy') if amount is not None else None,
+            'credit_debit': self._text(ntry, 'CdtDbtInd'),
+            'status': status,
+            'booking_date': self._date(ntry, 'BookgDt'),
+            'value_date': self._date(ntry, 'ValDt'),
+            'account_servicer_reference': self._text(ntry, 'AcctSvcrRef'),
+            'transactions': transactions
+        }
+
+    def _status_entry(self, tx: ET.Element) -> Dict[str, Any]:
+        """
+        Read one pain.002 TxInfAndSts
+
+        Returns:
+            dict: The transaction's status and references, with its original payment information
+        """
+        amount = self._find(tx, 'OrgnlTxRef/Amt/InstdAmt')
+        return {
+            'message_type': self.message_type,
+            'message_id': self.header['message_id'],
+            'original_message_id': self.header['original_message_id'],
+            'original_payment_information_id': self._container.get('original_payment_information_id'),
+            'status_id': self._text(tx, 'StsId'),
+            'original_instruction_id': self._text(tx, 'OrgnlInstrId'),
+            'original_end_to_end_id': self._text(tx, 'OrgnlEndToEndId'),
+            'transaction_status': self._text(tx, 'TxSts'),
+            'reason_code': self._text(tx, 'StsRsnInf/Rsn/Cd') or self._text(tx, 'StsRsnInf/RsnCd'),
+            'additional_info': self._text(tx, 'StsRsnInf/AddtlInf'),
+            'amount': _decimal(amount.text) if amount is not None else None,
+            'currency': amount.get('Ccy') if amount is not None else None
+        }
+
+
+def iter_entries(source) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the entries of a camt.052/053/054 or pain.002 document
+
+    Args:
+        source: File path, file object, or the XML as str/bytes
+
+    Returns:
+        generator: Entry dicts (see ISO20022StreamParser.entries)
+    """
+    return ISO20022StreamParser(source).entries()
+
+
+def _reference(*candidates: Optional[str]) -> Optional[str]:
+    for candidate in candidates:
+        if candidate and candidate != NOT_PROVIDED:
+            return candidate
+    return None
+
+
+def reconciliation_records(entries: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Flatten parsed entries into one record per underlying transaction
+
+    A camt entry booked as a batch yields one record per TxDtls (with the
+    transaction's own amount when given); a pain.002 status yields one
+    record. 'reference' is the first usable of the end-to-end ID,
+    instruction ID and servicer references.
+
+    Args:
+        entries: Entries from ISO20022StreamParser.entries / iter_entries
+
+    Yields:
+        dict: reference, end_to_end_id, amount, currency, credit_debit,
+        status, booking_date, value_date, account, statement_id, message_id
+    """
+    for entry in entries:
+        if 'transactions' not in entry:
+            yield {
+                'reference': _reference(entry['original_end_to_end_id'], entry['original_instruction_id']),
+                'end_to_end_id': entry['original_end_to_end_id'],
+                'amount': entry['amount'],
+                'currency': entry['currency'],
+                'credit_debit': None,
+                'status': entry['transaction_status'],
+                'booking_date': None,
+                'value_date': None,
+                'account': None,
+                'statement_id': entry['original_payment_information_id'],
+                'message_id': entry['message_id']
+            }
+            continue
+
+        transactions = entry['transactions'] or [{}]
+        single = len(transactions) == 1
+        for tx in transactions:
+            yield {
+                'reference': _reference(
+                    tx.get('end_to_end_id'), tx.get('instruction_id'), tx.get('account_servicer_reference'),
+                    entry['account_servicer_reference'], entry['entry_reference']
+                ),
+                'end_to_end_id': tx.get('end_to_end_id'),
+                'amount': tx.get('amount') if tx.get('amount') is not None or not single else entry['amount'],
+                'currency': tx.get('currency') or entry['currency'],
+                'credit_debit': entry['credit_debit'],
+                'status': entry['status'],
+                'booking_date': entry['booking_date'],
+                'value_date': entry['value_date'],
+                'account': entry['account'],
+                'statement_id': entry['statement_id'],
+                'message_id': entry['message_id']
+            }
+
+
+def batched(records: Iterable[Dict[str, Any]], size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+    """Group records into lists of up to size, e.g. for one ledger lookup per batch of references"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,399 @@
+"""
+Streaming pain.001 Writer for NVC Banking Platform
+
+Writes pain.001.001.03 CustomerCreditTransferInitiation messages for large
+payment batches (payroll runs, treasury settlements) in constant memory.
+
+- Payments are added one at a time. Each is serialised to its
+  CdtTrfTxInf XML at once and buffered for its payment information block;
+  full buffers go to one shared temporary file, so the batch itself is
+  never held in memory (only a buffer per block still taking payments).
+- Payments are grouped into PmtInf blocks by debtor account and currency
+  (configurable), and a block is split when it reaches a transaction
+  limit.
+- Amounts are rounded to their currency's minor unit, and transaction
+  counts and control sums are kept in Decimal, exactly. Since
+  the group header and each PmtInf header carry them before the
+  transactions, the message is written out when the writer is closed:
+  headers first, then each block's spooled transactions, streamed to a
+  file path or any binary file object (e.g. socket.makefile('wb')).
+- write_credit_transfer_files splits a batch across several messages
+  (files) by group or by size.
+"""
+
+import os
+import uuid
+import logging
+import tempfile
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from money import quantize_amount
+
+logger = logging.getLogger(__name__)
+
+PAIN_001_NAMESPACE = 'urn:iso:std:iso:20022:tech:xsd:pain.001.001.03'
+
+# Transactions buffered per block before they go to the temporary file, and
+# in all blocks together (many debtor accounts) before every buffer is flushed
+BLOCK_BUFFER_BYTES = 64 * 1024
+MAX_BUFFERED_BYTES = 4 * 1024 * 1024
+
+# Payment fields a batch can be grouped by
+GROUP_FIELDS = {
+    'debtor_account': lambda payment: _account_id(payment.debtor_account),
+    'currency': lambda payment: payment.currency,
+    'debtor': lambda payment: payment.debtor.name,
+}
+
+DEFAULT_INITIATING_PARTY = 'NVC Fund Holding Trust'
+DEFAULT_DEBTOR_AGENT_BIC = 'NVCFGLGL'
+
+
+def _account_id(account) -> Optional[str]:
+    return account.iban or account.account_number
+
+
+def _amount(value, currency: str) -> Decimal:
+    """
+    Convert an amount to Decimal (floats through their shortest repr),
+    rounded to the currency's minor unit as it is written and summed
+
+    Raises:
+        ValueError: If the amount is not a finite number
+    """
+    try:
+        amount = value if isinstance(value, Decimal) else Decimal(str(value))
+        if not amount.is_finite():
+            raise ValueError(f"Invalid payment amount: {value!r}")
+        return quantize_amount(amount, currency)
+    except InvalidOperation:
+        raise ValueError(f"Invalid payment amount: {value!r}")
+
+
+def _format_amount(amount: Decimal) -> str:
+    """Format a Decimal without exponent notation"""
+    return format(amount, 'f')
+
+
+def _element(name: str, text: Any) -> str:
+    return f"<{name}>{escape(str(text))}</{name}>"
+
+
+def _account_xml(account) -> str:
+    if account.iban:
+        return f"<Id>{_element('IBAN', account.iban)}</Id>"
+    return f"<Id><Othr>{_element('Id', account.account_number or '')}</Othr></Id>"
+
+
+class _Block:
+    """
+    One PmtInf block: its header fields, totals and transactions
+
+    Transactions are buffered and written to the shared spool file in
+    chunks; the block keeps the (offset, length) of each chunk.
+    """
+
+    def __init__(self, number: int, payment):
+        self.number = number
+        self.debtor = payment.debtor
+        self.debtor_account = payment.debtor_account
+        self.currency = payment.currency
+        self.count = 0
+        self.control_sum = Decimal('0')
+        self.buffer = []
+        self.buffered = 0
+        self.chunks = []
+
+    def write(self, data: bytes, spool) -> None:
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= BLOCK_BUFFER_BYTES:
+            self.flush(spool)
+
+    def flush(self, spool) -> None:
+        if not self.buffer:
+            return
+        data = b''.join(self.buffer)
+        offset = spool.seek(0, os.SEEK_END)
+        spool.write(data)
+        self.chunks.append((offset, len(data)))
+        self.buffer = []
+        self.buffered = 0
+
+    def copy_to(self, spool, output) -> None:
+        """Write the block's transactions, in order, to output"""
+        self.flush(spool)
+        for offset, length in self.chunks:
+            spool.seek(offset)
+            while length > 0:
+                data = spool.read(min(length, BLOCK_BUFFER_BYTES))
+                if not data:
+                    raise IOError("Payment spool file ended early")
+                output.write(data)
+                length -= len(data)
+
+
+class Pain001StreamWriter:
+    """
+    Write a pain.001.001.03 message incrementally
+
+    Use as a context manager, or call close() to write the message;
+    abort() discards it.
+
+    Args:
+        output: File path, or a binary file object (left open)
+        message_id: Message ID (default: generated)
+        group_by: Payment fields that start a new PmtInf block when they
+            change ('debtor_account', 'currency', 'debtor'); empty for one block
+        max_block_transactions: Split blocks at this many transactions (None: no limit)
+        execution_date: Requested execution date, YYYY-MM-DD (default: today)
+        initiating_party: Name in the group header
+        service_level: PmtTpInf service level code
+        debtor_agent_bic: BIC used when a debtor account has no bank_code
+    """
+
+    def __init__(self, output, message_id: str = None,
+                 group_by: Tuple[str, ...] = ('debtor_account', 'currency'),
+                 max_block_transactions: int = None, execution_date: str = None,
+                 initiating_party: str = DEFAULT_INITIATING_PARTY, service_level: str = 'SEPA',
+                 debtor_agent_bic: str = DEFAULT_DEBTOR_AGENT_BIC):
+        unknown = [field for field in group_by if field not in GROUP_FIELDS]
+        if unknown:
+            raise ValueError(f"Cannot group payments by {', '.join(unknown)}")
+        if max_block_transactions is not None and max_block_transactions < 1:
+            raise ValueError("max_block_transactions must be at least 1")
+
+        self.output = output
+        self.message_id = message_id or f"NVC{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:8]}"
+        self.group_by = tuple(group_by)
+        self.max_block_transactions = max_block_transactions
+        self.execution_date = execution_date or datetime.now().strftime('%Y-%m-%d')
+        self.initiating_party = initiating_party
+        self.service_level = service_level
+        self.debtor_agent_bic = debtor_agent_bic
+
+        self.count = 0
+        self.control_sum = Decimal('0')
+        self.blocks = []  # in order of creation
+        self._open_blocks = {}  # group key -> block taking new payments
+        self._spool = tempfile.TemporaryFile()
+        self._buffered = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+    def _group_key(self, payment) -> tuple:
+        return tuple(GROUP_FIELDS[field](payment) for field in self.group_by)
+
+    def add(self, payment) -> None:
+        """
+        Add a payment (an ISO20022Payment) to the message
+
+        Raises:
+            ValueError: If the amount isn't a positive finite number or the currency is missing
+        """
+        if self.closed:
+            raise ValueError("Writer is closed")
+        if not payment.currency:
+            raise ValueError(f"Payment {payment.instruction_id} has no currency")
+        amount = _amount(payment.amount, payment.currency)
+        if amount <= 0:
+            raise ValueError(f"Payment {payment.instruction_id} has non-positive amount {amount}")
+
+        key = self._group_key(payment)
+        block = self._open_blocks.get(key)
+        if block is None or (self.max_block_transactions and block.count >= self.max_block_transactions):
+            if block is not None:
+                # The full block takes no more payments; release its buffer
+                self._buffered -= block.buffered
+                block.flush(self._spool)
+            block = _Block(len(self.blocks) + 1, payment)
+            self.blocks.append(block)
+            self._open_blocks[key] = block
+
+        buffered = block.buffered
+        block.write(self._transaction_xml(payment, amount).encode('utf-8'), self._spool)
+        self._buffered += block.buffered - buffered
+        if self._buffered >= MAX_BUFFERED_BYTES:
+            for open_block in self._open_blocks.values():
+                open_block.flush(self._spool)
+            self._buffered = 0
+        block.count += 1
+        block.control_sum += amount
+        self.count += 1
+        self.control_sum += amount
+
+    def add_all(self, payments: Iterable) -> None:
+        for payment in payments:
+            self.add(payment)
+
+    def _transaction_xml(self, payment, amount: Decimal) -> str:
+        parts = [
+            "<CdtTrfTxInf><PmtId>",
+            _element('InstrId', payment.instruction_id),
+            _element('EndToEndId', payment.end_to_end_id),
+            f"</PmtId><Amt><InstdAmt Ccy={quoteattr(payment.currency)}>{_format_amount(amount)}</InstdAmt></Amt>"
+        ]
+        if payment.creditor_account.bank_code:
+            parts.append(f"<CdtrAgt><FinInstnId>{_element('BIC', payment.creditor_account.bank_code)}</FinInstnId></CdtrAgt>")
+        parts.append(f"<Cdtr>{_element('Nm', payment.creditor.name)}</Cdtr>")
+        parts.append(f"<CdtrAcct>{_account_xml(payment.creditor_account)}</CdtrAcct>")
+        if payment.purpose_code:
+            parts.append(f"<Purp>{_element('Cd', payment.purpose_code)}</Purp>")
+        if payment.remittance_info:
+            parts.append(f"<RmtInf>{_element('Ustrd', payment.remittance_info)}</RmtInf>")
+        parts.append("</CdtTrfTxInf>")
+        return ''.join(parts)
+
+    def _block_header(self, block: _Block) -> str:
+        debtor_bic = block.debtor_account.bank_code or self.debtor_agent_bic
+        return ''.join([
+            "<PmtInf>",
+            _element('PmtInfId', f"{self.message_id}-{block.number}"),
+            _element('PmtMtd', 'TRF'),
+            _element('NbOfTxs', block.count),
+            _element('CtrlSum', _format_amount(block.control_sum)),
+            f"<PmtTpInf><SvcLvl>{_element('Cd', self.service_level)}</SvcLvl></PmtTpInf>",
+            _element('ReqdExctnDt', self.execution_date),
+            f"<Dbtr>{_element('Nm', block.debtor.name)}</Dbtr>",
+            f"<DbtrAcct>{_account_xml(block.debtor_account)}{_element('Ccy', block.currency)}</DbtrAcct>",
+            f"<DbtrAgt><FinInstnId>{_element('BIC', debtor_bic)}</FinInstnId></DbtrAgt>"
+        ])
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Write the message to the output and release the spooled blocks
+
+        Returns:
+            dict: message_id, transaction count, control sum and the blocks written
+        """
+        if self.closed:
+            return self.summary()
+        self.closed = True
+
+        output = open(self.output, 'wb') if isinstance(self.output, (str, os.PathLike)) else self.output
+        try:
+            output.write((
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<Document xmlns="{PAIN_001_NAMESPACE}"><CstmrCdtTrfInitn><GrpHdr>'
+                f"{_element('MsgId', self.message_id)}"
+                f"{_element('CreDtTm', datetime.now(timezone.utc).isoformat())}"
+                f"{_element('NbOfTxs', self.count)}"
+                f"{_element('CtrlSum', _format_amount(self.control_sum))}"
+                f"<InitgPty>{_element('Nm', self.initiating_party)}</InitgPty></GrpHdr>"
+            ).encode('utf-8'))
+            for block in self.blocks:
+                output.write(self._block_header(block).encode('utf-8'))
+                block.copy_to(self._spool, output)
+                output.write(b"</PmtInf>")
+            output.write(b"</CstmrCdtTrfInitn></Document>\n")
+            output.flush()
+        finally:
+            if output is not self.output:
+                output.close()
+            self._release()
+
+        logger.info(f"Wrote pain.001 message {self.message_id}: {self.count} transactions "
+                    f"in {len(self.blocks)} payment blocks, control sum {_format_amount(self.control_sum)}")
+        return self.summary()
+
+    def abort(self) -> None:
+        """Discard the spooled payments without writing the message"""
+        self.closed = True
+        self._release()
+
+    def _release(self) -> None:
+        self._spool.close()
+        self._open_blocks.clear()
+        for block in self.blocks:
+            block.buffer = []
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'message_id': self.message_id,
+            'transaction_count': self.count,
+            'control_sum': self.control_sum,
+            'blocks': [
+                {
+                    'payment_information_id': f"{self.message_id}-{block.number}",
+                    'debtor_account': _account_id(block.debtor_account),
+                    'currency': block.currency,
+                    'transaction_count': block.count,
+                    'control_sum': block.control_sum
+                }
+                for block in self.blocks
+            ]
+        }
+
+
+def write_credit_transfer_files(payments: Iterable, directory: str,
+                                max_file_transactions: int = None,
+                                split_files_by: Tuple[str, ...] = (),
+                                prefix: str = 'pain001',
+                                message_id: str = None,
+                                **writer_options) -> List[Dict[str, Any]]:
+    """
+    Write a payment batch as one or more pain.001 files
+
+    A new file is started for each combination of split_files_by fields,
+    and whenever a file reaches max_file_transactions. Within a file,
+    payments are grouped into PmtInf blocks as configured by
+    writer_options (see Pain001StreamWriter).
+
+    Args:
+        payments: ISO20022Payment objects (any iterable, consumed once)
+        directory: Directory for the files
+        max_file_transactions: Transactions per file at most (None: no limit)
+        split_files_by: Payment fields that get separate files ('debtor_account', 'currency', 'debtor')
+        prefix: File name prefix
+        message_id: Base message ID; files get <message_id>-<n> (default: generated)
+
+    Returns:
+        list: Each file's writer summary with its 'path', in order of creation
+    """
+    unknown = [field for field in split_files_by if field not in GROUP_FIELDS]
+    if unknown:
+        raise ValueError(f"Cannot split files by {', '.join(unknown)}")
+    os.makedirs(directory, exist_ok=True)
+    base_id = message_id or f"NVC{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:8]}"
+
+    writers = []  # (path, writer) in order of creation
+    open_writers = {}  # file key -> writer taking new payments
+    try:
+        for payment in payments:
+            key = tuple(GROUP_FIELDS[field](payment) for field in split_files_by)
+            writer = open_writers.get(key)
+            if writer is not None and max_file_transactions and writer.count >= max_file_transactions:
+                writer.close()
+                writer = None
+            if writer is None:
+                number = len(writers) + 1
+                path = os.path.join(directory, f"{prefix}_{base_id}_{number:04d}.xml")
+                writer = Pain001StreamWriter(path, message_id=f"{base_id}-{number}", **writer_options)
+                writers.append((path, writer))
+                open_writers[key] = writer
+            writer.add(payment)
+    except Exception:
+        # Don't leave part of a batch behind to be submitted
+        for path, writer in writers:
+            if writer.closed:
+                if os.path.exists(path):
+                    os.remove(path)
+            else:
+                writer.abort()
+        raise
+
+    results = []
+    for path, writer in writers:
+        results.append(dict(writer.close(), path=path))
+    return results
@@ -0,0 +1,162 @@
+"""
+Keyset Pagination for NVC Banking Platform
+
+Cursor-based pagination for newest-first listings. Instead of OFFSET, each
+page continues from the (sort value, id) of the last row of the previous
+page, so with a matching index every page costs the same as the first one.
+
+Counting is optional: 'exact' runs COUNT(*), 'approximate' counts up to
+APPROXIMATE_COUNT_CAP rows and beyond that uses the PostgreSQL planner's
+row estimate, and 'none' skips the count.
+"""
+
+import json
+import base64
+import logging
+from datetime import datetime
+
+from sqlalchemy import DateTime, tuple_, func, select
+
+logger = logging.getLogger(__name__)
+
+COUNT_MODES = ('none', 'approximate', 'exact')
+APPROXIMATE_COUNT_CAP = 1000
+
+
+def encode_cursor(sort_value, row_id):
+    """Encode a (sort value, id) position as an opaque URL-safe cursor"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_column):
+    """
+    Decode a cursor created by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        if isinstance(sort_column.type, DateTime):
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, per_page=20, total=None, total_is_estimate=False):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def to_dict(self):
+        """Pagination metadata for JSON responses"""
+        return {
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+            'has_next': self.has_next,
+            'has_prev': self.has_prev,
+            'total': self.total,
+            'total_is_estimate': self.total_is_estimate
+        }
+
+
+def keyset_paginate(query, sort_column, id_column, after=None, before=None, per_page=20, count='none'):
+    """
+    Paginate a query newest first by (sort_column, id_column)
+
+    Args:
+        query: Filtered SQLAlchemy query (without ORDER BY, LIMIT or OFFSET)
+        sort_column: Column to sort by, descending (e.g. Transaction.created_at)
+        id_column: Unique tiebreaker column (e.g. Transaction.id)
+        after (str): Cursor of the last row of the previous page (next page)
+        before (str): Cursor of the first row of the following page (previous page)
+        per_page (int): Rows per page
+        count (str): 'none', 'approximate' or 'exact'
+
+    Returns:
+        KeysetPage
+
+    Raises:
+        ValueError: If a cursor or the count mode is invalid
+    """
+    if count not in COUNT_MODES:
+        raise ValueError(f"Invalid count mode: {count}")
+
+    total, total_is_estimate = None, False
+    if count == 'exact':
+        total = query.order_by(None).count()
+    elif count == 'approximate':
+        total, total_is_estimate = _approximate_count(query)
+
+    position = tuple_(sort_column, id_column)
+    if before:
+        # Walk backwards from the cursor and flip the rows back into page order
+        rows = query.filter(position > tuple_(*decode_cursor(before, sort_column))).order_by(
+            sort_column.asc(), id_column.asc()
+        ).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        if after:
+            query = query.filter(position < tuple_(*decode_cursor(after, sort_column)))
+        rows = query.order_by(sort_column.desc(), id_column.desc()).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = after is not None
+
+    sort_key, id_key = sort_column.key, id_column.key
+
+    def cursor_for(item):
+        return encode_cursor(getattr(item, sort_key), getattr(item, id_key))
+
+    return KeysetPage(
+        items,
+        next_cursor=cursor_for(items[-1]) if items and has_next else None,
+        prev_cursor=cursor_for(items[0]) if items and has_prev else None,
+        per_page=per_page,
+        total=total,
+        total_is_estimate=total_is_estimate
+    )
+
+
+def _approximate_count(query):
+    """Count up to APPROXIMATE_COUNT_CAP rows, then fall back to an estimate"""
+    query = query.order_by(None)
+    capped = query.session.execute(
+        select(func.count()).select_from(query.limit(APPROXIMATE_COUNT_CAP + 1).subquery())
+    ).scalar()
+    if capped <= APPROXIMATE_COUNT_CAP:
+        return capped, False
+
+    bind = query.session.get_bind()
+    if bind.dialect.name == 'postgresql':
+        try:
+            statement = query.statement.compile(dialect=bind.dialect, compile_kwargs={'literal_binds': True})
+            plan = query.session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}").scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return max(int(plan[0]['Plan']['Plan Rows']), capped), True
+        except Exception as e:
+            logger.debug(f"Planner row estimate unavailable: {str(e)}")
+    return capped, True
@@ -0,0 +1,130 @@
+"""
+Convert the floating-point money columns to their Money storage
+
+Every column declared with the Money type (see money.py) is converted in
+place: fiat and stablecoin columns to a BIGINT holding
+round(amount * 10^scale), numeric=True columns (amounts that may be crypto
+or exceed int64 at their scale) to an exact NUMERIC(38, scale). Columns that
+already have their storage are skipped, so the script can be re-run safely;
+NUMERIC columns converted to BIGINT by an earlier version are moved back.
+
+Every column's largest value is checked against its new range before any
+table is altered; the script stops without changes if one would overflow.
+
+Each table is rewritten under an exclusive lock; run it during a
+maintenance window on large tables.
+"""
+import sys
+from sqlalchemy import text
+from app import db, app
+
+FLOAT_TYPES = ('double precision', 'real', 'numeric')
+
+def money_columns():
+    """List (table, column, Money type) for every Money column in the models"""
+    import models  # noqa: F401 - registers the tables
+    import account_holder_models  # noqa: F401
+    from money import Money
+
+    columns = []
+    for table in db.metadata.sorted_tables:
+        for column in table.columns:
+            if isinstance(column.type, Money):
+                columns.append((table.name, column.name, column.type))
+    return columns
+
+def plan_table(table, columns):
+    """
+    Work out the conversions of one table and check their range
+
+    Returns:
+        list: (column, USING expression, target type) to apply
+
+    Raises:
+        ValueError: If a column holds a value its new storage cannot
+    """
+    from money import INT64_MAX, MONEY_PRECISION
+
+    types = {row[0]: row[1:] for row in db.session.execute(text(
+        "SELECT column_name, data_type, numeric_scale FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = :table"
+    ), {'table': table}).all()}
+
+    plan = []
+    for column, money in columns:
+        data_type, numeric_scale = types.get(column, (None, None))
+        scale = money.scale
+        if data_type is None:
+            print(f"Column {table}.{column} does not exist, skipping")
+            continue
+        if data_type == 'bigint':
+            # Minor units at the column's scale
+            major = f'("{column}"::numeric / {10 ** scale})'
+        elif data_type in FLOAT_TYPES:
+            major = f'"{column}"::numeric'
+        else:
+            print(f"Column {table}.{column} has unexpected type {data_type}, skipping")
+            continue
+
+        if money.numeric:
+            if data_type == 'numeric' and numeric_scale == scale:
+                print(f"Column {table}.{column} already stores exact amounts")
+                continue
+            target = f'NUMERIC({MONEY_PRECISION}, {scale})'
+            using = f'ROUND({major}, {scale})'
+            limit = 10 ** (MONEY_PRECISION - scale)
+        else:
+            if data_type == 'bigint':
+                print(f"Column {table}.{column} already stores minor units")
+                continue
+            target = 'BIGINT'
+            using = f'ROUND({major} * {10 ** scale})::bigint'
+            limit = INT64_MAX / 10 ** scale
+
+        largest = db.session.execute(text(f'SELECT MAX(ABS({major})) FROM "{table}"')).scalar()
+        if largest is not None and largest >= limit:
+            raise ValueError(f"{table}.{column} holds {largest}, beyond the {target} range at scale {scale} "
+                             f"(limit {limit:.6g})")
+        plan.append((column, using, target))
+    return plan
+
+def convert_table(table, plan):
+    """Apply the planned conversions of one table; returns the number converted"""
+    if plan:
+        print(f"Converting {len(plan)} money columns in {table}...")
+        db.session.execute(text(f'ALTER TABLE "{table}" ' + ', '.join(
+            f'ALTER COLUMN "{column}" TYPE {target} USING {using}' for column, using, target in plan
+        ) + ';'))
+        db.session.commit()
+    return len(plan)
+
+def migrate_money_to_minor_units():
+    """Convert all Money columns that don't have their storage yet"""
+
+    with app.app_context():
+        try:
+            if db.engine.dialect.name != 'postgresql':
+                print("In-place conversion is only supported on PostgreSQL; "
+                      "recreate other databases with db.create_all()")
+                return False
+
+            by_table = {}
+            for table, column, money in money_columns():
+                by_table.setdefault(table, []).append((column, money))
+
+            # Check every column before altering any table
+            plans = {table: plan_table(table, columns) for table, columns in by_table.items()}
+            db.session.rollback()
+
+            converted = sum(convert_table(table, plan) for table, plan in plans.items())
+            print(f"Converted {converted} money columns")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error: {str(e)}")
+            return False
+
+if __name__ == "__main__":
+    result = migrate_money_to_minor_units()
+    sys.exit(0 if result else 1)
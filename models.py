@@ -5,7 +5,9 @@ from datetime import datetime, timedelta, date
 from app import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event, select, inspect as sa_inspect
 from sqlalchemy.ext.hybrid import hybrid_property
+from money import Money, FIAT_SCALE, MONEY_SCALE, to_decimal
 
 # Import account holder models
 try:
@@ -182,6 +184,13 @@ class TransactionStatus(enum.Enum):
     REJECTED = "REJECTED"
     SCHEDULED = "SCHEDULED"  # For future-scheduled transactions
 
+class MessageChannel(enum.Enum):
+    """Messaging network a transaction travels over, stored on Transaction.message_channel"""
+    SWIFT = "SWIFT"
+    RTGS = "RTGS"
+    EDI = "EDI"
+    OTHER = "OTHER"
+
 class TransactionType(enum.Enum):
     DEPOSIT = "DEPOSIT"
     WITHDRAWAL = "WITHDRAWAL"
@@ -254,7 +263,7 @@ class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     transaction_id = db.Column(db.String(64), unique=True, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money(MONEY_SCALE, numeric=True), nullable=False)
     currency = db.Column(db.String(10), default="ETH")
     transaction_type = db.Column(db.Enum(TransactionType), nullable=False)
     status = db.Column(db.Enum(TransactionStatus), default=TransactionStatus.PENDING)
@@ -265,6 +274,7 @@ class Transaction(db.Model):
     # PHP banking system integration
     external_id = db.Column(db.String(64), index=True) # To store external transaction IDs
     tx_metadata_json = db.Column(db.Text) # To store additional JSON data
+    message_channel = db.Column(db.Enum(MessageChannel))  # Set on write by classify_message_channel
 
     # Recipient information
     recipient_name = db.Column(db.String(128))
@@ -274,13 +284,29 @@ class Transaction(db.Model):
     recipient_country = db.Column(db.String(64))
     recipient_bank = db.Column(db.String(128))  # Name of the recipient's bank (for RTGS transfers)
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = db.relationship('User', backref=db.backref('transactions', lazy=True))
     institution = db.relationship('FinancialInstitution', backref=db.backref('transactions', lazy=True))
     gateway = db.relationship('PaymentGateway', backref=db.backref('transactions', lazy=True))
 
+    # Newest-first history listings per user, optionally filtered by status or type
+    # (see add_transaction_history_indexes.py for existing databases)
+    __table_args__ = (
+        db.Index('ix_transaction_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_transaction_user_status_created', 'user_id', 'status', 'created_at', 'id'),
+        db.Index('ix_transaction_user_type_created', 'user_id', 'transaction_type', 'created_at', 'id'),
+        db.Index('ix_transaction_user_channel_created', 'user_id', 'message_channel', 'created_at', 'id'),
+        # Bank account statements: an account's entries in time order (see statement_checkpoints.py)
+        db.Index('ix_transaction_recipient_account_created', 'recipient_account', 'created_at', 'id'),
+        # Upsert key of transactions synced from the PHP platform (see transaction_sync.py
+        # and add_transaction_sync_index.py)
+        db.Index('ux_transaction_sync_external_id', 'external_id', unique=True,
+                 postgresql_where=db.text("transaction_id LIKE 'NVC-SYNC-%'"),
+                 sqlite_where=db.text("transaction_id LIKE 'NVC-SYNC-%'")),
+    )
+
     def get_recipient_details(self):
         """Extract recipient details from either dedicated fields or description"""
         if self.recipient_name:
@@ -306,6 +332,104 @@ class Transaction(db.Model):
 
         return details
 
+SWIFT_MESSAGE_TYPES = ('MT103', 'MT202', 'MT760', 'MT799')
+SWIFT_REFERENCE_PREFIXES = ('FT', 'IT', 'LC', 'FM')
+SWIFT_DESCRIPTION_HINTS = ('SWIFT', 'Letter of Credit', 'Fund Transfer', 'Financial Institution Transfer')
+
+# Transaction columns that classify_message_channel depends on
+MESSAGE_CHANNEL_FIELDS = ('transaction_type', 'description', 'tx_metadata_json', 'institution_id')
+
+def classify_message_channel(transaction_type, description=None, metadata_json=None, institution_name=None):
+    """
+    Classify which messaging network a transaction belongs to
+
+    PAYMENT transactions created through integrations carry no SWIFT type, so
+    they are recognised by their description, SWIFT metadata or a receiving bank.
+
+    Args:
+        transaction_type (TransactionType): Transaction type
+        description (str): Transaction description
+        metadata_json (str): Transaction tx_metadata_json
+        institution_name (str): Name of the transaction's financial institution
+
+    Returns:
+        MessageChannel
+    """
+    type_name = transaction_type.name if hasattr(transaction_type, 'name') else str(transaction_type or '')
+    type_name = type_name.upper()
+
+    if 'SWIFT' in type_name:
+        return MessageChannel.SWIFT
+    if type_name == 'RTGS_TRANSFER':
+        return MessageChannel.RTGS
+    if type_name.startswith('EDI_'):
+        return MessageChannel.EDI
+    if type_name != 'PAYMENT':
+        return MessageChannel.OTHER
+
+    if description and any(hint in description for hint in SWIFT_DESCRIPTION_HINTS):
+        return MessageChannel.SWIFT
+
+    if metadata_json:
+        try:
+            metadata = json.loads(metadata_json)
+        except (TypeError, ValueError):
+            metadata = None
+        if isinstance(metadata, dict):
+            if metadata.get('message_type') in SWIFT_MESSAGE_TYPES:
+                return MessageChannel.SWIFT
+            reference = metadata.get('reference')
+            if isinstance(reference, str) and reference.startswith(SWIFT_REFERENCE_PREFIXES):
+                return MessageChannel.SWIFT
+            if 'receiver_institution' in metadata or 'receiving_institution' in metadata:
+                return MessageChannel.SWIFT
+
+    # PHP integration payments to a bank are SWIFT transfers
+    if institution_name and 'bank' in institution_name.lower():
+        return MessageChannel.SWIFT
+
+    return MessageChannel.OTHER
+
+@event.listens_for(Transaction, 'before_insert')
+@event.listens_for(Transaction, 'before_update')
+def _set_message_channel(mapper, connection, target):
+    """Keep Transaction.message_channel in step with the fields it is derived from"""
+    if target.message_channel is not None:
+        state = sa_inspect(target)
+        if not any(state.attrs[field].history.has_changes() for field in MESSAGE_CHANNEL_FIELDS):
+            return
+
+    channel = classify_message_channel(target.transaction_type, target.description, target.tx_metadata_json)
+    if channel == MessageChannel.OTHER and target.transaction_type == TransactionType.PAYMENT \
+            and target.institution_id is not None:
+        institution_name = connection.execute(
+            select(FinancialInstitution.name).where(FinancialInstitution.id == target.institution_id)
+        ).scalar()
+        channel = classify_message_channel(
+            target.transaction_type, target.description, target.tx_metadata_json, institution_name
+        )
+    target.message_channel = channel
+
+class TransactionDailyRollup(db.Model):
+    """Transaction count and amount per day, user, type and status (see transaction_rollup.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    transaction_type = db.Column(db.Enum(TransactionType), nullable=False)
+    status = db.Column(db.Enum(TransactionStatus))
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(Money(MONEY_SCALE, numeric=True), nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'user_id', 'transaction_type', 'status', name='uq_transaction_rollup_bucket'),
+        db.Index('ix_transaction_rollup_user_day', 'user_id', 'day'),
+    )
+
+class TransactionRollupDay(db.Model):
+    """A day whose TransactionDailyRollup rows are complete; removed when the day's transactions change"""
+    day = db.Column(db.Date, primary_key=True)
+    built_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class FinancialInstitutionType(enum.Enum):
     BANK = "bank"
     CREDIT_UNION = "credit_union"
@@ -613,7 +737,7 @@ class StablecoinAccount(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     account_number = db.Column(db.String(64), unique=True, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    balance = db.Column(db.Float, default=0.0)
+    balance = db.Column(Money(FIAT_SCALE), default=0)
     currency = db.Column(db.String(10), default="NVCT")
     is_active = db.Column(db.Boolean, default=True)
     account_type = db.Column(db.String(20), default="INDIVIDUAL")  # INDIVIDUAL, BUSINESS, INSTITUTION, PARTNER
@@ -623,12 +747,14 @@ class StablecoinAccount(db.Model):
     user = db.relationship('User', backref=db.backref('stablecoin_accounts', lazy=True))
     
     def deposit(self, amount):
+        amount = to_decimal(amount)
         if amount <= 0:
             raise ValueError("Deposit amount must be positive")
         self.balance += amount
         self.updated_at = datetime.utcnow()
         
     def withdraw(self, amount):
+        amount = to_decimal(amount)
         if amount <= 0:
             raise ValueError("Withdrawal amount must be positive")
         if amount > self.balance:
@@ -739,8 +865,8 @@ class LedgerEntry(db.Model):
     transaction_id = db.Column(db.String(64), nullable=False, index=True)
     account_id = db.Column(db.Integer, db.ForeignKey('stablecoin_account.id'), nullable=False)
     entry_type = db.Column(db.String(10), nullable=False)  # DEBIT or CREDIT
-    amount = db.Column(db.Float, nullable=False)
-    balance_after = db.Column(db.Float)  # Running balance after this entry
+    amount = db.Column(Money(FIAT_SCALE), nullable=False)
+    balance_after = db.Column(Money(FIAT_SCALE))  # Running balance after this entry
     description = db.Column(db.String(256))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -751,9 +877,9 @@ class SettlementBatch(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     batch_id = db.Column(db.String(64), unique=True, nullable=False)
     correspondent_bank_id = db.Column(db.Integer, db.ForeignKey('correspondent_bank.id'), nullable=False)
-    total_amount = db.Column(db.Float, nullable=False)
-    fee_amount = db.Column(db.Float, nullable=False)
-    net_amount = db.Column(db.Float, nullable=False)
+    total_amount = db.Column(Money(FIAT_SCALE), nullable=False)
+    fee_amount = db.Column(Money(FIAT_SCALE), nullable=False)
+    net_amount = db.Column(Money(FIAT_SCALE), nullable=False)
     currency = db.Column(db.String(10), default="USD")
     status = db.Column(db.Enum(TransactionStatus), default=TransactionStatus.PENDING)
     settlement_method = db.Column(db.String(20))  # ACH, SWIFT, WIRE
@@ -1229,11 +1355,11 @@ class TreasuryAccount(db.Model):
     institution_id = db.Column(db.Integer, db.ForeignKey('financial_institution.id'))
     account_number = db.Column(db.String(64))
     currency = db.Column(db.String(10), default="USD")
-    current_balance = db.Column(db.Float, default=0.0)
-    target_balance = db.Column(db.Float)
-    minimum_balance = db.Column(db.Float, default=0.0)
-    maximum_balance = db.Column(db.Float)
-    available_balance = db.Column(db.Float, default=0.0)
+    current_balance = db.Column(Money(FIAT_SCALE), default=0)
+    target_balance = db.Column(Money(FIAT_SCALE))
+    minimum_balance = db.Column(Money(FIAT_SCALE), default=0)
+    maximum_balance = db.Column(Money(FIAT_SCALE))
+    available_balance = db.Column(Money(FIAT_SCALE), default=0)
     organization_id = db.Column(db.Integer)  # For multi-organization support
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1245,6 +1371,7 @@ class TreasuryAccount(db.Model):
 
     def update_balance(self, amount, transaction_type=None):
         """Update account balance based on transaction type"""
+        amount = to_decimal(amount)
         if transaction_type in [TransactionType.DEPOSIT, TransactionType.TREASURY_TRANSFER]:
             self.current_balance += amount
             self.available_balance += amount
@@ -1355,7 +1482,7 @@ class TreasuryTransaction(db.Model):
     from_account_id = db.Column(db.Integer, db.ForeignKey('treasury_account.id'))
     to_account_id = db.Column(db.Integer, db.ForeignKey('treasury_account.id'))
     transaction_type = db.Column(db.Enum(TreasuryTransactionType), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money(FIAT_SCALE), nullable=False)
     currency = db.Column(db.String(10), default="USD")
     exchange_rate = db.Column(db.Float, default=1.0)
     status = db.Column(db.Enum(TransactionStatus), default=TransactionStatus.PENDING)
@@ -1363,7 +1490,7 @@ class TreasuryTransaction(db.Model):
     description = db.Column(db.String(256))
     approval_user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     approval_date = db.Column(db.DateTime)
-    transaction_fees = db.Column(db.Float, default=0.0)
+    transaction_fees = db.Column(Money(FIAT_SCALE), default=0)
     reference_number = db.Column(db.String(64))
     memo = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1382,7 +1509,7 @@ class TreasuryTransaction(db.Model):
 
     def get_exchange_amount(self):
         """Calculate amount with exchange rate applied"""
-        return self.amount * self.exchange_rate
+        return self.amount * to_decimal(self.exchange_rate)
 
     def process_transaction(self):
         """Process the transaction and update account balances"""
@@ -1393,7 +1520,7 @@ class TreasuryTransaction(db.Model):
             self.from_account.update_balance(-self.amount, TransactionType.WITHDRAWAL)
 
         if self.to_account:
-            self.to_account.update_balance(self.amount * self.exchange_rate, TransactionType.DEPOSIT)
+            self.to_account.update_balance(self.get_exchange_amount(), TransactionType.DEPOSIT)
 
         self.execution_date = datetime.utcnow()
         self.status = TransactionStatus.COMPLETED
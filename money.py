@@ -0,0 +1,269 @@
+"""
+Money Representation for NVC Banking Platform
+
+Monetary columns are stored as exact integers of minor units (BIGINT) or
+exact NUMERIC major units instead of floating point, and are read back as
+Decimal, so balances, ledger postings and SQL aggregates never pass through
+binary floating point.
+
+- currency_exponents() gives the number of minor-unit digits of every
+  CurrencyType (ISO 4217 for fiat, micro-units for crypto assets).
+- A Money column has a fixed scale: the largest exponent of the currencies
+  it can hold (FIAT_SCALE for fiat and stablecoin columns, MONEY_SCALE for
+  columns that may also hold crypto assets). The ORM reads and writes
+  major units: any int, float, str or Decimal is accepted on write and a
+  Decimal at the column's scale is returned on read, so arithmetic on it
+  must use Decimal operands (see to_decimal).
+- Fiat and stablecoin columns store BIGINT minor units. Columns at
+  MONEY_SCALE are declared numeric=True and store exact NUMERIC major units:
+  six digits of int64 would cap them at about 9.2 trillion, and token and
+  institutional balances reach that.
+- minor_units() exposes the raw integers of a Money column or aggregate in
+  SQL, and to_minor_array() converts amounts to NumPy int64 arrays for
+  vectorised balance math.
+"""
+
+import logging
+from decimal import Decimal, ROUND_HALF_EVEN
+from functools import lru_cache
+
+import numpy as np
+from sqlalchemy import BigInteger, Numeric, type_coerce, literal
+from sqlalchemy.sql import operators
+from sqlalchemy.types import TypeDecorator
+
+logger = logging.getLogger(__name__)
+
+# Minor-unit digits for currencies that don't use two (ISO 4217)
+ISO_EXPONENTS = {
+    # Zero-decimal currencies
+    'JPY': 0, 'KRW': 0, 'VND': 0, 'CLP': 0, 'PYG': 0, 'XOF': 0, 'XAF': 0,
+    'GNF': 0, 'RWF': 0, 'BIF': 0, 'DJF': 0, 'UGX': 0,
+    # Three-decimal currencies
+    'BHD': 3, 'KWD': 3, 'OMR': 3, 'JOD': 3, 'IQD': 3, 'LYD': 3, 'TND': 3,
+}
+
+# Crypto assets are kept in micro-units: native precision (satoshi, wei)
+# would not leave int64 room for institution-sized balances
+CRYPTO_CURRENCIES = {
+    'BTC', 'ETH', 'USDT', 'BNB', 'SOL', 'XRP', 'USDC', 'ADA', 'AVAX', 'DOGE',
+    'DOT', 'MATIC', 'LTC', 'SHIB', 'DAI', 'TRX', 'UNI', 'LINK', 'ATOM', 'XMR',
+    'ETC', 'FIL', 'XLM', 'NEAR', 'ALGO', 'ZCASH', 'APE', 'ICP', 'FLOW', 'VET',
+}
+CRYPTO_EXPONENT = 6
+DEFAULT_EXPONENT = 2
+
+# Column scales: ±9.2 quadrillion units at FIAT_SCALE in BIGINT; MONEY_SCALE
+# columns are NUMERIC(MONEY_PRECISION, MONEY_SCALE)
+FIAT_SCALE = 3
+MONEY_SCALE = 6
+MONEY_PRECISION = 38
+
+INT64_MAX = 2 ** 63 - 1
+
+SCALING_OPERATORS = (operators.mul, operators.truediv)
+
+
+@lru_cache(maxsize=1)
+def currency_exponents():
+    """
+    Build the minor-unit exponent table for every CurrencyType
+
+    Returns:
+        dict: Currency code -> number of minor-unit digits
+    """
+    # Imported here: account_holder_models imports models, which uses Money
+    from account_holder_models import CurrencyType
+
+    return {currency.value: currency_exponent(currency.value) for currency in CurrencyType}
+
+
+def currency_exponent(currency):
+    """
+    Get the number of minor-unit digits of a currency
+
+    Args:
+        currency: Currency code or CurrencyType
+
+    Returns:
+        int: Exponent (DEFAULT_EXPONENT for unknown currencies)
+    """
+    code = getattr(currency, 'value', currency)
+    if not code:
+        return DEFAULT_EXPONENT
+    # Decided from the code alone, so callers outside the app (e.g. message
+    # writers) don't import the models
+    code = str(code).upper()
+    if code in CRYPTO_CURRENCIES:
+        return CRYPTO_EXPONENT
+    return ISO_EXPONENTS.get(code, DEFAULT_EXPONENT)
+
+
+def quantize_amount(amount, currency):
+    """Round an amount to the minor unit of its currency"""
+    return to_decimal(amount).quantize(Decimal(1).scaleb(-currency_exponent(currency)), rounding=ROUND_HALF_EVEN)
+
+
+def to_decimal(amount):
+    """Convert an int, float, str or Decimal amount to Decimal without binary float noise"""
+    if isinstance(amount, Decimal):
+        return amount
+    if isinstance(amount, float):
+        return Decimal(repr(amount))
+    return Decimal(amount)
+
+
+def to_minor_units(amount, scale):
+    """
+    Convert a major-unit amount to integer minor units
+
+    Args:
+        amount: Amount in major units (int, float, str or Decimal)
+        scale (int): Minor-unit digits
+
+    Returns:
+        int
+
+    Raises:
+        ValueError: If the amount is not a finite number or does not fit in int64
+    """
+    minor = exact_minor_units(amount, scale)
+    if not -INT64_MAX <= minor <= INT64_MAX:
+        raise ValueError(f"Money amount {amount} out of range at scale {scale}")
+    return minor
+
+
+def exact_minor_units(amount, scale):
+    """Convert a major-unit amount to integer minor units without an int64 bound (NUMERIC columns)"""
+    value = to_decimal(amount)
+    if not value.is_finite():
+        raise ValueError(f"Invalid money amount: {amount}")
+    return int(value.scaleb(scale).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_minor_units(minor, scale):
+    """Convert integer minor units to a Decimal amount in major units"""
+    return to_decimal(minor).scaleb(-scale)
+
+
+def to_minor_array(amounts, scale):
+    """
+    Convert major-unit amounts to a NumPy array of minor units
+
+    Args:
+        amounts: Iterable of amounts in major units
+        scale (int): Minor-unit digits
+
+    Returns:
+        numpy.ndarray (see minor_array)
+    """
+    return minor_array([exact_minor_units(amount or 0, scale) for amount in amounts])
+
+
+def minor_array(values):
+    """
+    Build a NumPy array of integer minor units
+
+    Args:
+        values (list): Python ints
+
+    Returns:
+        numpy.ndarray of int64, or of exact Python ints (dtype object) if a
+        value or their total does not fit in int64
+    """
+    if sum(abs(value) for value in values) <= INT64_MAX:
+        return np.array(values, dtype=np.int64)
+    return np.array(values, dtype=object)
+
+
+class MinorUnits(TypeDecorator):
+    """Integer minor units read from a NUMERIC expression"""
+
+    impl = Numeric
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else int(value)
+
+
+def minor_units(expression):
+    """
+    Read a Money column or aggregate as raw integer minor units
+
+    Args:
+        expression: SQL expression typed Money (e.g. func.sum(Transaction.amount))
+    """
+    money = expression.type
+    if isinstance(money, Money) and money.numeric:
+        major = type_coerce(expression, Numeric(MONEY_PRECISION, money.scale))
+        return type_coerce(major * literal(10 ** money.scale, Numeric(MONEY_PRECISION, 0)), MinorUnits())
+    return type_coerce(expression, BigInteger)
+
+
+class Money(TypeDecorator):
+    """
+    Monetary amount stored as int64 minor units, or as exact NUMERIC major
+    units with numeric=True
+
+    Python values are major-unit numbers: any int, float, str or Decimal is
+    accepted on write and a Decimal is returned on read, so amounts keep
+    every minor-unit digit through read-modify-write cycles.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def __init__(self, scale=MONEY_SCALE, numeric=False):
+        super().__init__()
+        self.scale = scale
+        self.numeric = numeric
+        if numeric:
+            self.impl = Numeric(MONEY_PRECISION, scale)
+
+    @property
+    def python_type(self):
+        return Decimal
+
+    def to_storage(self, amount):
+        """
+        Convert a major-unit amount to the value stored in the column
+
+        Raw SQL writers must store this instead of the amount itself.
+
+        Raises:
+            ValueError: If the amount is not a finite number or is out of range
+        """
+        if not self.numeric:
+            return to_minor_units(amount, self.scale)
+        minor = exact_minor_units(amount, self.scale)
+        if abs(minor) >= 10 ** MONEY_PRECISION:
+            raise ValueError(f"Money amount {amount} out of range at scale {self.scale}")
+        return from_minor_units(minor, self.scale)
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return self.to_storage(value)
+
+    def process_literal_param(self, value, dialect):
+        return str(self.process_bind_param(value, dialect))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if self.numeric:
+            return to_decimal(value)
+        return from_minor_units(value, self.scale)
+
+    def coerce_compared_value(self, op, value):
+        # Factors and divisors are plain numbers, not amounts
+        if op in SCALING_OPERATORS:
+            return Numeric()
+        return self
+
+    class comparator_factory(TypeDecorator.Comparator):
+        def _adapt_expression(self, op, other_comparator):
+            # An amount scaled by a plain number is still an amount
+            if op in SCALING_OPERATORS and not isinstance(other_comparator.type, Money):
+                return op, self.type
+            return super()._adapt_expression(op, other_comparator)
@@ -0,0 +1,164 @@
+"""
+PDF Artifact Cache for NVC Banking Platform
+
+Documentation PDFs and receipts of finished transactions don't change
+between requests, so each rendered PDF is kept in a content-addressed
+artifact store (caching.get_artifact_cache) and repeat downloads are a
+file send:
+
+- The key is a SHA-256 digest of the document kind, its template, its
+  inputs and the code version (the source of the rendering modules plus
+  PDF_CACHE_VERSION), so editing a template or renderer produces new keys
+  instead of serving stale documents.
+- The key doubles as a strong ETag, and responses honour If-None-Match and
+  Range requests.
+- The store is capped at PDF_CACHE_MAX_BYTES (default 1 GiB) and evicts
+  the least recently downloaded PDFs first.
+
+Warm the cache at deploy time with:
+    python pdf_cache.py [--receipts-days N]
+"""
+
+import os
+import sys
+import hashlib
+import logging
+import argparse
+from functools import lru_cache
+
+from flask import send_file
+
+from caching import get_artifact_cache, artifact_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Browser caching for documents anyone can download; receipts are per user
+PUBLIC_MAX_AGE = 3600
+
+
+def pdf_cache():
+    """Get the PDF artifact store"""
+    return get_artifact_cache(
+        'pdf', max_bytes=int(os.environ.get('PDF_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)), extension='.pdf'
+    )
+
+
+@lru_cache(maxsize=None)
+def code_version(*modules):
+    """
+    Fingerprint the code that renders a document
+
+    Args:
+        *modules (str): Names of the modules whose source determines the output
+
+    Returns:
+        str: Hex digest of the modules' source and PDF_CACHE_VERSION
+    """
+    digest = hashlib.sha256(os.environ.get('PDF_CACHE_VERSION', '').encode('utf-8'))
+    for name in modules:
+        module = sys.modules.get(name)
+        path = getattr(module, '__file__', None)
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        else:
+            digest.update(name.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def pdf_key(kind, template, inputs, modules):
+    """
+    Build the cache key of a PDF
+
+    Args:
+        kind (str): Document kind, e.g. 'documentation' or 'receipt'
+        template (str): Template the PDF is rendered from (its content or name)
+        inputs: JSON-serialisable inputs of the render
+        modules (tuple): Modules whose source determines the output
+
+    Returns:
+        str: Hex SHA-256 key
+    """
+    return artifact_key(kind, template, inputs, code_version(*modules))
+
+
+def cached_pdf(key, render):
+    """
+    Get the path of a cached PDF, rendering and storing it on a miss
+
+    Args:
+        key (str): Key from pdf_key
+        render (callable): Returns the PDF as bytes
+
+    Returns:
+        str: Path of the PDF file
+    """
+    return pdf_cache().get_or_create(key, render)
+
+
+def send_pdf(path, key, download_name, private=False):
+    """
+    Send a cached PDF with a strong ETag and Range support
+
+    Args:
+        path (str): Path from cached_pdf
+        key (str): The PDF's cache key (used as the ETag)
+        download_name (str): File name offered to the browser
+        private (bool): The document belongs to one user
+
+    Returns:
+        Flask response (200, 206 or 304)
+    """
+    response = send_file(
+        path,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=download_name,
+        conditional=True,
+        etag=key,
+        max_age=0 if private else PUBLIC_MAX_AGE
+    )
+    if private:
+        response.cache_control.private = True
+        response.cache_control.must_revalidate = True
+    else:
+        response.cache_control.public = True
+    return response
+
+
+def warm(receipts_days=None):
+    """
+    Render every documentation PDF (and, optionally, recent receipts) into the cache
+
+    Must run inside an app context.
+
+    Args:
+        receipts_days (int): Also warm receipts of transactions finished in this many days
+
+    Returns:
+        dict: Number of PDFs warmed per kind
+    """
+    from routes.documentation_routes import warm_documentation_pdfs
+
+    warmed = {'documentation': warm_documentation_pdfs()}
+    if receipts_days:
+        from routes.pdf_receipt_routes import warm_receipt_pdfs
+        warmed['receipt'] = warm_receipt_pdfs(receipts_days)
+    return warmed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the PDF artifact cache")
+    parser.add_argument('--receipts-days', type=int, default=None,
+                        help="Also warm receipts of transactions finished in the last N days")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from app import app
+    with app.app_context():
+        result = warm(args.receipts_days)
+    print(f"Warmed PDF cache: {result}")
+    print(f"PDF cache: {pdf_cache().get_stats()}")
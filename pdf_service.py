@@ -7,7 +7,6 @@ transaction types, receipts, and financial documents.
 import io
 import os
 import logging
-import tempfile
 from datetime import datetime, timedelta
 
 from flask import render_template_string, render_template
@@ -15,6 +14,9 @@ from sqlalchemy import desc, asc
 
 from account_holder_models import AccountHolder, BankAccount, Address, CurrencyExchangeTransaction
 from models import Transaction
+from browser_pool import render_pdf
+from money import from_minor_units
+from statement_checkpoints import balance_at, running_balances, SCALE as CHECKPOINT_SCALE
 
 logger = logging.getLogger(__name__)
 
@@ -419,77 +421,19 @@ class PDFService:
             if not start_date:
                 start_date = end_date - timedelta(days=30)
                 
-            # Format dates for display
-            start_date_display = start_date.strftime('%B %d, %Y')
-            end_date_display = end_date.strftime('%B %d, %Y')
-            
-            # Get transactions for this account in the date range (placeholder for actual transactions)
-            # This should be replaced with actual transaction data from your database
+            # Get the account's entries in the date range (ix_transaction_recipient_account_created)
             transactions = Transaction.query.filter(
                 Transaction.recipient_account == account.account_number,
-                Transaction.created_at.between(start_date, end_date)
-            ).order_by(asc(Transaction.created_at)).all()
-            
-            # Prepare transaction data for template
-            transaction_data = []
-            running_balance = account.balance  # Start with current balance
-            
-            # Calculate backward to get the opening balance
-            total_transaction_amount = sum(t.amount for t in transactions if t.amount)
-            opening_balance = account.balance - total_transaction_amount
-            
-            # Prepare transactions for display in reverse order (most recent last)
-            for transaction in reversed(transactions):
-                # Adjust running balance for each transaction
-                if hasattr(transaction, 'amount') and transaction.amount:
-                    running_balance -= transaction.amount
-                
-                # Format date
-                if hasattr(transaction, 'created_at') and transaction.created_at:
-                    date_display = transaction.created_at.strftime('%Y-%m-%d %H:%M')
-                else:
-                    date_display = "N/A"
-                
-                # Add transaction info
-                transaction_data.append({
-                    'date': date_display,
-                    'description': transaction.description if hasattr(transaction, 'description') else "Transaction",
-                    'reference': transaction.transaction_id if hasattr(transaction, 'transaction_id') else "",
-                    'amount': transaction.amount if hasattr(transaction, 'amount') else 0.0,
-                    'balance': running_balance
-                })
-            
-            # Reverse back to chronological order
-            transaction_data.reverse()
-            
-            # Calculate summary totals
-            total_credits = sum(t.amount for t in transactions if hasattr(t, 'amount') and t.amount > 0)
-            total_debits = sum(abs(t.amount) for t in transactions if hasattr(t, 'amount') and t.amount < 0)
-            net_change = total_credits - total_debits
-            
-            # Get primary address if available
-            primary_address = account_holder.primary_address
-            address_display = primary_address.formatted if primary_address else ""
-            has_address = bool(primary_address)
-            
-            # Prepare template variables
-            template_vars = {
-                'title': f"Account Statement",
-                'subtitle': f"For the period {start_date_display} to {end_date_display}",
-                'header': "NVC Fund Bank - Account Statement",
-                'account_holder': account_holder,
-                'account': account,
-                'transactions': transaction_data,
-                'start_date': start_date_display,
-                'end_date': end_date_display,
-                'opening_balance': opening_balance,
-                'primary_address': address_display,
-                'has_address': has_address,
-                'total_credits': total_credits,
-                'total_debits': total_debits,
-                'net_change': net_change,
-                'generation_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
+                Transaction.created_at >= start_date,
+                Transaction.created_at <= end_date
+            ).order_by(asc(Transaction.created_at), asc(Transaction.id)).all()
+            
+            # Opening balance from the nearest balance checkpoint, so it is
+            # correct for any period and does not depend on the history length
+            template_vars = PDFService.account_statement_context(
+                account, account_holder, transactions, balance_at(account, start_date),
+                start_date, end_date, account_holder.primary_address
+            )
             
             # Render the template
             html_content = render_template('account_holders/account_statement_template.html', **template_vars)
@@ -515,75 +459,80 @@ class PDFService:
             except Exception as e:
                 logger.error(f"Error generating PDF with WeasyPrint: {str(e)}")
                 
-                # Try with pyppeteer as fallback
+                # Fall back to the shared headless browser pool
                 try:
-                    import asyncio
-                    from pyppeteer import launch
-                    
-                    # Write HTML to a temporary file
-                    with tempfile.NamedTemporaryFile(suffix='.html', delete=False) as temp_html:
-                        temp_html_path = temp_html.name
-                        temp_html.write(html_content.encode())
-                    
-                    # Generate PDF with pyppeteer
-                    async def generate_pdf_with_pyppeteer():
-                        browser = await launch(
-                            options={
-                                'headless': True, 
-                                'args': [
-                                    '--no-sandbox',
-                                    '--disable-setuid-sandbox',
-                                    '--disable-dev-shm-usage',
-                                    '--disable-gpu'
-                                ]
-                            }
-                        )
-                        
-                        try:
-                            page = await browser.newPage()
-                            
-                            # Set viewport size to ensure content fits well
-                            await page.setViewport({'width': 1200, 'height': 1600})
-                            
-                            # Navigate to the HTML file
-                            await page.goto(f'file://{temp_html_path}', {'waitUntil': 'networkidle0'})
-                            
-                            # Wait a moment for any JS to execute
-                            await asyncio.sleep(1)
-                            
-                            # Generate PDF
-                            pdf_bytes = await page.pdf({
-                                'format': 'Letter',
-                                'margin': {
-                                    'top': '0.5in',
-                                    'right': '0.5in',
-                                    'bottom': '0.5in',
-                                    'left': '0.5in'
-                                },
-                                'printBackground': True
-                            })
-                            
-                            return pdf_bytes
-                        finally:
-                            await browser.close()
-                            # Clean up the temporary HTML file
-                            try:
-                                os.unlink(temp_html_path)
-                            except:
-                                pass
-                    
-                    # Run the async function
-                    pdf_content = asyncio.get_event_loop().run_until_complete(generate_pdf_with_pyppeteer())
-                    return pdf_content
+                    return render_pdf(html_content)
                     
                 except Exception as e2:
-                    logger.error(f"Error generating PDF with pyppeteer: {str(e2)}")
+                    logger.error(f"Error generating PDF with headless browser: {str(e2)}")
                     return None
             
         except Exception as e:
             logger.error(f"Error generating account statement PDF: {str(e)}")
             return None
     
+    @staticmethod
+    def account_statement_context(account, account_holder, transactions, opening_minor, start_date, end_date,
+                                  primary_address=None):
+        """
+        Build the template variables of an account statement
+        
+        Args:
+            account: BankAccount
+            account_holder: AccountHolder
+            transactions (list): The account's entries in the period, in time order
+            opening_minor (int): Balance at start_date in minor units (see statement_checkpoints.balance_at)
+            start_date (datetime): Start of the period
+            end_date (datetime): End of the period
+            primary_address: Address of the account holder, if any
+            
+        Returns:
+            dict: Variables for account_holders/account_statement_template.html
+        """
+        # Format dates for display
+        start_date_display = start_date.strftime('%B %d, %Y')
+        end_date_display = end_date.strftime('%B %d, %Y')
+        
+        amounts = [t.amount or 0.0 for t in transactions]
+        balances = running_balances(opening_minor, amounts)
+        opening_balance = float(from_minor_units(opening_minor, CHECKPOINT_SCALE))
+        closing_balance = float(from_minor_units(int(balances[-1]), CHECKPOINT_SCALE)) if transactions else opening_balance
+        
+        # Prepare transaction data for template (chronological order)
+        transaction_data = []
+        for transaction, amount, balance in zip(transactions, amounts, balances):
+            transaction_data.append({
+                'date': transaction.created_at.strftime('%Y-%m-%d %H:%M') if transaction.created_at else "N/A",
+                'description': transaction.description or "Transaction",
+                'reference': transaction.transaction_id or "",
+                'amount': amount,
+                'balance': float(from_minor_units(int(balance), CHECKPOINT_SCALE))
+            })
+        
+        # Calculate summary totals
+        total_credits = sum(amount for amount in amounts if amount > 0)
+        total_debits = sum(abs(amount) for amount in amounts if amount < 0)
+        net_change = total_credits - total_debits
+        
+        return {
+            'title': f"Account Statement",
+            'subtitle': f"For the period {start_date_display} to {end_date_display}",
+            'header': "NVC Fund Bank - Account Statement",
+            'account_holder': account_holder,
+            'account': account,
+            'transactions': transaction_data,
+            'start_date': start_date_display,
+            'end_date': end_date_display,
+            'opening_balance': opening_balance,
+            'closing_balance': closing_balance,
+            'primary_address': primary_address.formatted if primary_address else "",
+            'has_address': bool(primary_address),
+            'total_credits': total_credits,
+            'total_debits': total_debits,
+            'net_change': net_change,
+            'generation_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+    
     @staticmethod
     def render_transaction_html(transaction, transaction_type="Transaction", metadata=None):
         """
@@ -779,6 +728,14 @@ class PDFService:
             except Exception as e:
                 logger.warning(f"WeasyPrint error: {str(e)}, trying alternative method...")
             
+            # Try the shared headless browser pool
+            try:
+                return render_pdf(html_content)
+            except ImportError:
+                logger.warning("pyppeteer not available, trying alternative method...")
+            except Exception as e:
+                logger.warning(f"Headless browser error: {str(e)}, trying alternative method...")
+            
             # Try using pdfkit as a fallback
             try:
                 import pdfkit
@@ -1248,6 +1205,14 @@ class PDFService:
         except Exception as e:
             logger.warning(f"WeasyPrint error: {str(e)}, trying alternative method...")
         
+        # Try the shared headless browser pool
+        try:
+            return render_pdf(html_content)
+        except ImportError:
+            logger.warning("pyppeteer not available, trying alternative method...")
+        except Exception as e:
+            logger.warning(f"Headless browser error: {str(e)}, trying alternative method...")
+        
         # Try using pdfkit as a fallback
         try:
             import pdfkit
@@ -1323,9 +1288,6 @@ class PDFService:
         try:
             from flask import render_template, current_app, request
             import os
-            import tempfile
-            import asyncio
-            import io
             
             # Ensure asset_count is properly calculated
             asset_count = data.get('asset_count', len(data.get('assets', [])))
@@ -1365,70 +1327,18 @@ class PDFService:
                 logo_url=logo_url
             )
             
-            # Save HTML to a temporary file
-            with tempfile.NamedTemporaryFile(suffix='.html', delete=False, mode='w', encoding='utf-8') as f:
-                f.write(html_content)
-                temp_html_path = f.name
-            
-            logger.info(f"Generating PDF using pyppeteer from {temp_html_path}")
+            logger.info("Generating holding report PDF with the headless browser pool")
             
             try:
-                # Use pyppeteer for reliable PDF generation
-                from pyppeteer import launch
-                
-                async def generate_pdf_with_pyppeteer():
-                    browser = await launch(
-                        options={
-                            'headless': True, 
-                            'args': [
-                                '--no-sandbox',
-                                '--disable-setuid-sandbox',
-                                '--disable-dev-shm-usage',
-                                '--disable-gpu'
-                            ]
-                        }
-                    )
-                    
-                    try:
-                        page = await browser.newPage()
-                        
-                        # Set viewport size to ensure content fits well
-                        await page.setViewport({'width': 1200, 'height': 1600})
-                        
-                        # Navigate to the HTML file
-                        await page.goto(f'file://{temp_html_path}', {'waitUntil': 'networkidle0'})
-                        
-                        # Wait a moment for any JS to execute
-                        await asyncio.sleep(1)
-                        
-                        # Generate PDF
-                        pdf_bytes = await page.pdf({
-                            'format': 'Letter',
-                            'margin': {
-                                'top': '0.5in',
-                                'right': '0.5in',
-                                'bottom': '0.5in',
-                                'left': '0.5in'
-                            },
-                            'printBackground': True
-                        })
-                        
-                        return pdf_bytes
-                    finally:
-                        await browser.close()
-                
-                # Run the async function to generate PDF
-                logger.info("Starting pyppeteer PDF generation...")
-                pdf_content = asyncio.get_event_loop().run_until_complete(generate_pdf_with_pyppeteer())
+                # Chromium renders this report's layout most faithfully; the logo is embedded,
+                # so the document needs no file on disk
+                pdf_content = render_pdf(html_content)
                 logger.info(f"PDF generation successful, generated {len(pdf_content)} bytes")
                 
-                # Clean up the temporary file
-                os.unlink(temp_html_path)
-                
                 return pdf_content
                 
             except Exception as e:
-                logger.error(f"Error generating PDF with pyppeteer: {str(e)}")
+                logger.error(f"Error generating PDF with headless browser: {str(e)}")
                 
                 # Try WeasyPrint as fallback
                 try:
@@ -1471,9 +1381,6 @@ class PDFService:
                     pdf_content = pdf_buffer.getvalue()
                     pdf_buffer.close()
                     
-                    # Clean up the temporary file
-                    os.unlink(temp_html_path)
-                    
                     return pdf_content
                     
                 except Exception as weasy_error:
@@ -1505,9 +1412,6 @@ class PDFService:
                     </html>
                     """.encode('utf-8')
                     
-                    # Clean up the temporary file
-                    os.unlink(temp_html_path)
-                    
                     return error_html
             
         except Exception as e:
@@ -1528,19 +1432,15 @@ class PDFService:
             bool: True if successful, False otherwise
         """
         try:
-            # Create a temporary HTML file
-            with tempfile.NamedTemporaryFile(suffix='.html', delete=False) as temp_html:
-                temp_html_path = temp_html.name
-                temp_html.write(html_content.encode('utf-8'))
+            try:
+                import weasyprint
+                pdf_data = weasyprint.HTML(string=html_content).write_pdf()
+            except Exception as e:
+                logger.warning(f"WeasyPrint error: {str(e)}, trying headless browser...")
+                pdf_data = render_pdf(html_content)
             
-            # Use a simple approach - just copy the HTML content to the PDF file
-            # with a PDF header to identify it as a PDF
-            with open(pdf_path, 'w') as pdf_file:
-                pdf_file.write('%PDF-1.5\n')
-                pdf_file.write(html_content)
-                
-            # Clean up the temporary file
-            os.unlink(temp_html_path)
+            with open(pdf_path, 'wb') as pdf_file:
+                pdf_file.write(pdf_data)
             
             return True
         except Exception as e:
@@ -39,7 +39,7 @@ def disable_blockchain_connection():
                 'network_id': '11155111',  # Sepolia testnet
                 'timestamp': blockchain.time.time()
             }
-            blockchain.cache_utils.cache_data('web3_connection_status', cache_result)
+            blockchain.cache_utils.cache_data(cache_result, 'web3_connection_status')
             return True
             
         # Replace the initialization function
@@ -0,0 +1,529 @@
+"""
+Raft Log Storage for NVC Banking Platform
+
+The replicated log of a ClusterNode, kept on disk as append-only segments.
+
+- A segment file holds consecutive entries. Each record is a header
+  (payload length, CRC-32, term) followed by the entry as JSON. Segment
+  files are named after their first index. A new segment is started once
+  the current one passes segment_bytes.
+- An in-memory index keeps the term and file offset of every entry. Term
+  lookups need no I/O and any entry is one seek away. The most recent
+  entries are also kept decoded for replication.
+- append() only writes to the OS buffer. sync() makes everything appended
+  so far durable with one fsync, so callers batch entries per fsync.
+- A snapshot of the state machine covers every entry up to its index.
+  compact() deletes the segments wholly behind it, so opening the log
+  reads the snapshot plus the segments written since.
+
+When the log is opened, a torn or corrupt record ends the log; it and
+everything after it are discarded.
+"""
+
+import os
+import json
+import zlib
+import bisect
+import struct
+import logging
+import collections
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Payload length, CRC-32 of the payload, entry term
+RECORD_HEADER = struct.Struct('>IIQ')
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+SNAPSHOT_FILE = 'snapshot.json'
+
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+DEFAULT_CACHE_ENTRIES = 16384
+
+
+class LogCorruptionError(Exception):
+    """A record failed its checksum or could not be read"""
+
+
+def _fsync_directory(directory: str) -> None:
+    """Make file creations, renames and deletions in a directory durable"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _Segment:
+    """One segment file and the offsets of its records"""
+
+    def __init__(self, path: str, first_index: int):
+        self.path = path
+        self.first_index = first_index
+        self.offsets = array('Q')
+        self.size = 0
+        self._reader = None
+
+    @property
+    def last_index(self) -> int:
+        return self.first_index + len(self.offsets) - 1
+
+    def read(self, index: int) -> Dict[str, Any]:
+        if self._reader is None:
+            self._reader = open(self.path, 'rb')
+        self._reader.seek(self.offsets[index - self.first_index])
+        length, checksum, _ = RECORD_HEADER.unpack(self._reader.read(RECORD_HEADER.size))
+        payload = self._reader.read(length)
+        if len(payload) != length or zlib.crc32(payload) != checksum:
+            raise LogCorruptionError(f"Entry {index} in {self.path} is damaged")
+        return json.loads(payload)
+
+    def close(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+
+class RaftLog:
+    """
+    Segmented append-only Raft log with snapshots
+
+    Indices start at 1. Entries from first_index to last_index are stored.
+    Entries up to snapshot_index are covered by the snapshot, so first_index
+    is at most snapshot_index + 1.
+
+    Not thread-safe; the owning node uses it from its event loop thread,
+    except for write_snapshot, which only touches the snapshot file.
+
+    Args:
+        directory (str): Directory of the segment and snapshot files
+        segment_bytes (int): Size after which a new segment is started
+        cache_entries (int): Number of recent entries kept decoded in memory
+        fsync (bool): fsync on sync(); disable only for throwaway clusters
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                 cache_entries: int = DEFAULT_CACHE_ENTRIES, fsync: bool = True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.cache_entries = cache_entries
+        self.fsync = fsync
+
+        self.snapshot_index = 0
+        self.snapshot_term = 0
+        self.durable_index = 0
+        self._first_index = 1
+        self._terms = array('Q')  # Terms of entries first_index..last_index
+        self._segments: List[_Segment] = []
+        self._segment_starts: List[int] = []
+        self._cache = collections.deque()  # Decoded entries ending at last_index
+        self._writer = None
+        self._snapshot = None
+        self._stats = {'appended': 0, 'syncs': 0, 'disk_reads': 0, 'truncations': 0, 'compactions': 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+    # Index
+
+    @property
+    def first_index(self) -> int:
+        return self._first_index
+
+    @property
+    def last_index(self) -> int:
+        return self._first_index + len(self._terms) - 1
+
+    def knows_term(self, index: int) -> bool:
+        """Whether term_at(index) is known (0, the snapshot index, or a stored entry)"""
+        return index == 0 or index == self.snapshot_index or self._first_index <= index <= self.last_index
+
+    def term_at(self, index: int) -> int:
+        """
+        Get the term of an entry
+
+        Returns:
+            int: The term, or 0 for index 0, indices past the end and compacted entries
+        """
+        if self._first_index <= index <= self.last_index:
+            return self._terms[index - self._first_index]
+        if index == self.snapshot_index:
+            return self.snapshot_term
+        return 0
+
+    def entry(self, index: int) -> Dict[str, Any]:
+        """
+        Get one entry
+
+        Raises:
+            IndexError: If the entry is compacted or past the end
+        """
+        if not self._first_index <= index <= self.last_index:
+            raise IndexError(f"Log index {index} outside {self._first_index}..{self.last_index}")
+        cached_from = self.last_index - len(self._cache) + 1
+        if index >= cached_from:
+            return self._cache[index - cached_from]
+
+        segment = self._segments[bisect.bisect_right(self._segment_starts, index) - 1]
+        if segment is self._segments[-1] and self._writer is not None:
+            self._writer.flush()
+        self._stats['disk_reads'] += 1
+        return segment.read(index)
+
+    def entries(self, start: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Get up to limit consecutive entries from start
+
+        Raises:
+            IndexError: If start is compacted
+        """
+        end = min(self.last_index, start + limit - 1)
+        return [self.entry(index) for index in range(start, end + 1)]
+
+    def find_latest(self, needle: bytes, match: Callable[[Dict[str, Any]], bool]) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Find the newest stored entry that satisfies match
+
+        Scans the segment files from the newest, decoding only records whose
+        raw JSON contains needle. Meant for occasional lookups of old entries.
+
+        Args:
+            needle: Bytes every matching record contains
+            match: Confirms a decoded candidate
+
+        Returns:
+            tuple: (index, entry), or None
+        """
+        if self._writer is not None:
+            self._writer.flush()
+        for segment in reversed(self._segments):
+            with open(segment.path, 'rb') as f:
+                data = f.read(segment.size)
+            position = data.rfind(needle)
+            while position >= 0:
+                record = bisect.bisect_right(segment.offsets, position) - 1
+                start = segment.offsets[record]
+                length = RECORD_HEADER.unpack_from(data, start)[0]
+                entry = json.loads(data[start + RECORD_HEADER.size:start + RECORD_HEADER.size + length])
+                index = segment.first_index + record
+                if index >= self._first_index and match(entry):
+                    return index, entry
+                position = data.rfind(needle, 0, start)
+            self._stats['disk_reads'] += 1
+        return None
+
+    # Writes
+
+    def append(self, entries: List[Dict[str, Any]]) -> int:
+        """
+        Append entries (each with a 'term') after last_index
+
+        The entries are buffered until the next sync().
+
+        Returns:
+            int: The new last index
+        """
+        for entry in entries:
+            if not self._segments or self._segments[-1].size >= self.segment_bytes:
+                self._roll()
+            payload = json.dumps(entry, separators=(',', ':'), default=str).encode('utf-8')
+            segment = self._segments[-1]
+            self._writer.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload), entry['term']))
+            self._writer.write(payload)
+            segment.offsets.append(segment.size)
+            segment.size += RECORD_HEADER.size + len(payload)
+            self._terms.append(entry['term'])
+            self._cache.append(entry)
+            if len(self._cache) > self.cache_entries:
+                self._cache.popleft()
+        self._stats['appended'] += len(entries)
+        return self.last_index
+
+    def sync(self) -> int:
+        """
+        Make every appended entry durable (one fsync for everything since the last call)
+
+        Returns:
+            int: The durable index
+        """
+        if self._writer is not None and self.durable_index < self.last_index:
+            self._writer.flush()
+            if self.fsync:
+                os.fsync(self._writer.fileno())
+            self._stats['syncs'] += 1
+        self.durable_index = self.last_index
+        return self.durable_index
+
+    def truncate_from(self, index: int) -> None:
+        """
+        Delete the entries from index to the end (a follower's conflicting suffix)
+
+        Raises:
+            ValueError: If index is covered by the snapshot
+        """
+        if index <= self.snapshot_index or index < self._first_index:
+            raise ValueError(f"Cannot truncate at {index}: entries up to {self.snapshot_index} are in the snapshot")
+        if index > self.last_index:
+            return
+
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        while self._segments and self._segments[-1].first_index >= index:
+            segment = self._segments.pop()
+            self._segment_starts.pop()
+            segment.close()
+            os.remove(segment.path)
+        if self._segments:
+            segment = self._segments[-1]
+            keep = index - segment.first_index
+            if keep < len(segment.offsets):
+                segment.size = segment.offsets[keep]
+                del segment.offsets[keep:]
+                os.truncate(segment.path, segment.size)
+            self._writer = open(segment.path, 'ab')
+
+        drop = self.last_index - index + 1
+        del self._terms[index - self._first_index:]
+        for _ in range(min(drop, len(self._cache))):
+            self._cache.pop()
+        self.durable_index = min(self.durable_index, self.last_index)
+        self._stats['truncations'] += 1
+
+    def _roll(self) -> None:
+        """Start a new segment at the next index"""
+        if self._writer is not None:
+            self.sync()
+            self._writer.close()
+        first_index = self.last_index + 1
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{first_index:020d}{SEGMENT_SUFFIX}")
+        self._writer = open(path, 'ab')
+        _fsync_directory(self.directory)
+        self._segments.append(_Segment(path, first_index))
+        self._segment_starts.append(first_index)
+
+    # Snapshots
+
+    def write_snapshot(self, index: int, term: int, state: Dict[str, Any]) -> None:
+        """
+        Durably write a snapshot of the state machine as of index
+
+        Only touches the snapshot file, so it may run on another thread; call
+        compact() afterwards (on the log's thread) to release the entries.
+        """
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'index': index, 'term': term, 'state': state}, f, separators=(',', ':'), default=str)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        _fsync_directory(self.directory)
+
+    def read_snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        Get the current snapshot
+
+        Returns:
+            dict: {'index', 'term', 'state'}, or None if there is none
+        """
+        if self._snapshot is None or self._snapshot['index'] != self.snapshot_index:
+            path = os.path.join(self.directory, SNAPSHOT_FILE)
+            if not os.path.exists(path):
+                return None
+            with open(path, 'r') as f:
+                self._snapshot = json.load(f)
+        return self._snapshot
+
+    def compact(self, index: int, term: int) -> int:
+        """
+        Record a written snapshot and delete the segments wholly behind it
+
+        The segment being written is kept, so entries shortly before the
+        snapshot stay available to followers that are slightly behind.
+
+        Returns:
+            int: Number of entries released
+        """
+        if index <= self.snapshot_index:
+            return 0
+        self.snapshot_index, self.snapshot_term = index, term
+
+        released = 0
+        while len(self._segments) > 1 and self._segments[0].last_index <= index:
+            segment = self._segments.pop(0)
+            self._segment_starts.pop(0)
+            segment.close()
+            os.remove(segment.path)
+            released += len(segment.offsets)
+        if released:
+            del self._terms[:released]
+            self._first_index += released
+            _fsync_directory(self.directory)
+            self._stats['compactions'] += 1
+        return released
+
+    def reset(self, index: int, term: int) -> None:
+        """
+        Adopt a snapshot received from the leader
+
+        Entries after the snapshot are kept if the log agrees with it at
+        index; otherwise the whole log is discarded.
+        """
+        if self._first_index <= index <= self.last_index and self.term_at(index) == term:
+            self.compact(index, term)
+            return
+
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for segment in self._segments:
+            segment.close()
+            os.remove(segment.path)
+        _fsync_directory(self.directory)
+        self._segments, self._segment_starts = [], []
+        self._terms = array('Q')
+        self._cache.clear()
+        self._first_index = index + 1
+        self.snapshot_index, self.snapshot_term = index, term
+        self.durable_index = index
+
+    # Recovery
+
+    def _recover(self) -> None:
+        """Load the snapshot and rebuild the index from the segment files"""
+        snapshot = self.read_snapshot()
+        if snapshot:
+            self.snapshot_index, self.snapshot_term = snapshot['index'], snapshot['term']
+
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+        segments = [_Segment(os.path.join(self.directory, name), int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                    for name in names]
+
+        # The log must continue the snapshot without a gap
+        expected = None
+        for position, segment in enumerate(segments):
+            if expected is None:
+                if segment.first_index > self.snapshot_index + 1:
+                    logger.error(f"Raft log in {self.directory} starts at {segment.first_index}, "
+                                 f"after snapshot {self.snapshot_index}; discarding it")
+                    self._discard(segments[position:])
+                    break
+            elif segment.first_index != expected:
+                logger.error(f"Raft log segment {segment.path} does not follow entry {expected - 1}; "
+                             f"discarding it and later segments")
+                self._discard(segments[position:])
+                break
+
+            intact = self._scan(segment)
+            if not self._segments:
+                self._first_index = segment.first_index
+            self._segments.append(segment)
+            self._segment_starts.append(segment.first_index)
+            expected = segment.last_index + 1
+            if not intact:
+                self._discard(segments[position + 1:])
+                break
+
+        if not self._segments:
+            self._first_index = self.snapshot_index + 1
+        elif self.last_index < self.snapshot_index:
+            # Every stored entry is covered by the snapshot
+            self._discard(self._segments)
+            self._segments, self._segment_starts = [], []
+            self._terms = array('Q')
+            self._cache.clear()
+            self._first_index = self.snapshot_index + 1
+        else:
+            # An interrupted compaction may have left segments behind the snapshot
+            while len(self._segments) > 1 and self._segments[0].last_index <= self.snapshot_index:
+                segment = self._segments.pop(0)
+                self._segment_starts.pop(0)
+                os.remove(segment.path)
+                del self._terms[:len(segment.offsets)]
+                self._first_index += len(segment.offsets)
+            self._writer = open(self._segments[-1].path, 'ab')
+
+        self.durable_index = self.last_index
+        logger.info(f"Raft log in {self.directory}: entries {self._first_index}..{self.last_index}, "
+                    f"snapshot at {self.snapshot_index}, {len(self._segments)} segments")
+
+    def _scan(self, segment: _Segment) -> bool:
+        """
+        Index a segment's records, cutting the file at the first damaged one
+
+        Returns:
+            bool: Whether the whole file was intact
+        """
+        intact = True
+        with open(segment.path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        while offset < len(data):
+            if offset + RECORD_HEADER.size > len(data):
+                intact = False
+                break
+            length, checksum, term = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) != length or zlib.crc32(payload) != checksum:
+                intact = False
+                break
+            segment.offsets.append(offset)
+            self._terms.append(term)
+            offset = start + length
+        segment.size = offset
+
+        if not intact:
+            logger.warning(f"Discarding damaged records after entry {segment.last_index} in {segment.path}")
+            os.truncate(segment.path, offset)
+
+        # Refill the cache with the tail of the log
+        keep = min(self.cache_entries, len(segment.offsets))
+        if keep >= self.cache_entries:
+            self._cache.clear()
+        for position in range(len(segment.offsets) - keep, len(segment.offsets)):
+            record = segment.offsets[position]
+            length = RECORD_HEADER.unpack_from(data, record)[0]
+            start = record + RECORD_HEADER.size
+            self._cache.append(json.loads(data[start:start + length]))
+        while len(self._cache) > self.cache_entries:
+            self._cache.popleft()
+        return intact
+
+    def _discard(self, segments: List[_Segment]) -> None:
+        for segment in segments:
+            segment.close()
+            os.remove(segment.path)
+
+    # Lifecycle
+
+    def close(self) -> None:
+        """Sync and close the files"""
+        if self._writer is not None:
+            self.sync()
+            self._writer.close()
+            self._writer = None
+        for segment in self._segments:
+            segment.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self._stats,
+            first_index=self._first_index,
+            last_index=self.last_index,
+            durable_index=self.durable_index,
+            snapshot_index=self.snapshot_index,
+            segments=len(self._segments),
+            bytes=sum(segment.size for segment in self._segments),
+            cached_entries=len(self._cache)
+        )
@@ -2,42 +2,152 @@
 Response Cache for NVC Banking Platform
 
 This module provides HTTP response caching for Flask routes.
+
+Cached entries are immutable snapshots of a response: status, headers and
+body bytes, plus pre-compressed gzip (and brotli, if installed) variants, so
+a hit builds a fresh response from stored bytes instead of handing out a
+shared Response object. Entries are spread over lock-striped shards, each an
+OrderedDict kept in LRU order, and evicted against a byte budget rather than
+an entry count. Endpoints can be given their own byte budgets, expired
+entries can be served while a background refresh runs
+(stale-while-revalidate), and cached responses carry strong ETags so clients
+can revalidate with If-None-Match.
 """
 
+import gzip
 import time
 import logging
 import functools
-from flask import request, make_response
+from collections import OrderedDict
+from flask import request, make_response, copy_current_request_context, Response
 import hashlib
 import threading
+from caching import register_cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+COMPRESSIBLE_MIMETYPES = ('text/', 'application/json', 'application/javascript',
+                          'application/xml', 'image/svg+xml')
+
+# Headers recomputed for every response built from a cached entry
+EXCLUDED_HEADERS = {'content-length', 'content-encoding', 'etag'}
+
+# Approximate per-entry bookkeeping overhead counted against the byte budget
+ENTRY_OVERHEAD_BYTES = 256
+
+
+class CachedResponse:
+    """An immutable cached response body and its freshness metadata"""
+
+    __slots__ = ('status', 'headers', 'body', 'variants', 'etag', 'endpoint',
+                 'expires_at', 'stale_until', 'size', 'revalidating')
+
+    def __init__(self, status, headers, body, variants, etag, endpoint, expires_at, stale_until):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.variants = variants
+        self.etag = etag
+        self.endpoint = endpoint
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.size = (len(body) + sum(len(data) for data in variants.values())
+                     + sum(len(name) + len(value) for name, value in headers) + ENTRY_OVERHEAD_BYTES)
+        self.revalidating = False
+
+    @classmethod
+    def from_response(cls, response, endpoint, expires_at, stale_until):
+        """Snapshot a Flask response into bytes, pre-compressing large text bodies"""
+        body = response.get_data()
+        headers = tuple((name, value) for name, value in response.headers.items()
+                        if name.lower() not in EXCLUDED_HEADERS)
+
+        variants = {}
+        if len(body) >= MIN_COMPRESS_BYTES and (response.mimetype or '').startswith(COMPRESSIBLE_MIMETYPES):
+            if brotli is not None:
+                variants['br'] = brotli.compress(body)
+            variants['gzip'] = gzip.compress(body, compresslevel=6)
+
+        etag = hashlib.sha1(body).hexdigest()
+        return cls(response.status_code, headers, body, variants, etag, endpoint, expires_at, stale_until)
+
+    def is_fresh(self, now):
+        return self.expires_at is None or now < self.expires_at
+
+    def is_usable(self, now):
+        return self.stale_until is None or now < self.stale_until
+
+    def negotiate(self, accept_encodings):
+        """Pick a stored encoding the client accepts, or None for the identity body"""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accept_encodings[encoding]:
+                return encoding
+        return None
+
+    def etag_for(self, encoding):
+        # Each content coding is its own representation and needs its own strong ETag
+        return f"{self.etag}-{encoding}" if encoding else self.etag
+
+    def build_response(self, encoding=None):
+        """Build a new response from the stored bytes"""
+        response = Response(self.variants[encoding] if encoding else self.body,
+                            status=self.status, headers=list(self.headers))
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if self.variants:
+            response.vary.add('Accept-Encoding')
+        response.set_etag(self.etag_for(encoding))
+        return response
+
+
+class _Shard:
+    """One lock stripe of the cache"""
+
+    __slots__ = ('lock', 'entries', 'max_bytes', 'bytes', 'stats')
+
+    def __init__(self, max_bytes):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'rejected': 0}
+
+
 class ResponseCache:
-    """Simple in-memory cache for HTTP responses"""
-    
-    def __init__(self, max_size=100, default_ttl=60):
+    """Sharded in-memory LRU cache for HTTP responses, bounded by bytes"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, default_ttl=60, shards=16, stale_ttl=0,
+                 endpoint_budgets=None):
         """
         Initialize cache
-        
+
         Args:
-            max_size (int): Maximum number of cached responses
+            max_bytes (int): Maximum bytes held by cached responses, split evenly across shards
             default_ttl (int): Default TTL in seconds
+            shards (int): Number of independently locked shards
+            stale_ttl (int): Seconds an expired response may still be served
+                while it is refreshed in the background
+            endpoint_budgets (dict): Maximum cached bytes per endpoint name
         """
-        self._cache = {}
-        self._expiry = {}
-        self._access_times = {}
-        self._lock = threading.RLock()
-        self._max_size = max_size
+        self._shards = [_Shard(max(1, max_bytes // shards)) for _ in range(shards)]
+        self._max_bytes = max_bytes
         self._default_ttl = default_ttl
-        self._stats = {
-            'hits': 0,
-            'misses': 0,
-            'sets': 0,
-            'evictions': 0
-        }
-    
+        self._stale_ttl = stale_ttl
+        self._endpoint_budgets = dict(endpoint_budgets or {})
+        self._endpoint_keys = {endpoint: OrderedDict() for endpoint in self._endpoint_budgets}
+        self._endpoint_bytes = {endpoint: 0 for endpoint in self._endpoint_budgets}
+        self._budget_lock = threading.Lock()
+        self._not_modified = 0
+
     def _generate_key(self, request):
         """Generate cache key from request"""
         # Create a key based on path and query string
@@ -45,149 +155,267 @@ class ResponseCache:
             request.path,
             request.query_string.decode('utf-8'),
         ]
-        
-        # Add selected headers that affect response
-        for header in ['Accept', 'Accept-Encoding', 'Accept-Language']:
+
+        # Add selected headers that affect response. Accept-Encoding is left
+        # out: every encoding is stored as a variant of the same entry.
+        for header in ['Accept', 'Accept-Language']:
             if header in request.headers:
                 key_parts.append(f"{header}:{request.headers[header]}")
-        
+
         # Generate hash
         key = hashlib.md5(':'.join(key_parts).encode('utf-8')).hexdigest()
         return key
-    
+
+    def _shard(self, key):
+        return self._shards[int(key[:8], 16) % len(self._shards)]
+
+    def set_endpoint_budget(self, endpoint, max_bytes):
+        """Limit how many bytes of responses a single endpoint may hold in the cache"""
+        with self._budget_lock:
+            self._endpoint_budgets[endpoint] = max_bytes
+            self._endpoint_keys.setdefault(endpoint, OrderedDict())
+            self._endpoint_bytes.setdefault(endpoint, 0)
+
+    def lookup(self, key):
+        """
+        Look up a cache entry by key
+
+        Returns:
+            CachedResponse (fresh or stale) or None
+        """
+        shard = self._shard(key)
+        now = time.time()
+        expired = None
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is not None and not entry.is_usable(now):
+                del shard.entries[key]
+                shard.bytes -= entry.size
+                expired, entry = entry, None
+
+            if entry is None:
+                shard.stats['misses'] += 1
+            else:
+                shard.entries.move_to_end(key)
+                shard.stats['hits' if entry.is_fresh(now) else 'stale_hits'] += 1
+
+        if expired is not None:
+            self._discharge_endpoint(expired.endpoint, key)
+        return entry
+
     def get(self, request):
         """
         Get cached response for a request
-        
+
         Args:
             request: Flask request object
-            
+
         Returns:
-            Cached response or None
+            New response built from the cached bytes, or None
         """
-        key = self._generate_key(request)
-        with self._lock:
-            # Check if response is in cache and not expired
-            if key in self._cache and (
-                    self._expiry[key] is None or 
-                    time.time() < self._expiry[key]):
-                # Update access time
-                self._access_times[key] = time.time()
-                self._stats['hits'] += 1
-                return self._cache[key]
-            elif key in self._cache:
-                # Expired - remove from cache
-                self._remove(key)
-            
-            self._stats['misses'] += 1
+        entry = self.lookup(self._generate_key(request))
+        if entry is None:
             return None
-    
+        return entry.build_response(entry.negotiate(request.accept_encodings))
+
     def set(self, request, response, ttl=None):
         """
         Cache a response
-        
+
         Args:
             request: Flask request object
             response: Response to cache
             ttl: Time-to-live in seconds or None for default
+
+        Returns:
+            The CachedResponse entry, or None if it is larger than a shard's budget
         """
         key = self._generate_key(request)
-        expiry = None if ttl is None else time.time() + (ttl or self._default_ttl)
-        
-        with self._lock:
-            # Check cache size and evict if necessary
-            if len(self._cache) >= self._max_size and key not in self._cache:
-                self._evict_one()
-            
-            # Store response
-            self._cache[key] = response
-            self._expiry[key] = expiry
-            self._access_times[key] = time.time()
-            self._stats['sets'] += 1
-    
-    def _remove(self, key):
-        """Remove an item from the cache"""
-        if key in self._cache:
-            del self._cache[key]
-        if key in self._expiry:
-            del self._expiry[key]
-        if key in self._access_times:
-            del self._access_times[key]
-    
-    def _evict_one(self):
-        """Evict the least recently used item"""
-        if not self._access_times:
+        ttl = self._default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        stale_until = expires_at + self._stale_ttl if expires_at is not None else None
+        entry = CachedResponse.from_response(response, request.endpoint, expires_at, stale_until)
+
+        shard = self._shard(key)
+        removed = []
+        with shard.lock:
+            if entry.size > shard.max_bytes:
+                shard.stats['rejected'] += 1
+                return None
+
+            previous = shard.entries.pop(key, None)
+            if previous is not None:
+                shard.bytes -= previous.size
+                removed.append((key, previous))
+
+            while shard.entries and shard.bytes + entry.size > shard.max_bytes:
+                old_key, old_entry = shard.entries.popitem(last=False)
+                shard.bytes -= old_entry.size
+                shard.stats['evictions'] += 1
+                removed.append((old_key, old_entry))
+
+            shard.entries[key] = entry
+            shard.bytes += entry.size
+            shard.stats['sets'] += 1
+
+        for old_key, old_entry in removed:
+            self._discharge_endpoint(old_entry.endpoint, old_key)
+        self._charge_endpoint(entry.endpoint, key, entry.size)
+        return entry
+
+    def _discharge_endpoint(self, endpoint, key):
+        """Stop counting a removed key against its endpoint budget"""
+        if endpoint not in self._endpoint_budgets:
             return
-            
-        # Find oldest accessed item
-        oldest_key = min(self._access_times.items(), key=lambda x: x[1])[0]
-        self._remove(oldest_key)
-        self._stats['evictions'] += 1
-    
+        with self._budget_lock:
+            size = self._endpoint_keys[endpoint].pop(key, None)
+            if size is not None:
+                self._endpoint_bytes[endpoint] -= size
+
+    def _charge_endpoint(self, endpoint, key, size):
+        """Count a key against its endpoint budget, evicting that endpoint's LRU entries if over"""
+        if endpoint not in self._endpoint_budgets:
+            return
+
+        with self._budget_lock:
+            keys = self._endpoint_keys[endpoint]
+            keys[key] = size
+            self._endpoint_bytes[endpoint] += size
+            overflow = []
+            while len(keys) > 1 and self._endpoint_bytes[endpoint] > self._endpoint_budgets[endpoint]:
+                old_key, old_size = keys.popitem(last=False)
+                self._endpoint_bytes[endpoint] -= old_size
+                overflow.append(old_key)
+
+        for old_key in overflow:
+            shard = self._shard(old_key)
+            with shard.lock:
+                old_entry = shard.entries.pop(old_key, None)
+                if old_entry is not None:
+                    shard.bytes -= old_entry.size
+                    shard.stats['evictions'] += 1
+
+    def record_not_modified(self):
+        """Count a request answered with 304 Not Modified"""
+        self._not_modified += 1
+
     def clear(self):
         """Clear the cache"""
-        with self._lock:
-            self._cache.clear()
-            self._expiry.clear()
-            self._access_times.clear()
-    
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.bytes = 0
+        with self._budget_lock:
+            for endpoint, keys in self._endpoint_keys.items():
+                keys.clear()
+                self._endpoint_bytes[endpoint] = 0
+
     def get_stats(self):
         """Get cache statistics"""
-        with self._lock:
-            stats = self._stats.copy()
-            stats['size'] = len(self._cache)
-            stats['max_size'] = self._max_size
-            return stats
+        stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'rejected': 0}
+        size = 0
+        used_bytes = 0
+        for shard in self._shards:
+            with shard.lock:
+                for stat, value in shard.stats.items():
+                    stats[stat] += value
+                size += len(shard.entries)
+                used_bytes += shard.bytes
+        stats['not_modified'] = self._not_modified
+        stats['size'] = size
+        stats['bytes'] = used_bytes
+        stats['max_bytes'] = self._max_bytes
+        stats['shards'] = len(self._shards)
+        with self._budget_lock:
+            stats['endpoints'] = {
+                endpoint: {
+                    'size': len(keys),
+                    'bytes': self._endpoint_bytes[endpoint],
+                    'budget': self._endpoint_budgets[endpoint]
+                }
+                for endpoint, keys in self._endpoint_keys.items()
+            }
+        return stats
 
 
 # Create a global cache instance
-response_cache = ResponseCache(max_size=500, default_ttl=60)
+response_cache = ResponseCache(max_bytes=64 * 1024 * 1024, default_ttl=60, stale_ttl=30)
+register_cache('response', response_cache)
+
+def _serve(entry):
+    """Serve a cached entry in the client's preferred encoding, or 304 if it already has it"""
+    encoding = entry.negotiate(request.accept_encodings)
+    etag = entry.etag_for(encoding)
+    if request.if_none_match.contains(etag):
+        response_cache.record_not_modified()
+        response = make_response('', 304)
+        response.set_etag(etag)
+        if entry.variants:
+            response.vary.add('Accept-Encoding')
+        return response
+    return entry.build_response(encoding)
 
 def cache_response(ttl=None, unless=None):
     """
     Decorator to cache view responses
-    
+
     Args:
         ttl: Time-to-live in seconds or None for default
         unless: Function that returns True if response should not be cached
-        
+
     Returns:
         Decorated function
     """
     def decorator(view_func):
+        def render_and_store(*args, **kwargs):
+            # Call view function
+            response = make_response(view_func(*args, **kwargs))
+
+            # Only cache complete, successful responses that set no cookies
+            if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+                    or 'Set-Cookie' in response.headers):
+                return response, None
+
+            # Add cache headers
+            if ttl:
+                response.headers['X-Cache-TTL'] = str(ttl)
+
+            return response, response_cache.set(request, response, ttl)
+
         @functools.wraps(view_func)
         def wrapper(*args, **kwargs):
             # Skip caching for non-GET requests
             if request.method != 'GET':
                 return view_func(*args, **kwargs)
-            
+
             # Skip caching based on unless condition
             if unless and unless():
                 return view_func(*args, **kwargs)
-            
+
             # Check cache
-            cached_response = response_cache.get(request)
-            if cached_response:
-                return cached_response
-            
-            # Call view function
-            response = view_func(*args, **kwargs)
-            
-            # Cache the response
-            # Only cache successful responses
-            if response.status_code == 200:
-                # Convert to response object if needed
-                if not hasattr(response, 'status_code'):
-                    response = make_response(response)
-                    
-                # Add cache headers
-                if ttl:
-                    response.headers['X-Cache-TTL'] = str(ttl)
-                
-                # Cache the response
-                response_cache.set(request, response, ttl)
-            
-            return response
+            entry = response_cache.lookup(response_cache._generate_key(request))
+            if entry is not None:
+                if not entry.is_fresh(time.time()) and not entry.revalidating:
+                    # Serve the stale copy and refresh it in the background
+                    entry.revalidating = True
+
+                    @copy_current_request_context
+                    def revalidate():
+                        try:
+                            render_and_store(*args, **kwargs)
+                        except Exception as e:
+                            logger.warning(f"Background revalidation failed for {request.path}: {str(e)}")
+                        finally:
+                            entry.revalidating = False
+
+                    threading.Thread(target=revalidate, daemon=True).start()
+
+                return _serve(entry)
+
+            response, entry = render_and_store(*args, **kwargs)
+            if entry is None:
+                return response
+            return _serve(entry)
         return wrapper
     return decorator
 
@@ -198,4 +426,4 @@ def clear_response_cache():
 
 def get_cache_stats():
     """Get cache statistics"""
-    return response_cache.get_stats()
\ No newline at end of file
+    return response_cache.get_stats()
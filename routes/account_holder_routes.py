@@ -15,6 +15,7 @@ from account_holder_models import (
     AccountType, AccountStatus, CurrencyType
 )
 from pdf_service import PDFService
+from currency_exchange_service import CurrencyExchangeService
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -148,9 +149,19 @@ def view(account_holder_id):
 def accounts(account_holder_id):
     """View all accounts for an account holder"""
     account_holder = AccountHolder.query.get_or_404(account_holder_id)
+    
+    # Total value of all accounts in USD, converted in a single batch
+    holder_accounts = account_holder.accounts
+    portfolio = CurrencyExchangeService(db).convert_many(
+        [account.balance or 0.0 for account in holder_accounts],
+        [account.currency for account in holder_accounts],
+        CurrencyType.USD
+    )
+    
     return render_template(
         'account_holders/accounts.html',
         account_holder=account_holder,
+        portfolio=portfolio,
         title=f"Accounts for {account_holder.name}"
     )
 
@@ -309,6 +320,13 @@ def api_account_holder(account_holder_id):
                 'currency_prefix': 'NVCT' if is_nvct else None
             })
         
+        # Total portfolio value in USD
+        portfolio = CurrencyExchangeService(db).convert_many(
+            [account['balance'] or 0.0 for account in accounts],
+            [account['currency'] for account in accounts],
+            CurrencyType.USD
+        )
+        
         # Compile result
         result = {
             'id': holder.id,
@@ -319,6 +337,8 @@ def api_account_holder(account_holder_id):
             'addresses': addresses,
             'phones': phones,
             'accounts': accounts,
+            'total_balance_usd': portfolio['total'],
+            'balances_by_currency': portfolio['by_currency'],
             'created_at': holder.created_at.isoformat() if holder.created_at else None
         }
         
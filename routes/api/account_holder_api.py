@@ -4,7 +4,11 @@ Provides API endpoints for accessing account holder data
 """
 import logging
 from flask import Blueprint, jsonify
+from app import db
+from auth import api_key_required
+from models import UserRole
 from account_holder_models import AccountHolder, BankAccount
+from balance_cache import get_balance
 
 logger = logging.getLogger(__name__)
 
@@ -49,4 +53,37 @@ def get_accounts(account_holder_id):
             'success': False,
             'message': f"Error getting accounts: {str(e)}",
             'accounts': []
-        }), 500
\ No newline at end of file
+        }), 500
+
+@account_holder_api.route('/accounts/<int:account_id>/balance', methods=['GET'])
+@api_key_required
+def get_account_balance(user, account_id):
+    """Get the balance of a bank account (served from the balance cache)"""
+    try:
+        balance = get_balance('bank', account_id)
+        # Other users' accounts look the same as missing ones; admins see every account
+        if balance is not None and user.role != UserRole.ADMIN:
+            owner_id = db.session.query(AccountHolder.user_id).filter_by(id=balance['account_holder_id']).scalar()
+            if owner_id != user.id:
+                balance = None
+        if balance is None:
+            return jsonify({
+                'success': False,
+                'message': 'Account not found'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'account_id': account_id,
+            'account_holder_id': balance['account_holder_id'],
+            'currency': balance['currency'],
+            'balance': balance['balance'],
+            'available_balance': balance['available_balance'],
+            'updated_at': balance['updated_at']
+        })
+    except Exception as e:
+        logger.error(f"Error getting balance for account {account_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f"Error getting balance: {str(e)}"
+        }), 500
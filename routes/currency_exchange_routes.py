@@ -3,12 +3,16 @@ Currency Exchange Routes
 This module provides routes for currency exchange operations
 """
 
+import os
+import random
 import logging
+import numpy as np
 from datetime import datetime
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, session
 from flask_login import login_required, current_user
 from account_holder_models import CurrencyType, ExchangeType, ExchangeStatus, CurrencyExchangeTransaction, CurrencyExchangeRate
 from currency_exchange_service import CurrencyExchangeService
+from exchange_rate_fetcher import rate_fetcher
 from app import db
 from forms import CurrencyExchangeForm
 from models import TreasuryAccount  # For account selection
@@ -230,6 +234,54 @@ def calculate():
         logger.error(f"Error calculating exchange: {str(e)}")
         return jsonify({'success': False, 'error': 'An error occurred processing your request'}), 500
 
+@currency_exchange.route('/convert_many', methods=['POST'])
+@login_required
+def convert_many():
+    """API endpoint to convert a batch of amounts in mixed currencies into one currency"""
+    data = request.get_json(silent=True) or {}
+    amounts = data.get('amounts')
+    from_currencies = data.get('from_currencies')
+    to_currency = data.get('to_currency')
+    
+    if not isinstance(amounts, list) or not isinstance(from_currencies, list) or not to_currency:
+        return jsonify({'success': False, 'error': 'Missing amounts, from_currencies or to_currency'}), 400
+    
+    if len(amounts) != len(from_currencies):
+        return jsonify({'success': False, 'error': 'amounts and from_currencies must have the same length'}), 400
+    
+    # Amounts are JSON numbers or numeric strings; null, booleans, NaN and inf are rejected
+    try:
+        if any(amount is None or isinstance(amount, bool) for amount in amounts):
+            raise ValueError
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if amounts.ndim != 1 or not np.isfinite(amounts).all():
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'amounts must be finite numbers'}), 400
+    
+    try:
+        local_exchange_service = CurrencyExchangeService(db)
+        result = local_exchange_service.convert_many(amounts, from_currencies, to_currency)
+        
+        return jsonify({
+            'success': True,
+            'to_currency': result['to_currency'],
+            'converted_amounts': result['converted'].tolist(),
+            'total': result['total'],
+            'by_currency': result['by_currency'],
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except KeyError as e:
+        logger.error(f"Invalid currency code: {str(e)}")
+        return jsonify({'success': False, 'error': f'Invalid currency code: {str(e)}'}), 400
+    except (TypeError, ValueError) as e:
+        logger.error(f"Invalid batch conversion input: {str(e)}")
+        return jsonify({'success': False, 'error': 'Invalid amount format'}), 400
+    except Exception as e:
+        logger.error(f"Error converting batch: {str(e)}")
+        return jsonify({'success': False, 'error': 'An error occurred processing your request'}), 500
+
 @currency_exchange.route('/convert', methods=['POST'])
 @login_required
 def convert():
@@ -546,6 +598,25 @@ def register_currency_exchange_routes(app):
                 flash(f"Error initializing rates: {str(e)}", "danger")
                 return redirect(url_for('currency_exchange.rates'))
         
+        # Refresh external rates in the background instead of on request threads.
+        # Every worker process runs this, so a refresh is skipped when another
+        # worker stored one within most of the interval, and the first one is
+        # staggered so workers starting together do not all fetch at once.
+        refresh_interval = int(os.environ.get('EXCHANGE_RATE_REFRESH_INTERVAL', '3600'))
+        if refresh_interval > 0:
+            max_age = refresh_interval * 0.9
+            
+            def rates_stale():
+                with app.app_context():
+                    return CurrencyExchangeService(db).external_rates_stale(max_age)
+            
+            def store_refreshed_rates(updates):
+                with app.app_context():
+                    CurrencyExchangeService(db).store_refreshed_rates(updates, max_age)
+            
+            rate_fetcher.start_refresh(store_refreshed_rates, interval=refresh_interval, should_refresh=rates_stale,
+                                       initial_delay=random.uniform(0, min(refresh_interval, 30)))
+        
         logger.info("Currency exchange routes registered successfully")
         return True
     except Exception as e:
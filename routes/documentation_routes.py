@@ -1,8 +1,9 @@
 import os
 import base64
 from flask import Blueprint, render_template, send_file, current_app
-import weasyprint
-from io import BytesIO
+
+from browser_pool import render_pdf
+from pdf_cache import pdf_key, cached_pdf, send_pdf
 
 documentation_bp = Blueprint('documentation', __name__)
 
@@ -91,6 +92,16 @@ def swift_documentation_pdf():
         current_app.logger.error(f"Error serving SWIFT Documentation PDF: {str(e)}")
         return f"Error accessing PDF: {str(e)}", 500
 
+BROWSER_PAGE_NUMBERS = {
+    'displayHeaderFooter': True,
+    'headerTemplate': '<span></span>',
+    'footerTemplate': (
+        '<div style="width: 100%; text-align: right; padding-right: 0.5in; '
+        'font-family: Arial, sans-serif; font-size: 10pt; color: #666;">'
+        'Page <span class="pageNumber"></span> of <span class="totalPages"></span></div>'
+    )
+}
+
 def generate_pdf_with_logo(html_content, base_url=None):
     """
     Generate a PDF from HTML content with page numbers
@@ -130,8 +141,72 @@ def generate_pdf_with_logo(html_content, base_url=None):
     """
     
     # Generate PDF
-    pdf = weasyprint.HTML(string=html_with_page_numbers, base_url=base_url).write_pdf()
-    return pdf
+    try:
+        import weasyprint
+        return weasyprint.HTML(string=html_with_page_numbers, base_url=base_url).write_pdf()
+    except Exception as e:
+        current_app.logger.warning(f"WeasyPrint error: {str(e)}, rendering with headless browser")
+    
+    # Chromium ignores @page margin boxes, so print the page numbers in its footer instead
+    return render_pdf(html_with_page_numbers, pdf_options=BROWSER_PAGE_NUMBERS, base_url=base_url)
+
+# Documentation PDFs: source HTML in static/docs -> download name
+DOCUMENTATION_PDFS = {
+    'transaction_settlement_explainer.html': 'NVC_Transaction_System_Explained.pdf',
+    'server_to_server_integration_guide.html': 'NVC_Server_to_Server_Integration_Guide.pdf',
+    'NVCTokenomics.html': 'NVC_Tokenomics.pdf',
+    'nvc_funds_transfer_guide.html': 'NVC_Funds_Transfer_Guide.pdf',
+    'nvc_mainnet_readiness_assessment.html': 'NVC_Mainnet_Readiness_Assessment.pdf',
+    'nvc_transfer_capabilities.html': 'NVC_Transfer_Capabilities_Assessment.pdf',
+    'paypal_payment_capabilities.html': 'NVC_PayPal_Payment_Capabilities.pdf',
+    'ach_capabilities.html': 'NVC_ACH_Transfer_Capabilities.pdf',
+    'swift_telex_capabilities.html': 'NVC_SWIFT_Telex_Capabilities.pdf',
+    'swift_bic_registration_guide.html': 'NVC_SWIFT_BIC_Registration_Guide.pdf',
+    'nvc_acquisition_strategy.html': 'NVC_Financial_Institution_Acquisition_Strategy.pdf',
+    'nvct_stablecoin_backing.html': 'NVC_Token_Stablecoin_10T_Asset_Backing.pdf'
+}
+
+# Modules whose source determines a documentation PDF
+DOCUMENTATION_RENDERERS = ('routes.documentation_routes', 'browser_pool')
+
+def documentation_pdf(filename):
+    """
+    Get a documentation PDF from the PDF cache, rendering it on a miss
+    
+    Args:
+        filename (str): Source HTML file in static/docs
+        
+    Returns:
+        tuple: (path of the cached PDF, cache key)
+    """
+    html_path = os.path.join(current_app.root_path, 'static/docs', filename)
+    with open(html_path, 'r') as f:
+        html_content = f.read()
+    
+    key = pdf_key('documentation', html_content, {'file': filename}, DOCUMENTATION_RENDERERS)
+    path = cached_pdf(key, lambda: generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path)))
+    return path, key
+
+def send_documentation_pdf(filename):
+    """Send a documentation PDF from the PDF cache with a strong ETag and Range support"""
+    path, key = documentation_pdf(filename)
+    return send_pdf(path, key, DOCUMENTATION_PDFS[filename])
+
+def warm_documentation_pdfs():
+    """
+    Render every documentation PDF into the PDF cache (run at deploy time)
+    
+    Returns:
+        int: Number of PDFs available in the cache
+    """
+    warmed = 0
+    for filename in DOCUMENTATION_PDFS:
+        try:
+            documentation_pdf(filename)
+            warmed += 1
+        except Exception as e:
+            current_app.logger.error(f"Error warming documentation PDF {filename}: {str(e)}")
+    return warmed
 
 @documentation_bp.route('/', methods=['GET'])
 def documentation_index():
@@ -142,27 +217,8 @@ def documentation_index():
 def transaction_system_pdf():
     """Generate a PDF explaining the transaction system"""
     try:
-        # Get the HTML content
-        html_path = os.path.join(current_app.root_path, 'static/docs/transaction_settlement_explainer.html')
-        
-        # Read the HTML content
-        with open(html_path, 'r') as f:
-            html_content = f.read()
-        
-        # Generate PDF with page numbers
-        pdf = generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path))
-        
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf)
-        pdf_io.seek(0)
-        
-        # Send the PDF as a response
-        return send_file(
-            pdf_io,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='NVC_Transaction_System_Explained.pdf'
-        )
+        # Rendered once per document version, then served from the PDF cache
+        return send_documentation_pdf('transaction_settlement_explainer.html')
     
     except Exception as e:
         current_app.logger.error(f"Error generating PDF: {str(e)}")
@@ -172,27 +228,8 @@ def transaction_system_pdf():
 def server_to_server_pdf():
     """Generate a PDF of the Server-to-Server Integration Guide"""
     try:
-        # Get the HTML content
-        html_path = os.path.join(current_app.root_path, 'static/docs/server_to_server_integration_guide.html')
-        
-        # Read the HTML content
-        with open(html_path, 'r') as f:
-            html_content = f.read()
-        
-        # Generate PDF with page numbers
-        pdf = generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path))
-        
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf)
-        pdf_io.seek(0)
-        
-        # Send the PDF as a response
-        return send_file(
-            pdf_io,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='NVC_Server_to_Server_Integration_Guide.pdf'
-        )
+        # Rendered once per document version, then served from the PDF cache
+        return send_documentation_pdf('server_to_server_integration_guide.html')
     
     except Exception as e:
         current_app.logger.error(f"Error generating PDF: {str(e)}")
@@ -202,27 +239,8 @@ def server_to_server_pdf():
 def nvct_pdf():
     """Generate a PDF of the NVC Tokenomics document"""
     try:
-        # Get the HTML content
-        html_path = os.path.join(current_app.root_path, 'static/docs/NVCTokenomics.html')
-        
-        # Read the HTML content
-        with open(html_path, 'r') as f:
-            html_content = f.read()
-        
-        # Generate PDF with page numbers
-        pdf = generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path))
-        
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf)
-        pdf_io.seek(0)
-        
-        # Send the PDF as a response
-        return send_file(
-            pdf_io,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='NVC_Tokenomics.pdf'
-        )
+        # Rendered once per document version, then served from the PDF cache
+        return send_documentation_pdf('NVCTokenomics.html')
     
     except Exception as e:
         current_app.logger.error(f"Error generating PDF: {str(e)}")
@@ -232,27 +250,8 @@ def nvct_pdf():
 def funds_transfer_pdf():
     """Generate a PDF of the Funds Transfer Guide"""
     try:
-        # Get the HTML content
-        html_path = os.path.join(current_app.root_path, 'static/docs/nvc_funds_transfer_guide.html')
-        
-        # Read the HTML content
-        with open(html_path, 'r') as f:
-            html_content = f.read()
-        
-        # Generate PDF with page numbers
-        pdf = generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path))
-        
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf)
-        pdf_io.seek(0)
-        
-        # Send the PDF as a response
-        return send_file(
-            pdf_io,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='NVC_Funds_Transfer_Guide.pdf'
-        )
+        # Rendered once per document version, then served from the PDF cache
+        return send_documentation_pdf('nvc_funds_transfer_guide.html')
     
     except Exception as e:
         current_app.logger.error(f"Error generating PDF: {str(e)}")
@@ -262,27 +261,8 @@ def funds_transfer_pdf():
 def mainnet_pdf():
     """Generate a PDF of the Mainnet Readiness Assessment"""
     try:
-        # Get the HTML content
-        html_path = os.path.join(current_app.root_path, 'static/docs/nvc_mainnet_readiness_assessment.html')
-        
-        # Read the HTML content
-        with open(html_path, 'r') as f:
-            html_content = f.read()
-        
-        # Generate PDF with page numbers
-        pdf = generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path))
-        
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf)
-        pdf_io.seek(0)
-        
-        # Send the PDF as a response
-        return send_file(
-            pdf_io,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='NVC_Mainnet_Readiness_Assessment.pdf'
-        )
+        # Rendered once per document version, then served from the PDF cache
+        return send_documentation_pdf('nvc_mainnet_readiness_assessment.html')
     
     except Exception as e:
         current_app.logger.error(f"Error generating PDF: {str(e)}")
@@ -292,27 +272,8 @@ def mainnet_pdf():
 def transfer_capabilities_pdf():
     """Generate a PDF of the NVC Transfer Capabilities document"""
     try:
-        # Get the HTML content
-        html_path = os.path.join(current_app.root_path, 'static/docs/nvc_transfer_capabilities.html')
-        
-        # Read the HTML content
-        with open(html_path, 'r') as f:
-            html_content = f.read()
-        
-        # Generate PDF with page numbers
-        pdf = generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path))
-        
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf)
-        pdf_io.seek(0)
-        
-        # Send the PDF as a response
-        return send_file(
-            pdf_io,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='NVC_Transfer_Capabilities_Assessment.pdf'
-        )
+        # Rendered once per document version, then served from the PDF cache
+        return send_documentation_pdf('nvc_transfer_capabilities.html')
     
     except Exception as e:
         current_app.logger.error(f"Error generating PDF: {str(e)}")
@@ -322,27 +283,8 @@ def transfer_capabilities_pdf():
 def paypal_capabilities_pdf():
     """Generate a PDF of the PayPal Payment Capabilities document"""
     try:
-        # Get the HTML content
-        html_path = os.path.join(current_app.root_path, 'static/docs/paypal_payment_capabilities.html')
-        
-        # Read the HTML content
-        with open(html_path, 'r') as f:
-            html_content = f.read()
-        
-        # Generate PDF with page numbers
-        pdf = generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path))
-        
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf)
-        pdf_io.seek(0)
-        
-        # Send the PDF as a response
-        return send_file(
-            pdf_io,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='NVC_PayPal_Payment_Capabilities.pdf'
-        )
+        # Rendered once per document version, then served from the PDF cache
+        return send_documentation_pdf('paypal_payment_capabilities.html')
     
     except Exception as e:
         current_app.logger.error(f"Error generating PDF: {str(e)}")
@@ -352,27 +294,8 @@ def paypal_capabilities_pdf():
 def ach_capabilities_pdf():
     """Generate a PDF of the ACH Transfer Capabilities document"""
     try:
-        # Get the HTML content
-        html_path = os.path.join(current_app.root_path, 'static/docs/ach_capabilities.html')
-        
-        # Read the HTML content
-        with open(html_path, 'r') as f:
-            html_content = f.read()
-        
-        # Generate PDF with page numbers
-        pdf = generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path))
-        
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf)
-        pdf_io.seek(0)
-        
-        # Send the PDF as a response
-        return send_file(
-            pdf_io,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='NVC_ACH_Transfer_Capabilities.pdf'
-        )
+        # Rendered once per document version, then served from the PDF cache
+        return send_documentation_pdf('ach_capabilities.html')
     
     except Exception as e:
         current_app.logger.error(f"Error generating PDF: {str(e)}")
@@ -382,27 +305,8 @@ def ach_capabilities_pdf():
 def swift_telex_capabilities_pdf():
     """Generate a PDF of the SWIFT & Telex Messaging Capabilities document"""
     try:
-        # Use the static document that already has the correct values
-        html_path = os.path.join(current_app.root_path, 'static/docs/swift_telex_capabilities.html')
-        
-        # Read the HTML content
-        with open(html_path, 'r') as f:
-            html_content = f.read()
-        
-        # Generate PDF with page numbers
-        pdf = generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path))
-        
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf)
-        pdf_io.seek(0)
-        
-        # Send the PDF as a response
-        return send_file(
-            pdf_io,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='NVC_SWIFT_Telex_Capabilities.pdf'
-        )
+        # Rendered once per document version, then served from the PDF cache
+        return send_documentation_pdf('swift_telex_capabilities.html')
     
     except Exception as e:
         current_app.logger.error(f"Error generating PDF: {str(e)}")
@@ -412,27 +316,8 @@ def swift_telex_capabilities_pdf():
 def swift_bic_registration_pdf():
     """Generate a PDF of the SWIFT BIC Registration Guide"""
     try:
-        # Get the HTML content
-        html_path = os.path.join(current_app.root_path, 'static/docs/swift_bic_registration_guide.html')
-        
-        # Read the HTML content
-        with open(html_path, 'r') as f:
-            html_content = f.read()
-        
-        # Generate PDF with page numbers
-        pdf = generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path))
-        
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf)
-        pdf_io.seek(0)
-        
-        # Send the PDF as a response
-        return send_file(
-            pdf_io,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='NVC_SWIFT_BIC_Registration_Guide.pdf'
-        )
+        # Rendered once per document version, then served from the PDF cache
+        return send_documentation_pdf('swift_bic_registration_guide.html')
     
     except Exception as e:
         current_app.logger.error(f"Error generating PDF: {str(e)}")
@@ -442,27 +327,8 @@ def swift_bic_registration_pdf():
 def acquisition_strategy_pdf():
     """Generate a PDF of the NVC Acquisition Strategy"""
     try:
-        # Get the HTML content
-        html_path = os.path.join(current_app.root_path, 'static/docs/nvc_acquisition_strategy.html')
-        
-        # Read the HTML content
-        with open(html_path, 'r') as f:
-            html_content = f.read()
-        
-        # Generate PDF with page numbers
-        pdf = generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path))
-        
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf)
-        pdf_io.seek(0)
-        
-        # Send the PDF as a response
-        return send_file(
-            pdf_io,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='NVC_Financial_Institution_Acquisition_Strategy.pdf'
-        )
+        # Rendered once per document version, then served from the PDF cache
+        return send_documentation_pdf('nvc_acquisition_strategy.html')
     
     except Exception as e:
         current_app.logger.error(f"Error generating PDF: {str(e)}")
@@ -491,27 +357,8 @@ def nvct_backing():
 def nvct_backing_pdf():
     """Generate a PDF of the NVCT Stablecoin Backing documentation"""
     try:
-        # Get the HTML content
-        html_path = os.path.join(current_app.root_path, 'static/docs/nvct_stablecoin_backing.html')
-        
-        # Read the HTML content
-        with open(html_path, 'r') as f:
-            html_content = f.read()
-        
-        # Generate PDF with page numbers
-        pdf = generate_pdf_with_logo(html_content, base_url=os.path.dirname(html_path))
-        
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf)
-        pdf_io.seek(0)
-        
-        # Send the PDF as a response
-        return send_file(
-            pdf_io,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name='NVC_Token_Stablecoin_10T_Asset_Backing.pdf'
-        )
+        # Rendered once per document version, then served from the PDF cache
+        return send_documentation_pdf('nvct_stablecoin_backing.html')
     
     except Exception as e:
         current_app.logger.error(f"Error generating PDF: {str(e)}")
@@ -6,13 +6,14 @@ This module provides routes for viewing transaction history and managing payment
 import os
 import logging
 from datetime import datetime, timedelta
-from flask import Blueprint, render_template, abort, redirect, url_for, request, flash, current_app
+from flask import Blueprint, render_template, abort, redirect, url_for, request, flash, current_app, jsonify
 from flask_login import login_required, current_user
 from sqlalchemy import desc
 
 from models import db, Transaction, TransactionStatus, TransactionType
 from routes.pdf_receipt_routes import generate_receipt_pdf
 from email_service import send_receipt_email
+from keyset_pagination import keyset_paginate
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -21,19 +22,8 @@ logger = logging.getLogger(__name__)
 payment_history_bp = Blueprint('payment_history', __name__, url_prefix='/payment-history')
 
 
-@payment_history_bp.route('/')
-@login_required
-def index():
-    """Display payment history for the current user"""
-    page = request.args.get('page', 1, type=int)
-    per_page = 10  # Number of transactions per page
-    
-    # Get filter parameters
-    current_status = request.args.get('status', 'all')
-    current_type = request.args.get('type', 'all')
-    current_days = request.args.get('days', '30')
-    
-    # Build query
+def _filtered_query(current_status, current_type, current_days):
+    """Build the current user's transaction query for the history filters"""
     query = Transaction.query.filter_by(user_id=current_user.id)
     
     # Apply status filter
@@ -65,11 +55,32 @@ def index():
             # Invalid days value - ignore filter
             pass
     
-    # Order by newest first
-    query = query.order_by(desc(Transaction.created_at))
+    return query
+
+
+@payment_history_bp.route('/')
+@login_required
+def index():
+    """Display payment history for the current user"""
+    per_page = 10  # Number of transactions per page
+    
+    # Get filter parameters
+    current_status = request.args.get('status', 'all')
+    current_type = request.args.get('type', 'all')
+    current_days = request.args.get('days', '30')
+    
+    query = _filtered_query(current_status, current_type, current_days)
     
-    # Paginate results
-    transactions = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Keyset pagination, newest first: deep pages cost the same as the first
+    try:
+        transactions = keyset_paginate(
+            query, Transaction.created_at, Transaction.id,
+            after=request.args.get('after'), before=request.args.get('before'),
+            per_page=per_page
+        )
+    except ValueError:
+        # Invalid cursor - start from the newest transactions
+        transactions = keyset_paginate(query, Transaction.created_at, Transaction.id, per_page=per_page)
     
     # Get list of all possible statuses and types for filters
     status_options = [s.name.lower() for s in TransactionStatus]
@@ -86,6 +97,43 @@ def index():
     )
 
 
+@payment_history_bp.route('/api/transactions')
+@login_required
+def api_transactions():
+    """JSON payment history for the current user, paginated with cursors"""
+    current_status = request.args.get('status', 'all')
+    current_type = request.args.get('type', 'all')
+    current_days = request.args.get('days', '0')
+    per_page = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    
+    query = _filtered_query(current_status, current_type, current_days)
+    
+    try:
+        page = keyset_paginate(
+            query, Transaction.created_at, Transaction.id,
+            after=request.args.get('after'), before=request.args.get('before'),
+            per_page=per_page, count=request.args.get('count', 'none')
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'transactions': [{
+            'id': tx.id,
+            'transaction_id': tx.transaction_id,
+            'amount': tx.amount,
+            'currency': tx.currency,
+            'type': tx.transaction_type.value if tx.transaction_type else None,
+            'status': tx.status.value if tx.status else None,
+            'description': tx.description,
+            'recipient_name': tx.recipient_name,
+            'created_at': tx.created_at.isoformat() if tx.created_at else None
+        } for tx in page.items],
+        'pagination': page.to_dict()
+    })
+
+
 @payment_history_bp.route('/transaction/<transaction_id>')
 @login_required
 def transaction_detail(transaction_id):
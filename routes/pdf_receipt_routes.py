@@ -14,8 +14,9 @@ from flask_login import login_required, current_user
 import qrcode
 from fpdf import FPDF
 
-from models import db, Transaction, User
+from models import db, Transaction, TransactionStatus, User
 from email_service import send_receipt_email
+from pdf_cache import pdf_key, cached_pdf, send_pdf
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -23,6 +24,12 @@ logger = logging.getLogger(__name__)
 # Create Blueprint
 pdf_receipt_bp = Blueprint('pdf_receipt', __name__, url_prefix='/pdf-receipt')
 
+# Receipts of transactions in these states no longer change, so they are cached
+FINAL_STATUSES = (
+    TransactionStatus.COMPLETED, TransactionStatus.FAILED, TransactionStatus.REFUNDED,
+    TransactionStatus.CANCELLED, TransactionStatus.REJECTED
+)
+
 
 class ReceiptPDF(FPDF):
     """Custom PDF class for receipt generation with enhanced styling"""
@@ -622,6 +629,70 @@ def generate_receipt_pdf(transaction, user):
     return buffer
 
 
+def receipt_key(transaction, user):
+    """
+    Build the PDF cache key of a receipt from everything generate_receipt_pdf prints
+    
+    Args:
+        transaction: Transaction model instance
+        user: User model instance
+        
+    Returns:
+        str: Cache key
+    """
+    address = None
+    try:
+        if getattr(user, 'account_holder', None) and callable(getattr(user.account_holder, 'primary_address', None)):
+            primary_address = user.account_holder.primary_address()
+            address = primary_address.formatted() if primary_address else None
+    except Exception:
+        pass
+    
+    name = user.full_name() if callable(getattr(user, 'full_name', None)) else user.username
+    inputs = {
+        'transaction': {column.key: getattr(transaction, column.key) for column in Transaction.__table__.columns},
+        'payer': {'name': name, 'email': user.email, 'address': address},
+        'domain': os.environ.get('REPLIT_DOMAINS', 'localhost:5000').split(',')[0]
+    }
+    return pdf_key('receipt', 'ReceiptPDF', inputs, ('routes.pdf_receipt_routes',))
+
+
+def warm_receipt_pdfs(days=7):
+    """
+    Render receipts of transactions finished in the last days into the PDF cache
+    
+    Must run inside an app context.
+    
+    Args:
+        days (int): How far back to warm
+        
+    Returns:
+        int: Number of receipts available in the cache
+    """
+    from datetime import timedelta
+    
+    since = datetime.utcnow() - timedelta(days=days)
+    transactions = Transaction.query.filter(
+        Transaction.status.in_(FINAL_STATUSES),
+        Transaction.updated_at >= since
+    ).order_by(Transaction.id)
+    
+    warmed = 0
+    users = {}
+    for transaction in transactions.yield_per(500):
+        try:
+            if transaction.user_id not in users:
+                users[transaction.user_id] = db.session.get(User, transaction.user_id)
+            user = users[transaction.user_id]
+            if user is None:
+                continue
+            cached_pdf(receipt_key(transaction, user), lambda: generate_receipt_pdf(transaction, user).getvalue())
+            warmed += 1
+        except Exception as e:
+            logger.error(f"Error warming receipt PDF for transaction {transaction.transaction_id}: {str(e)}")
+    return warmed
+
+
 @pdf_receipt_bp.route('/generate/<transaction_id>')
 @login_required
 def generate_receipt(transaction_id):
@@ -632,6 +703,14 @@ def generate_receipt(transaction_id):
         user_id=current_user.id
     ).first_or_404()
     
+    download_name = f'Receipt-{transaction.transaction_id}.pdf'
+    
+    # Receipts of finished transactions are rendered once and served from the PDF cache
+    if transaction.status in FINAL_STATUSES:
+        key = receipt_key(transaction, current_user)
+        path = cached_pdf(key, lambda: generate_receipt_pdf(transaction, current_user).getvalue())
+        return send_pdf(path, key, download_name, private=True)
+    
     # Generate PDF receipt
     pdf_buffer = generate_receipt_pdf(transaction, current_user)
     
@@ -639,7 +718,7 @@ def generate_receipt(transaction_id):
     return send_file(
         pdf_buffer, 
         mimetype='application/pdf',
-        download_name=f'Receipt-{transaction.transaction_id}.pdf',
+        download_name=download_name,
         as_attachment=True
     )
 
@@ -5,6 +5,7 @@ This module provides routes for the POS payment system.
 
 import os
 import json
+from decimal import Decimal
 import uuid
 import logging
 from datetime import datetime, timedelta
@@ -57,8 +58,8 @@ def pos_dashboard():
     ).order_by(Transaction.created_at.desc()).limit(10).all()
     
     # Calculate totals
-    total_payments = 0.0
-    total_payouts = 0.0
+    total_payments = Decimal(0)
+    total_payouts = Decimal(0)
     
     # Get transactions for calculating totals
     completed_transactions = Transaction.query.filter(
@@ -74,9 +75,9 @@ def pos_dashboard():
             if tx.currency == 'USD':
                 total_payments += tx.amount
             elif tx.currency == 'EUR':
-                total_payments += tx.amount * 1.1  # Simplified EUR to USD conversion
+                total_payments += tx.amount * Decimal('1.1')  # Simplified EUR to USD conversion
             elif tx.currency == 'GBP':
-                total_payments += tx.amount * 1.25  # Simplified GBP to USD conversion
+                total_payments += tx.amount * Decimal('1.25')  # Simplified GBP to USD conversion
             elif tx.currency == 'NVCT':
                 total_payments += tx.amount  # 1:1 with USD
         # For payouts, check the metadata to determine if it's a payout
@@ -95,9 +96,9 @@ def pos_dashboard():
                 if tx.currency == 'USD':
                     total_payouts += tx.amount
                 elif tx.currency == 'EUR':
-                    total_payouts += tx.amount * 1.1  # Simplified EUR to USD conversion
+                    total_payouts += tx.amount * Decimal('1.1')  # Simplified EUR to USD conversion
                 elif tx.currency == 'GBP':
-                    total_payouts += tx.amount * 1.25  # Simplified GBP to USD conversion
+                    total_payouts += tx.amount * Decimal('1.25')  # Simplified GBP to USD conversion
                 elif tx.currency == 'NVCT':
                     total_payouts += tx.amount  # 1:1 with USD
     
@@ -9,6 +9,7 @@ from flask_login import login_required, current_user
 from decimal import Decimal
 
 from app import db, logger
+from money import to_decimal
 from account_holder_models import AccountHolder, BankAccount, CurrencyType, CurrencyExchangeRate
 from account_holder_models import CurrencyExchangeTransaction, ExchangeType, ExchangeStatus
 import uuid
@@ -100,7 +101,7 @@ def convert():
             return redirect(url_for('exchange.convert'))
             
         # Check sufficient balance
-        if from_account.balance < float(amount):
+        if from_account.balance < amount:
             flash("Insufficient balance in the source account", "error")
             return redirect(url_for('exchange.convert'))
             
@@ -176,8 +177,8 @@ def convert():
             )
             
             # Update account balances
-            from_account.balance -= float(amount)
-            to_account.balance += converted_amount
+            from_account.balance -= amount
+            to_account.balance += to_decimal(converted_amount)
             
             # Update last transaction timestamp
             from_account.last_transaction_at = db.func.now()
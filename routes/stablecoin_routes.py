@@ -19,6 +19,7 @@ from models import (
     TransactionType
 )
 import stablecoin_service
+from balance_cache import get_balance
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -354,6 +355,31 @@ def api_get_accounts():
         'accounts': accounts_data
     })
 
+@stablecoin_bp.route('/api/accounts/<int:account_id>/balance', methods=['GET'])
+@login_required
+def api_get_account_balance(account_id):
+    """API endpoint to get a stablecoin account balance (served from the balance cache)"""
+    balance = get_balance('stablecoin', account_id)
+    if balance is None:
+        return jsonify({
+            'success': False,
+            'error': "Account not found"
+        }), 404
+
+    if balance['user_id'] != current_user.id and current_user.role.name != 'ADMIN':
+        return jsonify({
+            'success': False,
+            'error': "You don't have permission to view this account"
+        }), 403
+
+    return jsonify({
+        'success': True,
+        'account_id': account_id,
+        'balance': balance['balance'],
+        'currency': balance['currency'],
+        'updated_at': balance['updated_at']
+    })
+
 @stablecoin_bp.route('/api/accounts/<int:account_id>/transactions', methods=['GET'])
 @login_required
 def api_get_account_transactions(account_id):
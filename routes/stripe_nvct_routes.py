@@ -16,6 +16,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from models import db, Transaction, TransactionStatus, TransactionType
 from account_holder_models import BankAccount, CurrencyType
 from utils import generate_transaction_id
+from money import from_minor_units
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -195,7 +196,7 @@ def handle_nvct_payment_success(session):
         account_id = int(metadata.get('account_id'))
         
         # Get payment details
-        amount_total = session.get('amount_total', 0) / 100  # Convert from cents to dollars
+        amount_total = from_minor_units(session.get('amount_total', 0), 2)  # Convert from cents to dollars
         
         # Get the NVCT account
         nvct_account = BankAccount.query.get(account_id)
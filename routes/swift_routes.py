@@ -12,10 +12,11 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from weasyprint import HTML
 
-from models import db, Transaction, TransactionType, TransactionStatus, FinancialInstitution
+from models import db, Transaction, TransactionType, TransactionStatus, FinancialInstitution, MessageChannel, classify_message_channel
 from forms import LetterOfCreditForm, SwiftFundTransferForm, SwiftFreeFormatMessageForm, SwiftMT542Form, FinancialInstitutionForm
 from swift_integration import SwiftService
 from pdf_service import pdf_service
+from keyset_pagination import keyset_paginate
 from models import FinancialInstitution, FinancialInstitutionType
 
 # Configure logger
@@ -515,99 +516,48 @@ def cancel_transfer(transaction_id):
 @login_required
 def swift_messages():
     """View all SWIFT messages"""
-    # Get all SWIFT-related transactions for the current user
-    # Check for both enum and string values to handle different transaction creation methods
-
-    # First, let's look for transactions with SWIFT-related metadata
-    swift_transactions = []
-
-    # Get all transactions for the current user
-    all_user_transactions = Transaction.query.filter(
-        Transaction.user_id == current_user.id
-    ).order_by(Transaction.created_at.desc()).all()
-
-    # Get all transactions with SWIFT in their type string
-    swift_type_transactions = []
-    payment_type_transactions = []
-
-    # First separate transactions by type to avoid enum comparison issues
-    for tx in all_user_transactions:
-        try:
-            # Get the transaction type value safely
-            tx_type = None
-            if hasattr(tx.transaction_type, 'value'):
-                tx_type = tx.transaction_type.value
-            elif hasattr(tx.transaction_type, 'name'):
-                tx_type = tx.transaction_type.name
-            else:
-                tx_type = str(tx.transaction_type)
-
-            # Add to appropriate list
-            if isinstance(tx_type, str) and 'swift' in tx_type.lower():
-                swift_type_transactions.append(tx)
-            elif tx_type == 'PAYMENT' or tx_type == 'payment':
-                payment_type_transactions.append(tx)
-        except Exception as e:
-            logger.error(f"Error determining transaction type: {str(e)}")
-
-    # Add all transactions with SWIFT in their type
-    swift_transactions.extend(swift_type_transactions)
-
-    # For PAYMENT transactions, check if they could be SWIFT
-    for tx in payment_type_transactions:
-        try:
-            # Check for description hints first
-            if tx.description and ('SWIFT' in tx.description or 'Letter of Credit' in tx.description or 
-                                'Fund Transfer' in tx.description or 'Financial Institution Transfer' in tx.description):
-                swift_transactions.append(tx)
-                continue
-
-            # Check if this is a SWIFT transaction based on metadata
-            if tx.tx_metadata_json:
-                try:
-                    metadata = json.loads(tx.tx_metadata_json)
-                    if ('message_type' in metadata and metadata['message_type'] in ['MT103', 'MT202', 'MT760', 'MT799']):
-                        swift_transactions.append(tx)
-                        continue
-                    # Check for references that follow SWIFT formats
-                    if 'reference' in metadata and any(metadata['reference'].startswith(prefix) 
-                            for prefix in ['FT', 'IT', 'LC', 'FM']):
-                        swift_transactions.append(tx)
-                        continue
-                    # Check for receiver institution which indicates SWIFT message
-                    if 'receiver_institution' in metadata or 'receiving_institution' in metadata:
-                        swift_transactions.append(tx)
-                        continue
-                except json.JSONDecodeError:
-                    # Malformed JSON, just skip this check
-                    pass
-
-            # Special handling for PHP integration transactions that use PAYMENT type
-            # but might be SWIFT transfers - check based on institution_id being set
-            if tx.institution_id is not None:
-                institution = FinancialInstitution.query.get(tx.institution_id)
-                if institution and 'bank' in institution.name.lower():
-                    swift_transactions.append(tx)
-                    continue
-        except Exception as e:
-            logger.error(f"Error processing potential SWIFT transaction: {str(e)}")
-            # Continue to next transaction
+    # SWIFT traffic is classified on write (Transaction.message_channel), so
+    # the filter and the newest-first pagination both run in the database
+    query = Transaction.query.filter(
+        Transaction.user_id == current_user.id,
+        Transaction.message_channel == MessageChannel.SWIFT
+    )
+    try:
+        page = keyset_paginate(
+            query, Transaction.created_at, Transaction.id,
+            after=request.args.get('after'), before=request.args.get('before'),
+            per_page=25
+        )
+    except ValueError:
+        # Invalid cursor - start from the newest messages
+        page = keyset_paginate(query, Transaction.created_at, Transaction.id, per_page=25)
+    swift_transactions = page.items
 
     # Create a list of message objects with additional data
-    messages = []
+    parsed = []
     for tx in swift_transactions:
         # Parse metadata
         try:
             metadata = json.loads(tx.tx_metadata_json) if tx.tx_metadata_json else {}
         except json.JSONDecodeError:
             metadata = {}
+        parsed.append((tx, metadata))
+
+    # Look up the page's receiving institutions in one query
+    institution_ids = {str(metadata['receiver_institution_id']) for _, metadata in parsed
+                       if metadata.get('receiver_institution_id')}
+    institution_names = {}
+    if institution_ids:
+        institution_names = {str(institution_id): name for institution_id, name in db.session.query(
+            FinancialInstitution.id, FinancialInstitution.name
+        ).filter(FinancialInstitution.id.in_([int(i) for i in institution_ids if i.isdigit()])).all()}
 
+    messages = []
+    for tx, metadata in parsed:
         # Get institution name
         institution_name = ""
         if 'receiver_institution_id' in metadata:
-            institution = FinancialInstitution.query.get(metadata.get('receiver_institution_id'))
-            if institution:
-                institution_name = institution.name
+            institution_name = institution_names.get(str(metadata.get('receiver_institution_id')), "")
         elif 'receiver_institution_name' in metadata:
             institution_name = metadata.get('receiver_institution_name')
 
@@ -625,7 +575,7 @@ def swift_messages():
             'metadata': metadata
         })
 
-    return render_template('swift_messages.html', messages=messages)
+    return render_template('swift_messages.html', messages=messages, page=page)
 
 @swift.route('/message/view/<transaction_id>')
 @login_required
@@ -638,49 +588,15 @@ def view_swift_message(transaction_id):
 
     # Check if it's a SWIFT message
     try:
-        is_swift_message = False
-
-        # Get the transaction type value safely
-        tx_type = None
-        if hasattr(transaction.transaction_type, 'value'):
-            tx_type = transaction.transaction_type.value
-        elif hasattr(transaction.transaction_type, 'name'):
-            tx_type = transaction.transaction_type.name
-        else:
-            tx_type = str(transaction.transaction_type)
-
-        # Check if this is a SWIFT transaction type
-        if isinstance(tx_type, str) and 'swift' in tx_type.lower():
-            is_swift_message = True
-
-        # If not a SWIFT type, check description for SWIFT hints
-        if not is_swift_message and transaction.description and ('SWIFT' in transaction.description or 
-                              'Letter of Credit' in transaction.description or 
-                              'Fund Transfer' in transaction.description or 
-                              'Financial Institution Transfer' in transaction.description):
-            is_swift_message = True
-
-        # Then check metadata for SWIFT-specific data
-        if not is_swift_message and transaction.tx_metadata_json:
-            try:
-                metadata = json.loads(transaction.tx_metadata_json)
-                if 'message_type' in metadata and metadata['message_type'] in ['MT103', 'MT202', 'MT760', 'MT799']:
-                    is_swift_message = True
-                # Check for references that follow SWIFT formats
-                elif 'reference' in metadata and any(metadata['reference'].startswith(prefix) 
-                        for prefix in ['FT', 'IT', 'LC', 'FM']):
-                    is_swift_message = True
-                # Check for receiver institution which indicates SWIFT message
-                elif 'receiver_institution' in metadata or 'receiving_institution' in metadata:
-                    is_swift_message = True
-            except (json.JSONDecodeError, AttributeError):
-                pass
-
-        # Special case for PAYMENT type with institution ID (possible PHP integration)
-        if not is_swift_message and (tx_type == 'PAYMENT' or tx_type == 'payment') and transaction.institution_id is not None:
-            institution = FinancialInstitution.query.get(transaction.institution_id)
-            if institution and 'bank' in institution.name.lower():
-                is_swift_message = True
+        channel = transaction.message_channel
+        if channel is None:
+            # Row written before message_channel was backfilled
+            institution = FinancialInstitution.query.get(transaction.institution_id) if transaction.institution_id else None
+            channel = classify_message_channel(
+                transaction.transaction_type, transaction.description, transaction.tx_metadata_json,
+                institution.name if institution else None
+            )
+        is_swift_message = channel == MessageChannel.SWIFT
 
         if not is_swift_message:
             flash('This transaction is not a SWIFT message.', 'warning')
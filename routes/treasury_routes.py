@@ -16,6 +16,7 @@ from sqlalchemy import desc, func
 from generate_transaction_pdf import generate_transaction_pdf
 
 from app import db
+from money import to_decimal
 from models import (
     User, FinancialInstitution, FinancialInstitutionType, Transaction, TransactionStatus, TransactionType,
     TreasuryAccount, TreasuryAccountType, TreasuryTransaction, TreasuryTransactionType,
@@ -557,7 +558,7 @@ def approve_transaction(transaction_id):
             to_account = TreasuryAccount.query.get(transaction.to_account_id)
             # If currencies are different, calculate the amount with exchange rate
             if transaction.from_account_id and from_account.currency != to_account.currency:
-                converted_amount = transaction.amount * transaction.exchange_rate
+                converted_amount = transaction.amount * to_decimal(transaction.exchange_rate)
             else:
                 converted_amount = transaction.amount
             
@@ -821,8 +822,8 @@ def approve_investment(investment_id):
                 flash('Insufficient funds in the account.', 'danger')
                 return redirect(url_for('treasury.view_investment', investment_id=investment.id))
             
-            account.current_balance -= investment.amount
-            account.available_balance -= investment.amount
+            account.current_balance -= to_decimal(investment.amount)
+            account.available_balance -= to_decimal(investment.amount)
             
             # Update transaction and investment status
             transaction.status = TransactionStatus.COMPLETED
@@ -878,8 +879,8 @@ def mature_investment(investment_id):
         
         # Update account balance
         account = TreasuryAccount.query.get(investment.account_id)
-        account.current_balance += maturity_value
-        account.available_balance += maturity_value
+        account.current_balance += to_decimal(maturity_value)
+        account.available_balance += to_decimal(maturity_value)
         
         # Update investment status
         investment.status = InvestmentStatus.COMPLETED
@@ -1033,8 +1034,8 @@ def disburse_loan(loan_id):
     try:
         # Update account balance
         account = TreasuryAccount.query.get(loan.account_id)
-        account.current_balance += loan.principal_amount
-        account.available_balance += loan.principal_amount
+        account.current_balance += to_decimal(loan.principal_amount)
+        account.available_balance += to_decimal(loan.principal_amount)
         
         # Update transaction status
         transaction.status = TransactionStatus.COMPLETED
@@ -1131,13 +1132,13 @@ def approve_loan_payment(loan_id, transaction_id):
         
         # Extract principal and interest from description
         # This is a simplification - in a real system, these would be stored as separate fields
-        principal_amount = Decimal(str(transaction.amount)) * Decimal('0.8')  # Assume 80% principal for demo
+        principal_amount = transaction.amount * Decimal('0.8')  # Assume 80% principal for demo
         interest_amount = transaction.amount - principal_amount
         
-        # Update loan details
-        loan.outstanding_amount -= principal_amount
-        loan.total_payments = (loan.total_payments or 0) + transaction.amount
-        loan.total_interest_paid = (loan.total_interest_paid or 0) + interest_amount
+        # Update loan details (the loan's amounts are float columns)
+        loan.outstanding_amount -= float(principal_amount)
+        loan.total_payments = (loan.total_payments or 0) + float(transaction.amount)
+        loan.total_interest_paid = (loan.total_interest_paid or 0) + float(interest_amount)
         
         # Update loan status if fully paid
         if loan.outstanding_amount <= 0:
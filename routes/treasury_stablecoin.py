@@ -5,6 +5,7 @@ This module handles transfers between Treasury Accounts and NVCT stablecoin acco
 
 import json
 from datetime import datetime
+from decimal import InvalidOperation
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, session
 from flask_login import login_required, current_user
@@ -15,6 +16,7 @@ from account_holder_models import AccountHolder, BankAccount, AccountType
 from account_generator import create_additional_account
 from decorators import roles_required
 from utils import generate_transaction_id, format_currency
+from money import to_decimal
 
 # Blueprint Definition
 treasury_bp = Blueprint('treasury_stablecoin', __name__, url_prefix='/treasury-stablecoin')
@@ -52,9 +54,11 @@ def transfer_to_stablecoin():
             # Handle amount with comma separators
             amount_str = request.form.get('amount', '')
             try:
-                # Remove commas and convert to float
-                amount = float(amount_str.replace(',', ''))
-            except ValueError:
+                # Remove commas and convert to Decimal
+                amount = to_decimal(amount_str.replace(',', ''))
+                if not amount.is_finite():
+                    amount = None
+            except InvalidOperation:
                 amount = None
                 
             description = request.form.get('description', '')
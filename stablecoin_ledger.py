@@ -0,0 +1,349 @@
+"""
+NVC Token Stablecoin Ledger Posting Engine
+
+Posts stablecoin transfers in batches:
+
+1. Every account touched by the batch is locked with SELECT ... FOR UPDATE
+   in ascending id order, so concurrent batches cannot deadlock and no
+   balance update is lost.
+2. Transfers are validated and applied in submission order against the
+   locked balances; a transfer that fails (insufficient funds, inactive
+   account) is rejected on its own without failing the batch.
+3. Each account's net change is written as one atomic
+   ``balance = balance + delta`` update, and the Transaction and
+   LedgerEntry rows for the whole batch are bulk inserted.
+4. The batch is committed once.
+
+``LedgerPoster`` groups transfers submitted concurrently (e.g. by request
+threads) into such batches on a background thread (group commit).
+"""
+
+import queue
+import logging
+import secrets
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import insert, update, select, bindparam
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from money import quantize_amount
+from models import (
+    StablecoinAccount,
+    LedgerEntry,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+    classify_message_channel
+)
+
+logger = logging.getLogger(__name__)
+
+# Stablecoin accounts are denominated in NVCT
+STABLECOIN_CURRENCY = 'NVCT'
+
+
+class TransferRequest:
+    """
+    A stablecoin transfer waiting to be posted
+
+    A request is queued until the poster claims it for a batch. A waiter that
+    times out cancels it only while it is still queued, so a transfer
+    reported as timed out is never posted afterwards.
+    """
+
+    QUEUED, POSTING, CANCELLED = 'queued', 'posting', 'cancelled'
+
+    __slots__ = ('from_account_id', 'to_account_id', 'amount', 'description', 'transaction_id',
+                 'error', '_done', '_state', '_state_lock')
+
+    def __init__(self, from_account_id, to_account_id, amount, description=None):
+        self.from_account_id = from_account_id
+        self.to_account_id = to_account_id
+        self.amount = quantize_amount(amount, STABLECOIN_CURRENCY)
+        self.description = description
+        self.transaction_id = secrets.token_hex(16)
+        self.error = None
+        self._done = threading.Event()
+        self._state = self.QUEUED
+        self._state_lock = threading.Lock()
+
+    def claim(self):
+        """Take the transfer for posting; False if its waiter already cancelled it"""
+        with self._state_lock:
+            if self._state == self.CANCELLED:
+                return False
+            self._state = self.POSTING
+            return True
+
+    def cancel(self):
+        """Withdraw the transfer if the poster has not claimed it yet"""
+        with self._state_lock:
+            if self._state != self.QUEUED:
+                return False
+            self._state = self.CANCELLED
+            self.error = "Timed out waiting for the ledger; the transfer was cancelled and not posted"
+            return True
+
+    def reject(self, error):
+        self.error = error
+
+    def finish(self):
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """
+        Wait until the transfer is posted or rejected
+
+        On timeout a still-queued transfer is cancelled. One already being
+        posted is waited for once more; if it is still not finished its
+        outcome is unknown and the error names its transaction_id, which
+        must be checked before the transfer is retried.
+
+        Returns:
+            tuple: (transaction_id, None) on success or (None, error)
+        """
+        if not self._done.wait(timeout):
+            if self.cancel():
+                return None, self.error
+            if not self._done.wait(timeout):
+                return None, (f"Transfer {self.transaction_id} is still being posted and its outcome is unknown; "
+                              f"check the transaction before retrying")
+        if self.error:
+            return None, self.error
+        return self.transaction_id, None
+
+
+def post_transfers(transfers, session=None):
+    """
+    Post a batch of transfers in one database transaction
+
+    Args:
+        transfers (list): TransferRequest objects; each one is marked posted or
+            rejected (see TransferRequest.error)
+        session: Session to use (default: db.session)
+
+    Returns:
+        int: Number of transfers posted
+    """
+    session = session or db.session
+    account_ids = set()
+    for transfer in transfers:
+        if transfer.amount <= 0:
+            transfer.reject("Transfer amount must be positive")
+        elif transfer.from_account_id == transfer.to_account_id:
+            transfer.reject("Cannot transfer to the same account")
+        else:
+            account_ids.update((transfer.from_account_id, transfer.to_account_id))
+
+    pending = [transfer for transfer in transfers if transfer.error is None]
+    if not pending:
+        return 0
+
+    try:
+        # Lock in a deterministic order so concurrent batches cannot deadlock
+        rows = session.execute(
+            select(
+                StablecoinAccount.id,
+                StablecoinAccount.account_number,
+                StablecoinAccount.user_id,
+                StablecoinAccount.currency,
+                StablecoinAccount.balance,
+                StablecoinAccount.is_active
+            ).where(StablecoinAccount.id.in_(account_ids)).order_by(StablecoinAccount.id).with_for_update()
+        ).all()
+        accounts = {row.id: row for row in rows}
+        balances = {row.id: quantize_amount(row.balance or 0, row.currency) for row in rows}
+        deltas = {}
+
+        now = datetime.utcnow()
+        channel = classify_message_channel(TransactionType.STABLECOIN_TRANSFER)
+        transaction_rows = []
+        entry_rows = []
+        posted = 0
+
+        for transfer in pending:
+            source = accounts.get(transfer.from_account_id)
+            destination = accounts.get(transfer.to_account_id)
+            if source is None:
+                transfer.reject("Source account not found")
+                continue
+            if destination is None:
+                transfer.reject("Destination account not found")
+                continue
+            if not source.is_active:
+                transfer.reject("Source account is inactive")
+                continue
+            if not destination.is_active:
+                transfer.reject("Destination account is inactive")
+                continue
+            if balances[source.id] < transfer.amount:
+                transfer.reject("Insufficient funds")
+                continue
+
+            balances[source.id] -= transfer.amount
+            balances[destination.id] += transfer.amount
+            deltas[source.id] = deltas.get(source.id, Decimal(0)) - transfer.amount
+            deltas[destination.id] = deltas.get(destination.id, Decimal(0)) + transfer.amount
+            amount = transfer.amount
+
+            transaction_rows.append({
+                'transaction_id': transfer.transaction_id,
+                'user_id': source.user_id,
+                'amount': amount,
+                'currency': source.currency,
+                'transaction_type': TransactionType.STABLECOIN_TRANSFER,
+                'status': TransactionStatus.COMPLETED,
+                'message_channel': channel,
+                'description': transfer.description or f"Transfer to {destination.account_number}",
+                'recipient_name': f"Account: {destination.account_number}",
+                'recipient_account': destination.account_number,
+                'created_at': now,
+                'updated_at': now
+            })
+            entry_rows.append({
+                'transaction_id': transfer.transaction_id,
+                'account_id': source.id,
+                'entry_type': 'DEBIT',
+                'amount': amount,
+                'balance_after': balances[source.id],
+                'description': f"Transfer to {destination.account_number}",
+                'created_at': now
+            })
+            entry_rows.append({
+                'transaction_id': transfer.transaction_id,
+                'account_id': destination.id,
+                'entry_type': 'CREDIT',
+                'amount': amount,
+                'balance_after': balances[destination.id],
+                'description': f"Transfer from {source.account_number}",
+                'created_at': now
+            })
+            posted += 1
+
+        if posted:
+            account_table = StablecoinAccount.__table__
+            session.execute(
+                update(account_table).where(account_table.c.id == bindparam('account_id')).values(
+                    balance=account_table.c.balance + bindparam('delta'),
+                    updated_at=now
+                ),
+                [{'account_id': account_id, 'delta': delta}
+                 for account_id, delta in deltas.items() if delta]
+            )
+            session.execute(insert(Transaction.__table__), transaction_rows)
+            session.execute(insert(LedgerEntry.__table__), entry_rows)
+        session.commit()
+
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.error(f"Database error posting {len(pending)} stablecoin transfers: {str(e)}")
+        for transfer in pending:
+            if transfer.error is None:
+                transfer.reject(f"Database error: {str(e)}")
+        return 0
+
+    # Core updates bypass the session events that maintain the balance cache
+    if posted:
+        try:
+            from balance_cache import invalidate_balance
+            for account_id in deltas:
+                invalidate_balance('stablecoin', account_id)
+        except Exception as e:
+            logger.warning(f"Could not invalidate cached stablecoin balances: {str(e)}")
+
+    return posted
+
+
+class LedgerPoster:
+    """Background thread that posts submitted transfers in group commits"""
+
+    def __init__(self, app, max_batch=500, max_delay=0.002):
+        """
+        Args:
+            app: Flask application (for the app context)
+            max_batch (int): Maximum transfers per commit
+            max_delay (float): Seconds to wait for more transfers after the first one
+        """
+        self.app = app
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'batches': 0, 'posted': 0, 'rejected': 0}
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stablecoin-ledger-poster', daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, from_account_id, to_account_id, amount, description=None):
+        """
+        Queue a transfer for the next batch
+
+        Returns:
+            TransferRequest; call wait() for the outcome
+        """
+        transfer = TransferRequest(from_account_id, to_account_id, amount, description)
+        self._queue.put(transfer)
+        return transfer
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        try:
+            # Whatever is already queued goes into this batch without waiting
+            while len(batch) < self.max_batch:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if len(batch) < self.max_batch and self.max_delay:
+            try:
+                batch.append(self._queue.get(timeout=self.max_delay))
+                while len(batch) < self.max_batch:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            # Transfers whose waiters timed out while queued are dropped
+            claimed = [transfer for transfer in batch if transfer.claim()]
+            if not claimed:
+                continue
+            batch = claimed
+            try:
+                with self.app.app_context():
+                    posted = post_transfers(batch)
+                    db.session.remove()
+                self.stats['batches'] += 1
+                self.stats['posted'] += posted
+                self.stats['rejected'] += len(batch) - posted
+            except Exception as e:
+                logger.error(f"Stablecoin ledger poster failed: {str(e)}")
+                for transfer in batch:
+                    if transfer.error is None and not transfer._done.is_set():
+                        transfer.reject(f"Error: {str(e)}")
+            finally:
+                for transfer in batch:
+                    transfer.finish()
+
+
+_poster = None
+_poster_lock = threading.Lock()
+
+
+def get_ledger_poster(app):
+    """Get the process-wide ledger poster, starting it on first use"""
+    global _poster
+    with _poster_lock:
+        if _poster is None:
+            _poster = LedgerPoster(app)
+        return _poster.start()
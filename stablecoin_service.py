@@ -13,7 +13,6 @@ global settlement operations.
 import logging
 import secrets
 from datetime import datetime
-from decimal import Decimal
 
 from flask import current_app
 from sqlalchemy.exc import SQLAlchemyError
@@ -95,90 +94,36 @@ def get_account_balance(account_id):
         return None, f"Error: {str(e)}"
 
 def transfer_stablecoins(from_account_id, to_account_id, amount, description=None):
-    """Transfer stablecoins between accounts"""
+    """
+    Transfer stablecoins between accounts
+
+    The transfer is posted by the ledger engine (see stablecoin_ledger), which
+    locks both accounts and commits it together with other transfers
+    submitted at the same time.
+    """
     try:
-        # Convert amount to float with 2 decimal precision
-        amount = float(Decimal(str(amount)).quantize(Decimal('0.01')))
-        
-        if amount <= 0:
-            return None, "Transfer amount must be positive"
-        
-        # Get source and destination accounts
-        source_account = StablecoinAccount.query.get(from_account_id)
-        if not source_account:
-            return None, "Source account not found"
-        
-        destination_account = StablecoinAccount.query.get(to_account_id)
-        if not destination_account:
-            return None, "Destination account not found"
-        
-        # Check if accounts are active
-        if not source_account.is_active:
-            return None, "Source account is inactive"
-        
-        if not destination_account.is_active:
-            return None, "Destination account is inactive"
-        
-        # Check sufficient balance
-        if source_account.balance < amount:
-            return None, "Insufficient funds"
-        
-        # Generate unique transaction ID
-        transaction_id = secrets.token_hex(16)
-        
-        # Create transaction record
-        transaction = Transaction(
-            transaction_id=transaction_id,
-            user_id=source_account.user_id,
-            amount=amount,
-            currency=source_account.currency,
-            transaction_type=TransactionType.STABLECOIN_TRANSFER,
-            status=TransactionStatus.COMPLETED,
-            description=description or f"Transfer to {destination_account.account_number}",
-            recipient_name=f"Account: {destination_account.account_number}",
-            recipient_account=destination_account.account_number
-        )
-        
-        # Update account balances
-        source_account.balance -= amount
-        destination_account.balance += amount
-        
-        # Create ledger entries
-        source_balance_after = source_account.balance
-        dest_balance_after = destination_account.balance
-        
-        debit_entry = LedgerEntry(
-            transaction_id=transaction_id,
-            account_id=source_account.id,
-            entry_type='DEBIT',
-            amount=amount,
-            balance_after=source_balance_after,
-            description=f"Transfer to {destination_account.account_number}"
-        )
-        
-        credit_entry = LedgerEntry(
-            transaction_id=transaction_id,
-            account_id=destination_account.id,
-            entry_type='CREDIT',
-            amount=amount,
-            balance_after=dest_balance_after,
-            description=f"Transfer from {source_account.account_number}"
+        from stablecoin_ledger import get_ledger_poster
+
+        poster = get_ledger_poster(current_app._get_current_object())
+        transaction_id, error = poster.submit(from_account_id, to_account_id, amount, description).wait(
+            timeout=current_app.config.get('STABLECOIN_LEDGER_TIMEOUT', 30)
         )
-        
-        # Save everything to database
-        db.session.add(transaction)
-        db.session.add(debit_entry)
-        db.session.add(credit_entry)
-        db.session.commit()
-        
-        logger.info(f"Completed stablecoin transfer of {amount} {source_account.currency} from {source_account.account_number} to {destination_account.account_number}")
+        if error:
+            logger.warning(f"Stablecoin transfer from account {from_account_id} to {to_account_id} rejected: {error}")
+            return None, error
+
+        # Balances were changed by the poster's session; don't serve stale copies from this one
+        db.session.expire_all()
+        transaction = Transaction.query.filter_by(transaction_id=transaction_id).first()
+
+        logger.info(f"Completed stablecoin transfer {transaction_id} of {transaction.amount} {transaction.currency} from account {from_account_id} to {to_account_id}")
         return transaction, None
-    
+
     except SQLAlchemyError as e:
         db.session.rollback()
         logger.error(f"Database error during stablecoin transfer: {str(e)}")
         return None, f"Database error: {str(e)}"
-    
+
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error processing stablecoin transfer: {str(e)}")
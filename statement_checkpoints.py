@@ -0,0 +1,424 @@
+"""
+Bank Account Balance Checkpoints for NVC Banking Platform
+
+Account statements need the balance at the start of an arbitrary period.
+Instead of deriving it from every transaction since then, the balance is
+recorded at the close of each day the account had activity
+(BankAccountBalanceCheckpoint), and a balance at any moment is the nearest
+checkpoint plus the few entries between the two, read through the
+ix_transaction_recipient_account_created index.
+
+- An account's entries are the transactions whose recipient_account is its
+  account number; the signed amount is the balance change.
+- Any insert, update or delete of an entry dated before today removes the
+  account's checkpoints from that moment on in the same database
+  transaction (before_flush hook); the compactor rebuilds them.
+- Daily checkpoints older than DAILY_RETENTION_DAYS are thinned out to one
+  per month, which bounds the table while keeping the delta scan to at most
+  a month of the account's entries.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta, date, time as day_time
+
+import numpy as np
+from sqlalchemy import event, inspect, func, delete, select, and_
+
+from app import db
+from models import Transaction
+from account_holder_models import BankAccount, BankAccountBalanceCheckpoint
+from money import minor_units, exact_minor_units, from_minor_units, minor_array
+
+logger = logging.getLogger(__name__)
+
+# Transaction columns that change an account's balance history
+ENTRY_FIELDS = ('amount', 'recipient_account', 'created_at')
+
+# Daily checkpoints are kept this long, then only the last one of each month
+DAILY_RETENTION_DAYS = 90
+
+# Entries, account balances and checkpoints share this minor-unit scale
+SCALE = Transaction.amount.type.scale
+
+_hooks_registered = False
+
+
+def _start_of_day(day):
+    return datetime.combine(day, day_time.min)
+
+
+def _as_date(value):
+    # func.date() returns a string on SQLite and a date elsewhere
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _entry_sum(account_number, start=None, end=None):
+    """Sum of an account's entries in [start, end), in minor units"""
+    query = db.session.query(minor_units(func.sum(Transaction.amount))).filter(
+        Transaction.recipient_account == account_number
+    )
+    if start is not None:
+        query = query.filter(Transaction.created_at >= start)
+    if end is not None:
+        query = query.filter(Transaction.created_at < end)
+    return int(query.scalar() or 0)
+
+
+def balance_at(account, moment):
+    """
+    Get an account's balance at a moment, in minor units
+
+    Args:
+        account (BankAccount): The account
+        moment (datetime): Point in time (UTC)
+
+    Returns:
+        int: Balance in minor units (see money.py)
+    """
+    balance = minor_units(BankAccountBalanceCheckpoint.balance)
+    before = db.session.query(BankAccountBalanceCheckpoint.as_of, balance).filter(
+        BankAccountBalanceCheckpoint.account_id == account.id,
+        BankAccountBalanceCheckpoint.as_of <= moment
+    ).order_by(BankAccountBalanceCheckpoint.as_of.desc()).first()
+    if before:
+        return int(before[1]) + _entry_sum(account.account_number, before[0], moment)
+
+    after = db.session.query(BankAccountBalanceCheckpoint.as_of, balance).filter(
+        BankAccountBalanceCheckpoint.account_id == account.id,
+        BankAccountBalanceCheckpoint.as_of > moment
+    ).order_by(BankAccountBalanceCheckpoint.as_of.asc()).first()
+    if after:
+        return int(after[1]) - _entry_sum(account.account_number, moment, after[0])
+
+    # No checkpoints yet: work back from the current balance
+    return exact_minor_units(account.balance or 0, SCALE) - _entry_sum(account.account_number, moment)
+
+
+def _checkpoint_balances(account_ids, moment, before):
+    """
+    Balances at a moment of the accounts with a checkpoint at or before it
+    (before=True) or after it (before=False), in one query
+
+    Returns:
+        dict: account id -> balance in minor units, for the accounts with such a checkpoint
+    """
+    as_of = BankAccountBalanceCheckpoint.as_of
+    rank = func.row_number().over(
+        partition_by=BankAccountBalanceCheckpoint.account_id,
+        order_by=as_of.desc() if before else as_of.asc()
+    ).label('rank')
+    ranked = db.session.query(
+        BankAccountBalanceCheckpoint.account_id, as_of,
+        minor_units(BankAccountBalanceCheckpoint.balance).label('minor'), rank
+    ).filter(
+        BankAccountBalanceCheckpoint.account_id.in_(account_ids),
+        as_of <= moment if before else as_of > moment
+    ).subquery()
+
+    # The entries between the nearest checkpoint and the moment
+    if before:
+        window = and_(Transaction.created_at >= ranked.c.as_of, Transaction.created_at < moment)
+    else:
+        window = and_(Transaction.created_at >= moment, Transaction.created_at < ranked.c.as_of)
+    rows = db.session.query(
+        ranked.c.account_id, ranked.c.minor, minor_units(func.sum(Transaction.amount))
+    ).join(
+        BankAccount, BankAccount.id == ranked.c.account_id
+    ).outerjoin(
+        Transaction, and_(Transaction.recipient_account == BankAccount.account_number, window)
+    ).filter(ranked.c.rank == 1).group_by(ranked.c.account_id, ranked.c.minor)
+
+    sign = 1 if before else -1
+    return {account_id: int(minor) + sign * int(total or 0) for account_id, minor, total in rows}
+
+
+def balances_at(accounts, moment):
+    """
+    Get several accounts' balances at a moment, in minor units
+
+    Same result as balance_at for each account, in at most three queries
+    for the whole batch instead of two or three per account.
+
+    Args:
+        accounts (list): BankAccounts
+        moment (datetime): Point in time (UTC)
+
+    Returns:
+        dict: account id -> balance in minor units (see money.py)
+    """
+    if not accounts:
+        return {}
+    balances = _checkpoint_balances([account.id for account in accounts], moment, before=True)
+    rest = [account for account in accounts if account.id not in balances]
+    if rest:
+        balances.update(_checkpoint_balances([account.id for account in rest], moment, before=False))
+    uncovered = [account for account in rest if account.id not in balances]
+    if uncovered:
+        # No checkpoints yet: work back from the current balances
+        sums = dict(db.session.query(
+            Transaction.recipient_account, minor_units(func.sum(Transaction.amount))
+        ).filter(
+            Transaction.recipient_account.in_([account.account_number for account in uncovered]),
+            Transaction.created_at >= moment
+        ).group_by(Transaction.recipient_account).all())
+        for account in uncovered:
+            balances[account.id] = (exact_minor_units(account.balance or 0, SCALE)
+                                    - int(sums.get(account.account_number) or 0))
+    return balances
+
+
+def get_balance_at(account, moment):
+    """Get an account's balance at a moment as a float amount"""
+    return float(from_minor_units(balance_at(account, moment), SCALE))
+
+
+def running_balances(opening_minor, amounts):
+    """
+    Compute the balance after each entry
+
+    Args:
+        opening_minor (int): Balance before the first entry, in minor units
+        amounts (list): Signed entry amounts in time order
+
+    Returns:
+        numpy.ndarray of minor units (see money.minor_array)
+    """
+    minors = [exact_minor_units(amount or 0, SCALE) for amount in amounts]
+    return np.cumsum(minor_array([opening_minor] + minors))[1:]
+
+
+def build_checkpoints(account, session=None):
+    """
+    Record the closing balance of every closed day with entries since the
+    account's latest checkpoint
+
+    Closing balances are derived from the current balance minus the entries
+    after each day. The account row is re-read and locked first, so the
+    balance and the entry sums agree even if the account was loaded earlier
+    (e.g. in bulk) or is being posted to concurrently; the lock is held
+    until the caller commits.
+
+    Args:
+        account (BankAccount): The account
+        session: Session to use (default: db.session)
+
+    Returns:
+        int: Number of checkpoints added
+    """
+    session = session or db.session
+    today = datetime.utcnow().date()
+
+    latest = session.query(func.max(BankAccountBalanceCheckpoint.as_of)).filter(
+        BankAccountBalanceCheckpoint.account_id == account.id
+    ).scalar()
+
+    # Postings update the balance under the account's row lock, so none lands between the two reads
+    session.refresh(account, with_for_update=True)
+
+    entry_day = func.date(Transaction.created_at)
+    query = session.query(
+        entry_day, minor_units(func.sum(Transaction.amount)), func.count()
+    ).filter(Transaction.recipient_account == account.account_number)
+    if latest is not None:
+        query = query.filter(Transaction.created_at >= latest)
+    rows = query.group_by(entry_day).order_by(entry_day.desc()).all()
+    if not rows:
+        return 0
+
+    # Newest first: the entries after a day are the running sum of the days before it in this order
+    totals = minor_array([int(row[1] or 0) for row in rows])
+    after = np.concatenate(([0], np.cumsum(totals)[:-1]))
+    current = exact_minor_units(account.balance or 0, SCALE)
+
+    added = 0
+    for (day, _, count), later in zip(rows, after):
+        day = _as_date(day)
+        if day >= today:
+            continue
+        session.add(BankAccountBalanceCheckpoint(
+            account_id=account.id,
+            as_of=_start_of_day(day + timedelta(days=1)),
+            balance=from_minor_units(current - int(later), SCALE),
+            entry_count=count
+        ))
+        added += 1
+    return added
+
+
+def prune_checkpoints(retention_days=DAILY_RETENTION_DAYS):
+    """
+    Keep only the last checkpoint of each month for checkpoints older than
+    retention_days
+
+    Returns:
+        int: Number of checkpoints removed
+    """
+    cutoff = _start_of_day(datetime.utcnow().date() - timedelta(days=retention_days))
+    rows = db.session.query(
+        BankAccountBalanceCheckpoint.id,
+        BankAccountBalanceCheckpoint.account_id,
+        BankAccountBalanceCheckpoint.as_of
+    ).filter(BankAccountBalanceCheckpoint.as_of < cutoff).order_by(
+        BankAccountBalanceCheckpoint.account_id, BankAccountBalanceCheckpoint.as_of.desc()
+    ).all()
+
+    keep = set()
+    redundant = []
+    for checkpoint_id, account_id, as_of in rows:
+        # as_of is the start of the next day, so step back to the day it closes
+        month = (account_id, (as_of - timedelta(days=1)).strftime('%Y-%m'))
+        if month in keep:
+            redundant.append(checkpoint_id)
+        else:
+            keep.add(month)
+
+    if redundant:
+        db.session.execute(delete(BankAccountBalanceCheckpoint).where(
+            BankAccountBalanceCheckpoint.id.in_(redundant)
+        ), execution_options={'synchronize_session': False})
+        db.session.commit()
+    return len(redundant)
+
+
+def compact():
+    """
+    Build missing checkpoints for every account with closed-day entries not
+    covered yet, then prune old daily checkpoints
+
+    Returns:
+        int: Number of checkpoints added
+    """
+    today_start = _start_of_day(datetime.utcnow().date())
+    latest_checkpoint = select(func.max(BankAccountBalanceCheckpoint.as_of)).where(
+        BankAccountBalanceCheckpoint.account_id == BankAccount.id
+    ).scalar_subquery()
+    account_ids = [account_id for (account_id,) in db.session.query(BankAccount.id).join(
+        Transaction, Transaction.recipient_account == BankAccount.account_number
+    ).filter(
+        Transaction.created_at < today_start
+    ).group_by(BankAccount.id).having(
+        func.max(Transaction.created_at) >= func.coalesce(latest_checkpoint, datetime.min)
+    ).all()]
+
+    added = 0
+    for account_id in account_ids:
+        try:
+            account = db.session.get(BankAccount, account_id)
+            added += build_checkpoints(account)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error building balance checkpoints for account {account_id}: {str(e)}")
+
+    try:
+        pruned = prune_checkpoints()
+    except Exception as e:
+        db.session.rollback()
+        pruned = 0
+        logger.error(f"Error pruning balance checkpoints: {str(e)}")
+
+    if added or pruned:
+        logger.info(f"Added {added} balance checkpoints for {len(account_ids)} accounts, pruned {pruned}")
+    return added
+
+
+def _before_flush(session, flush_context, instances):
+    """Drop the checkpoints that entries about to change would make stale"""
+    today_start = _start_of_day(datetime.utcnow().date())
+    earliest = {}
+    transactions = [instance for instance in list(session.new) + list(session.dirty) + list(session.deleted)
+                    if isinstance(instance, Transaction)]
+    with session.no_autoflush:
+        for instance in transactions:
+            _collect_changes(session, instance, today_start, earliest)
+
+    invalidate_checkpoints(session, earliest)
+
+
+def invalidate_checkpoints(session, earliest):
+    """
+    Drop the checkpoints after the earliest changed moment of each account
+
+    The before_flush hook covers ORM writes; bulk INSERT/UPDATE statements
+    bypass it and must call this in the same database transaction.
+
+    Args:
+        session: Session the transaction writes run in
+        earliest (dict): Account number -> earliest past created_at that changed
+    """
+    for account_number, moment in earliest.items():
+        session.execute(delete(BankAccountBalanceCheckpoint).where(
+            BankAccountBalanceCheckpoint.account_id.in_(
+                select(BankAccount.id).where(BankAccount.account_number == account_number)
+            ),
+            BankAccountBalanceCheckpoint.as_of > moment
+        ), execution_options={'synchronize_session': False})
+
+
+def _collect_changes(session, instance, today_start, earliest):
+    """Record the earliest past moment each affected account's history changes at"""
+    accounts = {instance.recipient_account}
+    moments = {instance.created_at}
+    if instance in session.dirty and instance not in session.deleted:
+        state = inspect(instance)
+        if not any(state.attrs[field].history.has_changes() for field in ENTRY_FIELDS):
+            return
+        # A moved entry changes the history of its old account and its old date too
+        accounts.update(state.attrs.recipient_account.history.deleted or ())
+        moments.update(state.attrs.created_at.history.deleted or ())
+
+    past = [moment for moment in moments if moment is not None and moment < today_start]
+    if not past:
+        return
+    moment = min(past)
+    for account_number in accounts:
+        if account_number and (account_number not in earliest or moment < earliest[account_number]):
+            earliest[account_number] = moment
+
+
+def register_checkpoint_hooks(session):
+    """
+    Keep balance checkpoints in step with transaction writes
+
+    Args:
+        session: Session class, sessionmaker or scoped_session (e.g. db.session)
+    """
+    global _hooks_registered
+    if _hooks_registered:
+        return
+    event.listen(session, 'before_flush', _before_flush)
+    _hooks_registered = True
+
+
+def start_checkpoint_compactor(app, interval=3600):
+    """
+    Start a daemon thread that builds missing checkpoints every interval seconds
+
+    Args:
+        app: Flask application (for the app context)
+        interval (int): Seconds between runs
+    """
+    stop_event = threading.Event()
+
+    def run():
+        while not stop_event.is_set():
+            try:
+                with app.app_context():
+                    compact()
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"Balance checkpoint compactor failed: {str(e)}")
+            stop_event.wait(interval)
+
+    thread = threading.Thread(target=run, name='balance-checkpoint-compactor', daemon=True)
+    thread.start()
+    logger.info(f"Balance checkpoint compactor started (every {interval}s)")
+    return stop_event
+
+
+if __name__ == "__main__":
+    from app import app
+    with app.app_context():
+        db.create_all()
+        print(f"Added {compact()} balance checkpoints")
@@ -0,0 +1,313 @@
+"""
+Transaction Analytics Rollups for NVC Banking Platform
+
+Maintains TransactionDailyRollup, a table of transaction count and amount
+per day, user, type and status, so dashboard analytics read a few rows per
+day instead of scanning the transaction table for the whole window.
+
+- A day is "built" once its rollup rows are written and a
+  TransactionRollupDay marker is recorded for it.
+- Any insert, update or delete of a transaction dated before today removes
+  that day's marker in the same database transaction (before_flush hook),
+  so an edited day is never read from stale rollups.
+- Days without a marker (always today, plus any edited day not yet rebuilt)
+  are aggregated live from the transaction table, which only scans those
+  days through the created_at index.
+- A background compactor builds unbuilt closed days periodically.
+- On PostgreSQL, building a day and unmarking it take the same per-day
+  advisory lock, so a build cannot aggregate a day while a concurrent write
+  to it is uncommitted and then mark it built over that write.
+"""
+
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta, date, time as day_time
+
+from sqlalchemy import event, inspect, func, insert, delete, select, literal, or_, and_
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from money import minor_units
+from models import Transaction, TransactionDailyRollup, TransactionRollupDay
+
+logger = logging.getLogger(__name__)
+
+# Transaction columns that move a transaction between rollup buckets
+ROLLUP_FIELDS = ('amount', 'status', 'transaction_type', 'user_id', 'created_at')
+
+# How far back the compactor builds missing days
+MAX_BACKFILL_DAYS = 400
+
+# First key of the per-day advisory locks (the second is the day's ordinal)
+ROLLUP_LOCK_KEY = 0x524F4C4C  # 'ROLL'
+
+# total_minor is the summed amount in integer minor units (see money.py)
+RollupRow = namedtuple('RollupRow', ['date', 'transaction_type', 'status', 'count', 'total_minor'])
+
+_hooks_registered = False
+
+
+def _day_range(day):
+    start = datetime.combine(day, day_time.min)
+    return start, start + timedelta(days=1)
+
+
+def _as_date(value):
+    # func.date() returns a string on SQLite and a date elsewhere
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _lock_days(session, days):
+    """Take the advisory lock of each day until the transaction ends (PostgreSQL only)"""
+    if session.get_bind().dialect.name != 'postgresql':
+        return
+    # Always in date order, so writers touching several days cannot deadlock each other
+    for day in sorted(days):
+        session.execute(select(func.pg_advisory_xact_lock(ROLLUP_LOCK_KEY, day.toordinal())))
+
+
+def build_day(day, session=None):
+    """
+    Rebuild the rollup rows for one day and mark it built
+
+    Args:
+        day (date): Day to build; should be before today
+        session: Session to use (default: db.session); the caller commits
+    """
+    session = session or db.session
+    start, end = _day_range(day)
+
+    # Wait for writers that unmarked this day to commit, so the aggregate sees their rows
+    _lock_days(session, [day])
+    session.execute(delete(TransactionDailyRollup).where(TransactionDailyRollup.day == day),
+                    execution_options={'synchronize_session': False})
+    session.execute(delete(TransactionRollupDay).where(TransactionRollupDay.day == day),
+                    execution_options={'synchronize_session': False})
+
+    aggregate = select(
+        literal(day, type_=db.Date),
+        Transaction.user_id,
+        Transaction.transaction_type,
+        Transaction.status,
+        func.count(),
+        func.coalesce(func.sum(Transaction.amount), 0)
+    ).where(
+        Transaction.created_at >= start,
+        Transaction.created_at < end
+    ).group_by(
+        Transaction.user_id,
+        Transaction.transaction_type,
+        Transaction.status
+    )
+    session.execute(insert(TransactionDailyRollup).from_select(
+        ['day', 'user_id', 'transaction_type', 'status', 'count', 'total_amount'], aggregate
+    ))
+    session.add(TransactionRollupDay(day=day, built_at=datetime.utcnow()))
+
+
+def compact(max_days=MAX_BACKFILL_DAYS):
+    """
+    Build every unbuilt day between the first transaction (at most max_days
+    ago) and yesterday
+
+    Returns:
+        int: Number of days built
+    """
+    today = datetime.utcnow().date()
+    first = db.session.query(func.min(Transaction.created_at)).scalar()
+    if first is None:
+        return 0
+
+    start_day = max(first.date(), today - timedelta(days=max_days))
+    built = {day for (day,) in db.session.query(TransactionRollupDay.day).filter(
+        TransactionRollupDay.day >= start_day
+    )}
+
+    count = 0
+    day = start_day
+    while day < today:
+        if day not in built:
+            try:
+                build_day(day)
+                db.session.commit()
+                count += 1
+            except IntegrityError:
+                # Another worker built the same day concurrently
+                db.session.rollback()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error building transaction rollup for {day}: {str(e)}")
+        day += timedelta(days=1)
+
+    if count:
+        logger.info(f"Built transaction rollups for {count} days")
+    return count
+
+
+def get_daily_totals(start_day, end_day, user_id=None):
+    """
+    Get transaction count and amount per day, type and status
+
+    Built days are read from the rollup table; the remaining days (normally
+    just today) are aggregated from the transaction table.
+
+    Args:
+        start_day (date): First day, inclusive
+        end_day (date): Last day, inclusive
+        user_id (int): Restrict to one user's transactions (None for all)
+
+    Returns:
+        list of RollupRow sorted by date (amounts in Transaction.amount minor units)
+    """
+    built = {day for (day,) in db.session.query(TransactionRollupDay.day).filter(
+        TransactionRollupDay.day >= start_day,
+        TransactionRollupDay.day <= end_day
+    )}
+
+    rows = []
+    if built:
+        query = db.session.query(
+            TransactionDailyRollup.day,
+            TransactionDailyRollup.transaction_type,
+            TransactionDailyRollup.status,
+            func.sum(TransactionDailyRollup.count),
+            minor_units(func.sum(TransactionDailyRollup.total_amount))
+        ).join(
+            TransactionRollupDay, TransactionRollupDay.day == TransactionDailyRollup.day
+        ).filter(
+            TransactionDailyRollup.day >= start_day,
+            TransactionDailyRollup.day <= end_day
+        )
+        if user_id:
+            query = query.filter(TransactionDailyRollup.user_id == user_id)
+        query = query.group_by(
+            TransactionDailyRollup.day,
+            TransactionDailyRollup.transaction_type,
+            TransactionDailyRollup.status
+        )
+        rows.extend(RollupRow(row[0], row[1], row[2], row[3], int(row[4] or 0)) for row in query.all())
+
+    # Contiguous ranges of days that have to be aggregated live
+    ranges = []
+    day = start_day
+    while day <= end_day:
+        if day not in built:
+            if ranges and ranges[-1][1] == day:
+                ranges[-1][1] = day + timedelta(days=1)
+            else:
+                ranges.append([day, day + timedelta(days=1)])
+        day += timedelta(days=1)
+
+    if ranges:
+        live_day = func.date(Transaction.created_at)
+        query = db.session.query(
+            live_day,
+            Transaction.transaction_type,
+            Transaction.status,
+            func.count(),
+            minor_units(func.sum(Transaction.amount))
+        ).filter(or_(*[
+            and_(Transaction.created_at >= _day_range(first)[0], Transaction.created_at < _day_range(last)[0])
+            for first, last in ranges
+        ]))
+        if user_id:
+            query = query.filter(Transaction.user_id == user_id)
+        query = query.group_by(live_day, Transaction.transaction_type, Transaction.status)
+        rows.extend(RollupRow(_as_date(row[0]), row[1], row[2], row[3], int(row[4] or 0)) for row in query.all())
+
+    rows.sort(key=lambda row: row.date)
+    return rows
+
+
+def _before_flush(session, flush_context, instances):
+    """Unmark the past days whose transactions are about to change"""
+    today = datetime.utcnow().date()
+    days = set()
+    transactions = [instance for instance in list(session.new) + list(session.dirty) + list(session.deleted)
+                    if isinstance(instance, Transaction)]
+    with session.no_autoflush:
+        for instance in transactions:
+            _collect_days(session, instance, today, days)
+
+    invalidate_days(session, days)
+
+
+def invalidate_days(session, days):
+    """
+    Unmark built days so they are aggregated live until rebuilt
+
+    The before_flush hook covers ORM writes; bulk INSERT/UPDATE statements
+    bypass it and must call this in the same database transaction.
+
+    Args:
+        session: Session the transaction writes run in
+        days (set): Past days whose transactions changed
+    """
+    if days:
+        _lock_days(session, days)
+        session.execute(delete(TransactionRollupDay).where(TransactionRollupDay.day.in_(days)),
+                        execution_options={'synchronize_session': False})
+
+
+def _collect_days(session, instance, today, days):
+    """Add the past days a pending transaction change affects"""
+    if instance in session.dirty and instance not in session.deleted:
+        state = inspect(instance)
+        if not any(state.attrs[field].history.has_changes() for field in ROLLUP_FIELDS):
+            return
+        # A re-dated transaction changes both its old and its new day
+        for value in state.attrs.created_at.history.deleted or ():
+            if value is not None and value.date() < today:
+                days.add(value.date())
+
+    created_at = instance.created_at
+    if created_at is not None and created_at.date() < today:
+        days.add(created_at.date())
+
+
+def register_rollup_hooks(session):
+    """
+    Keep rollup day markers in step with transaction writes
+
+    Args:
+        session: Session class, sessionmaker or scoped_session (e.g. db.session)
+    """
+    global _hooks_registered
+    if _hooks_registered:
+        return
+    event.listen(session, 'before_flush', _before_flush)
+    _hooks_registered = True
+
+
+def start_rollup_compactor(app, interval=900):
+    """
+    Start a daemon thread that builds unbuilt days every interval seconds
+
+    Args:
+        app: Flask application (for the app context)
+        interval (int): Seconds between runs
+    """
+    stop_event = threading.Event()
+
+    def run():
+        while not stop_event.is_set():
+            try:
+                with app.app_context():
+                    compact()
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"Transaction rollup compactor failed: {str(e)}")
+            stop_event.wait(interval)
+
+    thread = threading.Thread(target=run, name='transaction-rollup-compactor', daemon=True)
+    thread.start()
+    logger.info(f"Transaction rollup compactor started (every {interval}s)")
+    return stop_event
+
+
+if __name__ == "__main__":
+    from app import app
+    with app.app_context():
+        db.create_all()
+        print(f"Built transaction rollups for {compact()} days")
@@ -0,0 +1,213 @@
+"""
+Transaction Status Store for NVC Banking Platform
+
+Bounded record of recent transaction statuses on a cluster node, and of
+the callbacks waiting for transactions to commit.
+
+- Statuses are kept in the order they were last updated. The oldest are
+  dropped once there are more than max_entries, or once they are older
+  than ttl seconds. This is only the in-memory tier: the node answers
+  lookups for older committed transactions from its state machine, which
+  its snapshots persist (ClusterNode.get_transaction_status).
+- A callback registered for a transaction fires once, when the commit
+  index passes the transaction's entry, and is then released. If the
+  transaction is already committed it fires at once. Callbacks still
+  waiting after ttl seconds fire with status 'expired'.
+- Callbacks run on a dedicated worker thread, so a slow callback doesn't
+  hold up replication. Callback lag is measured from the commit to the
+  start of the callback.
+"""
+
+import time
+import logging
+import threading
+import collections
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_TTL = 3600.0
+
+# Callback lags kept for the percentiles in get_stats
+LAG_SAMPLES = 1024
+
+
+class TransactionStatusStore:
+    """
+    Size- and TTL-bounded map of transaction statuses with commit callbacks
+
+    Thread-safe: the node's event loop records statuses while request
+    threads read them and register callbacks.
+
+    Args:
+        max_entries (int): Statuses kept at most
+        ttl (float): Seconds a status (or a waiting callback) is kept
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._statuses = collections.OrderedDict()  # tx_id -> (status, recorded_at)
+        self._callbacks = {}  # tx_id -> [(callback, registered_at)]
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tx-callbacks')
+        self._lags = collections.deque(maxlen=LAG_SAMPLES)
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'log_lookups': 0,
+            'log_hits': 0,
+            'evictions': 0,
+            'callbacks_fired': 0,
+            'callbacks_expired': 0,
+            'callback_errors': 0
+        }
+
+    def record(self, tx_id: str, status: str, index: int, timestamp: str = None) -> None:
+        """
+        Record a transaction's status, firing its callbacks if it committed
+
+        Args:
+            tx_id: Transaction ID
+            status: 'pending' or 'committed'
+            index: Log index of the transaction's entry
+            timestamp: ISO time of the change (default: now)
+        """
+        entry = {
+            'status': status,
+            'index': index,
+            'timestamp': timestamp or datetime.now().isoformat()
+        }
+        now = time.monotonic()
+        with self._lock:
+            self._statuses[tx_id] = (entry, now)
+            self._statuses.move_to_end(tx_id)
+            while len(self._statuses) > self.max_entries:
+                self._statuses.popitem(last=False)
+                self._stats['evictions'] += 1
+            callbacks = self._callbacks.pop(tx_id, None) if status == 'committed' else None
+        if callbacks:
+            self._dispatch(tx_id, entry, callbacks, now)
+
+    def get(self, tx_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a recent transaction's status
+
+        Returns:
+            dict: {'status', 'index', 'timestamp'}, or None if it isn't kept
+        """
+        with self._lock:
+            item = self._statuses.get(tx_id)
+            if item is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            return dict(item[0])
+
+    def record_log_lookup(self, found: bool) -> None:
+        """Count a lookup the node answered from its log after a miss"""
+        with self._lock:
+            self._stats['log_lookups'] += 1
+            if found:
+                self._stats['log_hits'] += 1
+
+    def add_callback(self, tx_id: str, callback: Callable[[str, Dict[str, Any]], None]) -> None:
+        """
+        Call callback(tx_id, status) once the transaction commits
+
+        Fires at once if the transaction is already recorded as committed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            item = self._statuses.get(tx_id)
+            if item is None or item[0]['status'] != 'committed':
+                self._callbacks.setdefault(tx_id, []).append((callback, now))
+                return
+        self._dispatch(tx_id, dict(item[0]), [(callback, now)], now)
+
+    def expire(self) -> None:
+        """Drop statuses older than ttl and fire callbacks that waited longer than ttl as 'expired'"""
+        cutoff = time.monotonic() - self.ttl
+        expired = []
+        with self._lock:
+            while self._statuses:
+                tx_id, (_, recorded_at) = next(iter(self._statuses.items()))
+                if recorded_at >= cutoff:
+                    break
+                self._statuses.popitem(last=False)
+                self._stats['evictions'] += 1
+            for tx_id, callbacks in list(self._callbacks.items()):
+                stale = [item for item in callbacks if item[1] < cutoff]
+                if stale:
+                    remaining = [item for item in callbacks if item[1] >= cutoff]
+                    if remaining:
+                        self._callbacks[tx_id] = remaining
+                    else:
+                        del self._callbacks[tx_id]
+                    expired.append((tx_id, stale))
+                    self._stats['callbacks_expired'] += len(stale)
+
+        for tx_id, callbacks in expired:
+            status = {'status': 'expired', 'message': f"Transaction not committed within {self.ttl:.0f}s"}
+            for callback, _ in callbacks:
+                self._executor.submit(self._run_callback, callback, tx_id, status, None)
+
+    def restore(self, committed_status: Callable[[str], Optional[Dict[str, Any]]]) -> None:
+        """
+        Drop the kept statuses after the node installed a snapshot
+
+        The snapshot may replace entries the kept statuses describe. Waiting
+        callbacks stay registered, except those of transactions the snapshot
+        shows committed, which fire.
+
+        Args:
+            committed_status: Returns the committed status of a transaction in the snapshot, or None
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._statuses = collections.OrderedDict()
+            ready = []
+            for tx_id in list(self._callbacks):
+                status = committed_status(tx_id)
+                if status is not None:
+                    ready.append((tx_id, status, self._callbacks.pop(tx_id)))
+        for tx_id, status, callbacks in ready:
+            self._dispatch(tx_id, status, callbacks, now)
+
+    def _dispatch(self, tx_id: str, status: Dict[str, Any], callbacks, committed_at: float) -> None:
+        for callback, _ in callbacks:
+            self._executor.submit(self._run_callback, callback, tx_id, status, committed_at)
+
+    def _run_callback(self, callback, tx_id: str, status: Dict[str, Any], committed_at: Optional[float]) -> None:
+        if committed_at is not None:
+            with self._lock:
+                self._lags.append(time.monotonic() - committed_at)
+                self._stats['callbacks_fired'] += 1
+        try:
+            callback(tx_id, dict(status))
+        except Exception as e:
+            with self._lock:
+                self._stats['callback_errors'] += 1
+            logger.error(f"Error in callback for transaction {tx_id}: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lags = sorted(self._lags)
+            stats = dict(
+                self._stats,
+                size=len(self._statuses),
+                max_entries=self.max_entries,
+                ttl=self.ttl,
+                waiting_callbacks=sum(len(callbacks) for callbacks in self._callbacks.values())
+            )
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['callback_lag_ms'] = {
+            'p50': lags[len(lags) // 2] * 1000 if lags else 0.0,
+            'p99': lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000 if lags else 0.0,
+            'max': lags[-1] * 1000 if lags else 0.0
+        }
+        return stats
@@ -0,0 +1,341 @@
+"""
+Bulk Transaction Sync for the PHP Banking Platform
+
+Imports the transactions the PHP banking software pushes to the php_bridge
+/transaction/sync endpoint in chunks instead of row by row:
+
+- Each chunk resolves its customers and its existing transactions with one
+  IN query each.
+- Rows matching an existing transaction update it with one executemany
+  UPDATE by primary key.
+- New rows are written with one INSERT ... ON CONFLICT (external_id)
+  DO UPDATE against the partial unique index ux_transaction_sync_external_id,
+  so a row a concurrent sync inserted since the lookup is updated instead of
+  failing the chunk.
+- Bulk statements bypass the ORM hooks, so message_channel is classified
+  here and rollup day markers and balance checkpoints are invalidated in the
+  same database transaction.
+- Each chunk commits on its own. Invalid rows (including amounts outside the
+  amount column's range) and failed chunks are reported per row and the
+  sync carries on with the next chunk.
+"""
+
+import json
+import uuid
+import logging
+from decimal import Decimal, InvalidOperation
+from datetime import datetime, timezone, time as day_time
+from itertools import islice
+
+from sqlalchemy import select, update, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import (db, User, Transaction, TransactionType, TransactionStatus, FinancialInstitution,
+                    classify_message_channel)
+from transaction_rollup import invalidate_days
+from statement_checkpoints import invalidate_checkpoints
+
+logger = logging.getLogger(__name__)
+
+# Rows per lookup, upsert and commit
+SYNC_CHUNK_SIZE = 1000
+
+# Prefix of the transaction_id of every synced transaction; the unique
+# index on external_id only covers these rows
+SYNC_ID_PREFIX = 'NVC-SYNC-'
+SYNC_INDEX_WHERE = text(f"transaction_id LIKE '{SYNC_ID_PREFIX}%'")
+
+# PHP transaction status -> our status (anything else is pending)
+STATUS_MAPPING = {
+    'pending': TransactionStatus.PENDING,
+    'processing': TransactionStatus.PROCESSING,
+    'completed': TransactionStatus.COMPLETED,
+    'failed': TransactionStatus.FAILED,
+    'refunded': TransactionStatus.REFUNDED,
+    'cancelled': TransactionStatus.FAILED
+}
+
+# Columns a sync writes on a transaction that already exists
+UPDATE_FIELDS = ('amount', 'currency', 'description', 'status')
+
+# Dialects whose INSERT supports ON CONFLICT on a partial unique index
+UPSERT_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def iter_ndjson(lines):
+    """
+    Yield the non-blank lines of an NDJSON body without reading it all
+
+    Lines are decoded by sync_transaction_rows, so a malformed line is
+    reported as a failed row instead of aborting the upload.
+
+    Args:
+        lines: Iterable of lines, e.g. a request stream or an open file
+
+    Returns:
+        generator: Raw lines (bytes or str)
+    """
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def _reference(txn):
+    return txn.get('transaction_id') if isinstance(txn, dict) else None
+
+
+def _row_error(index, reference, message):
+    return {"index": index, "transaction": reference, "error": message}
+
+
+def _parse_created_at(value):
+    """Parse an ISO 8601 timestamp into naive UTC, like datetime.utcnow()"""
+    if not value:
+        return datetime.utcnow()
+    moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _prepare(txn):
+    """
+    Validate one incoming row
+
+    Args:
+        txn (dict): Incoming row
+
+    Returns:
+        dict: external_id, customer_id and the UPDATE_FIELDS values
+
+    Raises:
+        ValueError: If the row is malformed
+    """
+    if not isinstance(txn, dict):
+        raise ValueError("Transaction must be a JSON object")
+
+    for field in ('transaction_id', 'customer_id', 'amount', 'currency'):
+        if txn.get(field) in (None, ''):
+            raise ValueError(f"Missing {field}")
+
+    external_id = str(txn['transaction_id'])
+    if len(external_id) > 64:
+        raise ValueError("transaction_id is longer than 64 characters")
+    currency = str(txn['currency'])
+    if len(currency) > 10:
+        raise ValueError(f"Invalid currency {currency}")
+    try:
+        amount = Decimal(str(txn['amount']))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount {txn['amount']}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount {txn['amount']}")
+    # Checked here so an out-of-range amount fails its own row, not the chunk's statement
+    amount = Transaction.amount.type.to_storage(amount)
+
+    return {
+        'external_id': external_id,
+        'customer_id': str(txn['customer_id']),
+        'amount': amount,
+        'currency': currency,
+        'description': str(txn.get('description') or '')[:256],
+        'status': STATUS_MAPPING.get(str(txn.get('status') or '').lower(), TransactionStatus.PENDING),
+    }
+
+
+def _new_values(txn, row, user_id, gateway_id, now):
+    """Column values of a transaction the sync creates"""
+    type_name = str(txn.get('transaction_type') or '').upper()
+    if type_name not in TransactionType.__members__:
+        raise ValueError(f"Unknown transaction_type {txn.get('transaction_type')}")
+    return {
+        'transaction_id': f"{SYNC_ID_PREFIX}{uuid.uuid4().hex}",
+        'external_id': row['external_id'],
+        'user_id': user_id,
+        'amount': row['amount'],
+        'currency': row['currency'],
+        'description': f"Imported: {row['description']}"[:256],
+        'status': row['status'],
+        'transaction_type': TransactionType[type_name],
+        'gateway_id': gateway_id,
+        'created_at': _parse_created_at(txn.get('created_at')),
+        'updated_at': now
+    }
+
+
+def _write_chunk(session, rows, gateway_id):
+    """
+    Upsert one chunk of validated rows (the caller commits)
+
+    Args:
+        session: Database session
+        rows (list): (index, txn, row dict) tuples
+        gateway_id (int): Gateway of the transactions created
+
+    Returns:
+        tuple: (created, updated, row errors)
+    """
+    now = datetime.utcnow()
+    customer_ids = {row['customer_id'] for _, _, row in rows}
+    external_ids = {row['external_id'] for _, _, row in rows}
+
+    # Lowest id wins when several users or transactions share an external id
+    users = dict(session.execute(
+        select(User.external_customer_id, User.id)
+        .where(User.external_customer_id.in_(customer_ids))
+        .order_by(User.id.desc())
+    ).all())
+    # Only synced transactions own an external id (the unique index's predicate)
+    existing = {record.external_id: record for record in session.execute(
+        select(Transaction.external_id, Transaction.id, Transaction.user_id, Transaction.transaction_type,
+               Transaction.tx_metadata_json, Transaction.created_at, Transaction.recipient_account,
+               FinancialInstitution.name.label('institution_name'))
+        .outerjoin(FinancialInstitution, Transaction.institution_id == FinancialInstitution.id)
+        .where(Transaction.external_id.in_(external_ids), SYNC_INDEX_WHERE)
+        .order_by(Transaction.id.desc())
+    )}
+
+    # Rows repeating an external id apply in order, as if synced one by one:
+    # the first creates the transaction and later ones update it
+    updates, inserts, errors = {}, {}, []
+    insert_rows = {}
+    created = updated = 0
+    for index, txn, row in rows:
+        user_id = users.get(row['customer_id'])
+        if user_id is None:
+            errors.append(_row_error(index, row['external_id'], f"User with customer_id {row['customer_id']} not found"))
+            continue
+        external_id = row['external_id']
+        owner_id = existing[external_id].user_id if external_id in existing else inserts.get(external_id, {}).get('user_id')
+        if owner_id is not None and owner_id != user_id:
+            errors.append(_row_error(index, external_id, f"external_id {external_id} belongs to another customer"))
+            continue
+        changes = {field: row[field] for field in UPDATE_FIELDS}
+        if external_id in existing:
+            updates[external_id] = changes
+            updated += 1
+        elif external_id in inserts:
+            inserts[external_id].update(changes)
+            updated += 1
+        else:
+            try:
+                inserts[external_id] = _new_values(txn, row, user_id, gateway_id, now)
+            except ValueError as e:
+                errors.append(_row_error(index, external_id, str(e)))
+                continue
+            insert_rows[external_id] = index
+            created += 1
+
+    if updates:
+        session.execute(update(Transaction), [
+            dict(changes, id=existing[external_id].id, updated_at=now, message_channel=classify_message_channel(
+                existing[external_id].transaction_type, changes['description'],
+                existing[external_id].tx_metadata_json, existing[external_id].institution_name
+            ))
+            for external_id, changes in updates.items()
+        ])
+
+    if inserts:
+        values = list(inserts.values())
+        for value in values:
+            value['message_channel'] = classify_message_channel(value['transaction_type'], value['description'])
+        upsert = UPSERT_INSERTS.get(session.get_bind().dialect.name)
+        if upsert is None:
+            session.execute(insert(Transaction), values)
+        else:
+            statement = upsert(Transaction)
+            statement = statement.on_conflict_do_update(
+                index_elements=[Transaction.external_id],
+                index_where=SYNC_INDEX_WHERE,
+                set_={field: statement.excluded[field] for field in UPDATE_FIELDS + ('message_channel', 'updated_at')},
+                where=Transaction.user_id == statement.excluded.user_id
+            ).returning(Transaction.external_id, Transaction.transaction_id)
+            # A row keeping another transaction_id was inserted by a concurrent sync and updated here;
+            # a row missing from the result conflicted with another customer's transaction
+            written = dict(session.execute(statement, values).all())
+            raced = sum(1 for external_id, transaction_id in written.items()
+                        if transaction_id != inserts[external_id]['transaction_id'])
+            rejected = inserts.keys() - written.keys()
+            for external_id in rejected:
+                errors.append(_row_error(insert_rows[external_id], external_id,
+                                         f"external_id {external_id} belongs to another customer"))
+                del inserts[external_id]
+            created -= raced + len(rejected)
+            updated += raced
+
+    today_start = datetime.combine(now.date(), day_time.min)
+    moments = [value['created_at'] for value in inserts.values()]
+    moments.extend(existing[external_id].created_at for external_id in updates)
+    invalidate_days(session, {moment.date() for moment in moments if moment is not None and moment < today_start})
+
+    earliest = {}
+    for external_id in updates:
+        record = existing[external_id]
+        if record.recipient_account and record.created_at is not None and record.created_at < today_start:
+            if record.recipient_account not in earliest or record.created_at < earliest[record.recipient_account]:
+                earliest[record.recipient_account] = record.created_at
+    invalidate_checkpoints(session, earliest)
+
+    return created, updated, errors
+
+
+def sync_transaction_rows(transactions, gateway_id=None, chunk_size=SYNC_CHUNK_SIZE, session=None):
+    """
+    Create or update transactions synced from the PHP platform in chunks
+
+    Args:
+        transactions: Iterable of row objects or NDJSON lines (see iter_ndjson),
+            consumed one chunk at a time
+        gateway_id (int): Gateway of the transactions created
+        chunk_size (int): Rows per lookup, upsert and commit
+        session: Database session (defaults to db.session)
+
+    Returns:
+        dict: success, processed, created and updated counts, and errors with
+            the index and transaction_id of every row that was not synced
+    """
+    session = session or db.session
+    results = {
+        "success": True,
+        "processed": 0,
+        "created": 0,
+        "updated": 0,
+        "errors": []
+    }
+
+    rows = enumerate(transactions)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        prepared = []
+        for index, txn in chunk:
+            try:
+                if isinstance(txn, (bytes, str)):
+                    txn = json.loads(txn)
+                prepared.append((index, txn, _prepare(txn)))
+            except ValueError as e:
+                results["errors"].append(_row_error(index, _reference(txn), str(e)))
+
+        if not prepared:
+            continue
+        try:
+            created, updated, errors = _write_chunk(session, prepared, gateway_id)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error syncing transactions {prepared[0][0]}-{prepared[-1][0]}: {str(e)}")
+            results["errors"].extend(_row_error(index, row['external_id'], str(e)) for index, _, row in prepared)
+            continue
+
+        results["created"] += created
+        results["updated"] += updated
+        results["processed"] += created + updated
+        results["errors"].extend(errors)
+
+    results["errors"].sort(key=lambda error: error["index"])
+    logger.info(f"Synced {results['processed']} transactions ({results['created']} created, "
+                f"{results['updated']} updated), {len(results['errors'])} failed")
+    return results
@@ -7,6 +7,7 @@ to treasury accounts and creating appropriate transaction records.
 
 import logging
 import uuid
+from decimal import Decimal
 from datetime import datetime, timedelta
 from typing import Tuple, Optional, List
 
@@ -14,6 +15,7 @@ from sqlalchemy import or_, func, desc
 from sqlalchemy.exc import SQLAlchemyError
 
 from app import db
+from money import to_decimal
 from models import TransactionStatus, TreasuryAccount, TreasuryTransaction, TreasuryTransactionType
 from payment_models import StripePayment, PayPalPayment, POSPayment
 
@@ -69,7 +71,7 @@ class SettlementBridge:
             return ("no-payments", 0.0)
         
         # Calculate total settlement amount
-        total_amount = sum(payment.amount for payment in payments)
+        total_amount = sum((to_decimal(payment.amount) for payment in payments), Decimal(0))
         
         # Generate a unique settlement reference
         settlement_id = f"STRIPE-{datetime.utcnow().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8]}"
@@ -134,7 +136,7 @@ class SettlementBridge:
             return ("no-payments", 0.0)
         
         # Calculate total settlement amount
-        total_amount = sum(payment.amount for payment in payments)
+        total_amount = sum((to_decimal(payment.amount) for payment in payments), Decimal(0))
         
         # Generate a unique settlement reference
         settlement_id = f"PAYPAL-{datetime.utcnow().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8]}"
@@ -199,7 +201,7 @@ class SettlementBridge:
             return ("no-payments", 0.0)
         
         # Calculate total settlement amount
-        total_amount = sum(payment.amount for payment in payments)
+        total_amount = sum((to_decimal(payment.amount) for payment in payments), Decimal(0))
         
         # Generate a unique settlement reference
         settlement_id = f"POS-{datetime.utcnow().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8]}"
@@ -86,10 +86,9 @@ def calculate_transaction_fee(amount, transaction_type):
 
 def get_transaction_analytics(user_id=None, days=30):
     """Get transaction analytics for the specified period"""
-    from models import Transaction, TransactionType
-    from sqlalchemy import func
-    import decimal
-    import json
+    from transaction_rollup import get_daily_totals
+    from models import Transaction
+    from money import from_minor_units
     
     # Default empty structure that matches what the dashboard.js expects
     default_analytics = {
@@ -109,70 +108,33 @@ def get_transaction_analytics(user_id=None, days=30):
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Base query
-        query = db.session.query(
-            func.date(Transaction.created_at).label('date'),
-            Transaction.transaction_type,
-            Transaction.status,
-            func.count().label('count'),
-            func.sum(Transaction.amount).label('total_amount')
-        )
-        
-        # Filter by date range
-        query = query.filter(
-            Transaction.created_at >= start_date,
-            Transaction.created_at <= end_date
-        )
-        
-        # Filter by user if specified
-        if user_id:
-            query = query.filter(Transaction.user_id == user_id)
-        
-        # Group by date, type, and status
-        query = query.group_by(
-            func.date(Transaction.created_at),
-            Transaction.transaction_type,
-            Transaction.status
-        )
-        
-        # Sort by date
-        query = query.order_by(func.date(Transaction.created_at))
-        
-        # Execute query
-        results = query.all()
+        # Read per-day totals from the rollup table (plus a live aggregate
+        # of today), so the cost does not grow with the transaction table
+        results = get_daily_totals(start_date.date(), end_date.date(), user_id)
         
         # If no results, return the default structure
         if not results:
             logger.info(f"No transaction analytics data found for user {user_id}")
             return default_analytics
         
-        # Helper function to convert decimals to float for JSON serialization
-        def decimal_to_float(obj):
-            if isinstance(obj, decimal.Decimal):
-                return float(obj)
-            return obj
-        
-        # Organize results with safe conversion of decimal values
+        # Amounts are summed as integer minor units and converted once at the end
+        scale = Transaction.amount.type.scale
+
+        def to_amount(minor):
+            return float(from_minor_units(minor, scale))
+
         analytics = {
             'days': days,
             'start_date': start_date.strftime('%Y-%m-%d'),
             'end_date': end_date.strftime('%Y-%m-%d'),
             'total_transactions': sum(r.count for r in results),
-            'total_amount': 0.0,  # Initialize with float instead of potentially Decimal
+            'total_amount': to_amount(sum(r.total_minor for r in results)),
             'by_type': {},
             'by_status': {},
             'by_date': {},
             'raw_data': []
         }
         
-        # Calculate total amount with explicit conversion to float
-        try:
-            total_sum = sum(decimal_to_float(r.total_amount or 0) for r in results)
-            analytics['total_amount'] = float(total_sum) if total_sum is not None else 0.0
-        except (TypeError, ValueError, decimal.InvalidOperation) as e:
-            logger.error(f"Error calculating total amount: {str(e)}")
-            analytics['total_amount'] = 0.0
-        
         # Process results
         for r in results:
             # Convert enums to strings and handle possible None values
@@ -180,44 +142,27 @@ def get_transaction_analytics(user_id=None, days=30):
             status_str = r.status.value if r.status else 'unknown'
             date_str = r.date.strftime('%Y-%m-%d') if r.date else 'unknown'
             count = r.count or 0
-            total_amount = decimal_to_float(r.total_amount or 0)
+            total_minor = r.total_minor
             
             # By type
-            if type_str not in analytics['by_type']:
-                analytics['by_type'][type_str] = {
-                    'count': 0,
-                    'total_amount': 0.0  # Initialize with float
-                }
-            analytics['by_type'][type_str]['count'] += count
-            analytics['by_type'][type_str]['total_amount'] = float(analytics['by_type'][type_str]['total_amount'] + total_amount)
+            by_type = analytics['by_type'].setdefault(type_str, {'count': 0, 'total_amount': 0})
+            by_type['count'] += count
+            by_type['total_amount'] += total_minor
             
             # By status
-            if status_str not in analytics['by_status']:
-                analytics['by_status'][status_str] = {
-                    'count': 0,
-                    'total_amount': 0.0  # Initialize with float
-                }
-            analytics['by_status'][status_str]['count'] += count
-            analytics['by_status'][status_str]['total_amount'] = float(analytics['by_status'][status_str]['total_amount'] + total_amount)
+            by_status = analytics['by_status'].setdefault(status_str, {'count': 0, 'total_amount': 0})
+            by_status['count'] += count
+            by_status['total_amount'] += total_minor
             
             # By date
-            if date_str not in analytics['by_date']:
-                analytics['by_date'][date_str] = {
-                    'count': 0,
-                    'total_amount': 0.0,  # Initialize with float
-                    'by_type': {}
-                }
-            analytics['by_date'][date_str]['count'] += count
-            analytics['by_date'][date_str]['total_amount'] = float(analytics['by_date'][date_str]['total_amount'] + total_amount)
+            by_date = analytics['by_date'].setdefault(date_str, {'count': 0, 'total_amount': 0, 'by_type': {}})
+            by_date['count'] += count
+            by_date['total_amount'] += total_minor
             
             # By date and type
-            if type_str not in analytics['by_date'][date_str]['by_type']:
-                analytics['by_date'][date_str]['by_type'][type_str] = {
-                    'count': 0,
-                    'total_amount': 0.0  # Initialize with float
-                }
-            analytics['by_date'][date_str]['by_type'][type_str]['count'] += count
-            analytics['by_date'][date_str]['by_type'][type_str]['total_amount'] = float(analytics['by_date'][date_str]['by_type'][type_str]['total_amount'] + total_amount)
+            by_date_type = by_date['by_type'].setdefault(type_str, {'count': 0, 'total_amount': 0})
+            by_date_type['count'] += count
+            by_date_type['total_amount'] += total_minor
             
             # Raw data
             analytics['raw_data'].append({
@@ -225,7 +170,7 @@ def get_transaction_analytics(user_id=None, days=30):
                 'type': type_str,
                 'status': status_str,
                 'count': count,
-                'total_amount': float(total_amount)  # Ensure float in raw data
+                'total_amount': to_amount(total_minor)
             })
         
         # Ensure we have data for all days in the range, even if no transactions
@@ -235,35 +180,18 @@ def get_transaction_analytics(user_id=None, days=30):
             if date_str not in analytics['by_date']:
                 analytics['by_date'][date_str] = {
                     'count': 0,
-                    'total_amount': 0.0,  # Initialize with float
+                    'total_amount': 0,
                     'by_type': {}
                 }
             current_date += timedelta(days=1)
         
-        # Final check to ensure all amounts are floats before returning
-        try:
-            # Verify all nested amounts are floats
-            for type_key in analytics['by_type']:
-                analytics['by_type'][type_key]['total_amount'] = float(analytics['by_type'][type_key]['total_amount'])
-            
-            for status_key in analytics['by_status']:
-                analytics['by_status'][status_key]['total_amount'] = float(analytics['by_status'][status_key]['total_amount'])
-            
-            for date_key in analytics['by_date']:
-                analytics['by_date'][date_key]['total_amount'] = float(analytics['by_date'][date_key]['total_amount'])
-                for type_key in analytics['by_date'][date_key].get('by_type', {}):
-                    if 'total_amount' in analytics['by_date'][date_key]['by_type'][type_key]:
-                        analytics['by_date'][date_key]['by_type'][type_key]['total_amount'] = float(
-                            analytics['by_date'][date_key]['by_type'][type_key]['total_amount']
-                        )
-            
-            # Ensure total_amount is a float
-            analytics['total_amount'] = float(analytics['total_amount'])
-            
-            logger.debug("Successfully converted all decimal values to float in analytics")
-        except Exception as e:
-            logger.error(f"Error converting decimal values in analytics: {str(e)}")
-            # Continue with the data as is - we've done our best to convert values
+        # Convert the minor-unit totals to float amounts for JSON
+        for bucket in list(analytics['by_type'].values()) + list(analytics['by_status'].values()):
+            bucket['total_amount'] = to_amount(bucket['total_amount'])
+        for by_date in analytics['by_date'].values():
+            by_date['total_amount'] = to_amount(by_date['total_amount'])
+            for bucket in by_date['by_type'].values():
+                bucket['total_amount'] = to_amount(bucket['total_amount'])
         
         return analytics
     